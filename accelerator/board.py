@@ -21,7 +21,6 @@ import json
 import sys
 import os
 import tarfile
-import itertools
 import collections
 import functools
 
@@ -346,9 +345,10 @@ def run(cfg, from_shell=False):
 		ds = Dataset(dsid.rstrip('/'))
 		q = bottle.request.query
 		if q.column:
-			lines = int(q.lines or 10)
-			it = ds.iterate(None, q.column)
-			it = itertools.islice(it, lines)
+			total = sum(ds.lines)
+			start = min(int(q.start or 0), total)
+			stop = min(start + int(q.lines or 10), total)
+			it = ds.iterate(None, q.column, slice=slice(start, stop))
 			t = ds.columns[q.column].type
 			if t in ('datetime', 'date', 'time',):
 				it = map(str, it)
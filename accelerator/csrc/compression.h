@@ -0,0 +1,737 @@
+/**
+ * Copyright (c) 2022 Carl Drougge
+ *
+ * Licensed under the Apache License, Version 2.0 (the "License");
+ * you may not use this file except in compliance with the License.
+ * You may obtain a copy of the License at
+ *
+ *  http://www.apache.org/licenses/LICENSE-2.0
+ *
+ * Unless required by applicable law or agreed to in writing, software
+ * distributed under the License is distributed on an "AS IS" BASIS,
+ * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ * See the License for the specific language governing permissions and
+ * limitations under the License.
+ **/
+
+// The compressors used for dataset columns. This is shared between
+// _dsutil and the generated modules (dataset_type, csvimport), so it
+// should not use python.
+//
+// All formats must be safe to concatenate, because slice files get
+// concatenated (both when merging and when rehashing).
+
+#ifndef DSU_COMPRESSION_H
+#define DSU_COMPRESSION_H
+
+#include <zlib.h>
+#include <errno.h>
+#include <stdint.h>
+#include <stdlib.h>
+#include <string.h>
+#include <unistd.h>
+#include <sys/types.h>
+#include <sys/stat.h>
+#include <sys/fcntl.h>
+
+#include "lz4.h"
+#ifdef DSU_HAVE_ZSTD
+#  include <zstd.h>
+#endif
+
+// Uncompressed size of lz4 blocks.
+#define DSU_BLOCK_SIZE (128 * 1024)
+
+// read: fills up to *len bytes, returns 0 or error. *len is set to how
+//       many bytes were read, which is only less than asked for at EOF.
+// write: returns 0 or error.
+// write_open: level <= 0 means the default for that compressor.
+// restart: ends what has been written so far so that reading can start
+//          (with read_open) at the returned file offset. Returns -1 on
+//          error.
+typedef struct dsu_compressor {
+	const char *name;
+	int (*read)(void *ctx, char *buf, int *len);
+	int (*write)(void *ctx, const char *buf, int len);
+	void *(*read_open)(int fd, ssize_t size_hint);
+	void *(*write_open)(int fd, int level);
+	void (*read_close)(void *ctx);
+	int (*write_close)(void *ctx);
+	off_t (*restart)(void *ctx);
+} dsu_compressor;
+
+static int dsu_write_all(int fd, const char *buf, size_t len)
+{
+	while (len) {
+		ssize_t wrote = write(fd, buf, len);
+		if (wrote <= 0) {
+			if (wrote < 0 && errno == EINTR) continue;
+			return 1;
+		}
+		buf += wrote;
+		len -= wrote;
+	}
+	return 0;
+}
+
+// Returns how much was read, which is only less than len at EOF, or -1.
+static ssize_t dsu_read_all(int fd, char *buf, size_t len)
+{
+	size_t got = 0;
+	while (got < len) {
+		ssize_t r = read(fd, buf + got, len - got);
+		if (r < 0) {
+			if (errno == EINTR) continue;
+			return -1;
+		}
+		if (r == 0) break;
+		got += r;
+	}
+	return got;
+}
+
+
+// Writers keep their own fd and give zlib a dup of it, so restart can
+// end the gzip member and start a new one in the same file. Concatenated
+// members read as the concatenated data.
+
+typedef struct dsu_gz_ctx {
+	gzFile fh;
+	int fd;
+	char mode[8];
+} dsu_gz_ctx;
+
+static void *dsu_gz_read_open(int fd, ssize_t size_hint)
+{
+	dsu_gz_ctx *ctx;
+	ctx = malloc(sizeof(*ctx));
+	if (!ctx) goto err;
+	ctx->fd = -1;
+	ctx->fh = gzdopen(fd, "rb");
+	if (!ctx->fh) goto err;
+	if (size_hint >= 0 && size_hint < 400000) {
+		gzbuffer(ctx->fh, 16 * 1024);
+	} else {
+		gzbuffer(ctx->fh, 64 * 1024);
+	}
+	if (gzdirect(ctx->fh)) {
+		errno = EINVAL; // not gzip compressed
+		goto err;
+	}
+	return ctx;
+err:
+	if (ctx) free(ctx);
+	return 0;
+}
+
+static int dsu_gz_read(void *ctx_, char *buf, int *len)
+{
+	dsu_gz_ctx *ctx = ctx_;
+	if (!ctx->fh) goto err;
+	int got = gzread(ctx->fh, buf, *len);
+	if (got == -1) goto err;
+	*len = got;
+	int error = 0;
+	if (got == 0) gzerror(ctx->fh, &error);
+	return error;
+err:
+	if (ctx->fh) {
+		gzclose(ctx->fh);
+		ctx->fh = 0;
+	}
+	return 1;
+}
+
+static void dsu_gz_read_close(void *ctx_)
+{
+	dsu_gz_ctx *ctx = ctx_;
+	if (ctx->fh) gzclose(ctx->fh);
+	free(ctx);
+}
+
+static gzFile dsu_gz_dopen(dsu_gz_ctx *ctx)
+{
+	int fd = dup(ctx->fd);
+	if (fd < 0) return 0;
+	gzFile fh = gzdopen(fd, ctx->mode);
+	if (!fh) close(fd);
+	return fh;
+}
+
+static void *dsu_gz_write_open(int fd, int level)
+{
+	dsu_gz_ctx *ctx;
+	ctx = malloc(sizeof(*ctx));
+	if (!ctx) return 0;
+	strcpy(ctx->mode, "wb");
+	if (level > 9) level = 9;
+	if (level > 0) ctx->mode[2] = '0' + level;
+	ctx->fd = fd;
+	ctx->fh = dsu_gz_dopen(ctx);
+	if (!ctx->fh) {
+		free(ctx);
+		return 0;
+	}
+	return ctx;
+}
+
+static int dsu_gz_write_close(void *ctx_)
+{
+	int res = 1;
+	dsu_gz_ctx *ctx = ctx_;
+	if (ctx->fh) res = gzclose(ctx->fh);
+	res |= close(ctx->fd);
+	free(ctx);
+	return res;
+}
+
+static off_t dsu_gz_restart(void *ctx_)
+{
+	dsu_gz_ctx *ctx = ctx_;
+	if (!ctx->fh) return -1;
+	int res = gzclose(ctx->fh);
+	ctx->fh = 0;
+	if (res != Z_OK) return -1;
+	off_t pos = lseek(ctx->fd, 0, SEEK_CUR);
+	if (pos < 0) return -1;
+	ctx->fh = dsu_gz_dopen(ctx);
+	if (!ctx->fh) return -1;
+	return pos;
+}
+
+static int dsu_gz_write(void *ctx_, const char *buf, int len)
+{
+	dsu_gz_ctx *ctx = ctx_;
+	if (!ctx->fh) goto err;
+	int wrote = gzwrite(ctx->fh, buf, len);
+	if (wrote != len) goto err;
+	return 0;
+err:
+	if (ctx->fh) {
+		gzclose(ctx->fh);
+		ctx->fh = 0;
+	}
+	return 1;
+}
+
+static const dsu_compressor dsu_gz = {
+	"gzip",
+	dsu_gz_read,
+	dsu_gz_write,
+	dsu_gz_read_open,
+	dsu_gz_write_open,
+	dsu_gz_read_close,
+	dsu_gz_write_close,
+	dsu_gz_restart,
+};
+
+
+// lz4 files are a sequence of independent blocks, each prefixed by
+// uint32_t compressed_size, uint32_t uncompressed_size (native endian,
+// like everything else in the column files).
+
+#define DSU_LZ4_BOUND LZ4_COMPRESSBOUND(DSU_BLOCK_SIZE)
+
+typedef struct dsu_lz4_ctx {
+	int fd;
+	int error;
+	int pos;
+	int len;
+	char raw[DSU_BLOCK_SIZE];
+	char compressed[DSU_LZ4_BOUND + 8];
+} dsu_lz4_ctx;
+
+static void *dsu_lz4_open(int fd)
+{
+	dsu_lz4_ctx *ctx = malloc(sizeof(*ctx));
+	if (!ctx) return 0;
+	ctx->fd = fd;
+	ctx->error = 0;
+	ctx->pos = ctx->len = 0;
+	return ctx;
+}
+
+static void *dsu_lz4_read_open(int fd, ssize_t size_hint)
+{
+	(void) size_hint;
+	return dsu_lz4_open(fd);
+}
+
+static void *dsu_lz4_write_open(int fd, int level)
+{
+	(void) level;
+	return dsu_lz4_open(fd);
+}
+
+// Decompresses the next block into dest (which has room for max_len
+// bytes). Returns the decompressed size, 0 at EOF or -1 on error.
+// If the block does not fit in max_len it is decompressed into ctx->raw
+// instead, and -2 is returned.
+static int dsu_lz4_read_block(dsu_lz4_ctx *ctx, char *dest, int max_len)
+{
+	uint32_t sizes[2];
+	ssize_t got = dsu_read_all(ctx->fd, (char *)sizes, sizeof(sizes));
+	if (got == 0) return 0;
+	if (got != sizeof(sizes)) return -1;
+	if (sizes[0] > DSU_LZ4_BOUND || sizes[1] > DSU_BLOCK_SIZE || !sizes[1]) return -1;
+	if (dsu_read_all(ctx->fd, ctx->compressed, sizes[0]) != (ssize_t)sizes[0]) return -1;
+	if ((int)sizes[1] > max_len) dest = ctx->raw;
+	int res = LZ4_decompress_safe(ctx->compressed, dest, sizes[0], sizes[1]);
+	if (res != (int)sizes[1]) return -1;
+	if (dest == ctx->raw) {
+		ctx->pos = 0;
+		ctx->len = res;
+		return -2;
+	}
+	return res;
+}
+
+static int dsu_lz4_read(void *ctx_, char *buf, int *len)
+{
+	dsu_lz4_ctx *ctx = ctx_;
+	int want = *len;
+	int got = 0;
+	if (ctx->error) return 1;
+	while (got < want) {
+		if (ctx->pos == ctx->len) {
+			int res = dsu_lz4_read_block(ctx, buf + got, want - got);
+			if (res == 0) break;
+			if (res == -1) {
+				ctx->error = 1;
+				return 1;
+			}
+			if (res > 0) {
+				got += res;
+				continue;
+			}
+		}
+		int avail = ctx->len - ctx->pos;
+		if (avail > want - got) avail = want - got;
+		memcpy(buf + got, ctx->raw + ctx->pos, avail);
+		ctx->pos += avail;
+		got += avail;
+	}
+	*len = got;
+	return 0;
+}
+
+static void dsu_lz4_read_close(void *ctx_)
+{
+	dsu_lz4_ctx *ctx = ctx_;
+	close(ctx->fd);
+	free(ctx);
+}
+
+static int dsu_lz4_write_block(dsu_lz4_ctx *ctx, const char *buf, int len)
+{
+	uint32_t sizes[2];
+	int res = LZ4_compress_default(buf, ctx->compressed + sizeof(sizes), len, DSU_LZ4_BOUND);
+	if (res <= 0) return 1;
+	sizes[0] = res;
+	sizes[1] = len;
+	memcpy(ctx->compressed, sizes, sizeof(sizes));
+	return dsu_write_all(ctx->fd, ctx->compressed, res + sizeof(sizes));
+}
+
+static int dsu_lz4_write(void *ctx_, const char *buf, int len)
+{
+	dsu_lz4_ctx *ctx = ctx_;
+	if (ctx->error) return 1;
+	while (len) {
+		if (!ctx->len && len >= DSU_BLOCK_SIZE) {
+			if (dsu_lz4_write_block(ctx, buf, DSU_BLOCK_SIZE)) goto err;
+			buf += DSU_BLOCK_SIZE;
+			len -= DSU_BLOCK_SIZE;
+			continue;
+		}
+		int chunk = DSU_BLOCK_SIZE - ctx->len;
+		if (chunk > len) chunk = len;
+		memcpy(ctx->raw + ctx->len, buf, chunk);
+		ctx->len += chunk;
+		buf += chunk;
+		len -= chunk;
+		if (ctx->len == DSU_BLOCK_SIZE) {
+			ctx->len = 0;
+			if (dsu_lz4_write_block(ctx, ctx->raw, DSU_BLOCK_SIZE)) goto err;
+		}
+	}
+	return 0;
+err:
+	ctx->error = 1;
+	return 1;
+}
+
+static int dsu_lz4_write_close(void *ctx_)
+{
+	dsu_lz4_ctx *ctx = ctx_;
+	int res = ctx->error;
+	if (!res && ctx->len) {
+		res = dsu_lz4_write_block(ctx, ctx->raw, ctx->len);
+	}
+	res |= close(ctx->fd);
+	free(ctx);
+	return res;
+}
+
+// Blocks are independent, so just end the current one.
+static off_t dsu_lz4_restart(void *ctx_)
+{
+	dsu_lz4_ctx *ctx = ctx_;
+	if (ctx->error) return -1;
+	if (ctx->len) {
+		const int len = ctx->len;
+		ctx->len = 0;
+		if (dsu_lz4_write_block(ctx, ctx->raw, len)) {
+			ctx->error = 1;
+			return -1;
+		}
+	}
+	return lseek(ctx->fd, 0, SEEK_CUR);
+}
+
+static const dsu_compressor dsu_lz4 = {
+	"lz4",
+	dsu_lz4_read,
+	dsu_lz4_write,
+	dsu_lz4_read_open,
+	dsu_lz4_write_open,
+	dsu_lz4_read_close,
+	dsu_lz4_write_close,
+	dsu_lz4_restart,
+};
+
+
+#ifdef DSU_HAVE_ZSTD
+
+// Plain zstd frames, one per writer. Concatenated frames decompress as
+// the concatenated data.
+
+typedef struct dsu_zstd_ctx {
+	int fd;
+	int error;
+	ZSTD_CCtx *cctx;
+	ZSTD_DCtx *dctx;
+	ZSTD_inBuffer in;
+	size_t bufsize;
+	char *buf;
+} dsu_zstd_ctx;
+
+static void dsu_zstd_free(dsu_zstd_ctx *ctx)
+{
+	if (ctx->cctx) ZSTD_freeCCtx(ctx->cctx);
+	if (ctx->dctx) ZSTD_freeDCtx(ctx->dctx);
+	if (ctx->buf) free(ctx->buf);
+	free(ctx);
+}
+
+static void *dsu_zstd_read_open(int fd, ssize_t size_hint)
+{
+	(void) size_hint;
+	dsu_zstd_ctx *ctx = calloc(1, sizeof(*ctx));
+	if (!ctx) return 0;
+	ctx->fd = fd;
+	ctx->bufsize = ZSTD_DStreamInSize();
+	ctx->buf = malloc(ctx->bufsize);
+	ctx->dctx = ZSTD_createDCtx();
+	if (!ctx->buf || !ctx->dctx) {
+		dsu_zstd_free(ctx);
+		return 0;
+	}
+	ctx->in.src = ctx->buf;
+	return ctx;
+}
+
+static int dsu_zstd_read(void *ctx_, char *buf, int *len)
+{
+	dsu_zstd_ctx *ctx = ctx_;
+	ZSTD_outBuffer out = { buf, *len, 0 };
+	if (ctx->error) return 1;
+	while (out.pos < out.size) {
+		if (ctx->in.pos == ctx->in.size) {
+			ssize_t got = read(ctx->fd, ctx->buf, ctx->bufsize);
+			if (got < 0) {
+				if (errno == EINTR) continue;
+				goto err;
+			}
+			if (got == 0) break;
+			ctx->in.size = got;
+			ctx->in.pos = 0;
+		}
+		size_t res = ZSTD_decompressStream(ctx->dctx, &out, &ctx->in);
+		if (ZSTD_isError(res)) goto err;
+	}
+	*len = out.pos;
+	return 0;
+err:
+	ctx->error = 1;
+	return 1;
+}
+
+static void dsu_zstd_read_close(void *ctx_)
+{
+	dsu_zstd_ctx *ctx = ctx_;
+	close(ctx->fd);
+	dsu_zstd_free(ctx);
+}
+
+static void *dsu_zstd_write_open(int fd, int level)
+{
+	dsu_zstd_ctx *ctx = calloc(1, sizeof(*ctx));
+	if (!ctx) return 0;
+	ctx->fd = fd;
+	ctx->bufsize = ZSTD_CStreamOutSize();
+	ctx->buf = malloc(ctx->bufsize);
+	ctx->cctx = ZSTD_createCCtx();
+	if (!ctx->buf || !ctx->cctx) goto err;
+	if (level > 0) {
+		if (ZSTD_isError(ZSTD_CCtx_setParameter(ctx->cctx, ZSTD_c_compressionLevel, level))) goto err;
+	}
+	return ctx;
+err:
+	dsu_zstd_free(ctx);
+	return 0;
+}
+
+static int dsu_zstd_compress(dsu_zstd_ctx *ctx, const char *buf, int len, ZSTD_EndDirective mode)
+{
+	ZSTD_inBuffer in = { buf, len, 0 };
+	size_t remaining;
+	do {
+		ZSTD_outBuffer out = { ctx->buf, ctx->bufsize, 0 };
+		remaining = ZSTD_compressStream2(ctx->cctx, &out, &in, mode);
+		if (ZSTD_isError(remaining)) return 1;
+		if (out.pos && dsu_write_all(ctx->fd, ctx->buf, out.pos)) return 1;
+	} while (mode == ZSTD_e_end ? remaining != 0 : in.pos != in.size);
+	return 0;
+}
+
+static int dsu_zstd_write(void *ctx_, const char *buf, int len)
+{
+	dsu_zstd_ctx *ctx = ctx_;
+	if (ctx->error) return 1;
+	ctx->error = dsu_zstd_compress(ctx, buf, len, ZSTD_e_continue);
+	return ctx->error;
+}
+
+static int dsu_zstd_write_close(void *ctx_)
+{
+	dsu_zstd_ctx *ctx = ctx_;
+	int res = ctx->error;
+	if (!res) res = dsu_zstd_compress(ctx, "", 0, ZSTD_e_end);
+	res |= close(ctx->fd);
+	dsu_zstd_free(ctx);
+	return res;
+}
+
+// Ends the frame, the next write starts a new one.
+static off_t dsu_zstd_restart(void *ctx_)
+{
+	dsu_zstd_ctx *ctx = ctx_;
+	if (ctx->error) return -1;
+	ctx->error = dsu_zstd_compress(ctx, "", 0, ZSTD_e_end);
+	if (ctx->error) return -1;
+	return lseek(ctx->fd, 0, SEEK_CUR);
+}
+
+static const dsu_compressor dsu_zstd = {
+	"zstd",
+	dsu_zstd_read,
+	dsu_zstd_write,
+	dsu_zstd_read_open,
+	dsu_zstd_write_open,
+	dsu_zstd_read_close,
+	dsu_zstd_write_close,
+	dsu_zstd_restart,
+};
+
+#endif /* DSU_HAVE_ZSTD */
+
+
+// No compression at all, the file is just the data. Fixed width types
+// in these files are read through mmap in _dsutil.
+
+typedef struct dsu_none_ctx {
+	int fd;
+	int error;
+	int len;
+	char buf[DSU_BLOCK_SIZE];
+} dsu_none_ctx;
+
+static void *dsu_none_open(int fd)
+{
+	dsu_none_ctx *ctx = malloc(sizeof(*ctx));
+	if (!ctx) return 0;
+	ctx->fd = fd;
+	ctx->error = 0;
+	ctx->len = 0;
+	return ctx;
+}
+
+static void *dsu_none_read_open(int fd, ssize_t size_hint)
+{
+	(void) size_hint;
+	return dsu_none_open(fd);
+}
+
+static void *dsu_none_write_open(int fd, int level)
+{
+	(void) level;
+	return dsu_none_open(fd);
+}
+
+static int dsu_none_read(void *ctx_, char *buf, int *len)
+{
+	dsu_none_ctx *ctx = ctx_;
+	if (ctx->error) return 1;
+	ssize_t got = dsu_read_all(ctx->fd, buf, *len);
+	if (got < 0) {
+		ctx->error = 1;
+		return 1;
+	}
+	*len = got;
+	return 0;
+}
+
+static void dsu_none_read_close(void *ctx_)
+{
+	dsu_none_ctx *ctx = ctx_;
+	close(ctx->fd);
+	free(ctx);
+}
+
+static int dsu_none_flush(dsu_none_ctx *ctx)
+{
+	int len = ctx->len;
+	ctx->len = 0;
+	return dsu_write_all(ctx->fd, ctx->buf, len);
+}
+
+static int dsu_none_write(void *ctx_, const char *buf, int len)
+{
+	dsu_none_ctx *ctx = ctx_;
+	if (ctx->error) return 1;
+	if (ctx->len + len > DSU_BLOCK_SIZE) {
+		if (dsu_none_flush(ctx)) goto err;
+	}
+	if (len >= DSU_BLOCK_SIZE) {
+		if (dsu_write_all(ctx->fd, buf, len)) goto err;
+		return 0;
+	}
+	memcpy(ctx->buf + ctx->len, buf, len);
+	ctx->len += len;
+	return 0;
+err:
+	ctx->error = 1;
+	return 1;
+}
+
+static int dsu_none_write_close(void *ctx_)
+{
+	dsu_none_ctx *ctx = ctx_;
+	int res = ctx->error;
+	if (!res && ctx->len) res = dsu_none_flush(ctx);
+	res |= close(ctx->fd);
+	free(ctx);
+	return res;
+}
+
+static off_t dsu_none_restart(void *ctx_)
+{
+	dsu_none_ctx *ctx = ctx_;
+	if (ctx->error) return -1;
+	if (ctx->len && dsu_none_flush(ctx)) {
+		ctx->error = 1;
+		return -1;
+	}
+	return lseek(ctx->fd, 0, SEEK_CUR);
+}
+
+static const dsu_compressor dsu_none = {
+	"none",
+	dsu_none_read,
+	dsu_none_write,
+	dsu_none_read_open,
+	dsu_none_write_open,
+	dsu_none_read_close,
+	dsu_none_write_close,
+	dsu_none_restart,
+};
+
+
+// All compressors in this build. They are always found by name (which
+// is what datasets store), so the order only decides the order of
+// dsutil.compressions.
+static const dsu_compressor * const dsu_compressors[] = {
+	&dsu_gz,
+	&dsu_lz4,
+#ifdef DSU_HAVE_ZSTD
+	&dsu_zstd,
+#endif
+	&dsu_none,
+	0
+};
+
+// Parse "name" or "name:level", level is set to 0 if not specified.
+static const dsu_compressor *dsu_parse_compression(const char *spec, int *r_level)
+{
+	const char *colon = strchr(spec, ':');
+	size_t len = colon ? (size_t)(colon - spec) : strlen(spec);
+	*r_level = 0;
+	if (colon) {
+		char *end;
+		long level = strtol(colon + 1, &end, 10);
+		if (*end || end == colon + 1 || level < 0 || level > 99) return 0;
+		*r_level = level;
+	}
+	for (const dsu_compressor * const *c = dsu_compressors; *c; c++) {
+		if (strlen((*c)->name) == len && !memcmp((*c)->name, spec, len)) {
+			return *c;
+		}
+	}
+	return 0;
+}
+
+// A simple file API for code that just wants to write a file.
+
+typedef struct dsu_file {
+	const dsu_compressor *compressor;
+	void *ctx;
+} dsu_file;
+
+static inline dsu_file *dsu_open_write(const char *filename, const char *spec)
+{
+	int level;
+	int fd = -1;
+	dsu_file *fh = 0;
+	const dsu_compressor *compressor = dsu_parse_compression(spec, &level);
+	if (!compressor) {
+		errno = EINVAL;
+		goto err;
+	}
+	fh = malloc(sizeof(*fh));
+	if (!fh) goto err;
+	fd = open(filename, O_WRONLY | O_CREAT | O_TRUNC, 0666);
+	if (fd < 0) goto err;
+	fh->compressor = compressor;
+	fh->ctx = compressor->write_open(fd, level);
+	if (!fh->ctx) goto err;
+	return fh;
+err:
+	if (fd >= 0) close(fd);
+	if (fh) free(fh);
+	return 0;
+}
+
+static inline int dsu_write(dsu_file *fh, const void *buf, int len)
+{
+	return fh->compressor->write(fh->ctx, buf, len);
+}
+
+static inline int dsu_close_write(dsu_file *fh)
+{
+	int res = fh->compressor->write_close(fh->ctx);
+	free(fh);
+	return res;
+}
+
+#endif /* DSU_COMPRESSION_H */
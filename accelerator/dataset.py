@@ -26,22 +26,26 @@ from __future__ import unicode_literals
 
 import os
 from keyword import kwlist
-from collections import namedtuple, Counter
-from itertools import compress, islice
+from collections import namedtuple, Counter, OrderedDict
+from itertools import compress, islice, repeat
 from functools import partial
 from contextlib import contextmanager
 from operator import itemgetter
+from bisect import bisect_left
+import operator
 from math import isnan
 import datetime
+import struct
 
-from accelerator.compat import unicode, uni, ifilter, imap, iteritems, PY2
-from accelerator.compat import builtins, open, getarglist, izip, izip_longest
+from accelerator.compat import unicode, uni, ifilter, imap, iteritems, itervalues, PY2
+from accelerator.compat import builtins, open, getarglist, izip
 from accelerator.compat import str_types, int_types, FileNotFoundError
 
 from accelerator import blob
 from accelerator.extras import DotDict, job_params, _ListTypePreserver, quote
 from accelerator.job import Job, NoJob
-from accelerator.dsutil import typed_writer, _type2iter
+from accelerator.dsutil import typed_writer, _type2iter, _type2dtype, _zone_rows, _bloom_check, _SplitWriter, _RowIter, _RoundRobin, compressions, encodings, _encodable_types
+from accelerator.dsutil import _hll_merge, _hll_estimate, _hist_range, _hash
 from accelerator.error import NoSuchDatasetError, DatasetUsageError, DatasetError
 
 kwlist = set(kwlist)
@@ -54,7 +58,7 @@ kwlist.update({
 iskeyword = frozenset(kwlist).__contains__
 
 # A dataset is defined by a pickled dict containing at least the following (all strings are unicode):
-#     version = (3, 3,),
+#     version = (3, 4,),
 #     filename = "filename" or None,
 #     hashlabel = "column name" or None,
 #     caption = "caption",
@@ -74,6 +78,20 @@ iskeyword = frozenset(kwlist).__contains__
 #     max = maximum value in this dataset or None
 #     offsets = (offset, per, slice) or None for non-merged slices.
 #     none_support = bool # not present in version 3.0, implicitly True there except for bits-types.
+#     zones = (rows_per_zone, [[(min, max), ...] per slice]) or None, not present before version 3.4.
+#         min/max for each rows_per_zone rows in each slice, used to skip
+#         parts of slices when iterating with a range.
+#     bloom = (location, [(offset, length) or None per slice]) or None, not present before version 3.4.
+#         Bloom filters for the values in each slice (see dsutil.bloom_check),
+#         all bloom filters for a dataset are in one file (DS/name.b).
+#     stats = {...} or None, not present before version 3.4.
+#         Statistics from the writers (see Dataset.stats), a dict with
+#         none_count = [count, per, slice],
+#         distinct = [approximate, count, per, slice],
+#         hll = HyperLogLog registers for all slices (or None if all empty),
+#         histogram = {bin: count} for all slices (see dsutil._hist_range) or None.
+#     encoding = "delta" or "rle" or None, not present before version 3.4.
+#         Applied to the values before compression (see dsutil.encodings).
 #
 # Going from a DatasetColumn to a filename:
 #     jid, path = dc.location.split('/', 1)
@@ -85,6 +103,12 @@ iskeyword = frozenset(kwlist).__contains__
 #         jid.filename(path % sliceno)
 # There is a ds.column_filename function to do this for you (not the seeking, obviously).
 #
+# Columns written by a DatasetWriter restart their compression every
+# rows_per_zone (dsutil._zone_rows) values. For slices with more than one
+# such block there is a filename.idx next to the column file, with the
+# file offsets of the blocks after the first as native uint64s. Reading
+# can start at any of these offsets (with an adjusted want_count).
+#
 # The dataset pickle is jid/DS/name.p, so jid/DS/default.p for the default dataset.
 # It was jid/name/dataset.pickle in jobs version 3 and lower.
 
@@ -112,18 +136,246 @@ def _dsid(t):
 		t += '/default'
 	return uni(t)
 
+def _histogram_merge(a, b):
+	res = dict(a or ())
+	for k, v in b.items():
+		res[k] = res.get(k, 0) + v
+	return res
+
+def _unsortable_values(coltype):
+	"""(nonev, nanv) that None and NaN sort as in a column of coltype
+	(as in dataset_sort). nanv is None for types that can not be NaN."""
+	if coltype == 'bytes':
+		return b'', None
+	elif coltype in ('ascii', 'unicode', 'dictunicode',):
+		return u'', None
+	elif coltype in ('int64', 'int32',):
+		return float('-inf'), None
+	elif coltype == 'bool':
+		return -1, None
+	elif coltype == 'datetime':
+		return datetime.datetime.max, None
+	elif coltype == 'date':
+		return datetime.date.max, None
+	elif coltype == 'time':
+		return datetime.time.max, None
+	else:
+		return float('-inf'), float('inf')
+
+if PY2:
+	class _ReverseKey(object):
+		__slots__ = ('k',)
+		def __init__(self, k):
+			self.k = k
+		def __lt__(self, other):
+			return other.k < self.k
+		def __eq__(self, other):
+			return self.k == other.k
+
+	def _heap_merge(iterables, key, reverse):
+		# heapq.merge only takes key and reverse from python 3.5.
+		from heapq import merge
+		key = key or (lambda v: v)
+		wrap = _ReverseKey if reverse else lambda k: k
+		def decorate(ix, it):
+			for v in it:
+				yield wrap(key(v)), ix, v
+		decorated = [decorate(ix, it) for ix, it in enumerate(iterables)]
+		return imap(itemgetter(2), merge(*decorated))
+else:
+	def _heap_merge(iterables, key, reverse):
+		from heapq import merge
+		return merge(*iterables, key=key, reverse=reverse)
+
+# Group-by aggregation, used by Dataset.aggregate and dataset_aggregate.
+# Each slice is read in batches (bulk reading where possible) and every
+# row gets a group number once per batch, then each aggregation runs over
+# its column with the group numbers. The per-group state is an int for
+# count and sum, a value (or None) for min and max, [sum, count] for mean
+# and HyperLogLog registers for distinct.
+
+_aggregations = ('count', 'sum', 'min', 'max', 'mean', 'distinct',)
+_aggregate_batch_size = 65536
+_aggregate_hll_bits = 10
+_int_types = ('bool', 'bits32', 'bits64', 'int32', 'int64',)
+_float_types = ('float32', 'float64',)
+_unordered_types = ('complex32', 'complex64', 'json', 'pickle',)
+
+def _aggregate_spec(columns, groupby, aggs):
+	"""Check groupby and aggs against columns ({name: DatasetColumn}).
+	Gives (groupby, spec, read_columns) where spec is a list of
+	(name, func, column, ignore_nan) in name order and read_columns is
+	groupby followed by the other columns the aggregations use."""
+	if isinstance(groupby, str_types):
+		groupby = [groupby]
+	groupby = list(groupby or ())
+	for column in groupby:
+		if column not in columns:
+			raise DatasetUsageError('groupby column %r does not exist' % (column,))
+	if len(set(groupby)) != len(groupby):
+		raise DatasetUsageError('groupby has duplicate columns')
+	if not aggs:
+		raise DatasetUsageError('Specify at least one aggregation')
+	spec = []
+	read_columns = list(groupby)
+	for name, agg in sorted(aggs.items()):
+		if name in groupby:
+			raise DatasetUsageError('Aggregation %r has the same name as a groupby column' % (name,))
+		if isinstance(agg, str_types):
+			agg = (agg,)
+		if not 1 <= len(agg) <= 2:
+			raise DatasetUsageError('Aggregation %r should be (function, column), not %r' % (name, agg,))
+		func, column = (tuple(agg) + (None,))[:2]
+		if func not in _aggregations:
+			raise DatasetUsageError('Aggregation %r has unknown function %r (known functions are %s)' % (name, func, ', '.join(_aggregations),))
+		if column is None:
+			if func != 'count':
+				raise DatasetUsageError('Aggregation %r needs a column' % (name,))
+			ignore_nan = False
+		else:
+			if column not in columns:
+				raise DatasetUsageError('Aggregation %r uses column %r which does not exist' % (name, column,))
+			coltype = columns[column].type
+			if func in ('sum', 'mean') and coltype not in _int_types + _float_types + ('number',):
+				raise DatasetUsageError("Aggregation %r can't %s column %r of type %s" % (name, func, column, coltype,))
+			if func != 'count' and coltype in _unordered_types:
+				raise DatasetUsageError("Aggregation %r can't %s column %r of type %s" % (name, func, column, coltype,))
+			ignore_nan = (func in ('min', 'max') and coltype in _float_types + ('number',))
+			if column not in read_columns:
+				read_columns.append(column)
+		spec.append((name, func, column, ignore_nan))
+	if not read_columns:
+		# Only counting lines, but something has to be read.
+		read_columns = [sorted(columns)[0]]
+	return groupby, spec, read_columns
+
+def _aggregate_output_types(columns, spec):
+	"""{name: (type, none_support)} for the aggregations in spec."""
+	res = {}
+	for name, func, column, _ in spec:
+		if func in ('count', 'distinct',):
+			res[name] = ('int64', False)
+		elif func == 'sum':
+			res[name] = ('float64' if columns[column].type in _float_types else 'number', False)
+		elif func == 'mean':
+			res[name] = ('float64', True)
+		else:
+			res[name] = (columns[column].type, True)
+	return res
+
+def _aggregate_batches(batches, groupby, spec, read_columns):
+	"""{group: [state per aggregation]} for batches from iterating
+	read_columns with batch_size. group is the groupby value (a tuple
+	of values with several groupby columns, () with none)."""
+	groups = {}
+	setdefault = groups.setdefault
+	states = [[] for _ in spec]
+	col_ix = [None if column is None else read_columns.index(column) for _, _, column, _ in spec]
+	ngroupby = len(groupby)
+	hll_shift = 64 - _aggregate_hll_bits
+	hll_mask = (1 << hll_shift) - 1
+	for batch in batches:
+		if ngroupby == 1:
+			keys = batch[0]
+		elif ngroupby:
+			keys = izip(*batch[:ngroupby])
+		else:
+			keys = repeat((), len(batch[0]))
+		gix = [setdefault(k, len(groups)) for k in keys]
+		ngroups = len(groups)
+		for (name, func, column, ignore_nan), state, ix in izip(spec, states, col_ix):
+			if len(state) < ngroups:
+				missing = range(ngroups - len(state))
+				if func in ('count', 'sum',):
+					state.extend(0 for _ in missing)
+				elif func == 'mean':
+					state.extend([0, 0] for _ in missing)
+				elif func == 'distinct':
+					state.extend(bytearray(1 << _aggregate_hll_bits) for _ in missing)
+				else:
+					state.extend(None for _ in missing)
+			if ix is None:
+				for g in gix:
+					state[g] += 1
+				continue
+			values = batch[ix]
+			if func == 'count':
+				for g, v in izip(gix, values):
+					if v is not None:
+						state[g] += 1
+			elif func == 'sum':
+				for g, v in izip(gix, values):
+					if v is not None:
+						state[g] += v
+			elif func == 'mean':
+				for g, v in izip(gix, values):
+					if v is not None:
+						s = state[g]
+						s[0] += v
+						s[1] += 1
+			elif func == 'distinct':
+				for g, v in izip(gix, values):
+					if v is not None:
+						h = _hash(v)
+						rank = hll_shift + 1 - (h & hll_mask).bit_length()
+						registers = state[g]
+						if rank > registers[h >> hll_shift]:
+							registers[h >> hll_shift] = rank
+			else:
+				better = operator.lt if func == 'min' else operator.gt
+				for g, v in izip(gix, values):
+					if v is not None and (v == v or not ignore_nan):
+						cur = state[g]
+						if cur is None or better(v, cur):
+							state[g] = v
+	return {k: [state[g] for state in states] for k, g in iteritems(groups)}
+
+def _aggregate_merge(spec, a, b):
+	"""Merge the {group: states} from b into a, gives a."""
+	for k, b_states in iteritems(b):
+		a_states = a.get(k)
+		if a_states is None:
+			a[k] = b_states
+			continue
+		for ix, (_, func, _, _) in enumerate(spec):
+			av, bv = a_states[ix], b_states[ix]
+			if func in ('count', 'sum',):
+				a_states[ix] = av + bv
+			elif func == 'mean':
+				a_states[ix] = [av[0] + bv[0], av[1] + bv[1]]
+			elif func == 'distinct':
+				a_states[ix] = bytearray(_hll_merge(av, bv))
+			elif av is None or (bv is not None and (bv < av if func == 'min' else bv > av)):
+				a_states[ix] = bv
+	return a
+
+def _aggregate_values(spec, states):
+	"""The final values from the states of one group."""
+	res = []
+	for (_, func, _, _), state in izip(spec, states):
+		if func == 'mean':
+			state = state[0] / state[1] if state[1] else None
+		elif func == 'distinct':
+			state = _hll_estimate(state)
+		res.append(state)
+	return res
+
 # If we want to add fields to later versions, using a versioned name will
 # allow still loading the old versions without messing with the constructor.
-_dscol_3_3 = namedtuple('_DatasetColumn_3_3', 'type compression location min max offsets none_support')
-class _DatasetColumn_3_3(_dscol_3_3):
+_dscol_3_4 = namedtuple('_DatasetColumn_3_4', 'type compression location min max offsets none_support zones bloom stats encoding')
+class _DatasetColumn_3_4(_dscol_3_4):
+	def __new__(cls, type, compression, location, min, max, offsets, none_support, zones=None, bloom=None, stats=None, encoding=None):
+		return _dscol_3_4.__new__(cls, type, compression, location, min, max, offsets, none_support, zones, bloom, stats, encoding)
+DatasetColumn = _DatasetColumn_3_4
+# It's probably usually best to generate the new type so the rest of the code needs no special handling.
+class _DatasetColumn_3_3(object):
+	__slots__ = ()
 	def __new__(cls, type, compression, location, min, max, offsets, none_support):
 		# Older dataset_3_3-releases (up to 2022.6.30.dev1) can sometimes write
 		# .compression as a bytes-str on PY2, this is a workaround for that.
 		if isinstance(compression, bytes):
 			compression = compression.decode('ascii')
-		return _dscol_3_3.__new__(cls, type, compression, location, min, max, offsets, none_support)
-DatasetColumn = _DatasetColumn_3_3
-# It's probably usually best to generate the new type so the rest of the code needs no special handling.
+		return _DatasetColumn_3_4(type, compression, location, min, max, offsets, none_support)
 class _DatasetColumn_3_2(object):
 	__slots__ = ()
 	def __new__(cls, type, backing_type, location, min, max, offsets, none_support):
@@ -143,22 +395,66 @@ class _New_dataset_marker(unicode): pass
 _new_dataset_marker = _New_dataset_marker('new')
 _no_override = object()
 
-_ds_cache = {}
+class _DatasetCache(object):
+	"""LRU cache of loaded dataset pickles, keyed by (jobid, name).
+	Each entry remembers the identity (device, inode, size, mtime) of the
+	file it came from, and is only used while the file still matches.
+	Entries from the 'cache' in a later dataset in the chain get the
+	identity of the file when they are first used."""
+
+	__slots__ = ('size', '_entries',)
+
+	def __init__(self, size):
+		self.size = size
+		self._entries = OrderedDict()
+
+	def get(self, key, identity):
+		entry = self._entries.pop(key, None)
+		if entry is None or (entry[0] is not None and entry[0] != identity):
+			return None
+		self._entries[key] = (identity, entry[1])
+		return entry[1]
+
+	def add(self, key, identity, data):
+		self._entries.pop(key, None)
+		self._entries[key] = (identity, data)
+		while len(self._entries) > self.size:
+			self._entries.popitem(last=False)
+
+	def add_unverified(self, key, data):
+		if key not in self._entries:
+			self.add(key, None, data)
+
+	def clear(self):
+		self._entries.clear()
+
+_ds_cache = _DatasetCache(4096)
+
 def _ds_load(obj):
-	n = unicode(obj)
-	if n not in _ds_cache:
-		fn = obj.job.filename(obj._name('pickle'))
-		if not os.path.exists(fn):
-			raise NoSuchDatasetError('Dataset %r does not exist' % (n,))
-		_ds_cache[n] = blob.load(fn)
-		_ds_cache.update(_ds_cache[n].get('cache', ()))
-	return _ds_cache[n]
+	fn = obj.job.filename(obj._name('pickle'))
+	try:
+		st = os.stat(fn)
+	except OSError:
+		raise NoSuchDatasetError('Dataset %r does not exist' % (unicode(obj),))
+	identity = (st.st_dev, st.st_ino, st.st_size, st.st_mtime,)
+	data = _ds_cache.get((obj.job, obj.name,), identity)
+	if data is None:
+		data = blob.load(fn)
+		_ds_cache.add((obj.job, obj.name,), identity, data)
+		for dsid, ds_data in data.get('cache', ()):
+			jobid, name = dsid.split('/', 1) if '/' in dsid else (dsid, 'default',)
+			_ds_cache.add_unverified((jobid, name,), ds_data)
+	return data
 
 def _namechk(name):
 	return uni(name)
 
 _dummy_iter = iter(())
 
+# Where rehash="shared" puts the split source slices (in the job directory).
+# Launch removes it when analysis is done.
+_shared_rehash_dir = 'shared_rehash.tmp'
+
 _dir_name_blacklist = list(range(32)) + [37, 47] # unprintable and '%/'
 _dir_name_blacklist = {chr(c): '\\x%02x' % (c,) for c in _dir_name_blacklist}
 _dir_name_blacklist['\\'] = '\\\\' # make sure names can't collide
@@ -221,7 +517,7 @@ class Dataset(unicode):
 		obj.fs_name = _fs_name(obj.name)
 		if jobid is _new_dataset_marker:
 			obj._data = DotDict({
-				'version': (3, 3,),
+				'version': (3, 4,),
 				'filename': None,
 				'hashlabel': None,
 				'caption': '',
@@ -305,6 +601,12 @@ class Dataset(unicode):
 	def max(self, column):
 		return self._minmax(column, 'max')
 
+	def stats(self, column):
+		"""Statistics the writers collected for column, or None if there
+		are none (columns not written by a DatasetWriter with stats=True,
+		or written before these were collected). See DatasetList.stats."""
+		return DatasetList((self,)).stats(column)
+
 	def link_to_here(self, name='default', column_filter=None, rename=None, override_previous=_no_override, filename=None):
 		"""Use this to expose a subjob as a dataset in your job:
 		Dataset(subjid).link_to_here()
@@ -361,13 +663,14 @@ class Dataset(unicode):
 				# make sure it's valid
 				Dataset(override_previous)
 			d._data.previous = override_previous
-			d._update_caches()
 		d._data.parent = '%s/%s' % (d.job, d.name,)
 		if filename is not None:
 			d._data.filename = filename or None
 		d.job = job
 		d.name = uni(name)
 		d.fs_name = _fs_name(d.name)
+		if override_previous is not _no_override:
+			d._update_caches()
 		d._save()
 		_datasets_written.append(d.name)
 		return Dataset(d.job, d.name)
@@ -422,17 +725,30 @@ class Dataset(unicode):
 		_datasets_written.append(name)
 		return job.dataset(name) # new_ds has the wrong string value, so we must make a new instance here.
 
-	def _column_iterator(self, sliceno, col, _type=None, **kw):
+	def _column_iterator(self, sliceno, col, _type=None, start=0, **kw):
 		if sliceno is not None and self.lines[sliceno] == 0:
 			return _dummy_iter
 		dc = self.columns[col]
+		if dc.encoding:
+			kw['encoding'] = dc.encoding
 		mkiter = partial(_type2iter[_type or dc.type], compression=dc.compression, **kw)
 		def one_slice(sliceno):
 			fn = self.column_filename(col, sliceno)
 			if dc.offsets:
-				return mkiter(fn, seek=dc.offsets[sliceno], want_count=self.lines[sliceno])
+				it = mkiter(fn, seek=dc.offsets[sliceno], want_count=self.lines[sliceno])
+				skip = start
 			else:
-				return mkiter(fn, want_count=self.lines[sliceno])
+				# Start reading in the last block before start, if indexed.
+				blocks = self._blocks(col, sliceno) if start else ()
+				block = min(start // _zone_rows, len(blocks))
+				if block:
+					it = mkiter(fn, seek=blocks[block - 1], want_count=self.lines[sliceno] - block * _zone_rows)
+				else:
+					it = mkiter(fn, want_count=self.lines[sliceno])
+				skip = start - block * _zone_rows
+			if skip:
+				it.skip(skip)
+			return it
 		if sliceno is None:
 			from accelerator.g import slices
 			from itertools import chain
@@ -440,16 +756,30 @@ class Dataset(unicode):
 		else:
 			return one_slice(sliceno)
 
-	def _iterator(self, sliceno, columns=None, copy_mode=False):
+	def _blocks(self, colname, sliceno):
+		"""File offsets of the blocks (after the first) in a column file,
+		() if there is no index for it."""
+		key = ('blocks', colname, sliceno,)
+		if key not in self._cache:
+			try:
+				with open(self.column_filename(colname, sliceno) + '.idx', 'rb') as fh:
+					data = fh.read()
+				self._cache[key] = struct.unpack('=%dQ' % (len(data) // 8,), data)
+			except FileNotFoundError:
+				self._cache[key] = ()
+		return self._cache[key]
+
+	def _iterator(self, sliceno, columns=None, copy_mode=False, start=0, readahead=False):
 		res = []
 		not_found = []
-		for col in columns or sorted(self.columns):
+		columns = columns or sorted(self.columns)
+		for col in columns:
 			if col in self.columns:
 				if copy_mode:
 					t = _copy_mode_overrides.get(self.columns[col].type)
-					res.append(self._column_iterator(sliceno, col, _type=t))
+					res.append(self._column_iterator(sliceno, col, _type=t, start=start, readahead=readahead))
 				else:
-					res.append(self._column_iterator(sliceno, col))
+					res.append(self._column_iterator(sliceno, col, start=start, readahead=readahead))
 			else:
 				not_found.append(col)
 		if not_found:
@@ -460,6 +790,87 @@ class Dataset(unicode):
 		from accelerator.g import slices
 		return compress(it, self._column_iterator(None, hashlabel, hashfilter=(sliceno, slices)))
 
+	def _shared_rehash_iterator(self, sliceno, hashlabel, columns, copy_mode=False):
+		"""Like _iterator(None, columns) filtered by _hashfilter, but each
+		source slice is only read once per job. The first process to
+		need a source slice splits it into temp files per target slice,
+		the other slices read their part from those."""
+		from accelerator import g
+		import fcntl
+		import hashlib
+		from itertools import chain
+		slices = g.slices
+		spill_cols = sorted(set(columns) | {hashlabel})
+		types = {}
+		for col in spill_cols:
+			if col not in self.columns:
+				raise DatasetError("Columns %r not found in %s/%s" % ([col], self.job, self.name,))
+			t = self.columns[col].type
+			if copy_mode:
+				t = _copy_mode_overrides.get(t, t)
+			types[col] = t
+		key = repr((self.quoted, hashlabel, spill_cols, bool(copy_mode), slices,)).encode('utf-8')
+		try:
+			os.mkdir(_shared_rehash_dir)
+		except OSError:
+			if not os.path.isdir(_shared_rehash_dir):
+				raise
+		prefix = os.path.join(_shared_rehash_dir, hashlib.sha1(key).hexdigest()[:16])
+		def fn(*a):
+			return '%s.%s' % (prefix, '.'.join(str(v) for v in a),)
+		def produce(src_sliceno):
+			lock_fn = fn(src_sliceno, 'lock')
+			done_fn = fn(src_sliceno, 'done')
+			with open(lock_fn, 'ab') as lock_fh:
+				fcntl.flock(lock_fh, fcntl.LOCK_EX)
+				if os.path.exists(done_fn):
+					return
+				writers = [
+					[
+						typed_writer(types[col])(fn(src_sliceno, ix, cix), compression='lz4', none_support=self.columns[col].none_support)
+						for cix, col in enumerate(spill_cols)
+					] for ix in builtins.range(slices)
+				]
+				split = _SplitWriter(
+					[[writer.write for writer in w] for w in writers],
+					tuple('c%d' % (cix,) for cix in builtins.range(len(spill_cols))),
+					tuple(spill_cols),
+					hashix=spill_cols.index(hashlabel),
+					hashfunc=typed_writer(types[hashlabel]).hash,
+				)
+				write_list = split.write_list
+				for values in izip(*self._iterator(src_sliceno, spill_cols, copy_mode=copy_mode)):
+					write_list(values)
+				split.close()
+				counts = []
+				for ix, w in enumerate(writers):
+					counts.append(w[0].count)
+					for cix, writer in enumerate(w):
+						writer.close()
+				with open(done_fn + '.tmp', 'w') as fh:
+					fh.write(' '.join(str(c) for c in counts))
+				os.rename(done_fn + '.tmp', done_fn)
+		def consume():
+			# Start with our own source slice, so the processes mostly
+			# split different slices at the same time.
+			for ix in builtins.range(slices):
+				src_sliceno = (sliceno + ix) % slices
+				if self.lines[src_sliceno]:
+					produce(src_sliceno)
+			for src_sliceno in builtins.range(slices):
+				if not self.lines[src_sliceno]:
+					continue
+				with open(fn(src_sliceno, 'done'), 'r') as fh:
+					count = int(fh.read().split()[sliceno])
+				if count:
+					yield src_sliceno, count
+		todo = list(consume())
+		def one_column(col):
+			cix = spill_cols.index(col)
+			mkiter = partial(_type2iter[types[col]], compression='lz4')
+			return chain.from_iterable(mkiter(fn(src_sliceno, sliceno, cix), want_count=count) for src_sliceno, count in todo)
+		return [one_column(col) for col in columns]
+
 	def column_filename(self, colname, sliceno=None):
 		dc = self.columns[colname]
 		jid, name = dc.location.split('/', 1)
@@ -486,17 +897,345 @@ class Dataset(unicode):
 			chain.reverse()
 		return chain
 
-	def iterate_chain(self, sliceno, columns=None, length=-1, range=None, sloppy_range=False, reverse=False, hashlabel=None, stop_ds=None, pre_callback=None, post_callback=None, filters=None, translators=None, status_reporting=True, rehash=False, slice=None, copy_mode=False):
+	def _chain_entry(self):
+		return (unicode(self), tuple(self.lines), {n: (c.min, c.max,) for n, c in self.columns.items()},)
+
+	def _chain_entries(self, length=-1, stop_ds=None):
+		"""[(dsid, lines, {colname: (min, max)}), ...] for .chain(length,
+		stop_ds=stop_ds), newest first. Datasets with a chain index (see
+		_update_caches) know the entries for the 2**N - 1 datasets before
+		them (for the largest N where 2**N divides their position in the
+		chain), so this only loads O(log(length)) files."""
+		if stop_ds:
+			stop_ds = unicode(Dataset(stop_ds))
+		res = []
+		def add(entry):
+			if length == len(res) or entry[0] == stop_ds:
+				return False
+			res.append(entry)
+			return True
+		current = self
+		while current is not None:
+			if not add(current._chain_entry()):
+				break
+			index = current._data.get('chain_index')
+			if index and index[1]:
+				jid, fn = index[1].split('/', 1)
+				before, entries = blob.load(fn, jobid=jid)
+				if not all(add(entry) for entry in reversed(entries)):
+					break
+				current = Dataset(before) if before else None
+			else:
+				current = current.previous
+		return res
+
+	def chain_length(self, stop_ds=None):
+		"""len(self.chain(stop_ds=stop_ds)), using the chain index."""
+		return len(self._chain_entries(stop_ds=stop_ds))
+
+	def chain_lines(self, sliceno=None, length=-1, stop_ds=None):
+		"""self.chain(length, stop_ds=stop_ds).lines(sliceno), using the
+		chain index so not every dataset in the chain has to be loaded."""
+		entries = self._chain_entries(length, stop_ds)
+		if sliceno is None:
+			return sum(sum(lines) for _, lines, _ in entries)
+		else:
+			return sum(lines[sliceno] for _, lines, _ in entries)
+
+	def chain_range(self, colname, start=None, stop=None, length=-1, stop_ds=None):
+		"""self.chain(length, stop_ds=stop_ds).range(colname, start, stop),
+		using the chain index so only the datasets in the range are loaded.
+		When the column is ordered over the chain (each dataset starts at
+		or after where the previous ended) the datasets are found by
+		bisection."""
+		entries = []
+		for dsid, _, minmax in reversed(self._chain_entries(length, stop_ds)):
+			if colname not in minmax:
+				raise DatasetUsageError('Dataset %s does not have column %r' % (quote(dsid), colname,))
+			if minmax[colname][0] is not None:
+				entries.append((dsid, minmax[colname],))
+		mins = [mm[0] for _, mm in entries]
+		maxs = [mm[1] for _, mm in entries]
+		if all(a <= b for a, b in izip(maxs, mins[1:])):
+			lo = 0 if start is None else bisect_left(maxs, start)
+			hi = len(entries) if stop is None else bisect_left(mins, stop)
+			entries = entries[lo:hi]
+		else:
+			entries = [
+				(dsid, (mn, mx,)) for dsid, (mn, mx,) in entries
+				if (stop is None or mn < stop) and (start is None or mx >= start)
+			]
+		return DatasetChain(Dataset(dsid) for dsid, _ in entries)
+
+	def iterate_chain(self, sliceno, columns=None, length=-1, range=None, sloppy_range=False, reverse=False, hashlabel=None, stop_ds=None, pre_callback=None, post_callback=None, filters=None, translators=None, status_reporting=True, rehash=False, slice=None, copy_mode=False, batch_size=None, equals=None, readahead=False):
 		"""Iterate a list of datasets. See .chain and .iterate_list for details."""
-		chain = self.chain(length, reverse, stop_ds)
-		return self.iterate_list(sliceno, columns, chain, range=range, sloppy_range=sloppy_range, hashlabel=hashlabel, pre_callback=pre_callback, post_callback=post_callback, filters=filters, translators=translators, status_reporting=status_reporting, rehash=rehash, slice=slice, copy_mode=copy_mode)
+		if range and len(range) == 1 and any(v is not None for v in next(itervalues(range))):
+			# Only the datasets that can have values in range
+			range_k, (range_bottom, range_top,) = next(iteritems(range))
+			chain = self.chain_range(range_k, range_bottom, range_top, length, stop_ds)
+			if reverse:
+				chain.reverse()
+		else:
+			chain = self.chain(length, reverse, stop_ds)
+		return self.iterate_list(sliceno, columns, chain, range=range, sloppy_range=sloppy_range, hashlabel=hashlabel, pre_callback=pre_callback, post_callback=post_callback, filters=filters, translators=translators, status_reporting=status_reporting, rehash=rehash, slice=slice, copy_mode=copy_mode, batch_size=batch_size, equals=equals, readahead=readahead)
 
-	def iterate(self, sliceno, columns=None, range=None, sloppy_range=False, hashlabel=None, pre_callback=None, post_callback=None, filters=None, translators=None, status_reporting=True, rehash=False, slice=None, copy_mode=False):
+	def iterate(self, sliceno, columns=None, range=None, sloppy_range=False, hashlabel=None, pre_callback=None, post_callback=None, filters=None, translators=None, status_reporting=True, rehash=False, slice=None, copy_mode=False, batch_size=None, equals=None, readahead=False):
 		"""Iterate just this dataset. See .iterate_list for details."""
-		return self.iterate_list(sliceno, columns, [self], range=range, sloppy_range=sloppy_range, hashlabel=hashlabel, pre_callback=pre_callback, post_callback=post_callback, filters=filters, translators=translators, status_reporting=status_reporting, rehash=rehash, slice=slice, copy_mode=copy_mode)
+		return self.iterate_list(sliceno, columns, [self], range=range, sloppy_range=sloppy_range, hashlabel=hashlabel, pre_callback=pre_callback, post_callback=post_callback, filters=filters, translators=translators, status_reporting=status_reporting, rehash=rehash, slice=slice, copy_mode=copy_mode, batch_size=batch_size, equals=equals, readahead=readahead)
+
+	def get_rows(self, sliceno, start, stop, columns=None):
+		"""List of lines start to stop (like a python slice, so negative
+		values count from the end) in slice sliceno (or all slices if
+		sliceno is None). This seeks to the right part of the column
+		files, so it's fast even far into big slices."""
+		return list(self.iterate(sliceno, columns, slice=builtins.slice(start, stop), status_reporting=False))
+
+	def column_array(self, sliceno, column):
+		"""Column as a numpy array, for one slice or all slices (sliceno=None).
+		If the column has none_support this is a masked array, with None
+		values masked.
+		Only for fixed width types, which are all types except number,
+		bytes, ascii, unicode, dictunicode, json and pickle. The values
+		are decoded in bulk, so this is much faster than .iterate.
+		Needs numpy."""
+		return self._column_array(sliceno, column, [self])
+
+	@staticmethod
+	def _column_array(sliceno, column, datasets):
+		import numpy as np
+		types = set()
+		for ds in datasets:
+			if column not in ds.columns:
+				raise DatasetUsageError('Dataset %s does not have column %r' % (ds.quoted, column,))
+			types.add(ds.columns[column].type)
+		if len(types) > 1:
+			raise DatasetUsageError('Column %r has more than one type (%s)' % (column, ', '.join(sorted(types)),))
+		typ = types.pop() if types else 'float64'
+		if typ not in _type2dtype:
+			raise DatasetUsageError('Column %r has type %s, column_array only supports %s' % (column, typ, ', '.join(sorted(_type2dtype)),))
+		if sliceno is None:
+			from accelerator.g import slices
+			slices = range(slices)
+		else:
+			slices = [sliceno]
+		total = sum(ds.lines[s] for ds in datasets for s in slices)
+		data = np.empty(total, dtype=_type2dtype[typ])
+		# numpy does not export datetime64 and timedelta64 as buffers
+		buf = data.view(np.int64) if data.dtype.kind in 'mM' else data
+		if any(ds.columns[column].none_support for ds in datasets):
+			mask = np.zeros(total, dtype=bool)
+		else:
+			mask = None
+		pos = 0
+		for ds in datasets:
+			for s in slices:
+				count = ds.lines[s]
+				if not count:
+					continue
+				end = pos + count
+				with ds._column_iterator(s, column) as fh:
+					got = fh.readinto(buf[pos:end], None if mask is None else mask[pos:end])
+				if got != count:
+					raise DatasetError('Only got %d of %d values for %r in slice %d of %s' % (got, count, column, s, ds.quoted,))
+				pos = end
+		if mask is None:
+			return data
+		return np.ma.MaskedArray(data, mask)
+
+	def map_slices(self, func, columns=None, merge=None, **kw):
+		"""Call func(iterator) for each slice in parallel processes, where
+		iterator is .iterate(sliceno, columns, **kw). See .iterate_list for
+		the options.
+		Returns a list of what func returned, in slice order, or if you
+		specify merge that is used to reduce the list to a single value
+		(like merge=operator.add or merge=lambda a, b: a | b).
+		The return values must be picklable, func does not have to be.
+		This is useful when you want to scan a dataset outside of analysis,
+		in a build script or in synthesis."""
+		return self._map_slices(func, columns, [self], merge, kw)
+
+	@staticmethod
+	def _map_slices(func, columns, datasets, merge, kw):
+		from accelerator import mp
+		from accelerator.compat import QueueEmpty
+		from traceback import format_exc
+		from functools import reduce
+		import signal
+		if not datasets:
+			raise DatasetUsageError("map_slices needs at least one dataset")
+		if kw.get('rehash') == 'shared':
+			raise DatasetUsageError('map_slices can not use rehash="shared" (it only works in analysis)')
+		kw['status_reporting'] = False
+		slices = len(Dataset(datasets[0]).lines)
+		q = mp.LockFreeQueue()
+		def one_slice(sliceno):
+			q.make_writer()
+			try:
+				res = func(Dataset.iterate_list(sliceno, columns, datasets, **kw))
+				q.put((sliceno, res, None,))
+			except Exception:
+				q.put((sliceno, None, format_exc(),))
+			q.close()
+		children = [
+			mp.SimplifiedProcess(target=one_slice, args=(sliceno,), name='map_slices-%d' % (sliceno,))
+			for sliceno in range(slices)
+		]
+		q.make_reader()
+		results = {}
+		try:
+			while len(results) < slices:
+				try:
+					sliceno, res, tb = q.get(timeout=1)
+				except QueueEmpty:
+					# A process that died badly never sends anything.
+					for p in children:
+						if not p.is_alive() and p.exitcode:
+							raise DatasetError("map_slices: %s exited with %d" % (p.name, p.exitcode,))
+					continue
+				if tb:
+					raise DatasetError("map_slices failed in slice %d:\n%s" % (sliceno, tb,))
+				results[sliceno] = res
+		finally:
+			for p in children:
+				if p.is_alive():
+					os.kill(p.pid, signal.SIGTERM)
+				p.join()
+			q.close()
+		results = [results[sliceno] for sliceno in range(slices)]
+		if merge:
+			return reduce(merge, results)
+		return results
+
+	def aggregate(self, groupby, aggs):
+		"""Group on the groupby columns and aggregate in each group.
+		aggs is {name: (function, column)}, where function is one of
+		count, sum, min, max, mean and distinct (an approximate count of
+		distinct values, typically within a few percent).
+		{name: 'count'} counts lines, count with a column counts values
+		that are not None. Other functions also ignore None, and min and
+		max ignore NaN. mean is None for groups without values.
+		Returns {group: {name: value}}, where group is the groupby value
+		(a tuple with several groupby columns, () with none).
+		The slices are aggregated in parallel processes (see .map_slices),
+		the dataset_aggregate method does the same thing in a job."""
+		return self._aggregate(groupby, aggs, [self])
+
+	@staticmethod
+	def _aggregate(groupby, aggs, datasets):
+		if isinstance(datasets, str_types + (Dataset, dict)):
+			datasets = [datasets]
+		datasets = [ds if isinstance(ds, Dataset) else Dataset(ds) for ds in datasets]
+		if not datasets:
+			return {}
+		groupby, spec, read_columns = _aggregate_spec(datasets[0].columns, groupby, aggs)
+		names = [name for name, _, _, _ in spec]
+		hashlabel = datasets[0].hashlabel
+		if hashlabel in groupby and all(ds.hashlabel == hashlabel and ds.columns[hashlabel].type == datasets[0].columns[hashlabel].type for ds in datasets):
+			# All lines for a group are in the same slice, so each slice
+			# can produce its final values and no merge is needed.
+			def one_slice(it):
+				res = _aggregate_batches(it, groupby, spec, read_columns)
+				return {k: dict(izip(names, _aggregate_values(spec, states))) for k, states in iteritems(res)}
+			res = {}
+			for part in Dataset._map_slices(one_slice, read_columns, datasets, None, dict(batch_size=_aggregate_batch_size)):
+				res.update(part)
+			return res
+		def one_slice(it):
+			return _aggregate_batches(it, groupby, spec, read_columns)
+		res = Dataset._map_slices(one_slice, read_columns, datasets, partial(_aggregate_merge, spec), dict(batch_size=_aggregate_batch_size))
+		return {k: dict(izip(names, _aggregate_values(spec, states))) for k, states in iteritems(res)}
+
+	def iterate_merged(self, columns, sort_columns, reverse=False):
+		"""Iterate all slices in sort_columns order, where each slice is
+		already sorted on sort_columns (like after dataset_sort without
+		sort_across_slices). The slices are merged as they are read, so
+		this needs no more memory than one row per slice.
+		None and NaN are ordered as in dataset_sort, and reverse=True is
+		for slices that are sorted in descending order.
+		Rows with equal sort keys come in slice order.
+		columns works like in .iterate, sort_columns can be a single name
+		or a list of names, and need not be among columns."""
+		return self._iterate_merged(columns, sort_columns, [self], reverse)
+
+	@staticmethod
+	def _iterate_merged(columns, sort_columns, datasets, reverse):
+		if isinstance(datasets, str_types + (Dataset, dict)):
+			datasets = [datasets]
+		datasets = [ds if isinstance(ds, Dataset) else Dataset(ds) for ds in datasets]
+		if not datasets:
+			return iter(())
+		if isinstance(sort_columns, str_types):
+			sort_columns = [sort_columns]
+		sort_columns = list(sort_columns)
+		if not sort_columns:
+			raise DatasetUsageError("iterate_merged needs at least one sort column")
+		if columns is None:
+			columns = datasets[0].columns
+		if isinstance(columns, str_types):
+			columns = [columns]
+			want_tuple = False
+		else:
+			if isinstance(columns, dict):
+				columns = sorted(columns)
+			columns = list(columns)
+			want_tuple = True
+		fixups = []
+		for column in sort_columns:
+			nonevs = set()
+			nanv = None
+			for ds in datasets:
+				if column not in ds.columns:
+					raise DatasetUsageError('Dataset %s does not have column %r' % (ds.quoted, column,))
+				dc = ds.columns[column]
+				if dc.none_support or dc.type.startswith('float') or dc.type == 'number':
+					ds_nonev, ds_nanv = _unsortable_values(dc.type)
+					nonevs.add(ds_nonev)
+					nanv = nanv or ds_nanv
+			if len(nonevs) > 1:
+				raise DatasetUsageError('Column %r has types that can not be merged' % (column,))
+			if nonevs:
+				nonev = nonevs.pop()
+				if nanv is None:
+					fixups.append(lambda v, nonev=nonev: nonev if v is None else v)
+				else:
+					fixups.append(lambda v, nonev=nonev, nanv=nanv: nonev if v is None else nanv if isnan(v) else v)
+			else:
+				fixups.append(None)
+		if not want_tuple and sort_columns == columns:
+			# Only the sort column, so no tuples and no projection.
+			read_columns = columns[0]
+			key = fixups[0]
+			project = None
+		else:
+			read_columns = columns + [c for c in sort_columns if c not in columns]
+			key_ix = [read_columns.index(c) for c in sort_columns]
+			if not any(fixups):
+				key = itemgetter(*key_ix)
+			elif len(key_ix) == 1:
+				ix, fixup = key_ix[0], fixups[0]
+				key = lambda row: fixup(row[ix])
+			else:
+				parts = [(ix, fixup or (lambda v: v)) for ix, fixup in zip(key_ix, fixups)]
+				key = lambda row: tuple(fixup(row[ix]) for ix, fixup in parts)
+			if not want_tuple:
+				project = itemgetter(0)
+			elif len(read_columns) > len(columns):
+				project = lambda row, n=len(columns): row[:n]
+			else:
+				project = None
+		iterables = [
+			ds.iterate(sliceno, read_columns, status_reporting=False)
+			for ds in datasets
+			for sliceno, lines in enumerate(ds.lines)
+			if lines
+		]
+		res = _heap_merge(iterables, key, reverse)
+		if project:
+			res = imap(project, res)
+		return res
 
 	@staticmethod
-	def iterate_list(sliceno, columns, datasets, range=None, sloppy_range=False, hashlabel=None, pre_callback=None, post_callback=None, filters=None, translators=None, status_reporting=True, rehash=False, slice=None, copy_mode=False):
+	def iterate_list(sliceno, columns, datasets, range=None, sloppy_range=False, hashlabel=None, pre_callback=None, post_callback=None, filters=None, translators=None, status_reporting=True, rehash=False, slice=None, copy_mode=False, batch_size=None, equals=None, readahead=False):
 		"""Iterator over the specified columns from datasets
 		(iterable of dataset-specifiers, or single dataset-specifier).
 		callbacks are called before and after each dataset is iterated.
@@ -506,10 +1245,22 @@ class Dataset(unicode):
 		In the latter case each individual filter is called with the column
 		value, or if it's None uses the column value directly.
 		All filters must say yes to yield a row.
+		A filter in the dict can also be a predicate tuple (or a list of
+		them, which must all match): (op, value) where op is one of
+		==, !=, <, <=, >, >= (these never match None), startswith, or
+		in (value is a collection of values, which may include None),
+		or just (op,) for isnone and notnone. These are evaluated by the
+		column reader without making python objects for rows that don't
+		match (when value is of the column type), and datasets and zones
+		where min/max show that nothing can match are skipped.
+		With a dict the other columns are only decoded for rows where all
+		filters match, so filtering wide datasets is cheap. (Don't rely on
+		translators for other columns being called for every row.)
 		examples:
 		filters={'some_col': some_dict.get}
 		filters={'some_col': some_set.__contains__}
 		filters={'some_col': some_str.__eq__}
+		filters={'some_col': ('>=', 5), 'other_col': ('in', {'a', 'b'})}
 		filters=lambda line: line[0] == line[1]
 
 		translators transform data values. It can be a callable (called with the
@@ -519,7 +1270,11 @@ class Dataset(unicode):
 		returning the new value) or dict. Items missing in the dict yield None,
 		which can be removed with filters={'col': None}.
 
-		Translators run before filters.
+		Translators run before filters. Column translators and filters (and
+		range) are applied by the native row iterator, so the only Python
+		code running per row is the functions you pass. (Tuple-translators,
+		tuple-filters and rehashing without rehash="shared" still need the
+		slower generic path.)
 
 		You can also pass a single name (a str) as columns, in which case you
 		don't get a tuple back (just the values). Tuple-filters/translators also
@@ -538,6 +1293,12 @@ class Dataset(unicode):
 		iteration. You should usually build a new rehashed dataset (using
 		the dataset_hashpart method), but this is available for when it makes
 		sense.
+		With rehash=True every slice reads all of the dataset. With
+		rehash="shared" each source slice is only read once, and split into
+		temporary files in the current job that the other slices read
+		their part from. (This uses some disk space until analysis is
+		done, but is much faster if you iterate in more than a few slices.)
+		rehash="shared" can only be used in analysis.
 
 		range limits which rows you see. Specify {colname: (start, stop)} and
 		only rows where start <= colvalue < stop will be returned.
@@ -564,9 +1325,43 @@ class Dataset(unicode):
 		copy_mode makes no promises about the returned types.
 		Use it together with copy_mode on a DatasetWriter for faster copying.
 		Not compatible with columns changing types across the list.
-		Also not compatible with filters or translators.
+		Also not compatible with translators or callable filters. Column
+		filters get normal values (you still get copy_mode values back).
+		Other columns are only read for the rows that match.
+
+		batch_size=N makes this return batches of up to N rows instead of
+		single rows. Each batch is a tuple with a list per column (or just
+		a list if you specified a single column name). Batches never span
+		more than one slice of one dataset, and without filters, translators,
+		range and rehash the values are read in bulk from the column files.
+		This is much faster than iterating rows when you want many values.
+		Not compatible with slice or sliceno="roundrobin".
+
+		equals={colname: value} only gives you rows where colname == value.
+		value can also be a set (or list/tuple) of values, and you can
+		specify several columns (all must match). This is a filter, so the
+		columns must be ones you are iterating. Slices without any of the
+		values are skipped without reading them if the dataset has a bloom
+		filter for the column (see DatasetWriter), as are slices where a
+		filters={colname: some_set.__contains__} filter can't match.
+
+		readahead=True decompresses the columns in background threads
+		while you consume the values, and opens the next slice/dataset
+		before you get to it. This uses more CPU (and memory), but can be
+		faster when you iterate several (compressed) columns.
 		"""
 
+		if batch_size is not None:
+			if not isinstance(batch_size, int_types) or batch_size < 1:
+				raise DatasetUsageError("batch_size must be a positive integer, not %r" % (batch_size,))
+			if slice:
+				raise DatasetUsageError("batch_size is not compatible with slice")
+			if sliceno == "roundrobin":
+				raise DatasetUsageError("batch_size is not compatible with roundrobin")
+		if rehash == 'shared':
+			from accelerator import g
+			if g.running != 'analysis':
+				raise DatasetUsageError('rehash="shared" can only be used in analysis, not in %s' % (g.running,))
 		if isinstance(datasets, str_types + (Dataset, dict)):
 			datasets = [datasets]
 		if not datasets:
@@ -584,13 +1379,49 @@ class Dataset(unicode):
 			if isinstance(columns, dict):
 				columns = sorted(columns)
 			want_tuple = True
+		bloom_values = {}
+		where = {}
+		if equals:
+			if callable(filters):
+				raise DatasetUsageError("equals is not compatible with callable filters")
+			filters = dict(filters or {})
+			for name, values in equals.items():
+				if name not in columns:
+					raise DatasetUsageError("equals column %r is not in columns" % (name,))
+				if name in filters:
+					raise DatasetUsageError("Can't have both equals and filters on column %r" % (name,))
+				if not isinstance(values, (set, frozenset, list, tuple)):
+					values = (values,)
+				filters[name] = ('in', values)
+		if filters and not callable(filters):
+			filters = dict(filters)
+			for name, f in filters.items():
+				preds = _where_preds(name, f)
+				if preds is not None:
+					where[name] = preds
+					filters[name] = f = _where_function(preds)
+					for p in preds:
+						if p[0] in ('==', 'in') and name not in bloom_values and not translators:
+							bloom_values[name] = p[1] if p[0] == 'in' else (p[1],)
+				if name not in bloom_values and getattr(f, '__name__', None) == '__contains__' and isinstance(getattr(f, '__self__', None), (set, frozenset)):
+					bloom_values[name] = f.__self__
+		# min/max can only rule out datasets for untranslated columns
+		where_minmax = {} if callable(translators) else {name: preds for name, preds in where.items() if name not in (translators or ())}
 		if copy_mode:
-			assert not filters, "copy_mode is not compatible with filters"
+			assert not callable(filters), "copy_mode is not compatible with callable filters"
 			assert not translators, "copy_mode is not compatible with translators"
 			need_types = {col: datasets[0].columns[col].type for col in columns}
 			for d in datasets:
 				for col, t in need_types.items():
 					assert d.columns[col].type == t, "%s column %s has type %s, not %s" % (d, col, d.columns[col].type, t,)
+			for name, f in (filters or {}).items():
+				decode = _copy_mode_decoders.get(need_types.get(name))
+				if decode:
+					# The filter gets the normal value, but the raw value
+					# is what gets yielded. The readers can't evaluate the
+					# predicates on the raw values.
+					filters[name] = lambda v, f=f or bool, decode=decode: f(None if v is None else decode(v))
+					where.pop(name, None)
 		to_iter = []
 		if range:
 			if len(range) != 1:
@@ -662,6 +1493,8 @@ class Dataset(unicode):
 					continue
 				if range_bottom is not None and c.max < range_bottom:
 					continue
+			if any(d.columns[name].min is not None and not _where_may_match(preds, d.columns[name].min, d.columns[name].max) for name, preds in where_minmax.items()):
+				continue
 			if hashlabel is not None and d.hashlabel != hashlabel:
 				if not rehash:
 					raise DatasetUsageError("%s has hashlabel %r, not %r" % (d, d.hashlabel, hashlabel,))
@@ -687,8 +1520,29 @@ class Dataset(unicode):
 		if not rehash and not pre_callback and not post_callback and not isinstance(sliceno, str_types):
 			# No reason to include empty slices then
 			to_iter = [t for t in to_iter if t[0].lines[t[1]]]
+			if bloom_values and not slice:
+				# or slices the bloom filters say don't have the values
+				hashes = {}
+				to_iter = [t for t in to_iter if Dataset._bloom_may_match(t[0], t[1], bloom_values, hashes)]
+		first_start = 0
+		if slice and slice.start and to_iter and to_iter[0][2] is None and not (filters or range or pre_callback or post_callback) and sliceno != "roundrobin":
+			# No lines before slice.start can be filtered out, so start
+			# reading there in the first slice. (Which can seek straight
+			# to the right block in the column files.)
+			first_start = slice.start
+			slice = adj_slice(first_start)
 		filter_func = Dataset._resolve_filters(columns, filters, want_tuple)
 		translation_func, translators = Dataset._resolve_translators(columns, translators)
+		if filters and not callable(filters) and ((want_tuple and len(set(filters)) < len(columns)) or where):
+			# The other columns only need to be decoded for matching rows,
+			# and declarative filters can be evaluated by the readers.
+			late_filters = sorted((columns.index(name), f, where.get(name),) for name, f in filters.items())
+		else:
+			late_filters = None
+		if filters and not callable(filters):
+			column_filters = {columns.index(name): f for name, f in filters.items()}
+		else:
+			column_filters = None
 		if sloppy_range:
 			range = None
 		from itertools import chain
@@ -703,21 +1557,21 @@ class Dataset(unicode):
 			range=range,
 			status_reporting=status_reporting,
 			copy_mode=copy_mode,
+			batch_size=batch_size,
+			readahead=readahead,
+			first_start=first_start,
+			shared_rehash=(rehash == 'shared'),
+			late_filters=late_filters,
+			column_filters=column_filters,
 		)
 		if sliceno == "roundrobin":
 			# We do our own status reporting
 			kw["status_reporting"] = False
 			def rr_inner(d, rehash):
-				todo = []
-				for ix in builtins.range(slices):
-					part = (d, ix, rehash)
-					todo.append(chain.from_iterable(Dataset._iterate_datasets([part], **kw)))
-				fv = object() # unique marker
-				return (
-					v for v in
-					chain.from_iterable(izip_longest(*todo, fillvalue=fv))
-					if v is not fv
-				)
+				return _RoundRobin([
+					chain.from_iterable(Dataset._iterate_datasets([(d, ix, rehash)], **kw))
+					for ix in builtins.range(slices)
+				])
 			def rr_outer():
 				with Dataset._iterstatus(status_reporting, to_iter) as update:
 					for ix, (d, sliceno, rehash) in enumerate(to_iter, 1):
@@ -730,6 +1584,35 @@ class Dataset(unicode):
 			res = islice(res, slice.start, slice.stop, slice.step)
 		return res
 
+	@staticmethod
+	def _bloom_may_match(d, sliceno, bloom_values, hashes):
+		for name, values in bloom_values.items():
+			dc = d.columns.get(name)
+			if not dc or not dc.bloom or not dc.bloom[1][sliceno]:
+				continue
+			if (dc.type, name,) not in hashes:
+				hashfunc = typed_writer(dc.type).hash
+				try:
+					hashes[(dc.type, name,)] = [hashfunc(v) for v in values]
+				except Exception:
+					# Values of other types could still compare equal
+					# (like 1.0 in an int column), so just read the slice.
+					hashes[(dc.type, name,)] = None
+			h_list = hashes[(dc.type, name,)]
+			if h_list is None:
+				continue
+			location, spans = dc.bloom
+			key = ('bloom', location,)
+			if key not in d._cache:
+				jid, fn = location.split('/', 1)
+				with open(Job(jid).filename(fn), 'rb') as fh:
+					d._cache[key] = fh.read()
+			offset, length = spans[sliceno]
+			bloom_filter = d._cache[key][offset:offset + length]
+			if not any(_bloom_check(bloom_filter, h) for h in h_list):
+				return False
+		return True
+
 	@staticmethod
 	def _resolve_filters(columns, filters, want_tuple):
 		if filters and not callable(filters):
@@ -768,7 +1651,8 @@ class Dataset(unicode):
 		else:
 			res = {}
 			for name, f in translators.items():
-				if not callable(f):
+				# Plain dicts are looked up directly by _RowIter.
+				if not callable(f) and type(f) is not dict:
 					f = f.get
 				res[columns.index(name)] = f
 			return None, res
@@ -796,8 +1680,10 @@ class Dataset(unicode):
 			yield update_status
 
 	@staticmethod
-	def _iterate_datasets(to_iter, columns, pre_callback, post_callback, filter_func, translation_func, translators, want_tuple, range, status_reporting, copy_mode):
+	def _iterate_datasets(to_iter, columns, pre_callback, post_callback, filter_func, translation_func, translators, want_tuple, range, status_reporting, copy_mode, batch_size=None, readahead=False, first_start=0, shared_rehash=False, late_filters=None, column_filters=None):
 		skip_ds = None
+		row_translators = translators
+		translators = {ix: t.get if type(t) is dict else t for ix, t in translators.items()}
 		def argfixup(func, is_post):
 			if func:
 				if len(getarglist(func)) == 1:
@@ -816,10 +1702,28 @@ class Dataset(unicode):
 		post_callback, unsliced_post_callback = argfixup(post_callback, True)
 		if not to_iter:
 			return
+		def prefetch(ix):
+			# Open the readers for to_iter[ix] (the part after the current
+			# one) now, so the files are read and decompressed in the
+			# background while the current part is consumed.
+			if not readahead or ix >= len(to_iter):
+				return None
+			d, sliceno, rehash = to_iter[ix]
+			if rehash is not None or not d.lines[sliceno]:
+				return None
+			return ix + 1, d._iterator(sliceno, columns, copy_mode=copy_mode, readahead=True)
+		def close_unused(prefetched, ix=None):
+			# Readers prefetched for another part than ix are never used,
+			# so stop their readahead threads now.
+			if prefetched and prefetched[0] != ix:
+				for r in prefetched[1]:
+					r.close()
+		prefetched = None
 		if range:
 			range_k, (range_bottom, range_top,) = next(iteritems(range))
 			range_none_support = any(d[0].columns[range_k].none_support for d in to_iter)
 			range_check = range_check_function(range_bottom, range_top, none_support=range_none_support)
+			range_preds = [p for p in (('>=', range_bottom), ('<', range_top)) if p[1] is not None]
 			if range_k in columns and range_k not in translators and not translation_func:
 				has_range_column = True
 				range_i = columns.index(range_k)
@@ -829,66 +1733,303 @@ class Dataset(unicode):
 					range_f = range_check
 			else:
 				has_range_column = False
-		with Dataset._iterstatus(status_reporting, to_iter) as update:
-			for ix, (d, sliceno, rehash) in enumerate(to_iter, 1):
-				if unsliced_post_callback:
-					try:
-						post_callback(d)
-					except StopIteration:
-						return
-				update(ix, d, sliceno, rehash)
-				if pre_callback:
-					if d == skip_ds:
-						continue
-					try:
-						pre_callback(d, sliceno)
-					except SkipSlice:
-						if unsliced_pre_callback:
+		try:
+			with Dataset._iterstatus(status_reporting, to_iter) as update:
+				for ix, (d, sliceno, rehash) in enumerate(to_iter, 1):
+					if unsliced_post_callback:
+						try:
+							post_callback(d)
+						except StopIteration:
+							return
+					update(ix, d, sliceno, rehash)
+					if pre_callback:
+						if d == skip_ds:
+							continue
+						try:
+							pre_callback(d, sliceno)
+						except SkipSlice:
+							if unsliced_pre_callback:
+								skip_ds = d
+							continue
+						except SkipDataset:
 							skip_ds = d
+							continue
+						except StopIteration:
+							return
+					if range:
+						c = d.columns[range_k]
+						need_range = c.min is not None and (not range_check(c.min) or not range_check(c.max))
+					else:
+						need_range = False
+					if batch_size and not (translators or translation_func or rehash is not None or need_range or filter_func):
+						if prefetched and prefetched[0] == ix:
+							it = prefetched[1]
+						else:
+							it = d._iterator(sliceno, columns, copy_mode=copy_mode, readahead=readahead)
+						close_unused(prefetched, ix)
+						prefetched = prefetch(ix)
+						yield Dataset._read_batches(it, batch_size, want_tuple, d.lines[sliceno])
+						if post_callback and not unsliced_post_callback:
+							try:
+								post_callback(d, sliceno)
+							except StopIteration:
+								return
 						continue
-					except SkipDataset:
-						skip_ds = d
+					shared = shared_rehash and rehash is not None and Dataset._can_share_rehash(d, rehash, copy_mode)
+					if shared:
+						it = d._shared_rehash_iterator(sliceno, rehash, columns, copy_mode=copy_mode)
+					elif prefetched and prefetched[0] == ix and not first_start:
+						it = prefetched[1]
+					else:
+						it = d._iterator(None if rehash is not None else sliceno, columns, copy_mode=copy_mode, start=first_start, readahead=readahead)
+					first_start = 0
+					close_unused(prefetched, ix)
+					prefetched = prefetch(ix)
+					spans = None
+					if need_range and rehash is None:
+						spans = Dataset._range_spans(d.columns[range_k], sliceno, d.lines[sliceno], range_bottom, range_top)
+					if late_filters and not translation_func and rehash is None and (not need_range or has_range_column) and all(hasattr(r, 'read_selected') for r in it):
+						filters = late_filters
+						if need_range:
+							filters = [(range_i, range_check, range_preds)] + filters
+						checks = [
+							(d.columns[columns[ix]], partial(_where_may_match, preds))
+							for ix, _, preds in filters
+							if preds is not None and ix not in translators
+						]
+						spans = Dataset._zone_spans(checks, sliceno, d.lines[sliceno])
+						it = Dataset._late_filter_iter(it, filters, translators, spans, want_tuple)
+						if batch_size:
+							it = Dataset._batch_rows(it, batch_size, want_tuple)
+						yield it
+						if post_callback and not unsliced_post_callback:
+							try:
+								post_callback(d, sliceno)
+							except StopIteration:
+								return
 						continue
-					except StopIteration:
-						return
-				it = d._iterator(None if rehash is not None else sliceno, columns, copy_mode=copy_mode)
-				for ix, trans in translators.items():
-					it[ix] = imap(trans, it[ix])
-				if want_tuple:
-					it = izip(*it)
-				else:
-					it = it[0]
-				if rehash is not None:
-					it = d._hashfilter(sliceno, rehash, it)
-				if translation_func:
-					it = imap(translation_func, it)
-				if range:
-					c = d.columns[range_k]
-					if c.min is not None and (not range_check(c.min) or not range_check(c.max)):
+					if spans is not None:
+						it = [Dataset._spans_iter(r, spans) for r in it]
+					if not translation_func and (rehash is None or shared) and (not filter_func or column_filters) and (not need_range or has_range_column):
+						# Everything happens in one native iterator.
+						it = _RowIter(
+							it,
+							translators=row_translators or None,
+							filters=column_filters,
+							range=(range_i, range_bottom, range_top) if need_range else None,
+							want_tuple=want_tuple,
+						)
+						if batch_size:
+							it = Dataset._batch_rows(it, batch_size, want_tuple)
+						yield it
+						if post_callback and not unsliced_post_callback:
+							try:
+								post_callback(d, sliceno)
+							except StopIteration:
+								return
+						continue
+					for ix, trans in translators.items():
+						it[ix] = imap(trans, it[ix])
+					if want_tuple:
+						it = izip(*it)
+					else:
+						it = it[0]
+					if rehash is not None and not shared:
+						it = d._hashfilter(sliceno, rehash, it)
+					if translation_func:
+						it = imap(translation_func, it)
+					if need_range:
 						if has_range_column:
 							it = ifilter(range_f, it)
 						else:
-							if rehash is not None:
+							if shared:
+								filter_it = d._shared_rehash_iterator(sliceno, rehash, [range_k])[0]
+							elif rehash is not None:
 								filter_it = d._hashfilter(sliceno, rehash, d._column_iterator(None, range_k))
 							else:
 								filter_it = d._column_iterator(sliceno, range_k)
+								if spans is not None:
+									filter_it = Dataset._spans_iter(filter_it, spans)
 							it = compress(it, imap(range_check, filter_it))
-				if filter_func:
-					it = ifilter(filter_func, it)
-				yield it
-				if post_callback and not unsliced_post_callback:
+					if filter_func:
+						it = ifilter(filter_func, it)
+					if batch_size:
+						it = Dataset._batch_rows(it, batch_size, want_tuple)
+					yield it
+					if post_callback and not unsliced_post_callback:
+						try:
+							post_callback(d, sliceno)
+						except StopIteration:
+							return
+				if unsliced_post_callback:
 					try:
-						post_callback(d, sliceno)
+						post_callback(None)
 					except StopIteration:
 						return
-			if unsliced_post_callback:
-				try:
-					post_callback(None)
-				except StopIteration:
-					return
+		finally:
+			close_unused(prefetched)
+
+	@staticmethod
+	def _can_share_rehash(d, hashlabel, copy_mode):
+		t = d.columns[hashlabel].type
+		if copy_mode:
+			t = _copy_mode_overrides.get(t, t)
+		return hasattr(typed_writer(t), 'hash')
+
+	@staticmethod
+	def _range_spans(c, sliceno, lines, bottom, top):
+		"""[(start, stop), ...] of rows in this slice that may be in range,
+		or None if this column has no zones or nothing can be skipped."""
+		def may_match(mn, mx):
+			if mn is None:
+				return False # only None values
+			return not ((top is not None and not mn < top) or (bottom is not None and not mx >= bottom))
+		return Dataset._zone_spans([(c, may_match)], sliceno, lines)
+
+	@staticmethod
+	def _zone_spans(checks, sliceno, lines):
+		"""[(start, stop), ...] of rows in this slice where all checks
+		[(column, may_match(min, max)), ...] say the zone may match,
+		or None if no column has zones or nothing can be skipped."""
+		if not lines:
+			return None
+		keep = None
+		zone_rows = None
+		for c, may_match in checks:
+			if not c.zones or (zone_rows and c.zones[0] != zone_rows):
+				continue
+			zone_rows, zones = c.zones
+			ok = [may_match(mn, mx) for mn, mx in zones[sliceno]]
+			keep = ok if keep is None else [a and b for a, b in izip(keep, ok)]
+		if keep is None:
+			return None
+		spans = []
+		for ix, ok in enumerate(keep):
+			if not ok:
+				continue
+			start = ix * zone_rows
+			stop = min(start + zone_rows, lines)
+			if spans and spans[-1][1] == start:
+				spans[-1] = (spans[-1][0], stop)
+			else:
+				spans.append((start, stop))
+		if spans == [(0, lines)]:
+			return None
+		return spans
+
+	@staticmethod
+	def _spans_iter(it, spans):
+		from itertools import chain
+		def parts():
+			pos = 0
+			for start, stop in spans:
+				if start != pos:
+					it.skip(start - pos)
+				yield islice(it, stop - start)
+				pos = stop
+		return chain.from_iterable(parts())
+
+	@staticmethod
+	def _late_filter_iter(readers, filters, translators, spans, want_tuple):
+		"""Rows from readers where all filters [(ix, f, preds), ...] match,
+		decoding the non-filter columns only for the matching rows.
+		Columns where all filters have (declarative) preds are checked by
+		the reader when it can, without decoding values that don't match.
+		Only rows in spans are read (all rows if spans is None)."""
+		by_ix = {}
+		for ix, f, preds in filters:
+			by_ix.setdefault(ix, []).append((f, preds,))
+		in_reader = []
+		in_python = []
+		for ix, fs in sorted(by_ix.items()):
+			r = readers[ix]
+			if all(preds is not None for _, preds in fs) and ix not in translators and hasattr(r, 'where'):
+				if r.where([p for _, preds in fs for p in preds]):
+					in_reader.append(ix)
+					continue
+			funcs = [bool if f is None else f for f, _ in fs]
+			if len(funcs) == 1:
+				in_python.append((ix, funcs[0],))
+			else:
+				in_python.append((ix, lambda v, funcs=funcs: all(f(v) for f in funcs),))
+		def filter_in_python(ix, f, selection):
+			r = readers[ix]
+			if isinstance(selection, int_types):
+				values = list(islice(r, selection))
+			else:
+				values = r.read_selected(selection)
+			if ix in translators:
+				values = list(imap(translators[ix], values))
+			keep = [bool(f(v)) for v in values]
+			if isinstance(selection, int_types):
+				matched = bytes(bytearray(keep))
+			else:
+				keep_it = iter(keep)
+				matched = bytes(bytearray(next(keep_it) if s else False for s in bytearray(selection)))
+			return list(compress(values, keep)), matched
+		def chunks():
+			pos = 0
+			for start, stop in spans or [(0, None)]:
+				if start != pos:
+					for r in readers:
+						r.skip(start - pos)
+					pos = start
+				while stop is None or pos < stop:
+					want_lines = _zone_rows if stop is None else min(_zone_rows, stop - pos)
+					selection = want_lines
+					filtered = {}
+					for ix in in_reader:
+						values, selection = readers[ix].read_where(selection)
+						filtered[ix] = (selection, values,)
+					for ix, f in in_python:
+						values, selection = filter_in_python(ix, f, selection)
+						filtered[ix] = (selection, values,)
+					lines = len(selection)
+					if not lines:
+						return
+					cols = []
+					for ix, r in enumerate(readers):
+						if ix in filtered:
+							matched, values = filtered[ix]
+							if matched is not selection:
+								# later filters removed some of these rows
+								values = list(compress(values, compress(bytearray(selection), bytearray(matched))))
+							cols.append(values)
+						else:
+							values = r.read_selected(selection)
+							if ix in translators:
+								values = imap(translators[ix], values)
+							cols.append(values)
+					yield izip(*cols) if want_tuple else cols[0]
+					pos += lines
+					if lines < want_lines:
+						return
+		from itertools import chain
+		return chain.from_iterable(chunks())
+
+	@staticmethod
+	def _read_batches(readers, batch_size, want_tuple, lines):
+		if not lines:
+			return
+		while True:
+			batch = tuple(r.read_chunk(batch_size) for r in readers)
+			if not batch[0]:
+				return
+			yield batch if want_tuple else batch[0]
 
 	@staticmethod
-	def new(columns, filenames, compressions, lines, minmax={}, filename=None, hashlabel=None, caption=None, previous=None, name='default'):
+	def _batch_rows(it, batch_size, want_tuple):
+		while True:
+			rows = list(islice(it, batch_size))
+			if not rows:
+				return
+			if want_tuple:
+				yield tuple(list(col) for col in izip(*rows))
+			else:
+				yield rows
+
+	@staticmethod
+	def new(columns, filenames, compressions, lines, minmax={}, filename=None, hashlabel=None, caption=None, previous=None, name='default', zones={}, bloom=(), stats={}, encodings={}):
 		"""columns = {"colname": "type"}, lines = [n, ...] or {sliceno: n}"""
 		columns = {uni(k): (uni(v[0]), bool(v[1])) if isinstance(v, tuple) else (uni(v), False) for k, v in columns.items()}
 		if hashlabel is not None:
@@ -898,7 +2039,7 @@ class Dataset(unicode):
 		res = Dataset(_new_dataset_marker, name)
 		res._data.lines = list(Dataset._linefixup(lines))
 		res._data.hashlabel = hashlabel
-		res._append(columns, filenames, compressions, minmax, filename, caption, previous, None, name)
+		res._append(columns, filenames, compressions, minmax, filename, caption, previous, None, name, zones, bloom, stats, encodings)
 		return res
 
 	@staticmethod
@@ -912,7 +2053,7 @@ class Dataset(unicode):
 			raise DatasetUsageError("Lines must be specified for all slices")
 		return lines
 
-	def append(self, columns, filenames, compressions, lines, minmax={}, filename=None, hashlabel=None, hashlabel_override=False, caption=None, previous=None, column_filter=None, name='default'):
+	def append(self, columns, filenames, compressions, lines, minmax={}, filename=None, hashlabel=None, hashlabel_override=False, caption=None, previous=None, column_filter=None, name='default', zones={}, bloom=(), stats={}, encodings={}):
 		hashlabel = uni(hashlabel)
 		if hashlabel_override:
 			self._data.hashlabel = hashlabel
@@ -921,7 +2062,7 @@ class Dataset(unicode):
 		if self._linefixup(lines) != self.lines:
 			raise DatasetUsageError("New columns don't have the same number of lines as parent columns")
 		columns = {uni(k): (uni(v[0]), bool(v[1])) if isinstance(v, tuple) else (uni(v), False) for k, v in columns.items()}
-		self._append(columns, filenames, compressions, minmax, filename, caption, previous, column_filter, name)
+		self._append(columns, filenames, compressions, minmax, filename, caption, previous, column_filter, name, zones, bloom, stats, encodings)
 
 	def _minmax_merge(self, minmax):
 		def minmax_fixup(a, b):
@@ -947,7 +2088,56 @@ class Dataset(unicode):
 					res[name] = [nanfix(min, mm[0], omm[0]), nanfix(max, mm[1], omm[1])]
 		return res
 
-	def _append(self, columns, filenames, compressions, minmax, filename, caption, previous, column_filter, name):
+	def _zones(self, colname, zones):
+		# zones is {sliceno: {colname: [(min, max), ...]}}, use it only if
+		# it is complete for this column.
+		res = []
+		for sliceno, lines in enumerate(self.lines):
+			z = zones.get(sliceno, {}).get(colname) if lines else []
+			if z is None or len(z) != (lines + _zone_rows - 1) // _zone_rows:
+				return None
+			res.append(list(z))
+		return (_zone_rows, res)
+
+	def _stats_merge(self, colname, stats):
+		# stats is {sliceno: {colname: (none_count, hll, histogram)}}, use
+		# it only if it is complete for this column.
+		none_count = []
+		distinct = []
+		hll = histogram = None
+		for sliceno, lines in enumerate(self.lines):
+			s = stats.get(sliceno, {}).get(colname)
+			if s is None:
+				if lines:
+					return None
+				none_count.append(0)
+				distinct.append(0)
+				continue
+			s_none_count, s_hll, s_histogram = s
+			none_count.append(s_none_count)
+			distinct.append(_hll_estimate(s_hll))
+			if lines > s_none_count:
+				hll = s_hll if hll is None else _hll_merge(hll, s_hll)
+			if s_histogram is not None:
+				histogram = _histogram_merge(histogram, s_histogram)
+		return dict(none_count=none_count, distinct=distinct, hll=hll, histogram=histogram)
+
+	def _bloom_collect(self, filename, m_fh):
+		# Move the bloom filter files for each slice into m_fh.
+		res = []
+		for sliceno in range(len(self.lines)):
+			fn = '%s/%d.%s.bloom' % (self._name('dir'), sliceno, filename,)
+			if not self.lines[sliceno] or not os.path.exists(fn):
+				res.append(None)
+				continue
+			with open(fn, 'rb') as fh:
+				data = fh.read()
+			os.unlink(fn)
+			res.append((m_fh.tell(), len(data),))
+			m_fh.write(data)
+		return res
+
+	def _append(self, columns, filenames, compressions, minmax, filename, caption, previous, column_filter, name, zones, bloom, stats, encodings):
 		from accelerator.g import job
 		name = uni(name)
 		filenames = {uni(k): uni(v) for k, v in filenames.items()}
@@ -973,6 +2163,10 @@ class Dataset(unicode):
 			if left_over:
 				raise DatasetUsageError("Columns in filter not available in dataset: %r" % (left_over,))
 			self._data.columns = filtered_columns
+		bloom = set(bloom) & set(columns)
+		if bloom:
+			b_location = '%s/%s' % (job, self._name('bloom'),)
+			b_fh = open(self._name('bloom'), 'wb')
 		for n, (t, none_support) in sorted(columns.items()):
 			if t not in _type2iter:
 				raise DatasetUsageError('Unknown type %s on column %s' % (t, n,))
@@ -986,8 +2180,14 @@ class Dataset(unicode):
 				max=mm[1],
 				offsets=None,
 				none_support=none_support,
+				zones=self._zones(n, zones),
+				bloom=(b_location, self._bloom_collect(filenames[n], b_fh)) if n in bloom else None,
+				stats=self._stats_merge(n, stats),
+				encoding=encodings.get(n),
 			)
 			self._maybe_merge(n)
+		if bloom:
+			b_fh.close()
 		if sum(self.lines) == 0:
 			os.rmdir(self._name('dir'))
 		else:
@@ -996,7 +2196,7 @@ class Dataset(unicode):
 		self._save()
 
 	def _update_caches(self):
-		for k in ('cache', 'cache_distance',):
+		for k in ('cache', 'cache_distance', 'chain_index',):
 			if k in self._data:
 				del self._data[k]
 		try:
@@ -1014,6 +2214,37 @@ class Dataset(unicode):
 				chain = self.chain(64)
 				self._data['cache'] = tuple((unicode(d), d._data) for d in chain[:-1])
 			self._data['cache_distance'] = cache_distance
+			self._update_chain_index(d)
+		else:
+			self._data['chain_index'] = (1, None,)
+
+	def _update_chain_index(self, previous):
+		# The chain index is (position, location). Position is 1 for the
+		# first dataset in the chain. If position is divisible by 2**N
+		# (with the largest such N > 0) location is a file with the
+		# entries for the 2**N - 1 datasets before this one (see
+		# _chain_entries), and which dataset comes before those. So
+		# _chain_entries only has to look at one dataset per set bit in
+		# the position (like a Fenwick tree).
+		index = previous._data.get('chain_index')
+		if index:
+			position = index[0] + 1
+		else:
+			# A chain from before there was a chain index
+			position = len(previous._chain_entries()) + 1
+		size = position & -position
+		location = None
+		if size > 1:
+			entries = previous._chain_entries(size)
+			if len(entries) == size:
+				before = entries.pop()[0]
+			else:
+				before = None
+			if not os.path.exists('DS'):
+				os.mkdir('DS')
+			blob.save((before, entries[::-1],), self._name('chain'), temp=False, _hidden=True)
+			location = '%s/%s' % (self.job, self._name('chain'),)
+		self._data['chain_index'] = (position, location,)
 
 	def _maybe_merge(self, n):
 		from accelerator.g import slices
@@ -1053,6 +2284,11 @@ class Dataset(unicode):
 				if size is not None:
 					os.unlink(fn % (sliceno,))
 					pos += size
+				try:
+					# the block index doesn't apply to merged files
+					os.unlink(fn % (sliceno,) + '.idx')
+				except FileNotFoundError:
+					pass
 		c = self._data.columns[n]
 		self._data.columns[n] = c._replace(
 			offsets=offsets,
@@ -1109,6 +2345,26 @@ _nodefault = object()
 
 _copy_mode_overrides = dict.fromkeys(('unicode', 'ascii', 'json', 'pickle'), 'bytes')
 
+# Turn copy_mode values back into normal values (for filters).
+def _copy_mode_decoders():
+	from json import JSONDecoder
+	from pickle import loads
+	json_decode = JSONDecoder().decode
+	if PY2:
+		return {
+			'unicode': lambda v: v.decode('utf-8'),
+			'ascii': lambda v: v,
+			'json': json_decode,
+		}
+	else:
+		return {
+			'unicode': lambda v: v.decode('utf-8'),
+			'ascii': lambda v: v.decode('ascii'),
+			'json': lambda v: json_decode(v.decode('utf-8')),
+			'pickle': loads,
+		}
+_copy_mode_decoders = _copy_mode_decoders()
+
 # short non-colliding filenames safe for any filesystem
 def _fngen():
 	from itertools import cycle
@@ -1168,6 +2424,12 @@ class DatasetWriter(object):
 
 	These should of course be assigned to a local name for performance.
 
+	If you already have the data in columns you can write many lines at
+	once with dw.write_columns({column: values}) (after set_slice) or
+	dw.get_split_write_columns()({column: values}). The values can be any
+	sequences (all of the same length), buffers with the right format
+	(like array.array or numpy arrays) are written without conversion.
+
 	It is permitted (but probably useless) to mix different write or
 	split functions, but you can only use either write functions or
 	split functions.
@@ -1186,11 +2448,37 @@ class DatasetWriter(object):
 
 	If you are just copying from another dataset you can set copy_mode
 	both here and in the iterator for that dataset for faster copying.
+
+	bloom is a list of column names to build bloom filters for. These
+	are used by .iterate with equals= (or filters={col: set.__contains__})
+	to skip slices that can not contain the wanted values. Not for json
+	or pickle columns. Building them needs 8 bytes of memory per line.
+
+	compression selects how the column files are compressed, "gzip"
+	(the default), "lz4" (much faster, but larger files), "zstd" (if
+	available, see accelerator.dsutil.compressions) or "none". Reading
+	is the same regardless of compression. Fixed width types (numbers
+	except "number", bool and the date/time types) in "none" columns are
+	read directly from a mmap of the file, so that is the fastest to read
+	and lets processes on the same host share the page cache.
+
+	encoding is {colname: encoding} for columns that should be encoded
+	before compression. "delta" stores the differences between values,
+	which is good for sorted columns (timestamps, ids), "rle" stores runs
+	of the same value once, which is good for low cardinality columns.
+	Only for the integer-like types (int, bits, bool and date/time types).
+	Reading is the same regardless of encoding, except that these columns
+	are never mmapped.
+
+	stats=True collects statistics (None count, approximate number of
+	distinct values and a histogram for numeric types) for all columns
+	while writing, see Dataset.stats. This makes writing slower (a lot
+	slower for string columns), so it is off by default.
 	"""
 
-	_split = _split_dict = _split_list = _allwriters_ = None
+	_split = _split_dict = _split_list = _split_columns = _allwriters_ = None
 
-	def __new__(cls, columns={}, filename=None, hashlabel=None, hashlabel_override=False, caption=None, previous=None, name='default', parent=None, meta_only=False, for_single_slice=None, copy_mode=False, allow_missing_slices=False):
+	def __new__(cls, columns={}, filename=None, hashlabel=None, hashlabel_override=False, caption=None, previous=None, name='default', parent=None, meta_only=False, for_single_slice=None, copy_mode=False, allow_missing_slices=False, compression='gzip', bloom=(), encoding={}, stats=False):
 		"""columns can be {'name': 'type'} or {'name': ('type', none_support)}.
 		It can also be {'name': DatasetColumn} to simplify basing your dataset on another."""
 		name = _namechk(name)
@@ -1204,6 +2492,11 @@ class DatasetWriter(object):
 		else:
 			if name in _datasetwriters or os.path.exists(_fs_name(name) + '.p'):
 				raise DatasetUsageError('Duplicate dataset name "%s"' % (name,))
+			if compression not in compressions:
+				raise DatasetUsageError("Unknown compression %r (available: %s)" % (compression, ', '.join(compressions),))
+			for k, v in encoding.items():
+				if v and v not in encodings:
+					raise DatasetUsageError("Unknown encoding %r for column %r (available: %s)" % (v, k, ', '.join(encodings),))
 			fs_name = _fs_name(name) + '.d'
 			if not os.path.exists('DS'):
 				os.mkdir('DS')
@@ -1222,6 +2515,12 @@ class DatasetWriter(object):
 			obj._for_single_slice = for_single_slice
 			obj._copy_mode = copy_mode
 			obj._allow_missing_slices = allow_missing_slices
+			obj._compression = uni(compression)
+			if isinstance(bloom, str_types):
+				bloom = [bloom]
+			obj._bloom = set(uni(n) for n in bloom)
+			obj._encodings = {uni(k): uni(v) for k, v in encoding.items() if v}
+			obj._collect_stats = bool(stats)
 			obj._filenames = {}
 			obj._fngen = _fngen()
 			discard_columns = {k for k, v in columns.items() if v is None}
@@ -1246,6 +2545,8 @@ class DatasetWriter(object):
 			obj._started = False
 			obj._lens = {}
 			obj._minmax = {}
+			obj._zones = {}
+			obj._stats = {}
 			obj._order = []
 			obj._compressions = {}
 			for k, v in sorted(columns.items()):
@@ -1291,6 +2592,7 @@ class DatasetWriter(object):
 		raise DatasetUsageError("Call .set_slice(sliceno) before writing.")
 	write_list = write
 	write_dict = write
+	write_columns = write
 
 	def set_slice(self, sliceno):
 		from accelerator import g
@@ -1333,6 +2635,17 @@ class DatasetWriter(object):
 			raise DatasetUsageError("No columns in dataset")
 		if self.hashlabel is not None and self.hashlabel not in self.columns:
 			raise DatasetUsageError("Hashed column (%r) missing" % (self.hashlabel,))
+		if self._bloom - set(self.columns):
+			raise DatasetUsageError("Bloom filter for non-existent column(s) %r" % (self._bloom - set(self.columns),))
+		for colname in self._bloom:
+			if self.columns[colname][0] in ('json', 'pickle',):
+				raise DatasetUsageError("Can't make a bloom filter for %s column %r" % (self.columns[colname][0], colname,))
+		if set(self._encodings) - set(self.columns):
+			raise DatasetUsageError("Encoding for non-existent column(s) %r" % (set(self._encodings) - set(self.columns),))
+		for colname in self._encodings:
+			coltype = self.columns[colname][0].split(':')[-1]
+			if coltype not in _encodable_types:
+				raise DatasetUsageError("Can't encode %s column %r" % (coltype, colname,))
 		self._started = 2 - filtered
 		if self.meta_only:
 			return
@@ -1343,9 +2656,15 @@ class DatasetWriter(object):
 				coltype = _copy_mode_overrides.get(coltype, coltype)
 			wt = typed_writer(coltype)
 			error_extra = ' (column %s (type %s) in %s)' % (quote(colname), coltype, quote('%s/%s' % (job, self.name,)),)
-			kw = {'none_support': none_support, 'error_extra': error_extra, 'compression': 'gzip'}
+			kw = {'none_support': none_support, 'error_extra': error_extra, 'compression': self._compression}
 			if default is not _nodefault:
 				kw['default'] = default
+			if self._collect_stats:
+				kw['stats'] = True
+			if colname in self._bloom:
+				kw['bloom'] = True
+			if colname in self._encodings:
+				kw['encoding'] = self._encodings[colname]
 			fn = self.column_filename(colname, sliceno)
 			if filtered and colname == self.hashlabel:
 				from accelerator.g import slices
@@ -1406,6 +2725,39 @@ class DatasetWriter(object):
 		self.write = w_d['write']
 		eval(compile('\n'.join(f_list), '<DatasetWriter generated write_list>', 'exec'), w_d)
 		self.write_list = w_d['write_list']
+		order = self._order
+		writers = [self.writers[c] for c in order]
+		write_list = self.write_list
+		def write_columns(columns):
+			values = self._column_values(columns)
+			if hl is not None and discard:
+				# Only the hashlabel knows which lines to keep.
+				for line in izip(*values):
+					write_list(line)
+				return
+			if hl is not None:
+				# Check all lines first, so nothing is written on error.
+				if not all(imap(writers[hix].hashcheck, values[hix])):
+					raise DatasetUsageError(wrong_slice_msg)
+			for w, v in zip(writers, values):
+				w.write_many(v)
+		self.write_columns = write_columns
+
+	def _column_values(self, columns):
+		"""The values from {column: values} in column order, as sequences
+		of the same length."""
+		if set(columns) != set(self._order):
+			raise DatasetUsageError("Columns %r don't match %r" % (sorted(columns), self._order,))
+		values = []
+		for colname in self._order:
+			v = columns[colname]
+			if not hasattr(v, '__getitem__') or not hasattr(v, '__len__'):
+				v = list(v)
+			values.append(v)
+		lens = set(len(v) for v in values)
+		if len(lens) > 1:
+			raise DatasetUsageError("Not all columns have the same length: %r" % (dict(zip(self._order, map(len, values))),))
+		return values
 
 	@property
 	def _allwriters(self):
@@ -1424,7 +2776,10 @@ class DatasetWriter(object):
 	def get_split_write_dict(self):
 		return self._split_dict or self._mksplit()['split_dict']
 
-	def _mksplit(self):
+	def get_split_write_columns(self):
+		return self._split_columns or self._mksplit_columns()
+
+	def _split_check(self):
 		from accelerator import g
 		if g.running == 'analysis' and self._for_single_slice != g.sliceno:
 			if self._for_single_slice is not None:
@@ -1437,81 +2792,103 @@ class DatasetWriter(object):
 			raise DatasetUsageError("Don't use a split writer with allow_missing_slices")
 		if self.parent and self.parent.hashlabel is not None and self.hashlabel is None:
 			raise DatasetUsageError("Can't use a split writer on hashed dataset when not writing the hash column.")
+
+	def _split_hash(self):
+		"""(hashfunc, default_slice) for the hashlabel, default_slice
+		is -1 if the hashlabel has no default value."""
+		from accelerator.g import slices
+		hl = self.hashlabel
+		hashfunc = self._allwriters[0][hl].hash
+		default_value = self.columns[hl][1]
+		if default_value is _nodefault:
+			return hashfunc, -1
+		return hashfunc, hashfunc(default_value) % slices # will not work with spread_None
+
+	def _mksplit(self):
+		self._split_check()
+		# The hashing and dispatching to the slice writers is done in C.
 		used_names = set()
 		names = [_clean_name(n, used_names) for n in self._order]
-		def key(t):
-			return self._order.index(t[0])
-		def d2l(d):
-			return [w.write for _, w in sorted(d.items(), key=key)]
-		f_____ = ['def split(' + ', '.join(names) + '):']
-		f_list = ['def split_list(v):']
-		f_dict = ['def split_dict(d):']
+		writes = [[d[c].write for c in self._order] for d in self._allwriters]
+		kw = {}
+		if self.hashlabel is not None:
+			kw['hashix'] = self._order.index(self.hashlabel)
+			kw['hashfunc'], kw['default_slice'] = self._split_hash()
+		split = _SplitWriter(writes, tuple(names), tuple(self._order), **kw)
+		self._split = split
+		self._split_list = split.write_list
+		self._split_dict = split.write_dict
+		return dict(split=split, split_list=split.write_list, split_dict=split.write_dict)
+
+	def _mksplit_columns(self):
+		self._split_check()
 		from accelerator.g import slices
+		writers = [[d[c] for c in self._order] for d in self._allwriters]
 		hl = self.hashlabel
-		name_w_l = _clean_name('w_l', used_names)
-		name_hsh = _clean_name('hsh', used_names)
-		name_cyc = _clean_name('cyc', used_names)
-		name_next = _clean_name('next', used_names)
-		name_writers = _clean_name('writers', used_names)
-		w_d = {}
-		w_d[name_writers] = [d2l(d) for d in self._allwriters]
-		w_d[name_next] = next
 		if hl is not None:
-			hashfunc = self._allwriters[0][hl].hash
-			default_value = self.columns[hl][1]
-			if default_value is not _nodefault:
-				default_slice = hashfunc(default_value) % slices # will not work with spread_None
-				def hashwrap(v):
+			hashfunc, default_slice = self._split_hash()
+			if default_slice != -1:
+				hashfunc_ = hashfunc
+				def hashfunc(v):
 					try:
-						return hashfunc(v)
+						return hashfunc_(v)
 					except (ValueError, TypeError, OverflowError):
 						return default_slice
-				w_d[name_hsh] = hashwrap
-			else:
-				w_d[name_hsh] = hashfunc
-			prefix = '%s = %s[%s(' % (name_w_l, name_writers, name_hsh,)
 			hix = self._order.index(hl)
-			f_____.append('%s%s) %% %d]' % (prefix, names[hix], slices,))
-			f_list.append('%sv[%d]) %% %d]' % (prefix, hix, slices,))
-			f_dict.append('%sd[%r]) %% %d]' % (prefix, hl, slices,))
-		else:
-			from itertools import cycle
-			w_d[name_cyc] = cycle(range(slices))
-			code = '%s = %s[%s(%s)]' % (name_w_l, name_writers, name_next, name_cyc,)
-			f_____.append(code)
-			f_list.append(code)
-			f_dict.append(code)
-		for ix in range(len(names)):
-			f_____.append('%s[%d](%s)' % (name_w_l, ix, names[ix],))
-			f_list.append('%s[%d](v[%d])' % (name_w_l, ix, ix,))
-			f_dict.append('%s[%d](d[%r])' % (name_w_l, ix, self._order[ix],))
-		eval(compile('\n '.join(f_____), '<DatasetWriter generated split_write>'     , 'exec'), w_d)
-		eval(compile('\n '.join(f_list), '<DatasetWriter generated split_write_list>', 'exec'), w_d)
-		eval(compile('\n '.join(f_dict), '<DatasetWriter generated split_write_dict>', 'exec'), w_d)
-		self._split = w_d['split']
-		self._split_list = w_d['split_list']
-		self._split_dict = w_d['split_dict']
-		return w_d
+		# Round robin continues where the previous call left off.
+		next_slice = [0]
+		def split_columns(columns):
+			values = self._column_values(columns)
+			if hl is None:
+				start = next_slice[0]
+				next_slice[0] = (start + len(values[0])) % slices
+				for sliceno, ws in enumerate(writers):
+					offset = (sliceno - start) % slices
+					for w, v in zip(ws, values):
+						w.write_many(v[offset::slices])
+			else:
+				line_slices = [hashfunc(v) % slices for v in values[hix]]
+				for sliceno, ws in enumerate(writers):
+					mask = [s == sliceno for s in line_slices]
+					for w, v in zip(ws, values):
+						w.write_many(compress(v, mask))
+		self._split_columns = split_columns
+		return split_columns
 
 	def _close(self, sliceno, writers):
 		lens = {}
 		minmax = {}
+		zones = {}
+		stats = {}
 		for k, w in writers.items():
 			lens[k] = w.count
 			minmax[k] = (w.min, w.max,)
 			w.close()
+			zones[k] = w.zones
+			stats[k] = w.stats()
+			if w.blocks:
+				with open(self.column_filename(k, sliceno) + '.idx', 'wb') as fh:
+					fh.write(struct.pack('=%dQ' % (len(w.blocks),), *w.blocks))
+			if w.bloom_filter is not None and w.count:
+				with open(self.column_filename(k, sliceno) + '.bloom', 'wb') as fh:
+					fh.write(w.bloom_filter)
 		len_set = set(lens.values())
 		if len(len_set) != 1:
 			raise DatasetUsageError("Not all columns have the same linecount in slice %d: %r" % (sliceno, lens))
 		self._lens[sliceno] = len_set.pop()
 		self._minmax[sliceno] = minmax
+		self._zones[sliceno] = zones
+		self._stats[sliceno] = stats
 
 	def close(self):
 		if self._split:
 			# this is needed to actually dispose of the writer objects
-			# when the gc is disabled (as it typically is here).
-			self._split.__globals__.clear()
+			# if the user keeps a reference to the split writer.
+			self._split.close()
 			self._split = self._split_dict = self._split_list = None
+		# (and this one is a reference cycle, which matters when the gc
+		# is disabled, as it typically is here.)
+		self._split_columns = None
 		if self._started == 2:
 			for sliceno, writers in enumerate(self._allwriters):
 				self._close(sliceno, writers)
@@ -1572,6 +2949,10 @@ class DatasetWriter(object):
 			compressions=self._compressions,
 			lines=self._lens,
 			minmax=self._minmax,
+			zones=self._zones,
+			bloom=() if self.meta_only else self._bloom,
+			stats=self._stats,
+			encodings={} if self.meta_only else self._encodings,
 			filename=self.filename,
 			hashlabel=self.hashlabel,
 			caption=self.caption,
@@ -1624,6 +3005,48 @@ class DatasetList(_ListTypePreserver):
 		min/max tracking"""
 		return self._minmax(column, 'max')
 
+	def stats(self, column):
+		"""Statistics for column over the whole chain, a DotDict with
+		lines, none_count, distinct (approximate, about 3% error, not
+		counting None), histogram (numeric types only, otherwise None)
+		and slices (lines, none_count and distinct per slice, distinct
+		is None there if there is more than one dataset).
+		The histogram is a list of (low, high, count) with bins between
+		powers of two, see dsutil._hist_range.
+		Will be None if no dataset in the chain contains column, or if
+		any of them has no statistics for it."""
+		parts = [(ds, ds.columns[column].stats) for ds in self if column in ds.columns]
+		if not parts or any(st is None for _, st in parts):
+			return None
+		slices = len(parts[0][0].lines)
+		hll = histogram = None
+		slice_lines = [0] * slices
+		slice_none_count = [0] * slices
+		for ds, st in parts:
+			if st['hll'] is not None:
+				hll = st['hll'] if hll is None else _hll_merge(hll, st['hll'])
+			if st['histogram'] is not None:
+				histogram = _histogram_merge(histogram, st['histogram'])
+			for sliceno in range(slices):
+				slice_lines[sliceno] += ds.lines[sliceno]
+				slice_none_count[sliceno] += st['none_count'][sliceno]
+		if len(parts) == 1:
+			slice_distinct = parts[0][1]['distinct']
+		else:
+			slice_distinct = [None] * slices
+		if histogram is not None:
+			histogram = [_hist_range(k) + (v,) for k, v in sorted(histogram.items(), key=lambda kv: _hist_range(kv[0]))]
+		return DotDict(
+			lines=sum(slice_lines),
+			none_count=sum(slice_none_count),
+			distinct=0 if hll is None else _hll_estimate(hll),
+			histogram=histogram,
+			slices=[
+				DotDict(lines=l, none_count=n, distinct=d)
+				for l, n, d in zip(slice_lines, slice_none_count, slice_distinct)
+			],
+		)
+
 	def lines(self, sliceno=None):
 		"""Number of rows in this chain, optionally for a specific slice."""
 		if sliceno is None:
@@ -1662,9 +3085,30 @@ class DatasetList(_ListTypePreserver):
 		"""If any dataset in the chain has None support for this column"""
 		return any(ds.columns[column].none_support for ds in self if column in ds.columns)
 
-	def iterate(self, sliceno, columns=None, range=None, sloppy_range=False, hashlabel=None, pre_callback=None, post_callback=None, filters=None, translators=None, status_reporting=True, rehash=False, slice=None, copy_mode=False):
+	def iterate(self, sliceno, columns=None, range=None, sloppy_range=False, hashlabel=None, pre_callback=None, post_callback=None, filters=None, translators=None, status_reporting=True, rehash=False, slice=None, copy_mode=False, batch_size=None, equals=None, readahead=False):
 		"""Iterate the datasets in this chain. See Dataset.iterate_list for usage"""
-		return Dataset.iterate_list(sliceno, columns, self, range=range, sloppy_range=sloppy_range, hashlabel=hashlabel, pre_callback=pre_callback, post_callback=post_callback, filters=filters, translators=translators, status_reporting=status_reporting, rehash=rehash, slice=slice, copy_mode=copy_mode)
+		return Dataset.iterate_list(sliceno, columns, self, range=range, sloppy_range=sloppy_range, hashlabel=hashlabel, pre_callback=pre_callback, post_callback=post_callback, filters=filters, translators=translators, status_reporting=status_reporting, rehash=rehash, slice=slice, copy_mode=copy_mode, batch_size=batch_size, equals=equals, readahead=readahead)
+
+	def get_rows(self, sliceno, start, stop, columns=None):
+		"""Lines start to stop over the whole chain. See Dataset.get_rows"""
+		return list(self.iterate(sliceno, columns, slice=builtins.slice(start, stop), status_reporting=False))
+
+	def column_array(self, sliceno, column):
+		"""Column over the whole chain as a numpy array. See Dataset.column_array"""
+		return Dataset._column_array(sliceno, column, self)
+
+	def map_slices(self, func, columns=None, merge=None, **kw):
+		"""Call func on each slice of the chain in parallel processes. See Dataset.map_slices"""
+		return Dataset._map_slices(func, columns, self, merge, kw)
+
+	def aggregate(self, groupby, aggs):
+		"""Group-by aggregation over the whole chain. See Dataset.aggregate"""
+		return Dataset._aggregate(groupby, aggs, self)
+
+	def iterate_merged(self, columns, sort_columns, reverse=False):
+		"""Iterate the chain in sort_columns order, merging all slices of all
+		datasets. Each slice must already be sorted. See Dataset.iterate_merged"""
+		return Dataset._iterate_merged(columns, sort_columns, self, reverse)
 
 	def range(self, colname, start=None, stop=None):
 		"""Filter out only datasets where colname has values in range(start, stop)"""
@@ -1752,6 +3196,98 @@ def range_check_function(bottom, top, none_support=False, index=None):
 	eval(compile(f_str, '<generated range check>', 'exec'), d)
 	return d['generated_range_check']
 
+_where_compare = {
+	'==': operator.eq,
+	'!=': operator.ne,
+	'<': operator.lt,
+	'<=': operator.le,
+	'>': operator.gt,
+	'>=': operator.ge,
+}
+_where_no_value = ('isnone', 'notnone',)
+_where_ops = set(_where_compare) | set(_where_no_value) | {'in', 'startswith'}
+
+def _where_preds(name, f):
+	"""Normalised [(op, value), ...] if f is a declarative filter (a
+	predicate tuple or a list of them), None for other filters."""
+	if isinstance(f, tuple) and f and isinstance(f[0], str_types):
+		f = [f]
+	elif not isinstance(f, list):
+		return None
+	res = []
+	for p in f:
+		if not isinstance(p, tuple):
+			raise DatasetUsageError("Bad filter %r for column %r" % (p, name,))
+		op = p[0] if p else None
+		if not isinstance(op, str_types) or op not in _where_ops:
+			raise DatasetUsageError("Unknown filter op %r for column %r" % (op, name,))
+		if len(p) != (1 if op in _where_no_value else 2):
+			raise DatasetUsageError("Bad filter %r for column %r" % (p, name,))
+		if op in _where_no_value:
+			res.append((str(op),))
+			continue
+		value = p[1]
+		if op == 'in':
+			if isinstance(value, str_types + (bytes,)) or not hasattr(value, '__iter__'):
+				raise DatasetUsageError("Filter ('in', values) for column %r needs a collection of values" % (name,))
+			value = frozenset(value)
+		elif value is None:
+			raise DatasetUsageError("Filter %r for column %r compares with None, use ('isnone',) instead" % (p, name,))
+		res.append((str(op), value,))
+	return res
+
+def _where_function(preds):
+	"""Python version of the predicates, for when the reader can't do it."""
+	def one(op, value=None):
+		if op == 'isnone':
+			return lambda v: v is None
+		elif op == 'notnone':
+			return lambda v: v is not None
+		elif op == 'in':
+			return value.__contains__
+		elif op == 'startswith':
+			return lambda v: v is not None and v.startswith(value)
+		else:
+			cmp = _where_compare[op]
+			return lambda v: v is not None and cmp(v, value)
+	funcs = [one(*p) for p in preds]
+	if len(funcs) == 1:
+		return funcs[0]
+	return lambda v: all(f(v) for f in funcs)
+
+def _where_may_match(preds, mn, mx):
+	"""Can any value v with mn <= v <= mx match all predicates?
+	mn and mx are None when there are only None values."""
+	for p in preds:
+		op = p[0]
+		if mn is None:
+			if op == 'isnone' or (op == 'in' and None in p[1]):
+				continue
+			return False
+		try:
+			if op == '==':
+				ok = mn <= p[1] <= mx
+			elif op == '<':
+				ok = mn < p[1]
+			elif op == '<=':
+				ok = mn <= p[1]
+			elif op == '>':
+				ok = mx > p[1]
+			elif op == '>=':
+				ok = mx >= p[1]
+			elif op == 'in':
+				ok = None in p[1] or any(mn <= v <= mx for v in p[1] if v is not None)
+			elif op == 'startswith':
+				l = len(p[1])
+				ok = mn[:l] <= p[1] <= mx[:l]
+			else:
+				ok = True
+		except TypeError:
+			ok = True
+		if not ok:
+			return False
+	return True
+
 
 class SkipDataset(Exception):
 	"""Raise this in pre_callback to skip iterating the coming dataset
@@ -119,6 +119,9 @@ class DepTree:
 				return v
 			if isinstance(default_v, OptionDefault):
 				default_v = default_v.value
+				if default_v is None:
+					# untyped, like a plain None option
+					return v
 			if isinstance(default_v, dict) and isinstance(v, dict):
 				if default_v:
 					sample_v = first_value(default_v)
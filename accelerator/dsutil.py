@@ -20,8 +20,10 @@
 from __future__ import print_function
 from __future__ import division
 
+from math import log
+
 from accelerator import _dsutil
-from accelerator.compat import str_types, PY3
+from accelerator.compat import str_types, imap, PY3
 
 _convfuncs = {
 	'number'   : _dsutil.WriteNumber,
@@ -40,6 +42,7 @@ _convfuncs = {
 	'bytes'    : _dsutil.WriteBytes,
 	'ascii'    : _dsutil.WriteAscii,
 	'unicode'  : _dsutil.WriteUnicode,
+	'dictunicode': _dsutil.WriteDictUnicode,
 	'parsed:number'   : _dsutil.WriteParsedNumber,
 	'parsed:complex64': _dsutil.WriteParsedComplex64,
 	'parsed:complex32': _dsutil.WriteParsedComplex32,
@@ -68,6 +71,23 @@ _type2iter = {
 	'bytes'    : _dsutil.ReadBytes,
 	'ascii'    : _dsutil.ReadAscii,
 	'unicode'  : _dsutil.ReadUnicode,
+	'dictunicode': _dsutil.ReadDictUnicode,
+}
+
+# numpy dtypes for Read*.readinto, only for the fixed width types.
+_type2dtype = {
+	'complex64': 'complex128',
+	'complex32': 'complex64',
+	'float64'  : 'float64',
+	'float32'  : 'float32',
+	'int64'    : 'int64',
+	'int32'    : 'int32',
+	'bits64'   : 'uint64',
+	'bits32'   : 'uint32',
+	'bool'     : 'bool',
+	'datetime' : 'datetime64[us]',
+	'date'     : 'datetime64[D]',
+	'time'     : 'timedelta64[us]',
 }
 
 def typed_writer(typename):
@@ -80,12 +100,91 @@ def typed_reader(typename):
 		raise ValueError("Unknown reader for type %s" % (typename,))
 	return _type2iter[typename]
 
+compressions = _dsutil.compressions
+
+# Encodings for fixed width integer-like types (applied before compression),
+# "delta" for sorted values and "rle" for long runs of the same value.
+encodings = _dsutil.encodings
+_encodable_types = {'int32', 'int64', 'bits32', 'bits64', 'bool', 'date', 'datetime', 'time'}
+
+# Rows per zone in DatasetColumn.zones, and per block in writer .blocks
+# (where the compression restarts, see dataset.py).
+_zone_rows = _dsutil.zone_rows
+
+# bloom_check(bloom_filter, hash) is False when the value is not in the slice
+_bloom_check = _dsutil.bloom_check
+
+# The split writer DatasetWriter.get_split_write* uses.
+_SplitWriter = _dsutil.SplitWriter
+
+# The row iterator Dataset.iterate uses (see its docstring).
+_RowIter = _dsutil.RowIter
+
+# The interleaving Dataset.iterate uses for sliceno="roundrobin".
+_RoundRobin = _dsutil.RoundRobin
+
+# hash(v) - the hash a writer for type(v) would use (any non-None value).
+_hash = _dsutil.hash
+
+# Helpers for the (none_count, hll_registers, histogram) that writers
+# created with stats=True give from .stats().
+
+def _hll_merge(a, b):
+	"""HyperLogLog registers for the union of the values in a and b."""
+	return bytes(bytearray(imap(max, bytearray(a), bytearray(b))))
+
+def _hll_estimate(registers):
+	"""Approximate number of distinct values from HyperLogLog registers."""
+	registers = bytearray(registers)
+	m = len(registers)
+	estimate = 0.7213 / (1 + 1.079 / m) * m * m / sum(2.0 ** -r for r in registers)
+	zeros = sum(1 for r in registers if not r)
+	if zeros and estimate <= 2.5 * m:
+		# Linear counting is better for small counts.
+		estimate = m * log(m / zeros)
+	return int(round(estimate))
+
+def _hist_range(key):
+	"""(low, high) for a histogram key. Positive keys are low <= v < high,
+	negative keys low < v <= high, and key 0 is (0, 0), for zeros.
+	The outermost bins (ending in +-inf) also hold the infinities."""
+	if not key:
+		return (0, 0)
+	e = abs(key) - _dsutil.hist_e - 1
+	low = 0 if e == -_dsutil.hist_e else 2.0 ** (e - 1)
+	high = float('inf') if e == _dsutil.hist_e else 2.0 ** e
+	if key < 0:
+		return (-high, -low)
+	return (low, high)
+
+# Highest level each compressor accepts (0 means no levels).
+_compression_max_level = {'gzip': 9, 'lz4': 0, 'zstd': 22, 'none': 0}
+
+def parse_compression(compression):
+	"""Parse a compression option like "gzip", "gzip:9", "lz4" or "zstd:3".
+	Just a number is a gzip level, like the old integer options.
+	Returns (name, spec) where spec is what the C code wants."""
+	compression = str(compression).strip()
+	if compression.isdigit():
+		compression = 'gzip:' + compression
+	name, _, level = compression.partition(':')
+	if name not in compressions:
+		raise ValueError("Unknown compression %r (available: %s)" % (name, ', '.join(compressions),))
+	if level:
+		max_level = _compression_max_level.get(name, 0)
+		if not level.isdigit() or not 1 <= int(level) <= max_level:
+			if max_level:
+				raise ValueError("Compression level for %s must be 1 - %d, not %r" % (name, max_level, level,))
+			else:
+				raise ValueError("Compression %s does not have levels" % (name,))
+	return name, compression
+
 _nodefault = object()
 
 from json import JSONEncoder, JSONDecoder, loads as json_loads
 class WriteJson(object):
 	__slots__ = ('fh', 'encode')
-	min = max = None
+	min = max = zones = bloom_filter = None
 	def __init__(self, *a, **kw):
 		default = kw.pop('default', _nodefault)
 		if PY3:
@@ -107,12 +206,19 @@ class WriteJson(object):
 		return wrapped_encode
 	def write(self, o):
 		self.fh.write(self.encode(o))
+	def write_many(self, values):
+		self.fh.write_many(imap(self.encode, values))
 	@property
 	def count(self):
 		return self.fh.count
 	@property
 	def compression(self):
 		return self.fh.compression
+	@property
+	def blocks(self):
+		return self.fh.blocks
+	def stats(self):
+		return self.fh.stats()
 	def close(self):
 		self.fh.close()
 	def __enter__(self):
@@ -153,6 +259,12 @@ class ReadJson(object):
 	def __next__(self):
 		return self.decode(next(self.fh))
 	next = __next__
+	def skip(self, n):
+		return self.fh.skip(n)
+	def read_selected(self, selection):
+		return [self.decode(v) for v in self.fh.read_selected(selection)]
+	def read_chunk(self, n):
+		return [self.decode(v) for v in self.fh.read_chunk(n)]
 	def close(self):
 		self.fh.close()
 	def __iter__(self):
@@ -166,19 +278,26 @@ _type2iter['json'] = ReadJson
 from pickle import dumps as pickle_dumps, loads as pickle_loads
 class WritePickle(object):
 	__slots__ = ('fh',)
-	min = max = None
+	min = max = zones = bloom_filter = None
 	def __init__(self, *a, **kw):
 		assert PY3, "Pickle columns require python 3, sorry"
 		assert 'default' not in kw, "default not supported for Pickle, sorry"
 		self.fh = _dsutil.WriteBytes(*a, **kw)
 	def write(self, o):
 		self.fh.write(pickle_dumps(o, 4))
+	def write_many(self, values):
+		self.fh.write_many(pickle_dumps(o, 4) for o in values)
 	@property
 	def count(self):
 		return self.fh.count
 	@property
 	def compression(self):
 		return self.fh.compression
+	@property
+	def blocks(self):
+		return self.fh.blocks
+	def stats(self):
+		return self.fh.stats()
 	def close(self):
 		self.fh.close()
 	def __enter__(self):
@@ -195,6 +314,12 @@ class ReadPickle(object):
 	def __next__(self):
 		return pickle_loads(next(self.fh))
 	next = __next__
+	def skip(self, n):
+		return self.fh.skip(n)
+	def read_selected(self, selection):
+		return [pickle_loads(v) for v in self.fh.read_selected(selection)]
+	def read_chunk(self, n):
+		return [pickle_loads(v) for v in self.fh.read_chunk(n)]
 	def close(self):
 		self.fh.close()
 	def __iter__(self):
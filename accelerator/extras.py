@@ -543,6 +543,7 @@ class OptionDefault(object):
 	foo={'bar': OptionEnum(...)} is a mandatory option.
 	foo=OptionDefault({'bar': OptionEnum(...)}) isn't.
 	(Default None unless specified.)
+	foo=OptionDefault(None, 6) accepts any value, and defaults to 6.
 	"""
 
 	__slots__ = ('value', 'default')
@@ -26,6 +26,7 @@ import signal
 import sys
 from collections import defaultdict
 from importlib import import_module
+from shutil import rmtree
 from traceback import format_tb, format_exception_only
 from time import sleep
 import json
@@ -140,6 +141,8 @@ def call_analysis(analysis_func, sliceno_, delayed_start, q, preserve_result, pa
 		from accelerator.extras import saved_files
 		dw_lens = {}
 		dw_minmax = {}
+		dw_zones = {}
+		dw_stats = {}
 		dw_compressions = {}
 		for name, dw in dataset._datasetwriters.items():
 			if dw._for_single_slice or sliceno_ == 0:
@@ -148,14 +151,16 @@ def call_analysis(analysis_func, sliceno_, delayed_start, q, preserve_result, pa
 				dw.close()
 				dw_lens[name] = dw._lens
 				dw_minmax[name] = dw._minmax
+				dw_zones[name] = dw._zones
+				dw_stats[name] = dw._stats
 		c_fflush()
-		q.put((sliceno_, monotonic(), saved_files, dw_lens, dw_minmax, dw_compressions, None, finishjob,))
+		q.put((sliceno_, monotonic(), saved_files, dw_lens, dw_minmax, dw_zones, dw_stats, dw_compressions, None, finishjob,))
 		q.close()
 	except:
 		c_fflush()
 		msg = fmt_tb(1)
 		print(msg)
-		q.put((sliceno_, monotonic(), {}, {}, {}, {}, msg, False,))
+		q.put((sliceno_, monotonic(), {}, {}, {}, {}, {}, {}, msg, False,))
 		q.close()
 		sleep(5) # give launcher time to report error (and kill us)
 		exitfunction()
@@ -213,7 +218,7 @@ def fork_analysis(slices, concurrency, analysis_func, kw, preserve_result, outpu
 				# the process died badly (e.g. from running out of memory).
 				exit_count += 1
 				continue
-			s_no, s_t, s_temp_files, s_dw_lens, s_dw_minmax, s_dw_compressions, s_tb, s_finishjob = msg
+			s_no, s_t, s_temp_files, s_dw_lens, s_dw_minmax, s_dw_zones, s_dw_stats, s_dw_compressions, s_tb, s_finishjob = msg
 		except QueueEmpty:
 			if not children:
 				# No children left, so they must have all sent their messages.
@@ -240,6 +245,10 @@ def fork_analysis(slices, concurrency, analysis_func, kw, preserve_result, outpu
 			dataset._datasetwriters[name]._lens.update(lens)
 		for name, minmax in s_dw_minmax.items():
 			dataset._datasetwriters[name]._minmax.update(minmax)
+		for name, zones in s_dw_zones.items():
+			dataset._datasetwriters[name]._zones.update(zones)
+		for name, stats in s_dw_stats.items():
+			dataset._datasetwriters[name]._stats.update(stats)
 		for name, compressions in s_dw_compressions.items():
 			dataset._datasetwriters[name]._compressions.update(compressions)
 	g.update_top_status("Waiting for all slices to finish cleanup")
@@ -387,7 +396,11 @@ def execute_process(workdir, jobid, slices, concurrency, result_directory, commo
 		g.subjob_cookie = None # subjobs are not allowed from analysis
 		with statmsg.status('Waiting for all slices to finish analysis') as update:
 			g.update_top_status = update
-			prof['per_slice'], files, g.analysis_res = fork_analysis(slices, concurrency, analysis_func, args_for(analysis_func), synthesis_needs_analysis, slaves, q)
+			try:
+				prof['per_slice'], files, g.analysis_res = fork_analysis(slices, concurrency, analysis_func, args_for(analysis_func), synthesis_needs_analysis, slaves, q)
+			finally:
+				# temp files from iterating with rehash="shared"
+				rmtree(dataset._shared_rehash_dir, ignore_errors=True)
 			del g.update_top_status
 		prof['analysis'] = monotonic() - t
 		saved_files.update(files)
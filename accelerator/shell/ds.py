@@ -62,6 +62,7 @@ def main(argv, cfg):
 	parser.add_argument('-q', '--suppress-errors',  action='store_true', negation='dont', help='silently ignores bad input datasets/jobids')
 	parser.add_argument('-s', '--slices',           action='store_true', negation='no',   help='list relative number of lines per slice in sorted order')
 	parser.add_argument('-S', '--chainedslices',    action='store_true', negation='no',   help='same as -s but for full chain')
+	parser.add_argument('-t', '--stats',            action='store_true', negation='no',   help='show None count, approximate number of distinct values and histogram per column (full chain with -c/-S)')
 	parser.add_argument('-w', '--location',         action='store_true', negation='no',   help='show where (ds/filename) each column is stored')
 	parser.add_argument("dataset", nargs='+', help='the job part of the dataset name can be specified in the same ways as for "ax job". you can use ds~ or ds~N to follow the chain N steps backwards, or ^ to follow .parent. this requires specifying the ds-name, so wd-1~ will not do this, but wd-1/default~ will.')
 	args = parser.parse_intermixed_args(argv)
@@ -92,7 +93,7 @@ def main(argv, cfg):
 				v = []
 				for ds in dsvec:
 					if args.chainedlist:
-						lines = sum(sum(x.lines) for x in ds.chain())
+						lines = ds.chain_lines()
 					else:
 						lines = sum(ds.lines)
 					v.append((ds.quoted, '{:n}'.format(lines)))
@@ -168,7 +169,9 @@ def main(argv, cfg):
 			len_n, len_t = colwidth((quote(n), name2typ[n]) for n, c in ds.columns.items())
 			if args.location:
 				len_l = max(len(quote(c.location)) for c in ds.columns.values())
-				len_c = max(len(c.compression) for c in ds.columns.values())
+				def compression(c):
+					return c.compression + '+' + c.encoding if c.encoding else c.compression
+				len_c = max(len(compression(c)) for c in ds.columns.values())
 				template = '        {2} {0:%d}  {1:%d}  {4:%d} {5:%d}  {3}' % (len_n, len_t, len_l, len_c,)
 			else:
 				template = '        {2} {0:%d}  {1:%d}  {3}' % (len_n, len_t,)
@@ -181,10 +184,29 @@ def main(argv, cfg):
 				else:
 					minval, maxval = c.min, c.max
 				hashdot = colour("*", "ds/highlight") if n == ds.hashlabel else " "
-				print(template.format(quote(n), name2typ[n], hashdot, prettyminmax(minval, maxval), quote(c.location), c.compression).rstrip())
+				print(template.format(quote(n), name2typ[n], hashdot, prettyminmax(minval, maxval), quote(c.location), compression(c) if args.location else None).rstrip())
 			print("    {0:n} columns".format(len(ds.columns)))
 		print("    {0:n} lines".format(sum(ds.lines)))
 
+		if args.stats:
+			print("    Statistics:")
+			if args.chainedslices or args.chain:
+				stats_src = ds.chain()
+			else:
+				stats_src = ds
+			len_n = max(len(quote(n)) for n in ds.columns)
+			for n in sorted(ds.columns):
+				st = stats_src.stats(n)
+				if st is None:
+					print("        {0:{1}}  (no statistics)".format(quote(n), len_n))
+					continue
+				print("        {0:{1}}  {2:n} None, ~{3:n} distinct".format(quote(n), len_n, st.none_count, st.distinct))
+				if st.histogram:
+					total = sum(count for _, _, count in st.histogram)
+					for low, high, count in st.histogram:
+						bar = '#' * int(ceil(30 * count / total))
+						print("        {0:{1}}    [{2:>9.3g}, {3:>9.3g}] {4:>12n} {5}".format('', len_n, low, high, count, bar))
+
 		if ds.previous or args.chain:
 			chain = ds.chain()
 			if args.non_empty_chain:
@@ -80,6 +80,7 @@ else:
 	format['bytes'] = None
 	format['number'] = lambda n: str(n) if isinstance(n, long) else repr(n)
 	format['unicode'] = lambda s: s.encode('utf-8')
+format['dictunicode'] = format['unicode']
 
 def csvexport(sliceno, filename, labelsonfirstline):
 	d = datasets.source[0]
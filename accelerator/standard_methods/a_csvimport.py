@@ -48,8 +48,8 @@ from threading import Thread
 import struct
 import locale
 
-from accelerator import OptionString, DotDict
-from accelerator.dsutil import typed_reader
+from accelerator import OptionString, OptionDefault, DotDict
+from accelerator.dsutil import typed_reader, parse_compression
 from accelerator.compat import setproctitle, uni
 from . import csvimport
 
@@ -72,7 +72,7 @@ options = dict(
 	allow_extra_empty = False, # Still consider a line good if it has extra empty fields at the end.
 	skip_lines        = 0,     # skip this many lines at the start of the file.
 	skip_empty_lines  = False, # ignore empty lines
-	compression       = 6,     # gzip level
+	compression       = OptionDefault(None, 6), # gzip level, or gzip, lz4, zstd or none, optionally with a level (gzip:9)
 )
 
 datasets = ('previous', )
@@ -132,13 +132,13 @@ def char2int(name, empty_value, specials="empty"):
 	assert len(char) == 1, msg
 	return cstuff.backend.char2int(char)
 
-def import_slice(fallback_msg, fd, sliceno, slices, field_count, out_fns, gzip_mode, separator, r_num, quote_char, lf_char, allow_bad, allow_extra_empty):
+def import_slice(fallback_msg, fd, sliceno, slices, field_count, out_fns, compression, separator, r_num, quote_char, lf_char, allow_bad, allow_extra_empty):
 	fn = "import.success.%d" % (sliceno,)
 	fh = open(fn, "wb+")
 	real_stderr = os.dup(2)
 	try:
 		os.dup2(fh.fileno(), 2)
-		res = cstuff.backend.import_slice(*cstuff.bytesargs(fd, sliceno, slices, field_count, out_fns, gzip_mode, separator, r_num, quote_char, lf_char, allow_bad, allow_extra_empty))
+		res = cstuff.backend.import_slice(*cstuff.bytesargs(fd, sliceno, slices, field_count, out_fns, compression, separator, r_num, quote_char, lf_char, allow_bad, allow_extra_empty))
 		os.dup2(real_stderr, 2)
 		fh.seek(0)
 		msg = fh.read().decode("utf-8", "replace")
@@ -164,7 +164,7 @@ def prepare(job, slices):
 		quote_char = char2int("quotes", 257, "True/False/empty")
 	filename = os.path.join(job.input_directory, options.filename)
 	orig_filename = filename
-	assert 1 <= options.compression <= 9
+	parse_compression(options.compression) # fail early on bad values
 
 	# To get a more useful error if the file doesn't exist or similar
 	open(filename, 'rb').close()
@@ -192,7 +192,7 @@ def prepare(job, slices):
 		out_fns = ["labels"]
 		r_num = cstuff.mk_uint64(3)
 		try:
-			import_slice("c backend failed in label parsing", labels_rfd, -1, -1, -1, out_fns, b"wb1", separator, r_num, quote_char, lf_char, 0, 0)
+			import_slice("c backend failed in label parsing", labels_rfd, -1, -1, -1, out_fns, b"gzip:1", separator, r_num, quote_char, lf_char, 0, 0)
 		finally:
 			os.close(labels_rfd)
 		if os.path.exists("labels"):
@@ -294,9 +294,9 @@ def analysis(sliceno, slices, prepare_res, update_top_status):
 	else:
 		out_fns.append(cstuff.NULL)
 	r_num = cstuff.mk_uint64(3) # [good_count, bad_count, comment_count]
-	gzip_mode = b"wb%d" % (options.compression,)
+	_, compression = parse_compression(options.compression)
 	try:
-		import_slice("c backend failed in slice %d" % (sliceno,), fds[sliceno], sliceno, slices, len(labels), out_fns, gzip_mode, separator, r_num, quote_char, lf_char, options.allow_bad, options.allow_extra_empty)
+		import_slice("c backend failed in slice %d" % (sliceno,), fds[sliceno], sliceno, slices, len(labels), out_fns, compression, separator, r_num, quote_char, lf_char, options.allow_bad, options.allow_extra_empty)
 	finally:
 		os.close(fds[sliceno])
 	return list(r_num)
@@ -329,9 +329,10 @@ def synthesis(prepare_res, analysis_res):
 		good_counts.append(good_count)
 		bad_counts.append(bad_count)
 		skipped_counts.append(skipped_count)
+	compression, _ = parse_compression(options.compression)
 	for dw in (bad_dw, skipped_dw, dw,):
 		if dw:
-			dw.set_compressions("gzip")
+			dw.set_compressions(compression)
 	return DotDict(
 		num_lines=sum(good_counts),
 		lines_per_slice=good_counts,
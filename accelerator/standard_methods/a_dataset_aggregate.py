@@ -0,0 +1,100 @@
+############################################################################
+#                                                                          #
+# Copyright (c) 2022 Carl Drougge                                          #
+#                                                                          #
+# Licensed under the Apache License, Version 2.0 (the "License");          #
+# you may not use this file except in compliance with the License.         #
+# You may obtain a copy of the License at                                  #
+#                                                                          #
+#  http://www.apache.org/licenses/LICENSE-2.0                              #
+#                                                                          #
+# Unless required by applicable law or agreed to in writing, software      #
+# distributed under the License is distributed on an "AS IS" BASIS,        #
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. #
+# See the License for the specific language governing permissions and      #
+# limitations under the License.                                           #
+#                                                                          #
+############################################################################
+
+from __future__ import division
+from __future__ import absolute_import
+
+description = r'''
+Group source (or chain to previous) on the groupby columns and aggregate
+in each group. Gives one line per group, with the groupby columns and
+one column per aggregation.
+
+aggregations is {name: [function, column]}, where function is one of
+count, sum, min, max, mean and distinct (an approximate count of distinct
+values, typically within a few percent). {name: "count"} counts lines,
+count with a column counts values that are not None. Other functions
+also ignore None, and min and max ignore NaN.
+
+If all of the chain is hashed on one of the groupby columns each slice
+has all lines for its groups, so the slices write their groups directly
+(and the result has the same hashlabel). Otherwise the groups from all
+slices are merged in synthesis and written without a hashlabel.
+
+Dataset.aggregate does the same thing without a job.
+'''
+
+from functools import partial, reduce
+
+from accelerator.compat import iteritems
+from accelerator.dataset import _aggregate_spec, _aggregate_output_types, _aggregate_batches, _aggregate_merge, _aggregate_values, _aggregate_batch_size
+
+options = {
+	'groupby'     : [str], # can be empty for a single group with everything
+	'aggregations': {}, # {name: [function, column]} or {name: 'count'}
+	'caption'     : 'aggregated',
+	'length'      : -1, # Go back at most this many datasets. You almost always want -1 (which goes until previous.source)
+}
+
+datasets = ('source', 'previous',)
+
+
+def prepare(job):
+	d = datasets.source
+	chain = d.chain(stop_ds={datasets.previous: 'source'}, length=options.length)
+	groupby, spec, read_columns = _aggregate_spec(d.columns, options.groupby, options.aggregations)
+	columns = [(name, (d.columns[name].type, chain.none_support(name))) for name in groupby]
+	columns.extend(sorted(_aggregate_output_types(d.columns, spec).items()))
+	hashlabel = d.hashlabel
+	local = (
+		hashlabel in groupby and
+		all(ds.hashlabel == hashlabel and ds.columns[hashlabel].type == d.columns[hashlabel].type for ds in chain)
+	)
+	dw = job.datasetwriter(
+		caption=options.caption,
+		hashlabel=hashlabel if local else None,
+		previous=datasets.previous,
+	)
+	# in this order, as the values are written positionally
+	for name, (coltype, none_support) in columns:
+		dw.add(name, coltype, none_support=none_support)
+	return dw, local, chain, groupby, spec, read_columns
+
+def group_values(groupby, key):
+	if len(groupby) == 1:
+		return [key]
+	return list(key)
+
+def analysis(sliceno, prepare_res):
+	dw, local, chain, groupby, spec, read_columns = prepare_res
+	it = chain.iterate(sliceno, read_columns, batch_size=_aggregate_batch_size)
+	res = _aggregate_batches(it, groupby, spec, read_columns)
+	if not local:
+		return res
+	# All lines for these groups are in this slice, so no merge is needed.
+	write = dw.write
+	for key, states in iteritems(res):
+		write(*group_values(groupby, key) + _aggregate_values(spec, states))
+
+def synthesis(prepare_res, analysis_res):
+	dw, local, chain, groupby, spec, read_columns = prepare_res
+	if local:
+		return
+	res = reduce(partial(_aggregate_merge, spec), analysis_res, {})
+	write = dw.get_split_write()
+	for key, states in iteritems(res):
+		write(*group_values(groupby, key) + _aggregate_values(spec, states))
@@ -89,7 +89,7 @@ def prepare():
 			# doesn't need any encoding, but might need None-handling.
 			if col.none_support:
 				translators[n] = self_none
-		elif col.type in ('unicode', 'ascii'):
+		elif col.type in ('unicode', 'dictunicode', 'ascii'):
 			if col.none_support:
 				translators[n] = bytesstr_none
 			else:
@@ -34,13 +34,17 @@ sort_across_slices will sort all lines and then split them over slices
 If you sort_across_slices you can also specify trigger_column to delay
 the slice switches to the next line where the value in that column
 changes.
+
+delta_encode stores the first sort column delta encoded (if it has an
+integer or date/time type), which makes it a lot smaller.
 '''
 
 from functools import partial
-import datetime
 from math import isnan
 
 from accelerator.compat import izip
+from accelerator.dsutil import _encodable_types
+from accelerator.dataset import _unsortable_values
 
 from accelerator.extras import OptionEnum, OptionString
 from accelerator.statmsg import status
@@ -52,32 +56,17 @@ options = {
 	'sort_order'             : OrderEnum.ascending,
 	'sort_across_slices'     : False, # normally only sort within slices
 	'trigger_column'         : str,   # only switch slice where this column changes
+	'delta_encode'           : False, # delta encode the first sort column
 }
 
 datasets = ('source', 'previous',)
 
 
 def filter_unsortable(column, it):
-	coltype = datasets.source.columns[column].type
-	if coltype == 'bytes':
-		nonev = b''
-	elif coltype in ('ascii', 'unicode',):
-		nonev = u''
-	elif coltype in ('int64', 'int32',):
-		nonev = float('-inf')
-	elif coltype == 'bool':
-		nonev = -1
-	elif coltype == 'datetime':
-		nonev = datetime.datetime.max
-	elif coltype == 'date':
-		nonev = datetime.date.max
-	elif coltype == 'time':
-		nonev = datetime.time.max
-	else:
-		nanv = float('inf')
-		nonev = float('-inf')
-		return (nonev if v is None else nanv if isnan(v) else v for v in it)
-	return (nonev if v is None else v for v in it)
+	nonev, nanv = _unsortable_values(datasets.source.columns[column].type)
+	if nanv is None:
+		return (nonev if v is None else v for v in it)
+	return (nonev if v is None else nanv if isnan(v) else v for v in it)
 
 def sort(columniter):
 	with status('Determining sort order'):
@@ -192,6 +181,11 @@ def prepare(job, params):
 		filename = d.filename
 	else:
 		filename = None
+	encoding = {}
+	if options.delta_encode:
+		column = options.sort_columns[0]
+		if d.columns[column].type in _encodable_types:
+			encoding[column] = 'delta'
 	dw = job.datasetwriter(
 		columns=d.columns,
 		caption=params.caption,
@@ -199,6 +193,7 @@ def prepare(job, params):
 		filename=filename,
 		previous=datasets.previous,
 		copy_mode=True,
+		encoding=encoding,
 	)
 	return dw, ds_list, sort_idx
 
@@ -31,8 +31,8 @@ import itertools
 
 from accelerator.compat import NoneType, unicode, imap, itervalues, PY2
 
-from accelerator.extras import OptionEnum, DotDict
-from accelerator.dsutil import typed_writer, typed_reader
+from accelerator.extras import OptionEnum, OptionDefault, DotDict
+from accelerator.dsutil import typed_writer, typed_reader, parse_compression
 from accelerator.error import NoSuchDatasetError, AcceleratorError
 from . import dataset_type
 
@@ -49,7 +49,8 @@ together with all other values on the same line.
 
 With filter_bad, when rehashing or when typing a chain a new dataset is
 produced. Any columns that do not have the same type over all the typed
-datasets will be discarded in this case. You can set discard_untyped to
+datasets will be discarded in this case (dictunicode columns are copied
+as unicode). You can set discard_untyped to
 discard all untyped columns, or set it to False to get an error if any
 columns were not preservable (except columns renamed over).
 
@@ -81,7 +82,7 @@ options = {
 	'numeric_comma'             : False, # floats as "3,14"
 	'length'                    : -1, # Go back at most this many datasets. You almost always want -1 (which goes until previous.source)
 	'as_chain'                  : False, # one dataset per slice if rehashing (avoids rewriting at the end)
-	'compression'               : 6,     # gzip level
+	'compression'               : OptionDefault(None, 6), # gzip level, or gzip, lz4, zstd or none, optionally with a level (gzip:9)
 }
 
 datasets = ('source', 'previous',)
@@ -92,7 +93,7 @@ byteslike_types = ('bytes', 'ascii', 'unicode',)
 cstuff = dataset_type.init()
 
 def prepare(job, slices):
-	assert 1 <= options.compression <= 9
+	parse_compression(options.compression) # fail early on bad values
 	assert datasets.source, 'No source specified'
 	if options.timezone:
 		cstuff.backend.init(options.timezone.encode('utf-8'))
@@ -146,6 +147,9 @@ def prepare(job, slices):
 		if 'bytes' in types:
 			types.discard('ascii')
 			types.discard('unicode')
+		if 'dictunicode' in types:
+			types.discard('dictunicode')
+			types.add('unicode')
 		if 'unicode' in types:
 			types.discard('ascii')
 		if len(types) == 1:
@@ -402,7 +406,8 @@ def analysis_lap(vars):
 			hash = typed_writer(real_coltype).hash
 			slices = vars.slices
 			vars.hash_lines = hash_lines = [0] * slices
-			for ix, value in enumerate(typed_reader(real_coltype)(out_fn)):
+			compression, _ = parse_compression(options.compression)
+			for ix, value in enumerate(typed_reader(real_coltype)(out_fn, compression=compression)):
 				dest_slice = hash(value) % slices
 				slicemap[ix] = dest_slice
 				hash_lines[dest_slice] += 1
@@ -461,9 +466,19 @@ def one_column(vars, colname, coltype, out_fns, for_hasher=False):
 		coltype = 'number'
 		cfunc = 'number'
 		fmt = "int"
+	if is_null_converter and any(d.columns[colname].type == 'dictunicode' for d in vars.chain):
+		# dictunicode isn't stored as blobs, so decode it and write unicode.
+		shorttype = 'unicode'
+		cfunc = None
+		pyfunc = lambda v: v.decode('utf-8') if isinstance(v, bytes) else v
+		src_type = None
+	else:
+		src_type = 'bytes'
 	assert cfunc or pyfunc, coltype + " didn't have cfunc or pyfunc"
+	compression, compression_spec = parse_compression(options.compression)
 	coltype = shorttype
 	in_fns = []
+	in_compressions = []
 	offsets = []
 	max_counts = []
 	dest_colname = options.rename.get(colname, colname)
@@ -474,6 +489,7 @@ def one_column(vars, colname, coltype, out_fns, for_hasher=False):
 		if not is_null_converter:
 			assert d.columns[colname].type in byteslike_types, '%s has bad type in %s' % (colname, d,)
 		in_fns.append(d.column_filename(colname, vars.sliceno))
+		in_compressions.append(d.columns[colname].compression)
 		if d.columns[colname].offsets:
 			offsets.append(d.columns[colname].offsets[vars.sliceno])
 			max_counts.append(d.lines[vars.sliceno])
@@ -505,10 +521,9 @@ def one_column(vars, colname, coltype, out_fns, for_hasher=False):
 			c_slices = 1
 		bad_count = cstuff.mk_uint64(c_slices)
 		default_count = cstuff.mk_uint64(c_slices)
-		gzip_mode = "wb%d" % (options.compression,)
 		if in_fns:
 			assert len(out_fns) == c_slices + vars.save_bad
-			res = c(*cstuff.bytesargs(in_fns, len(in_fns), out_fns, gzip_mode, minmax_fn, default_value, default_len, default_value_is_None, fmt, fmt_b, record_bad, skip_bad, vars.badmap_fd, vars.badmap_size, vars.save_bad, c_slices, vars.slicemap_fd, vars.slicemap_size, bad_count, default_count, offsets, max_counts))
+			res = c(*cstuff.bytesargs(in_fns, in_compressions, len(in_fns), out_fns, compression_spec, minmax_fn, default_value, default_len, default_value_is_None, fmt, fmt_b, record_bad, skip_bad, vars.badmap_fd, vars.badmap_size, vars.save_bad, c_slices, vars.slicemap_fd, vars.slicemap_size, bad_count, default_count, offsets, max_counts))
 			assert not res, 'Failed to convert ' + colname
 		vars.res_bad_count[dest_colname] = list(bad_count)
 		vars.res_default_count[dest_colname] = sum(default_count)
@@ -522,7 +537,7 @@ def one_column(vars, colname, coltype, out_fns, for_hasher=False):
 		else:
 			real_coltype = dataset_type.typerename.get(coltype, coltype)
 			if exists(minmax_fn):
-				with typed_reader(real_coltype)(minmax_fn) as it:
+				with typed_reader(real_coltype)(minmax_fn, compression=compression) as it:
 					vars.res_minmax[dest_colname] = list(it)
 				unlink(minmax_fn)
 	else:
@@ -550,17 +565,17 @@ def one_column(vars, colname, coltype, out_fns, for_hasher=False):
 			bad_count = [0]
 			chosen_slice = 0
 		default_count = 0
-		dont_minmax_types = {'bytes', 'ascii', 'unicode', 'json', 'complex32', 'complex64'}
+		dont_minmax_types = {'bytes', 'ascii', 'unicode', 'dictunicode', 'json', 'complex32', 'complex64'}
 		real_coltype = dataset_type.typerename.get(coltype, coltype)
 		do_minmax = real_coltype not in dont_minmax_types
 		if vars.save_bad:
-			bad_fh = typed_writer('bytes')(out_fns.pop(), none_support=True)
-		fhs = [typed_writer(real_coltype)(fn, none_support=True) for fn in out_fns]
+			bad_fh = typed_writer('bytes')(out_fns.pop(), none_support=True, compression=compression)
+		fhs = [typed_writer(real_coltype)(fn, none_support=True, compression=compression) for fn in out_fns]
 		if vars.save_bad:
 			fhs.append(bad_fh)
 		write = fhs[0].write
 		col_min = col_max = None
-		it = itertools.chain.from_iterable(d._column_iterator(vars.sliceno, colname, _type='bytes') for d in vars.chain)
+		it = itertools.chain.from_iterable(d._column_iterator(vars.sliceno, colname, _type=src_type) for d in vars.chain)
 		for ix, v in enumerate(it):
 			if vars.rehashing:
 				chosen_slice = slicemap[ix]
@@ -603,6 +618,7 @@ def one_column(vars, colname, coltype, out_fns, for_hasher=False):
 
 def synthesis(slices, analysis_res, prepare_res):
 	dw, dw_bad, dws, lines, _, column2type, columns, rev_rename = prepare_res
+	compression, _ = parse_compression(options.compression)
 	analysis_res = list(analysis_res)
 	if options.filter_bad:
 		bad_line_count_per_slice = [sum(data[1]) for data in analysis_res]
@@ -644,7 +660,7 @@ def synthesis(slices, analysis_res, prepare_res):
 				unlink(fn)
 		for s, cnt in enumerate(bad_line_count_per_slice):
 			dw_bad.set_lines(s, cnt)
-		dw_bad.set_compressions('gzip')
+		dw_bad.set_compressions(compression)
 	if options.defaults and sum(sum(data[2].values()) for data in analysis_res):
 		print('Defaulted values')
 		for colname in sorted(options.defaults):
@@ -686,14 +702,14 @@ def synthesis(slices, analysis_res, prepare_res):
 					dws[sliceno].set_minmax(-1, data[3])
 					for s, count in enumerate(data[4]):
 						dws[sliceno].set_lines(s, count - data[1][s])
-					dws[sliceno].set_compressions('gzip')
+					dws[sliceno].set_compressions(compression)
 	else:
 		for sliceno, count in enumerate(lines):
 			dw.set_lines(sliceno, count)
 		for sliceno, data in enumerate(analysis_res):
 			dw.set_minmax(sliceno, data[3])
 	if dw:
-		dw.set_compressions('gzip')
+		dw.set_compressions(compression)
 	used = {rev_rename.get(colname, colname) for colname in column2type}
 	discarded = set(datasets.source.columns) - used
 	if discarded:
@@ -20,6 +20,7 @@ from __future__ import print_function
 from __future__ import division
 from __future__ import unicode_literals
 
+import os
 import sys
 import hashlib
 from importlib import import_module
@@ -147,7 +148,20 @@ def init(name, hash, protos, extra_protos, functions):
 		# so I guess we'll just assume that ssize_t is the same as off_t.
 		ffi.cdef('typedef ssize_t off_t;')
 		ffi.cdef(''.join(protos + extra_protos))
-		backend = ffi.verify(functions, libraries=['z'], extra_compile_args=['-std=c99', '-DCFFI_ATE_MY_GIL'])
+		# The compression code _dsutil and the backends share is installed
+		# with the package, and zstd is used if _dsutil was built with it.
+		from accelerator.dsutil import compressions
+		csrc_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'csrc')
+		kw = dict(
+			libraries=['z'],
+			include_dirs=[csrc_dir],
+			sources=[os.path.join(csrc_dir, 'lz4.c')],
+			extra_compile_args=['-std=c99', '-DCFFI_ATE_MY_GIL'],
+		)
+		if 'zstd' in compressions:
+			kw['libraries'].append('zstd')
+			kw['extra_compile_args'].append('-DDSU_HAVE_ZSTD')
+		backend = ffi.verify(functions, **kw)
 
 	# make any unicode args bytes, for C calls.
 	def bytesargs(*a):
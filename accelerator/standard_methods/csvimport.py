@@ -33,6 +33,8 @@ all_c_functions = r'''
 #include <sys/types.h>
 #include <signal.h>
 
+#include "compression.h"
+
 #define err1(v) if (v) { if (errno) perror("ERROR"); fprintf(stderr, "ERROR on %s line %d\n", __FILE__, __LINE__); goto err; }
 #define BIG_Z (1024 * 1024 * 16 - 64)
 #define SMALL_Z (1024 * 64)
@@ -303,19 +305,19 @@ err:
 	return res;
 }
 
-static inline int field_write(gzFile fh, char *ptr, const int32_t len)
+static inline int field_write(dsu_file *fh, char *ptr, const int32_t len)
 {
 	if (len < 255) {
 		// callers make sure there is room for one byte before ptr
 		uint8_t *uptr = (uint8_t *)ptr - 1;
 		*uptr = len;
-		return (gzwrite(fh, uptr, len + 1) != len + 1);
+		return dsu_write(fh, uptr, len + 1);
 	} else {
 		uint8_t lenbuf[5];
 		lenbuf[0] = 255;
 		memcpy(lenbuf + 1, &len, 4);
-		if (gzwrite(fh, &lenbuf, 5) != 5) return 1;
-		return (gzwrite(fh, ptr, len) != len);
+		if (dsu_write(fh, &lenbuf, 5)) return 1;
+		return dsu_write(fh, ptr, len);
 	}
 }
 
@@ -350,7 +352,7 @@ static inline int bufread(const int fd, readbuf *buf, const uint32_t len, int *r
 	return 0;
 }
 
-static int import_slice(const int fd, const int sliceno, const int slices, int field_count, const char *out_fns[], const char *gzip_mode, const int separator, uint64_t *r_num, const int quote_char, const int lf_char, const int allow_bad, const int allow_extra_empty)
+static int import_slice(const int fd, const int sliceno, const int slices, int field_count, const char *out_fns[], const char *compression, const int separator, uint64_t *r_num, const int quote_char, const int lf_char, const int allow_bad, const int allow_extra_empty)
 {
 	FILE * const badline_report_fh = (allow_bad ? stdout : stderr);
 	int badline_reported = 0;
@@ -361,7 +363,7 @@ static int import_slice(const int fd, const int sliceno, const int slices, int f
 	const int parsing_labels = (field_count == -1);
 	const int real_field_count = (parsing_labels ? 1 : field_count);
 	const int full_field_count = (parsing_labels ? 1 : real_field_count + 5);
-	gzFile outfh[full_field_count];
+	dsu_file *outfh[full_field_count];
 	char *field_ptrs[real_field_count];
 	int32_t field_lens[real_field_count];
 	const int save_lineno = !!out_fns[real_field_count + 4];
@@ -391,7 +393,7 @@ static int import_slice(const int fd, const int sliceno, const int slices, int f
 	}
 	for (int i = 0; i < full_field_count; i++) {
 		if (out_fns[i]) {
-			outfh[i] = gzopen(out_fns[i], gzip_mode);
+			outfh[i] = dsu_open_write(out_fns[i], compression);
 			err1(!outfh[i]);
 		}
 	}
@@ -415,7 +417,7 @@ buf_prefilled:
 		}
 		err1(bufread(fd, buf, len, &eof, &bufptr));
 		if (skip_line) {
-			err1(gzwrite(outfh[real_field_count + 2], &lineno, 8) != 8);
+			err1(dsu_write(outfh[real_field_count + 2], &lineno, 8));
 			err1(field_write(outfh[real_field_count + 3], bufptr, len));
 			r_num[2]++;
 			skip_line = 0;
@@ -533,7 +535,7 @@ buf_prefilled:
 				}
 			}
 			if (save_lineno) {
-				err1(gzwrite(outfh[real_field_count + 4], &lineno, 8) != 8);
+				err1(dsu_write(outfh[real_field_count + 4], &lineno, 8));
 			}
 		}
 		num++;
@@ -545,7 +547,7 @@ done:
 err:
 	if (res && errno) perror("import_slice");
 	for (int i = 0; i < full_field_count; i++) {
-		if (outfh[i] && gzclose(outfh[i])) res = 1;
+		if (outfh[i] && dsu_close_write(outfh[i])) res = 1;
 	}
 	return res;
 bad_line:
@@ -562,7 +564,7 @@ bad_line:
 	r_num[1]++;
 	if (allow_bad) {
 		if (outfh[real_field_count]) {
-			err1(gzwrite(outfh[real_field_count], &lineno, 8) != 8);
+			err1(dsu_write(outfh[real_field_count], &lineno, 8));
 			err1(field_write(outfh[real_field_count + 1], bufptr, len));
 		}
 		lineno += slices;
@@ -636,7 +638,7 @@ static PyObject *py_import_slice(PyObject *self, PyObject *args)
 	int field_count;
 	PyObject *o_out_fns;
 	const char **out_fns = 0;
-	const char *gzip_mode;
+	const char *compression;
 	int separator;
 	PyObject *o_r_num;
 	uint64_t r_num[3] = {0, 0, 0};
@@ -650,7 +652,7 @@ static PyObject *py_import_slice(PyObject *self, PyObject *args)
 		&slices,
 		&field_count,
 		&o_out_fns,
-		Py_FileSystemDefaultEncoding, &gzip_mode,
+		Py_FileSystemDefaultEncoding, &compression,
 		&separator,
 		&o_r_num,
 		&quote_char,
@@ -673,7 +675,7 @@ static PyObject *py_import_slice(PyObject *self, PyObject *args)
 			return 0;
 		}
 	}
-	err1(import_slice(fd, sliceno, slices, field_count, out_fns, gzip_mode, separator, r_num, quote_char, lf_char, allow_bad, allow_extra_empty));
+	err1(import_slice(fd, sliceno, slices, field_count, out_fns, compression, separator, r_num, quote_char, lf_char, allow_bad, allow_extra_empty));
 	for (int i = 0; i < 3; i++) {
 		err1(PyList_SetItem(o_r_num, i, PyLong_FromUnsignedLongLong(r_num[i])));
 	}
@@ -705,7 +707,7 @@ c_module_code, c_module_hash = c_backend_support.make_source('csvimport', all_c_
 def init():
 	protos = [
 		'static int reader(const char *fn, const int slices, uint64_t skip_lines, const int skip_empty_lines, const int outfds[], int labels_fd, int status_fd, const int comment_char, const int lf_char);',
-		'static int import_slice(const int fd, const int sliceno, const int slices, const int field_count, const char *out_fns[], const char *gzip_mode, const int separator, uint64_t *r_num, const int quote_char, const int lf_char, const int allow_bad, const int allow_extra_empty);',
+		'static int import_slice(const int fd, const int sliceno, const int slices, const int field_count, const char *out_fns[], const char *compression, const int separator, uint64_t *r_num, const int quote_char, const int lf_char, const int allow_bad, const int allow_extra_empty);',
 		'static int char2int(const char c);',
 	]
 	return c_backend_support.init('csvimport', c_module_hash, [], protos, all_c_functions)
@@ -913,7 +913,8 @@ def _test():
 	for key, mm in iteritems(minmaxfuncs):
 		for v in mm:
 			assert isinstance(v, str), key
-	known = set(v for v in _convfuncs if ':' not in v)
+	# dictunicode is not stored as blobs, so it can't be copied.
+	known = set(v for v in _convfuncs if ':' not in v) - {'dictunicode'}
 	copy_missing = known - set(copy_types)
 	copy_extra = set(copy_types) - known
 	assert not copy_missing, 'copy_types missing %r' % (copy_missing,)
@@ -927,7 +928,7 @@ convert_template = r'''
 	PyGILState_STATE gstate = PyGILState_Ensure();
 #endif
 	g g;
-	gzFile outfhs[slices + save_bad];
+	dsu_file *outfhs[slices + save_bad];
 	memset(outfhs, 0, sizeof(outfhs));
 	const char *line;
 	int res = 1;
@@ -940,7 +941,7 @@ convert_template = r'''
 	uint16_t *slicemap = 0;
 	int chosen_slice = 0;
 	int current_file = 0;
-	err1(g_init(&g, in_fns[current_file], offsets[current_file], 1));
+	err1(g_init(&g, in_fns[current_file], in_compressions[current_file], offsets[current_file], 1));
 	if (badmap_fd != -1) {
 		badmap = mmap(0, badmap_size, PROT_READ | PROT_WRITE, MAP_NOSYNC | MAP_SHARED, badmap_fd, 0);
 		err1(!badmap);
@@ -1008,32 +1009,32 @@ more_infiles:
 			default_count[chosen_slice] += 1;
 		}
 		if (!outfhs[chosen_slice]) {
-			outfhs[chosen_slice] = gzopen(out_fns[chosen_slice], gzip_mode);
+			outfhs[chosen_slice] = dsu_open_write(out_fns[chosen_slice], compression);
 			err1(!outfhs[chosen_slice]);
 		}
 		%(minmax_code)s;
-		err1(gzwrite(outfhs[chosen_slice], ptr, %(datalen)s) != %(datalen)s);
+		err1(dsu_write(outfhs[chosen_slice], ptr, %(datalen)s));
 	}
 	current_file++;
 	if (current_file < in_count) {
-		g_init(&g, in_fns[current_file], offsets[current_file], 0);
+		g_init(&g, in_fns[current_file], in_compressions[current_file], offsets[current_file], 0);
 		goto more_infiles;
 	}
 	if (minmax_any) {
 		%(minmax_extra)s
-		gzFile minmaxfh = gzopen(minmax_fn, gzip_mode);
+		dsu_file *minmaxfh = dsu_open_write(minmax_fn, compression);
 		err1(!minmaxfh);
 		res = g.error;
-		if (gzwrite(minmaxfh, buf_col_min, %(datalen)s) != %(datalen)s) res = 1;
-		if (gzwrite(minmaxfh, buf_col_max, %(datalen)s) != %(datalen)s) res = 1;
-		if (gzclose(minmaxfh)) res = 1;
+		if (dsu_write(minmaxfh, buf_col_min, %(datalen)s)) res = 1;
+		if (dsu_write(minmaxfh, buf_col_max, %(datalen)s)) res = 1;
+		if (dsu_close_write(minmaxfh)) res = 1;
 	} else {
 		res = g.error;
 	}
 err:
 	if (g_cleanup(&g)) res = 1;
 	for (int i = 0; i < slices + save_bad; i++) {
-		if (outfhs[i] && gzclose(outfhs[i])) res = 1;
+		if (outfhs[i] && dsu_close_write(outfhs[i])) res = 1;
 	}
 	if (badmap) munmap(badmap, badmap_size);
 	if (slicemap) munmap(slicemap, slicemap_size);
@@ -1172,7 +1173,7 @@ err:
 %(proto)s
 {
 	g g;
-	gzFile outfhs[slices + save_bad];
+	dsu_file *outfhs[slices + save_bad];
 	memset(outfhs, 0, sizeof(outfhs));
 	const char *line;
 	int  res = 1;
@@ -1198,7 +1199,7 @@ err:
 #ifdef CFFI_ATE_MY_GIL
 	PyGILState_STATE gstate = PyGILState_Ensure();
 #endif
-	err1(g_init(&g, in_fns[current_file], offsets[current_file], 1));
+	err1(g_init(&g, in_fns[current_file], in_compressions[current_file], offsets[current_file], 1));
 	if (badmap_fd != -1) {
 		badmap = mmap(0, badmap_size, PROT_READ | PROT_WRITE, MAP_NOSYNC | MAP_SHARED, badmap_fd, 0);
 		err1(!badmap);
@@ -1321,14 +1322,14 @@ more_infiles:
 			}
 		}
 		if (!outfhs[chosen_slice]) {
-			outfhs[chosen_slice] = gzopen(out_fns[chosen_slice], gzip_mode);
+			outfhs[chosen_slice] = dsu_open_write(out_fns[chosen_slice], compression);
 			err1(!outfhs[chosen_slice]);
 		}
-		err1(gzwrite(outfhs[chosen_slice], ptr, len) != len);
+		err1(dsu_write(outfhs[chosen_slice], ptr, len));
 	}
 	current_file++;
 	if (current_file < in_count) {
-		g_init(&g, in_fns[current_file], offsets[current_file], 0);
+		g_init(&g, in_fns[current_file], in_compressions[current_file], offsets[current_file], 0);
 		goto more_infiles;
 	}
 	if (!minlen && saw_nan) {
@@ -1340,12 +1341,12 @@ more_infiles:
 		minlen = maxlen = 9;
 	}
 	if (minlen) {
-		gzFile minmaxfh = gzopen(minmax_fn, gzip_mode);
+		dsu_file *minmaxfh = dsu_open_write(minmax_fn, compression);
 		err1(!minmaxfh);
 		res = g.error;
-		if (gzwrite(minmaxfh, buf_col_min, minlen) != minlen) res = 1;
-		if (gzwrite(minmaxfh, buf_col_max, maxlen) != maxlen) res = 1;
-		if (gzclose(minmaxfh)) res = 1;
+		if (dsu_write(minmaxfh, buf_col_min, minlen)) res = 1;
+		if (dsu_write(minmaxfh, buf_col_max, maxlen)) res = 1;
+		if (dsu_close_write(minmaxfh)) res = 1;
 	} else {
 		res = g.error;
 	}
@@ -1361,7 +1362,7 @@ err:
 #endif
 	if (g_cleanup(&g)) res = 1;
 	for (int i = 0; i < slices + save_bad; i++) {
-		if (outfhs[i] && gzclose(outfhs[i])) res = 1;
+		if (outfhs[i] && dsu_close_write(outfhs[i])) res = 1;
 	}
 	if (badmap) munmap(badmap, badmap_size);
 	if (slicemap) munmap(slicemap, slicemap_size);
@@ -1369,7 +1370,7 @@ err:
 }
 '''
 
-proto_template = 'static int convert_column_%s(const char **in_fns, int in_count, const char **out_fns, const char *gzip_mode, const char *minmax_fn, const char *default_value, uint32_t default_len, int default_value_is_None, const char *fmt, const char *fmt_b, int record_bad, int skip_bad, int badmap_fd, size_t badmap_size, int save_bad, int slices, int slicemap_fd, size_t slicemap_size, uint64_t *bad_count, uint64_t *default_count, off_t *offsets, int64_t *max_counts)'
+proto_template = 'static int convert_column_%s(const char **in_fns, const char **in_compressions, int in_count, const char **out_fns, const char *compression, const char *minmax_fn, const char *default_value, uint32_t default_len, int default_value_is_None, const char *fmt, const char *fmt_b, int record_bad, int skip_bad, int badmap_fd, size_t badmap_size, int save_bad, int slices, int slicemap_fd, size_t slicemap_size, uint64_t *bad_count, uint64_t *default_count, off_t *offsets, int64_t *max_counts)'
 
 protos = []
 funcs = [noneval_data]
@@ -1386,7 +1387,7 @@ convert_blob_template = r'''
 	PyGILState_STATE gstate = PyGILState_Ensure();
 #endif
 	g g;
-	gzFile outfhs[slices + save_bad];
+	dsu_file *outfhs[slices + save_bad];
 	memset(outfhs, 0, sizeof(outfhs));
 	const char *line;
 	int res = 1;
@@ -1395,7 +1396,7 @@ convert_blob_template = r'''
 	uint16_t *slicemap = 0;
 	int chosen_slice = 0;
 	int current_file = 0;
-	err1(g_init(&g, in_fns[current_file], offsets[current_file], 1));
+	err1(g_init(&g, in_fns[current_file], in_compressions[current_file], offsets[current_file], 1));
 	if (badmap_fd != -1) {
 		badmap = mmap(0, badmap_size, PROT_READ | PROT_WRITE, MAP_NOSYNC | MAP_SHARED, badmap_fd, 0);
 		err1(!badmap);
@@ -1449,11 +1450,11 @@ more_infiles:
 			continue;
 		}
 		if (!outfhs[chosen_slice]) {
-			outfhs[chosen_slice] = gzopen(out_fns[chosen_slice], gzip_mode);
+			outfhs[chosen_slice] = dsu_open_write(out_fns[chosen_slice], compression);
 			err1(!outfhs[chosen_slice]);
 		}
 		if (line == NoneMarker) {
-			err1(gzwrite(outfhs[chosen_slice], "\xff\0\0\0\0", 5) != 5);
+			err1(dsu_write(outfhs[chosen_slice], "\xff\0\0\0\0", 5));
 			continue;
 		}
 %(convert)s
@@ -1462,10 +1463,10 @@ more_infiles:
 				uint8_t lenbuf[5];
 				lenbuf[0] = 255;
 				memcpy(lenbuf + 1, &len, 4);
-				err1(gzwrite(outfhs[chosen_slice], lenbuf, 5) != 5);
+				err1(dsu_write(outfhs[chosen_slice], lenbuf, 5));
 			} else {
 				uint8_t len8 = len;
-				err1(gzwrite(outfhs[chosen_slice], &len8, 1) != 1);
+				err1(dsu_write(outfhs[chosen_slice], &len8, 1));
 			}
 		} else {
 			if (record_bad && !default_value) {
@@ -1482,12 +1483,12 @@ more_infiles:
 			len = default_len;
 			default_count[chosen_slice] += 1;
 		}
-		err1(gzwrite(outfhs[chosen_slice], ptr, len) != len);
+		err1(dsu_write(outfhs[chosen_slice], ptr, len));
 %(cleanup)s
 	}
 	current_file++;
 	if (current_file < in_count) {
-		g_init(&g, in_fns[current_file], offsets[current_file], 0);
+		g_init(&g, in_fns[current_file], in_compressions[current_file], offsets[current_file], 0);
 		goto more_infiles;
 	}
 	res = g.error;
@@ -1495,7 +1496,7 @@ err:
 	if (defbuf) free(defbuf);
 	if (g_cleanup(&g)) res = 1;
 	for (int i = 0; i < slices + save_bad; i++) {
-		if (outfhs[i] && gzclose(outfhs[i])) res = 1;
+		if (outfhs[i] && dsu_close_write(outfhs[i])) res = 1;
 	}
 	if (badmap) munmap(badmap, badmap_size);
 	if (slicemap) munmap(slicemap, slicemap_size);
@@ -1516,14 +1517,14 @@ null_number_template = r'''
 	PyGILState_STATE gstate = PyGILState_Ensure();
 #endif
 	g g;
-	gzFile outfhs[slices];
+	dsu_file *outfhs[slices];
 	memset(outfhs, 0, sizeof(outfhs));
 	int res = 1;
 	char *badmap = 0;
 	uint16_t *slicemap = 0;
 	int chosen_slice = 0;
 	int current_file = 0;
-	err1(g_init(&g, in_fns[current_file], offsets[current_file], 1));
+	err1(g_init(&g, in_fns[current_file], in_compressions[current_file], offsets[current_file], 1));
 	err1(save_bad);
 	if (badmap_fd != -1) {
 		badmap = mmap(0, badmap_size, PROT_READ | PROT_WRITE, MAP_NOSYNC | MAP_SHARED, badmap_fd, 0);
@@ -1559,21 +1560,21 @@ more_infiles:
 			continue;
 		}
 		if (!outfhs[chosen_slice]) {
-			outfhs[chosen_slice] = gzopen(out_fns[chosen_slice], gzip_mode);
+			outfhs[chosen_slice] = dsu_open_write(out_fns[chosen_slice], compression);
 			err1(!outfhs[chosen_slice]);
 		}
-		err1(gzwrite(outfhs[chosen_slice], buf, z) != z);
+		err1(dsu_write(outfhs[chosen_slice], buf, z));
 	}
 	current_file++;
 	if (current_file < in_count) {
-		g_init(&g, in_fns[current_file], offsets[current_file], 0);
+		g_init(&g, in_fns[current_file], in_compressions[current_file], offsets[current_file], 0);
 		goto more_infiles;
 	}
 	res = g.error;
 err:
 	if (g_cleanup(&g)) res = 1;
 	for (int i = 0; i < slices; i++) {
-		if (outfhs[i] && gzclose(outfhs[i])) res = 1;
+		if (outfhs[i] && dsu_close_write(outfhs[i])) res = 1;
 	}
 	if (badmap) munmap(badmap, badmap_size);
 	if (slicemap) munmap(slicemap, slicemap_size);
@@ -1594,14 +1595,14 @@ null_template = r'''
 	PyGILState_STATE gstate = PyGILState_Ensure();
 #endif
 	g g;
-	gzFile outfhs[slices];
+	dsu_file *outfhs[slices];
 	memset(outfhs, 0, sizeof(outfhs));
 	int res = 1;
 	char *badmap = 0;
 	uint16_t *slicemap = 0;
 	int chosen_slice = 0;
 	int current_file = 0;
-	err1(g_init(&g, in_fns[current_file], offsets[current_file], 1));
+	err1(g_init(&g, in_fns[current_file], in_compressions[current_file], offsets[current_file], 1));
 	err1(save_bad);
 	if (badmap_fd != -1) {
 		badmap = mmap(0, badmap_size, PROT_READ | PROT_WRITE, MAP_NOSYNC | MAP_SHARED, badmap_fd, 0);
@@ -1630,21 +1631,21 @@ more_infiles:
 			continue;
 		}
 		if (!outfhs[chosen_slice]) {
-			outfhs[chosen_slice] = gzopen(out_fns[chosen_slice], gzip_mode);
+			outfhs[chosen_slice] = dsu_open_write(out_fns[chosen_slice], compression);
 			err1(!outfhs[chosen_slice]);
 		}
-		err1(gzwrite(outfhs[chosen_slice], buf, %(size)d) != %(size)d);
+		err1(dsu_write(outfhs[chosen_slice], buf, %(size)d));
 	}
 	current_file++;
 	if (current_file < in_count) {
-		g_init(&g, in_fns[current_file], offsets[current_file], 0);
+		g_init(&g, in_fns[current_file], in_compressions[current_file], offsets[current_file], 0);
 		goto more_infiles;
 	}
 	res = g.error;
 err:
 	if (g_cleanup(&g)) res = 1;
 	for (int i = 0; i < slices; i++) {
-		if (outfhs[i] && gzclose(outfhs[i])) res = 1;
+		if (outfhs[i] && dsu_close_write(outfhs[i])) res = 1;
 	}
 	if (badmap) munmap(badmap, badmap_size);
 	if (slicemap) munmap(slicemap, slicemap_size);
@@ -1693,7 +1694,6 @@ copy_types['pickle'] = 'null_blob'
 
 
 all_c_functions = r'''
-#include <zlib.h>
 #include <time.h>
 #include <stdlib.h>
 #include <strings.h>
@@ -1710,6 +1710,8 @@ all_c_functions = r'''
 #include <bytesobject.h>
 #include <datetime.h>
 
+#include "compression.h"
+
 #ifndef MAP_NOSYNC
 #  define MAP_NOSYNC 0
 #endif
@@ -1719,7 +1721,8 @@ all_c_functions = r'''
 #define Z (128 * 1024)
 
 typedef struct {
-	gzFile fh;
+	const dsu_compressor *compressor;
+	void *ctx;
 	int len;
 	int pos;
 	int error;
@@ -1733,23 +1736,26 @@ typedef struct {
 static const char NoneMarker[1] = {0};
 static char decimal_separator = '.';
 
-static int g_init(g *g, const char *filename, off_t offset, const int first)
+static int g_init(g *g, const char *filename, const char *compression, off_t offset, const int first)
 {
 	if (!first) {
-		int e = gzclose(g->fh);
-		g->fh = 0;
-		if (e || g->error) return 1;
+		g->compressor->read_close(g->ctx);
+		g->ctx = 0;
+		if (g->error) return 1;
 	}
-	g->fh = 0;
+	g->ctx = 0;
 	g->pos = g->len = 0;
 	g->error = 0;
 	g->filename = filename;
 	if (first) g->largetmp = 0;
+	int level;
+	g->compressor = dsu_parse_compression(compression, &level);
+	if (!g->compressor) return 1;
 	int fd = open(filename, O_RDONLY);
 	if (fd < 0) return 1;
 	if (lseek(fd, offset, 0) != offset) goto errfd;
-	g->fh = gzdopen(fd, "rb");
-	if (!g->fh) goto errfd;
+	g->ctx = g->compressor->read_open(fd, -1);
+	if (!g->ctx) goto errfd;
 	return 0;
 errfd:
 	close(fd);
@@ -1759,7 +1765,7 @@ errfd:
 static int g_cleanup(g *g)
 {
 	if (g->largetmp) free(g->largetmp);
-	if (g->fh) return gzclose(g->fh);
+	if (g->ctx) g->compressor->read_close(g->ctx);
 	return 0;
 }
 
@@ -1775,11 +1781,9 @@ static int numeric_comma(const char *localename)
 static int read_chunk(g *g, int offset)
 {
 	if (g->error) return 1;
-	const int len = gzread(g->fh, g->buf + offset, Z - offset);
-	if (len <= 0) {
-		(void) gzerror(g->fh, &g->error);
-		return 1;
-	}
+	int len = Z - offset;
+	g->error = g->compressor->read(g->ctx, g->buf + offset, &len);
+	if (g->error || len <= 0) return 1;
 	g->len = offset + len;
 	g->buf[g->len] = 0;
 	g->pos = 0;
@@ -1838,8 +1842,8 @@ size_again:
 		}
 		memcpy(g->largetmp, g->buf + g->pos, avail);
 		const int fill_len = size - avail;
-		const int read_len = gzread(g->fh, g->largetmp + avail, fill_len);
-		if (read_len != fill_len) {
+		int read_len = fill_len;
+		if (g->compressor->read(g->ctx, g->largetmp + avail, &read_len) || read_len != fill_len) {
 			PyErr_Format(PyExc_IOError, "%s: Format error\n", g->filename);
 			g->error = 1;
 			return 0;
@@ -1900,7 +1904,7 @@ err:
 #define MAYBE_SAVE_BAD_BLOB                                                \
 	if (save_bad) {                                                        \
 		if (!outfhs[slices]) {                                             \
-			outfhs[slices] = gzopen(out_fns[slices], gzip_mode);           \
+			outfhs[slices] = dsu_open_write(out_fns[slices], compression); \
 			err1(!outfhs[slices]);                                         \
 		}                                                                  \
 		int32_t len = g.linelen;                                           \
@@ -1912,13 +1916,13 @@ err:
 				uint8_t lenbuf[5];                                         \
 				lenbuf[0] = 255;                                           \
 				memcpy(lenbuf + 1, &len, 4);                               \
-				err1(gzwrite(outfhs[slices], lenbuf, 5) != 5);             \
+				err1(dsu_write(outfhs[slices], lenbuf, 5));                \
 			} else {                                                       \
 				uint8_t len8 = len;                                        \
-				err1(gzwrite(outfhs[slices], &len8, 1) != 1);              \
+				err1(dsu_write(outfhs[slices], &len8, 1));                 \
 			}                                                              \
 		}                                                                  \
-		err1(gzwrite(outfhs[slices], line, len) != len);                   \
+		err1(dsu_write(outfhs[slices], line, len));                        \
 	}
 
 static int use_tz = 0;
@@ -1972,9 +1976,11 @@ static PyObject *py_%s(PyObject *self, PyObject *args)
 	PyObject *o_in_fns;
 	int in_count;
 	const char **in_fns = 0;
+	PyObject *o_in_compressions;
+	const char **in_compressions = 0;
 	PyObject *o_out_fns;
 	const char **out_fns = 0;
-	const char *gzip_mode;
+	const char *compression;
 	const char *minmax_fn;
 	PyObject *o_default_value;
 	const char *default_value;
@@ -2000,11 +2006,12 @@ static PyObject *py_%s(PyObject *self, PyObject *args)
 	off_t *offsets = 0;
 	PyObject *o_max_counts;
 	int64_t *max_counts = 0;
-	if (!PyArg_ParseTuple(args, "OiOetetOiiOOiiiLiiiLOOOO",
+	if (!PyArg_ParseTuple(args, "OOiOetetOiiOOiiiLiiiLOOOO",
 		&o_in_fns,
+		&o_in_compressions,
 		&in_count,
 		&o_out_fns,
-		Py_FileSystemDefaultEncoding, &gzip_mode,
+		Py_FileSystemDefaultEncoding, &compression,
 		Py_FileSystemDefaultEncoding, &minmax_fn,
 		&o_default_value,
 		&default_len,
@@ -2036,12 +2043,15 @@ static PyObject *py_%s(PyObject *self, PyObject *args)
 	LISTCHK(bad_count, slices);
 	LISTCHK(default_count, slices);
 	LISTCHK(in_fns, in_count);
+	LISTCHK(in_compressions, in_count);
 	LISTCHK(offsets, in_count);
 	LISTCHK(max_counts, in_count);
 	LISTCHK(out_fns, slices + save_bad);
 #undef LISTCHK
 	in_fns = malloc(in_count * sizeof(*in_fns));
 	err1(!in_fns);
+	in_compressions = malloc(in_count * sizeof(*in_compressions));
+	err1(!in_compressions);
 	offsets = malloc(in_count * sizeof(*offsets));
 	err1(!offsets);
 	max_counts = malloc(in_count * sizeof(*max_counts));
@@ -2049,6 +2059,8 @@ static PyObject *py_%s(PyObject *self, PyObject *args)
 	for (int i = 0; i < in_count; i++) {
 		in_fns[i] = PyBytes_AS_STRING(PyList_GetItem(o_in_fns, i));
 		err1(!in_fns[i]);
+		in_compressions[i] = PyBytes_AS_STRING(PyList_GetItem(o_in_compressions, i));
+		err1(!in_compressions[i]);
 		offsets[i] = PyLong_AsLongLong(PyList_GetItem(o_offsets, i));
 		err1(PyErr_Occurred());
 		max_counts[i] = PyLong_AsLongLong(PyList_GetItem(o_max_counts, i));
@@ -2066,7 +2078,7 @@ static PyObject *py_%s(PyObject *self, PyObject *args)
 		err1(!out_fns[i]);
 	}
 
-	err1(%s(in_fns, in_count, out_fns, gzip_mode, minmax_fn, default_value, default_len, default_value_is_None, fmt, fmt_b, record_bad, skip_bad, badmap_fd, badmap_size, save_bad, slices, slicemap_fd, slicemap_size, bad_count, default_count, offsets, max_counts));
+	err1(%s(in_fns, in_compressions, in_count, out_fns, compression, minmax_fn, default_value, default_len, default_value_is_None, fmt, fmt_b, record_bad, skip_bad, badmap_fd, badmap_size, save_bad, slices, slicemap_fd, slicemap_size, bad_count, default_count, offsets, max_counts));
 	for (int i = 0; i < slices; i++) {
 		err1(PyList_SetItem(o_default_count, i, PyLong_FromUnsignedLongLong(default_count[i])));
 		err1(PyList_SetItem(o_bad_count, i, PyLong_FromUnsignedLongLong(bad_count[i])));
@@ -2078,6 +2090,7 @@ err:
 	if (out_fns) free(out_fns);
 	if (max_counts) free(max_counts);
 	if (offsets) free(offsets);
+	if (in_compressions) free(in_compressions);
 	if (in_fns) free(in_fns);
 	if (good) Py_RETURN_NONE;
 	if (err) {
@@ -42,6 +42,7 @@ def synthesis(job):
 		'complex64',
 		'date',
 		'datetime',
+		'dictunicode',
 		'float32',
 		'float64',
 		'int32',
@@ -66,7 +67,7 @@ def synthesis(job):
 	write(
 		'a', 0xffffffff, 0xfedcba9876543210, True, b'hello',
 		42, 1e100+0.00000000000000001j,
-		date(2020, 6, 23), datetime(2020, 6, 23, 12, 13, 14),
+		date(2020, 6, 23), datetime(2020, 6, 23, 12, 13, 14), 'dict\xe5',
 		1.0, float('-inf'), -10, -20,
 		{'json': True}, 0xfedcba9876543210beef,
 		'...' if PY2 else 1+2j, time(12, 13, 14), 'bl\xe5',
@@ -76,7 +77,7 @@ def synthesis(job):
 	write(
 		'b', 0, 0, False, b'bye',
 		2-3j, -7,
-		date(1868,  1,  3), datetime(1868,  1,  3, 13, 14, 5),
+		date(1868,  1,  3), datetime(1868,  1,  3, 13, 14, 5), 'dict\xe4',
 		float('inf'), float('nan'), 0, 0,
 		[False, None], 42.18,
 		'...' if PY2 else d, time(13, 14, 5), 'bl\xe4',
@@ -84,7 +85,7 @@ def synthesis(job):
 	write(
 		None, 72, 64, None, None,
 		None, None,
-		None, None,
+		None, None, None,
 		None, None, None, None,
 		None, None,
 		None, None, None,
@@ -95,7 +96,7 @@ def synthesis(job):
 		('\x1e', '', None, (
 			'None', '72', '64', 'None', 'None',
 			'None', 'None',
-			'None', 'None',
+			'None', 'None', 'None',
 			'None', 'None', 'None', 'None',
 			'null', 'None',
 			'None', 'None', 'None',
@@ -103,7 +104,7 @@ def synthesis(job):
 		('\x1e', 'a', '', (
 			'', '72', '64', '', '',
 			'', '',
-			'', '',
+			'', '', '',
 			'', '', '', '',
 			'', '',
 			'', '', '',
@@ -111,7 +112,7 @@ def synthesis(job):
 		('\x00', '0', None, (
 			'None', '72', '64', 'None', 'None',
 			'None', 'None',
-			'None', 'None',
+			'None', 'None', 'None',
 			'None', 'None', 'None', 'None',
 			'null', 'None',
 			'None', 'None', 'None',
@@ -119,7 +120,7 @@ def synthesis(job):
 		(':', '"', '"', (
 			'"', '72', '64', '"', '"',
 			'"', '"',
-			'"', '"',
+			'"', '"', '"',
 			'"', '"', '"', '"',
 			'"', '"',
 			'"', '"', '"',
@@ -127,7 +128,7 @@ def synthesis(job):
 		(':', '"', {'time': 'never', 'float32': '"0"'}, (
 			'None', '72', '64', 'None', 'None',
 			'None', 'None',
-			'None', 'None',
+			'None', 'None', 'None',
 			'"0"', 'None', 'None', 'None',
 			'null', 'None',
 			'None', 'never', 'None',
@@ -144,7 +145,7 @@ def synthesis(job):
 				expect(
 					'a', '4294967295', '18364758544493064720', 'True', 'hello',
 					'(42+0j)', '(1e+100+1e-17j)',
-					'2020-06-23', '2020-06-23 12:13:14',
+					'2020-06-23', '2020-06-23 12:13:14', 'dict\xe5',
 					'1.0', '-inf', '-10', '-20',
 					'{"json": true}', '1203552815971897489538799',
 					'...' if PY2 else '(1+2j)', '12:13:14', 'bl\xe5',
@@ -152,7 +153,7 @@ def synthesis(job):
 				expect(
 					'b', '0', '0', 'False', 'bye',
 					'(2-3j)', '(-7+0j)',
-					'1868-01-03', '1868-01-03 13:14:05',
+					'1868-01-03', '1868-01-03 13:14:05', 'dict\xe4',
 					'inf', 'nan', '0', '0',
 					'[false, null]', '42.18',
 					'...' if PY2 else "{'recursion': {...}}", '13:14:05', 'bl\xe4',
@@ -0,0 +1,174 @@
+############################################################################
+#                                                                          #
+# Copyright (c) 2022 Carl Drougge                                          #
+#                                                                          #
+# Licensed under the Apache License, Version 2.0 (the "License");          #
+# you may not use this file except in compliance with the License.         #
+# You may obtain a copy of the License at                                  #
+#                                                                          #
+#  http://www.apache.org/licenses/LICENSE-2.0                              #
+#                                                                          #
+# Unless required by applicable law or agreed to in writing, software      #
+# distributed under the License is distributed on an "AS IS" BASIS,        #
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. #
+# See the License for the specific language governing permissions and      #
+# limitations under the License.                                           #
+#                                                                          #
+############################################################################
+
+from __future__ import print_function
+from __future__ import division
+from __future__ import unicode_literals
+
+description = r'''
+Test Dataset.aggregate, DatasetList.aggregate and dataset_aggregate,
+both with a source hashed on a groupby column (no merge) and without.
+'''
+
+from collections import defaultdict
+from datetime import date
+from math import isnan
+
+from accelerator import subjobs
+from accelerator.dataset import DatasetList
+from accelerator.error import DatasetUsageError
+
+columns = {
+	'g': ('unicode', True),
+	'h': 'int32',
+	'v': ('int64', True),
+	'f': 'float64',
+	'd': 'date',
+	'j': 'json',
+}
+
+aggs = {
+	'lines': 'count',
+	'v_count': ('count', 'v'),
+	'v_sum': ('sum', 'v'),
+	'v_min': ('min', 'v'),
+	'v_max': ('max', 'v'),
+	'v_mean': ('mean', 'v'),
+	'f_sum': ('sum', 'f'),
+	'f_min': ('min', 'f'),
+	'f_max': ('max', 'f'),
+	'd_max': ('max', 'd'),
+	'h_distinct': ('distinct', 'h'),
+	'g_distinct': ('distinct', 'g'),
+	'j_count': ('count', 'j'),
+}
+
+def mkdata(ix):
+	return dict(
+		g=None if ix % 23 == 0 else 'group %d' % (ix % 5,),
+		h=ix % 7,
+		v=None if ix % 3 == 0 else ix * 11 % 1000 - 300,
+		f=float('nan') if ix % 19 == 0 else ix / 8,
+		d=date(2023, 1 + ix % 12, 1 + ix % 28),
+		j=None if ix % 4 == 0 else {'ix': ix},
+	)
+
+def expect(rows, groupby):
+	groups = defaultdict(list)
+	for row in rows:
+		groups[tuple(row[c] for c in groupby) if len(groupby) != 1 else row[groupby[0]]].append(row)
+	res = {}
+	for key, rows in groups.items():
+		v = [row['v'] for row in rows if row['v'] is not None]
+		f = [row['f'] for row in rows]
+		f_nonnan = [x for x in f if not isnan(x)]
+		res[key] = dict(
+			lines=len(rows),
+			v_count=len(v),
+			v_sum=sum(v),
+			v_min=min(v) if v else None,
+			v_max=max(v) if v else None,
+			v_mean=sum(v) / len(v) if v else None,
+			f_sum=sum(f),
+			f_min=min(f_nonnan) if f_nonnan else None,
+			f_max=max(f_nonnan) if f_nonnan else None,
+			d_max=max(row['d'] for row in rows),
+			h_distinct=len(set(row['h'] for row in rows)),
+			g_distinct=len(set(row['g'] for row in rows if row['g'] is not None)),
+			j_count=sum(1 for row in rows if row['j'] is not None),
+		)
+	return res
+
+def close(a, b):
+	if a is None or b is None:
+		return a is b
+	if isinstance(a, float) and isnan(a):
+		return isnan(b)
+	return abs(a - b) <= abs(a) * 1e-9 + 1e-9
+
+def check(got, want, msg):
+	assert set(got) == set(want), (msg, sorted(got, key=repr), sorted(want, key=repr),)
+	for key, values in want.items():
+		for name, value in values.items():
+			g = got[key][name]
+			if name.endswith('_distinct'):
+				# approximate, but good for small counts
+				assert abs(g - value) <= max(1, value // 20), (msg, key, name, g, value,)
+			elif name.endswith(('_mean', 'f_sum')):
+				assert close(g, value), (msg, key, name, g, value,)
+			else:
+				assert g == value, (msg, key, name, g, value,)
+
+def from_ds(ds, groupby):
+	res = {}
+	names = sorted(aggs)
+	for row in ds.iterate(None, groupby + names):
+		key = row[0] if len(groupby) == 1 else tuple(row[:len(groupby)])
+		res[key] = dict(zip(names, row[len(groupby):]))
+	return res
+
+def synthesis(job, slices):
+	def write_ds(name, start, stop, hashlabel=None, previous=None):
+		dw = job.datasetwriter(name=name, columns=columns, hashlabel=hashlabel, previous=previous)
+		write = dw.get_split_write_dict()
+		rows = [mkdata(ix) for ix in range(start, stop)]
+		for row in rows:
+			write(row)
+		return dw.finish(), rows
+
+	plain, plain_rows = write_ds('plain', 0, 5000)
+	hashed, hashed_rows = write_ds('hashed', 0, 5000, hashlabel='h')
+	plain2, plain2_rows = write_ds('plain2', 5000, 8000, previous=plain)
+
+	for groupby in (['g'], ['g', 'd'], []):
+		want = expect(plain_rows, groupby)
+		if not groupby:
+			want = {(): want[()]}
+		check(plain.aggregate(groupby, aggs), want, 'plain.aggregate %r' % (groupby,))
+		check(hashed.aggregate(groupby, aggs), want, 'hashed.aggregate %r' % (groupby,))
+		check(plain2.chain().aggregate(groupby, aggs), expect(plain_rows + plain2_rows, groupby), 'chain.aggregate %r' % (groupby,))
+		if groupby:
+			ds = subjobs.build('dataset_aggregate', source=plain, groupby=groupby, aggregations=aggs).dataset()
+			assert ds.hashlabel is None
+			check(from_ds(ds, groupby), want, 'dataset_aggregate %r' % (groupby,))
+
+	# hashed on a groupby column, each slice writes its own groups
+	for groupby in (['h'], ['g', 'h']):
+		want = expect(hashed_rows, groupby)
+		check(hashed.aggregate(groupby, aggs), want, 'hashed.aggregate %r' % (groupby,))
+		ds = subjobs.build('dataset_aggregate', source=hashed, groupby=groupby, aggregations=aggs).dataset()
+		assert ds.hashlabel == 'h', ds
+		check(from_ds(ds, groupby), want, 'dataset_aggregate hashed %r' % (groupby,))
+		for sliceno in range(slices):
+			assert set(ds.iterate(sliceno, 'h')) == set(hashed.iterate(sliceno, 'h')), (ds, sliceno,)
+		# not all hashed on h, so the slices have to be merged
+		mixed = DatasetList([hashed, plain2])
+		check(mixed.aggregate(groupby, aggs), expect(hashed_rows + plain2_rows, groupby), 'mixed.aggregate %r' % (groupby,))
+
+	# with previous only the new part of the chain is aggregated
+	first = subjobs.build('dataset_aggregate', source=plain, groupby=['g'], aggregations=aggs).dataset()
+	ds = subjobs.build('dataset_aggregate', source=plain2, previous=first, groupby=['g'], aggregations=aggs).dataset()
+	assert ds.previous == first
+	check(from_ds(ds, ['g']), expect(plain2_rows, ['g']), 'dataset_aggregate with previous')
+
+	for bad in ({'x': ('median', 'v')}, {'x': ('sum', 'g')}, {'x': ('max', 'nonexistent')}, {'x': ('distinct', 'j')}, {'x': 'sum'}, {'g': 'count'}, {}):
+		try:
+			plain.aggregate(['g'], bad)
+			raise Exception('aggregate accepted %r' % (bad,))
+		except DatasetUsageError:
+			pass
@@ -0,0 +1,96 @@
+############################################################################
+#                                                                          #
+# Copyright (c) 2022 Carl Drougge                                          #
+#                                                                          #
+# Licensed under the Apache License, Version 2.0 (the "License");          #
+# you may not use this file except in compliance with the License.         #
+# You may obtain a copy of the License at                                  #
+#                                                                          #
+#  http://www.apache.org/licenses/LICENSE-2.0                              #
+#                                                                          #
+# Unless required by applicable law or agreed to in writing, software      #
+# distributed under the License is distributed on an "AS IS" BASIS,        #
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. #
+# See the License for the specific language governing permissions and      #
+# limitations under the License.                                           #
+#                                                                          #
+############################################################################
+
+from __future__ import print_function
+from __future__ import division
+from __future__ import unicode_literals
+
+description = r'''
+Test iteration with batch_size, both the bulk reading and the batched
+rows used with filters, translators, range and rehash.
+'''
+
+from accelerator.compat import str_types
+from accelerator.error import DatasetUsageError
+
+def unbatch(batches, want_tuple=True):
+	res = []
+	for batch in batches:
+		if want_tuple:
+			assert isinstance(batch, tuple), batch
+			lens = set(len(col) for col in batch)
+			assert len(lens) == 1, batch
+			res.extend(zip(*batch))
+		else:
+			assert isinstance(batch, list), batch
+			res.extend(batch)
+	return res
+
+def synthesis(job, slices):
+	previous = None
+	for name, count in (('a', 1000), ('empty', 0), ('b', 12345)):
+		dw = job.datasetwriter(name=name, columns={'i': 'int64', 's': 'ascii', 'n': 'number', 'j': 'json', 'p': 'pickle'}, hashlabel='i', previous=previous)
+		write = dw.get_split_write_dict()
+		for ix in range(count):
+			write(dict(i=ix, n=ix / 2, s=str(ix), j={'ix': ix, 'l': [ix] * (ix % 3)}, p=(ix, {ix % 5})))
+		previous = dw.finish()
+	chain = previous.chain()
+
+	def check(msg, batch_size, *a, **kw):
+		want_tuple = not isinstance(a[1] if len(a) > 1 else kw.get('columns'), str_types)
+		want = list(chain.iterate(*a, **kw))
+		for bs in (1, 7, batch_size):
+			batches = list(chain.iterate(*a, batch_size=bs, **kw))
+			assert all(len(b[0] if want_tuple else b) <= bs for b in batches), msg
+			got = unbatch(batches, want_tuple)
+			assert got == [tuple(v) for v in want] if want_tuple else want, '%s with batch_size=%d' % (msg, bs,)
+
+	for sliceno in (None, 0, slices - 1):
+		check('all columns', 1000, sliceno)
+		check('one column', 100, sliceno, 'i')
+		check('two columns', 1000000, sliceno, ['s', 'i'])
+		check('json and pickle', 100, sliceno, ['i', 'j', 'p'])
+		check('only json', 1000, sliceno, 'j')
+		check('filters', 1000, sliceno, ['i', 's'], filters={'i': lambda i: i % 3})
+		check('translators', 1000, sliceno, 'i', translators={'i': lambda i: i * 2})
+		check('range', 500, sliceno, 'i', range={'i': (500, 5000)})
+		check('sloppy range', 500, sliceno, 'i', range={'i': (500, 5000)}, sloppy_range=True)
+		check('copy_mode', 64, sliceno, ['n', 's'], copy_mode=True)
+	check('rehash', 100, 1, 'i', hashlabel='s', rehash=True)
+
+	# batches don't span slices or datasets
+	batches = list(chain.iterate(None, 'i', batch_size=1000000))
+	assert len(batches) == sum(1 for ds in chain for sliceno in range(slices) if ds.lines[sliceno]), batches
+
+	seen = []
+	def post(ds, sliceno):
+		seen.append((ds, sliceno,))
+	assert unbatch(chain.iterate(None, 'i', batch_size=10, post_callback=post), False) == list(chain.iterate(None, 'i'))
+	assert seen == [(ds, sliceno) for ds in chain for sliceno in range(slices) if ds.lines[sliceno]], seen
+
+	for kw in ({'batch_size': 0}, {'batch_size': 10, 'slice': 3}):
+		try:
+			list(chain.iterate(None, 'i', **kw))
+			raise Exception('iterate accepted %r' % (kw,))
+		except DatasetUsageError:
+			pass
+	try:
+		list(chain.iterate('roundrobin', 'i', batch_size=10))
+		raise Exception('iterate accepted batch_size with roundrobin')
+	except DatasetUsageError:
+		pass
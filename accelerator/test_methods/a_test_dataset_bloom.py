@@ -0,0 +1,118 @@
+############################################################################
+#                                                                          #
+# Copyright (c) 2022 Carl Drougge                                          #
+#                                                                          #
+# Licensed under the Apache License, Version 2.0 (the "License");          #
+# you may not use this file except in compliance with the License.         #
+# You may obtain a copy of the License at                                  #
+#                                                                          #
+#  http://www.apache.org/licenses/LICENSE-2.0                              #
+#                                                                          #
+# Unless required by applicable law or agreed to in writing, software      #
+# distributed under the License is distributed on an "AS IS" BASIS,        #
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. #
+# See the License for the specific language governing permissions and      #
+# limitations under the License.                                           #
+#                                                                          #
+############################################################################
+
+from __future__ import print_function
+from __future__ import division
+from __future__ import unicode_literals
+
+description = r'''
+Test bloom filters in DatasetWriter and iterating with equals=.
+'''
+
+from accelerator.dataset import Dataset
+from accelerator.error import DatasetUsageError
+
+def prepare(job):
+	dw = job.datasetwriter(name='analysis', columns={'user': 'unicode', 'n': 'int64'}, bloom='user')
+	return dw
+
+def analysis(sliceno, prepare_res):
+	for ix in range(100):
+		prepare_res.write(ix, ('user%d' % (ix % 10,)) if ix % 3 == sliceno % 3 else 'other')
+
+def synthesis(job, slices, prepare_res):
+	a_ds = prepare_res.finish()
+	assert a_ds.columns['user'].bloom, a_ds
+	assert a_ds.columns['n'].bloom is None, a_ds
+	previous = None
+	for ix in range(4):
+		dw = job.datasetwriter(
+			name='ds%d' % (ix,),
+			columns={'user': 'unicode', 'n': ('int64', True), 'f': 'float64'},
+			hashlabel='user',
+			bloom=('user', 'n',) if ix != 2 else (), # one without
+			previous=previous,
+		)
+		write = dw.get_split_write()
+		for n in range(500):
+			write(n / 4, n if n % 7 else None, 'user%d' % (n % 50 + ix * 25,))
+		previous = dw.finish()
+	chain = previous.chain()
+	data = list(chain.iterate(None, ('f', 'n', 'user')))
+
+	def check(equals, columns=('f', 'n', 'user')):
+		def ok(line):
+			for name, want in equals.items():
+				if not isinstance(want, (set, frozenset, list, tuple)):
+					want = (want,)
+				if line[('f', 'n', 'user').index(name)] not in want:
+					return False
+			return True
+		want = sorted(line for line in data if ok(line))
+		got = sorted(chain.iterate(None, ('f', 'n', 'user'), equals=equals))
+		assert got == want, 'equals=%r gave %d lines, wanted %d' % (equals, len(got), len(want),)
+		return want
+	assert check({'user': 'user30'})
+	assert check({'user': {'user0', 'user99', 'nobody'}})
+	assert not check({'user': 'nobody'})
+	assert check({'user': ['user1', 'user26'], 'n': [1, 26, 76]})
+	assert check({'n': None})
+	# other types that compare equal must not be skipped
+	assert check({'n': 3.0}) == check({'n': 3})
+	assert check({'f': 1}) == check({'f': 1.0})
+
+	# with a hashlabel each value is only in one slice
+	for ds in chain:
+		if not ds.columns['user'].bloom:
+			continue
+		for user in ('user0', 'user30', 'user74'):
+			in_slices = {sliceno for sliceno in range(slices) if user in set(ds.iterate(sliceno, 'user'))}
+			for sliceno in range(slices):
+				may_match = Dataset._bloom_may_match(ds, sliceno, {'user': {user}}, {})
+				if sliceno in in_slices:
+					assert may_match, '%s:%d does not match %s' % (ds, sliceno, user,)
+		# and there are only a few false positives
+		misses = sum(Dataset._bloom_may_match(ds, sliceno, {'user': {'nobody%d' % (ix,)}}, {}) for ix in range(100) for sliceno in range(slices))
+		assert misses < slices * 10, '%d false positives in %s' % (misses, ds,)
+
+	# filters with a set work the same way
+	users = {'user3', 'user60'}
+	want = sorted(v for v in data if v[2] in users)
+	assert sorted(chain.iterate(None, ('f', 'n', 'user'), filters={'user': users.__contains__})) == want
+	assert sorted(chain.iterate(0, 'user', equals={'user': users})) == sorted(chain.iterate(0, 'user', filters={'user': users.__contains__}))
+
+	# slices written in analysis
+	assert sorted(n for n, _ in a_ds.iterate(None, ('n', 'user'), equals={'user': 'user4'})) == [ix for ix in range(100) if ix % 10 == 4 for sliceno in range(slices) if ix % 3 == sliceno % 3]
+
+	for kw in (
+		dict(columns='n', equals={'user': 'user1'}),
+		dict(columns='user', equals={'user': 'user1'}, filters={'user': None}),
+		dict(columns='user', equals={'user': 'user1'}, filters=lambda v: True),
+	):
+		try:
+			list(chain.iterate(None, **kw))
+			raise Exception('iterate accepted %r' % (kw,))
+		except DatasetUsageError:
+			pass
+	for bloom in ('missing', 'j',):
+		dw = job.datasetwriter(name='bad_bloom_' + bloom, columns={'j': 'json'}, bloom=bloom)
+		try:
+			dw.set_slice(0)
+			raise Exception('DatasetWriter accepted bloom=%r' % (bloom,))
+		except DatasetUsageError:
+			dw.discard()
@@ -0,0 +1,79 @@
+############################################################################
+#                                                                          #
+# Copyright (c) 2022 Carl Drougge                                          #
+#                                                                          #
+# Licensed under the Apache License, Version 2.0 (the "License");          #
+# you may not use this file except in compliance with the License.         #
+# You may obtain a copy of the License at                                  #
+#                                                                          #
+#  http://www.apache.org/licenses/LICENSE-2.0                              #
+#                                                                          #
+# Unless required by applicable law or agreed to in writing, software      #
+# distributed under the License is distributed on an "AS IS" BASIS,        #
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. #
+# See the License for the specific language governing permissions and      #
+# limitations under the License.                                           #
+#                                                                          #
+############################################################################
+
+from __future__ import print_function
+from __future__ import division
+from __future__ import unicode_literals
+
+description = r'''
+Test the cache of loaded dataset pickles: it is bounded, and datasets
+whose pickle has changed are loaded again.
+'''
+
+import os
+import shutil
+
+from accelerator import dataset
+from accelerator.dataset import Dataset
+from accelerator.error import NoSuchDatasetError
+
+def synthesis(job, slices):
+	previous = None
+	for ix in range(150):
+		dw = job.datasetwriter(name=str(ix), columns={'a': 'int32'}, previous=previous, caption='ds %d' % (ix,))
+		dw.get_split_write()(ix)
+		previous = dw.finish()
+	dataset._ds_cache.clear()
+	chain = previous.chain()
+	assert [ds.caption for ds in chain] == ['ds %d' % (ix,) for ix in range(150)]
+	assert chain.lines() == 150
+	# the chain is cached now, including datasets that were only in the
+	# 'cache' of a later dataset
+	for ix in (0, 63, 64, 148):
+		key = (job, str(ix),)
+		assert key in dataset._ds_cache._entries, key
+	assert Dataset(job, '10').caption == 'ds 10'
+
+	# a changed pickle is loaded again (on a copy of the last dataset, so
+	# the chain stays as it was)
+	shutil.copy(job.filename(previous._name('pickle')), job.filename('DS/copy.p'))
+	copy = Dataset(job, 'copy')
+	assert copy.caption == 'ds 149'
+	fn = job.filename(copy._name('pickle'))
+	shutil.copy(job.filename(Dataset(job, '20')._name('pickle')), fn + '.tmp')
+	os.rename(fn + '.tmp', fn)
+	assert Dataset(job, 'copy').caption == 'ds 20'
+	# and a missing one is an error even if it was cached
+	os.unlink(fn)
+	try:
+		Dataset(job, 'copy')
+		raise Exception('Loaded a removed dataset')
+	except NoSuchDatasetError:
+		pass
+
+	# the cache is bounded
+	org_size = dataset._ds_cache.size
+	try:
+		dataset._ds_cache.size = 20
+		dataset._ds_cache.clear()
+		assert len(previous.chain()) == 150
+		assert len(dataset._ds_cache._entries) <= 20
+		# most recently used last
+		assert list(dataset._ds_cache._entries)[-1] == (job, '0',)
+	finally:
+		dataset._ds_cache.size = org_size
@@ -0,0 +1,74 @@
+############################################################################
+#                                                                          #
+# Copyright (c) 2022 Carl Drougge                                          #
+#                                                                          #
+# Licensed under the Apache License, Version 2.0 (the "License");          #
+# you may not use this file except in compliance with the License.         #
+# You may obtain a copy of the License at                                  #
+#                                                                          #
+#  http://www.apache.org/licenses/LICENSE-2.0                              #
+#                                                                          #
+# Unless required by applicable law or agreed to in writing, software      #
+# distributed under the License is distributed on an "AS IS" BASIS,        #
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. #
+# See the License for the specific language governing permissions and      #
+# limitations under the License.                                           #
+#                                                                          #
+############################################################################
+
+from __future__ import print_function
+from __future__ import division
+from __future__ import unicode_literals
+
+description = r'''
+Test the chain index: chain_length, chain_lines and chain_range must
+agree with the same things computed on .chain(), also with length and
+stop_ds, for datasets made by finish, link_to_here and merge.
+'''
+
+from accelerator.dataset import Dataset
+
+def check(ds, slices):
+	for length, stop_ds in ((-1, None), (1, None), (7, None), (64, None), (1000, None), (-1, ds.chain()[len(ds.chain()) // 3])):
+		chain = ds.chain(length, stop_ds=stop_ds)
+		assert ds.chain_length(stop_ds=stop_ds) == len(ds.chain(stop_ds=stop_ds)), ds
+		assert ds.chain_lines(length=length, stop_ds=stop_ds) == chain.lines(), (ds, length, stop_ds,)
+		for sliceno in range(slices):
+			assert ds.chain_lines(sliceno, length, stop_ds) == chain.lines(sliceno), (ds, sliceno,)
+		for colname in ('ordered', 'unordered'):
+			for start, stop in ((None, None), (None, 500), (500, None), (250, 750), (333, 334), (2000, None)):
+				want = chain.range(colname, start, stop)
+				got = ds.chain_range(colname, start, stop, length, stop_ds)
+				assert got == want, (ds, colname, start, stop, got, want,)
+
+def synthesis(job, slices):
+	previous = None
+	for ix in range(100):
+		dw = job.datasetwriter(name=str(ix), columns={'ordered': 'int32', 'unordered': 'int32'}, previous=previous)
+		write = dw.get_split_write()
+		if ix % 9 != 4: # some empty datasets
+			for v in range(ix * 10, ix * 10 + ix % 13):
+				write(v, (v * 7919) % 1000)
+		previous = dw.finish()
+		if ix in (0, 1, 2, 3, 31, 32, 33, 63, 64, 65):
+			check(previous, slices)
+	check(previous, slices)
+	assert previous.chain_length() == 100
+
+	# link_to_here keeps the index, or makes a new one with a new previous
+	linked = previous.link_to_here('linked')
+	check(linked, slices)
+	relinked = previous.link_to_here('relinked', override_previous=Dataset(job, '50'))
+	assert relinked.chain_length() == 52
+	check(relinked, slices)
+	merged = linked.merge(previous, name='merged', previous=Dataset(job, '60'))
+	assert merged.chain_length() == 62
+	check(merged, slices)
+	# iterate_chain with range gives the same rows as without the index
+	for start, stop in ((None, 500), (250, 750), (990, None)):
+		want = sorted(v for ds in previous.chain() for v in ds.iterate(None, 'ordered') if (start is None or v >= start) and (stop is None or v < stop))
+		got = sorted(previous.iterate_chain(None, 'ordered', range={'ordered': (start, stop)}))
+		assert got == want, (start, stop,)
+		got = sorted(previous.iterate_chain(None, 'ordered', range={'ordered': (start, stop)}, reverse=True, length=50))
+		want = sorted(v for ds in previous.chain(50) for v in ds.iterate(None, 'ordered') if (start is None or v >= start) and (stop is None or v < stop))
+		assert got == want, (start, stop,)
@@ -0,0 +1,119 @@
+############################################################################
+#                                                                          #
+# Copyright (c) 2022 Carl Drougge                                          #
+#                                                                          #
+# Licensed under the Apache License, Version 2.0 (the "License");          #
+# you may not use this file except in compliance with the License.         #
+# You may obtain a copy of the License at                                  #
+#                                                                          #
+#  http://www.apache.org/licenses/LICENSE-2.0                              #
+#                                                                          #
+# Unless required by applicable law or agreed to in writing, software      #
+# distributed under the License is distributed on an "AS IS" BASIS,        #
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. #
+# See the License for the specific language governing permissions and      #
+# limitations under the License.                                           #
+#                                                                          #
+############################################################################
+
+from __future__ import print_function
+from __future__ import division
+from __future__ import unicode_literals
+
+description = r'''
+Test Dataset.column_array and DatasetList.column_array against .iterate,
+for all fixed width types and compressions.
+'''
+
+from datetime import date, datetime, time
+
+from accelerator.dsutil import compressions
+from accelerator.error import DatasetUsageError
+
+columns = {
+	'bits32': ('bits32', False),
+	'bits64': ('bits64', False),
+	'bool': ('bool', True),
+	'complex32': ('complex32', True),
+	'complex64': ('complex64', True),
+	'date': ('date', True),
+	'datetime': ('datetime', True),
+	'float32': ('float32', True),
+	'float64': ('float64', True),
+	'int32': ('int32', True),
+	'int64': ('int64', True),
+	'time': ('time', True),
+	'unicode': 'unicode',
+}
+
+# in column order
+def mkdata(ix):
+	none = (ix % 11 == 3)
+	def n(v):
+		return None if none else v
+	return (
+		ix,
+		ix * 1000000007,
+		n(bool(ix % 3)),
+		n(complex(ix, -0.5)),
+		n(complex(ix / 7, ix)),
+		n(date(1960 + ix % 80, 1 + ix % 12, 1 + ix % 28)),
+		n(datetime(1960 + ix % 80, 1 + ix % 12, 1 + ix % 28, ix % 24, ix % 60, ix % 59, ix)),
+		n(ix / 2),
+		n(ix / 3),
+		n(-ix),
+		n(ix * -1000000007),
+		n(time(ix % 24, ix % 60, ix % 59, ix)),
+		'%d' % (ix,),
+	)
+
+def as_python(v, typ):
+	if v is None:
+		return None
+	if typ == 'datetime':
+		return v.astype(datetime)
+	if typ == 'date':
+		return v.astype(date)
+	if typ == 'time':
+		v = v.astype(int)
+		return time(v // 3600000000, v // 60000000 % 60, v // 1000000 % 60, v % 1000000)
+	return v.item()
+
+def check(want, got, colname, msg):
+	if hasattr(got, 'mask'):
+		got = [None if m else v for v, m in zip(got.data, got.mask)]
+	got = [as_python(v, colname) for v in got]
+	assert got == want, '%s: %s wrong, %r != %r' % (msg, colname, got[:10], want[:10],)
+
+def synthesis(job, slices):
+	try:
+		import numpy
+	except ImportError:
+		print('numpy not available, not testing column_array')
+		return
+	previous = None
+	for compression in compressions:
+		dw = job.datasetwriter(name=compression, columns=columns, previous=previous, compression=compression)
+		write = dw.get_split_write()
+		for ix in range(2000):
+			write(*mkdata(ix))
+		previous = dw.finish()
+	chain = previous.chain()
+	for colname in sorted(columns):
+		if colname == 'unicode':
+			continue
+		for ds in chain:
+			for sliceno in range(slices):
+				check(list(ds.iterate(sliceno, colname)), ds.column_array(sliceno, colname), colname, '%s slice %d' % (ds, sliceno,))
+			check(list(ds.iterate(None, colname)), ds.column_array(None, colname), colname, ds)
+		check(list(chain.iterate(None, colname)), chain.column_array(None, colname), colname, 'chain')
+		check(list(chain.iterate(1, colname)), chain.column_array(1, colname), colname, 'chain slice 1')
+	assert type(previous.column_array(0, 'bits64')) is numpy.ndarray, 'column without none_support gave a masked array'
+	assert isinstance(previous.column_array(0, 'int64'), numpy.ma.MaskedArray)
+	assert previous.column_array(0, 'int64').mask.sum() == sum(v is None for v in previous.iterate(0, 'int64'))
+	assert chain.column_array(None, 'int64').sum() == sum(v for v in chain.iterate(None, 'int64') if v is not None)
+	try:
+		previous.column_array(0, 'unicode')
+		raise Exception('column_array on unicode column worked')
+	except DatasetUsageError:
+		pass
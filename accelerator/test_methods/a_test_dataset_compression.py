@@ -0,0 +1,118 @@
+############################################################################
+#                                                                          #
+# Copyright (c) 2022 Carl Drougge                                          #
+#                                                                          #
+# Licensed under the Apache License, Version 2.0 (the "License");          #
+# you may not use this file except in compliance with the License.         #
+# You may obtain a copy of the License at                                  #
+#                                                                          #
+#  http://www.apache.org/licenses/LICENSE-2.0                              #
+#                                                                          #
+# Unless required by applicable law or agreed to in writing, software      #
+# distributed under the License is distributed on an "AS IS" BASIS,        #
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. #
+# See the License for the specific language governing permissions and      #
+# limitations under the License.                                           #
+#                                                                          #
+############################################################################
+
+from __future__ import print_function
+from __future__ import division
+from __future__ import unicode_literals
+
+description = r'''
+Test the different compressions in DatasetWriter, csvimport and
+dataset_type, and that datasets with different compressions chain.
+'''
+
+from datetime import date
+
+from accelerator import subjobs
+from accelerator.dsutil import compressions
+from accelerator.error import DatasetUsageError
+
+columns = {
+	'int64': ('int64', True),
+	'float64': 'float64',
+	'date': 'date',
+	'number': 'number',
+	'unicode': ('unicode', True),
+}
+
+# in column order
+def mkdata(ix):
+	return (
+		date(2022, 1, 1 + ix % 28),
+		ix / 3,
+		ix if ix % 7 else None,
+		ix * 1000000000000,
+		'line %d' % (ix,) if ix % 5 else None,
+	)
+
+def synthesis(job, slices):
+	try:
+		job.datasetwriter(name='bad', columns=columns, compression='no such compression')
+		raise Exception('DatasetWriter accepted a bad compression')
+	except DatasetUsageError:
+		pass
+
+	previous = None
+	for compression in compressions:
+		dw = job.datasetwriter(name=compression, columns=columns, hashlabel='int64', previous=previous, compression=compression)
+		write = dw.get_split_write()
+		for ix in range(1000):
+			write(*mkdata(ix))
+		ds = dw.finish()
+		# make one slice big enough to use several blocks
+		dw = job.datasetwriter(name=compression + '_big', columns=columns, previous=ds, compression=compression, allow_missing_slices=True)
+		dw.set_slice(0)
+		for ix in range(100000):
+			dw.write(*mkdata(ix))
+		previous = dw.finish()
+		for col in ds.columns.values():
+			assert col.compression == compression, '%s has %s, wanted %s' % (ds, col.compression, compression,)
+		assert sorted(ds.iterate(None, 'float64')) == [ix / 3 for ix in range(1000)], ds
+		assert list(previous.iterate(0)) == [mkdata(ix) for ix in range(100000)], previous
+		for sliceno in range(slices):
+			assert len(list(ds.iterate(sliceno))) == ds.lines[sliceno], ds
+
+	# the whole chain, with all compressions
+	chain = previous.chain()
+	assert len(chain) == len(compressions) * 2
+	assert sum(1 for _ in chain.iterate(None, 'date')) == chain.lines()
+
+	# typing from and to all compressions, including rehashing
+	src = job.datasetwriter(name='src', columns={'a': 'ascii', 'b': 'bytes'}, compression=compressions[-1])
+	write = src.get_split_write()
+	for ix in range(5000):
+		write(str(ix), b'%d.5' % (ix,) if ix % 10 else b'bad')
+	src = src.finish()
+	for compression in compressions:
+		for hashlabel in (None, 'a'):
+			typed = subjobs.build(
+				'dataset_type',
+				source=src,
+				column2type={'a': 'int32_10', 'b': 'float64'},
+				hashlabel=hashlabel,
+				filter_bad=True,
+				compression=compression,
+			).dataset()
+			assert set(c.compression for c in typed.columns.values()) == {compression}, typed
+			assert sorted(typed.iterate(None, 'a')) == [ix for ix in range(5000) if ix % 10], typed
+			bad = typed.job.dataset('bad')
+			assert sorted(bad.iterate(None, 'b')) == [b'bad'] * 500, bad
+
+	# csvimport
+	with job.open('data.csv', 'wb') as fh:
+		fh.write(b'a,b\n')
+		for ix in range(5000):
+			fh.write(b'%d,%d\n' % (ix, ix * 2))
+	for compression in list(compressions) + ['3', 'gzip:9', 3]:
+		imported = subjobs.build('csvimport', filename=job.filename('data.csv'), compression=compression).dataset()
+		want_compression = 'gzip' if str(compression).isdigit() else compression.split(':')[0]
+		assert set(c.compression for c in imported.columns.values()) == {want_compression}, imported
+		assert sorted(imported.iterate(None, 'b'), key=int) == [b'%d' % (ix * 2,) for ix in range(5000)], imported
+	# the default is still the old integer (gzip level 6)
+	imported = subjobs.build('csvimport', filename=job.filename('data.csv'))
+	assert imported.params.options.compression == 6, imported.params.options.compression
+	assert set(c.compression for c in imported.dataset().columns.values()) == {'gzip'}, imported
@@ -0,0 +1,91 @@
+############################################################################
+#                                                                          #
+# Copyright (c) 2022 Carl Drougge                                          #
+#                                                                          #
+# Licensed under the Apache License, Version 2.0 (the "License");          #
+# you may not use this file except in compliance with the License.         #
+# You may obtain a copy of the License at                                  #
+#                                                                          #
+#  http://www.apache.org/licenses/LICENSE-2.0                              #
+#                                                                          #
+# Unless required by applicable law or agreed to in writing, software      #
+# distributed under the License is distributed on an "AS IS" BASIS,        #
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. #
+# See the License for the specific language governing permissions and      #
+# limitations under the License.                                           #
+#                                                                          #
+############################################################################
+
+from __future__ import print_function
+from __future__ import division
+from __future__ import unicode_literals
+
+description = r'''
+Test filters together with copy_mode: the filters get normal values
+but the rows are still in copy_mode, so they can be written with a
+copy_mode DatasetWriter.
+'''
+
+from accelerator.compat import PY3
+
+columns = {
+	'a': 'int64',
+	'b': ('unicode', True),
+	'c': 'ascii',
+	'e': 'json',
+}
+if PY3:
+	columns['p'] = 'pickle'
+
+def mkrow(ix):
+	row = dict(
+		a=ix,
+		b='r\xe4d %d' % (ix,) if ix % 13 else None,
+		c='line %d' % (ix,),
+		e={'ix': ix} if ix % 4 else 0,
+	)
+	if PY3:
+		row['p'] = ('pickle', ix,)
+	return row
+
+def check(job, src, name, filters, **kw):
+	want = list(src.iterate(None, filters=filters, **kw))
+	assert want, name
+	dw = job.datasetwriter(name=name, columns=src.columns, copy_mode=True, allow_missing_slices=True)
+	dw.set_slice(0)
+	for row in src.iterate(None, filters=filters, copy_mode=True, **kw):
+		dw.write(*row)
+	got = list(dw.finish().iterate(0))
+	assert got == want, "%s: got %r, wanted %r" % (name, got[:5], want[:5],)
+
+def synthesis(job, slices):
+	dw = job.datasetwriter(name='src', columns=columns)
+	write = dw.get_split_write_dict()
+	for ix in range(50000):
+		write(mkrow(ix))
+	src = dw.finish()
+
+	check(job, src, 'int', {'a': lambda v: v % 7 == 3})
+	check(job, src, 'unicode', {'b': lambda v: v and v.endswith('7')})
+	check(job, src, 'unicode_none', {'b': None})
+	check(job, src, 'unicode_pred', {'b': ('startswith', 'r\xe4d 12')})
+	check(job, src, 'ascii_pred', {'c': ('in', {'line 17', 'line 4711', 'nope'})})
+	check(job, src, 'ascii_range', {'c': [('>=', 'line 2'), ('<', 'line 3')]})
+	check(job, src, 'json', {'e': None})
+	check(job, src, 'equals', None, equals={'c': 'line 42'})
+	check(job, src, 'several', {'a': lambda v: v % 2, 'e': lambda v: v and v['ix'] % 3 == 0})
+	if PY3:
+		check(job, src, 'pickle', {'p': lambda v: v[1] % 1000 == 0})
+	# a single column, so not through the late filter code
+	for name in sorted(src.columns):
+		want = list(src.iterate(None, name, filters={name: None}))
+		got = list(src.iterate(None, name, filters={name: None}, copy_mode=True))
+		assert len(got) == len(want), name
+	got = list(src.iterate(None, 'b', filters={'b': ('==', 'r\xe4d 1')}, copy_mode=True))
+	assert got == ['r\xe4d 1'.encode('utf-8')], got
+
+	try:
+		list(src.iterate(None, filters=lambda t: True, copy_mode=True))
+		raise Exception("copy_mode accepted callable filters")
+	except AssertionError:
+		pass
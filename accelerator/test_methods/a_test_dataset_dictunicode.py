@@ -0,0 +1,77 @@
+############################################################################
+#                                                                          #
+# Copyright (c) 2022 Carl Drougge                                          #
+#                                                                          #
+# Licensed under the Apache License, Version 2.0 (the "License");          #
+# you may not use this file except in compliance with the License.         #
+# You may obtain a copy of the License at                                  #
+#                                                                          #
+#  http://www.apache.org/licenses/LICENSE-2.0                              #
+#                                                                          #
+# Unless required by applicable law or agreed to in writing, software      #
+# distributed under the License is distributed on an "AS IS" BASIS,        #
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. #
+# See the License for the specific language governing permissions and      #
+# limitations under the License.                                           #
+#                                                                          #
+############################################################################
+
+from __future__ import print_function
+from __future__ import division
+from __future__ import unicode_literals
+
+description = r'''
+Test the dictunicode type: values, sharing, hashing and that the
+standard methods that look at types handle it.
+'''
+
+from accelerator import subjobs
+
+# in column order
+def mkdata(ix):
+	return (
+		ix,
+		'name %d' % (ix % 17,) if ix % 11 else None,
+		'name %d' % (ix % 17,) if ix % 11 else None,
+	)
+
+def synthesis(job, slices):
+	columns = {'ix': 'int64', 'name': ('dictunicode', True), 'uname': ('unicode', True)}
+	res = {}
+	for hashlabel in (None, 'name', 'uname'):
+		dw = job.datasetwriter(name=str(hashlabel), columns=columns, hashlabel=hashlabel)
+		write = dw.get_split_write()
+		for ix in range(5000):
+			write(*mkdata(ix))
+		ds = res[hashlabel] = dw.finish()
+		assert ds.columns['name'].type == 'dictunicode', ds
+		assert ds.columns['name'].min is None and ds.columns['name'].max is None, ds
+		assert sorted(ds.iterate(None, ('ix', 'name', 'uname'))) == [mkdata(ix) for ix in range(5000)], ds
+		for sliceno in range(slices):
+			names = {}
+			for name in ds.iterate(sliceno, 'name'):
+				if name is not None:
+					assert names.setdefault(name, name) is name, '%s: %r is not shared' % (ds, name,)
+	# hashes the same as unicode
+	for sliceno in range(slices):
+		assert list(res['name'].iterate(sliceno, 'ix')) == list(res['uname'].iterate(sliceno, 'ix')), sliceno
+		assert sorted(res[None].iterate(sliceno, 'ix', hashlabel='name', rehash=True)) == sorted(res['uname'].iterate(sliceno, 'ix')), sliceno
+	ds = res[None]
+	# sort, checksum and csvexport
+	sorted_ds = subjobs.build('dataset_sort', source=ds, sort_columns='name').dataset()
+	for sliceno in range(slices):
+		assert list(sorted_ds.iterate(sliceno, 'name')) == sorted(ds.iterate(sliceno, 'name'), key=lambda v: v or ''), sorted_ds
+	checksum_dict = subjobs.build('dataset_checksum', source=ds, columns={'name'}).load()
+	checksum_uni = subjobs.build('dataset_checksum', source=ds, columns={'uname'}).load()
+	assert checksum_dict.sum == checksum_uni.sum, (checksum_dict, checksum_uni)
+	exported = subjobs.build('csvexport', source=ds, labels=['name', 'uname'], filename='out.csv', labelsonfirstline=False)
+	with exported.open('out.csv', 'r') as fh:
+		for line in fh:
+			a, b = line.rstrip('\n').split(',')
+			assert a == b, line
+	# dataset_type copies untyped dictunicode columns as unicode
+	for kw in (dict(filter_bad=True), dict(hashlabel='ix'), dict(filter_bad=True, discard_untyped=False)):
+		typed = subjobs.build('dataset_type', source=ds, column2type={'uname': 'ascii'}, **kw).dataset()
+		assert set(typed.columns) == {'ix', 'name', 'uname'}, typed
+		assert typed.columns['name'].type == 'unicode', typed
+		assert sorted(typed.iterate(None, ('ix', 'name'))) == [mkdata(ix)[:2] for ix in range(5000)], typed
@@ -0,0 +1,96 @@
+############################################################################
+#                                                                          #
+# Copyright (c) 2022 Carl Drougge                                          #
+#                                                                          #
+# Licensed under the Apache License, Version 2.0 (the "License");          #
+# you may not use this file except in compliance with the License.         #
+# You may obtain a copy of the License at                                  #
+#                                                                          #
+#  http://www.apache.org/licenses/LICENSE-2.0                              #
+#                                                                          #
+# Unless required by applicable law or agreed to in writing, software      #
+# distributed under the License is distributed on an "AS IS" BASIS,        #
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. #
+# See the License for the specific language governing permissions and      #
+# limitations under the License.                                           #
+#                                                                          #
+############################################################################
+
+from __future__ import print_function
+from __future__ import division
+from __future__ import unicode_literals
+
+description = r'''
+Test delta and rle encoded columns in DatasetWriter, with all
+compressions, several blocks per slice, slicing, ranges and chaining
+with unencoded datasets. Also dataset_sort with delta_encode.
+'''
+
+from datetime import datetime, timedelta
+
+from accelerator import subjobs
+from accelerator.dsutil import compressions
+from accelerator.error import DatasetUsageError
+
+columns = {
+	'ts': ('datetime', True),
+	'id': 'int64',
+	'flag': 'bool',
+	'name': 'ascii',
+}
+encoding = {'ts': 'delta', 'id': 'delta', 'flag': 'rle'}
+
+# in column order
+def mkdata(ix):
+	return (
+		ix % 3 == 0,
+		ix,
+		'name %d' % (ix % 10,),
+		datetime(2022, 1, 1) + timedelta(seconds=ix * 5) if ix % 1000 else None,
+	)
+
+def synthesis(job, slices):
+	for ix, bad in enumerate(({'name': 'delta'}, {'ts': 'foo'}, {'missing': 'rle'})):
+		dw = None
+		try:
+			dw = job.datasetwriter(name='bad%d' % (ix,), columns=columns, encoding=bad)
+			dw.get_split_write()
+			raise Exception('DatasetWriter accepted encoding=%r' % (bad,))
+		except DatasetUsageError:
+			pass
+		if dw:
+			dw.discard()
+
+	previous = None
+	for compression in compressions:
+		dw = job.datasetwriter(name=compression, columns=columns, encoding=encoding, compression=compression, previous=previous, allow_missing_slices=True)
+		dw.set_slice(0)
+		for ix in range(150000):
+			dw.write(*mkdata(ix))
+		ds = dw.finish()
+		for name, col in ds.columns.items():
+			assert col.encoding == encoding.get(name), '%s: %r has %r' % (ds, name, col.encoding,)
+		want = [mkdata(ix) for ix in range(150000)]
+		assert list(ds.iterate(0)) == want, ds
+		# slice= seeks to blocks in the middle of the file
+		assert list(ds.iterate(0, slice=slice(70000, 140000))) == want[70000:140000], ds
+		assert list(ds.iterate(0, 'id', range={'id': (131072, 131080)})) == list(range(131072, 131080)), ds
+		# and an unencoded dataset in between
+		dw = job.datasetwriter(name=compression + '_plain', columns=columns, compression=compression, previous=ds)
+		write = dw.get_split_write()
+		for ix in range(100):
+			write(*mkdata(ix))
+		previous = dw.finish()
+		assert all(col.encoding is None for col in previous.columns.values()), previous
+
+	chain = previous.chain()
+	assert chain.lines() == (150000 + 100) * len(compressions)
+	assert sum(chain.iterate(None, 'id')) == (sum(range(150000)) + sum(range(100))) * len(compressions)
+
+	# dataset_sort
+	sorted_plain = subjobs.build('dataset_sort', source=previous, sort_columns=['ts']).dataset()
+	sorted_delta = subjobs.build('dataset_sort', source=previous, sort_columns=['ts'], delta_encode=True).dataset()
+	assert sorted_delta.columns['ts'].encoding == 'delta'
+	assert sorted_delta.columns['id'].encoding is None
+	for sliceno in range(slices):
+		assert list(sorted_plain.iterate(sliceno)) == list(sorted_delta.iterate(sliceno)), sliceno
@@ -0,0 +1,123 @@
+############################################################################
+#                                                                          #
+# Copyright (c) 2022 Carl Drougge                                          #
+#                                                                          #
+# Licensed under the Apache License, Version 2.0 (the "License");          #
+# you may not use this file except in compliance with the License.         #
+# You may obtain a copy of the License at                                  #
+#                                                                          #
+#  http://www.apache.org/licenses/LICENSE-2.0                              #
+#                                                                          #
+# Unless required by applicable law or agreed to in writing, software      #
+# distributed under the License is distributed on an "AS IS" BASIS,        #
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. #
+# See the License for the specific language governing permissions and      #
+# limitations under the License.                                           #
+#                                                                          #
+############################################################################
+
+from __future__ import print_function
+from __future__ import division
+from __future__ import unicode_literals
+
+description = r'''
+Test declarative filters ({'col': ('>=', 5)} and so on), which are
+evaluated by the column readers when possible. Results should be the
+same as for the equivalent python filters, including with translators,
+range, batch_size and columns that have to use the python version.
+'''
+
+from datetime import date
+
+from accelerator.dsutil import _zone_rows
+from accelerator.error import DatasetUsageError
+
+columns = {
+	'i': ('int64', True),
+	'f': 'float64',
+	'u': ('unicode', True),
+	'd': 'date',
+	'n': 'number',
+	'j': 'json',
+}
+
+def mkrow(ix):
+	return dict(
+		i=ix if ix % 13 else None,
+		f=ix / 8,
+		u='%s %d' % ('abcde'[ix % 5], ix,) if ix % 7 else None,
+		d=date(2000 + ix // 50000, 1 + ix % 12, 1),
+		n=ix if ix % 2 else ix / 2,
+		j=[ix],
+	)
+
+def synthesis(job, slices):
+	dw = job.datasetwriter(name='small', columns=columns)
+	write = dw.get_split_write_dict()
+	for ix in range(5000):
+		write(mkrow(ix))
+	small = dw.finish()
+	# several zones in slice 0, so some can be skipped
+	dw = job.datasetwriter(name='big', columns=columns, previous=small, allow_missing_slices=True)
+	dw.set_slice(0)
+	lines = _zone_rows * 3 + 100
+	for ix in range(lines):
+		dw.write_dict(mkrow(ix + 10000))
+	big = dw.finish()
+	names = sorted(columns)
+	ixs = {name: names.index(name) for name in names}
+
+	def check(want_f, filters, translators=None, **kw):
+		for ds in (small, big):
+			for sliceno in range(slices):
+				want = ds.iterate(sliceno, names, translators=translators)
+				want = [row for row in want if want_f(dict(zip(names, row)))]
+				got = list(ds.iterate(sliceno, names, filters=filters, translators=translators, **kw))
+				assert got == want, '%s slice %d with %r: got %d rows, wanted %d' % (ds, sliceno, filters, len(got), len(want),)
+				batched = ds.iterate(sliceno, names, filters=filters, translators=translators, batch_size=777, **kw)
+				got = [row for batch in batched for row in zip(*batch)]
+				assert got == want, '%s slice %d with %r and batch_size' % (ds, sliceno, filters,)
+				if len(filters) == 1:
+					name, = filters
+					got = list(ds.iterate(sliceno, name, filters=filters, translators=translators, **kw))
+					assert got == [row[ixs[name]] for row in want], '%s slice %d with %r (single column)' % (ds, sliceno, filters,)
+
+	check(lambda r: r['i'] is not None and r['i'] >= 70000, {'i': ('>=', 70000)})
+	check(lambda r: r['i'] is not None and 100 <= r['i'] < 200, {'i': [('>=', 100), ('<', 200)]})
+	check(lambda r: r['i'] is None, {'i': ('isnone',)})
+	check(lambda r: r['i'] is not None and r['i'] != 7, {'i': ('!=', 7)})
+	check(lambda r: r['i'] in (3, 4, None, 80000), {'i': ('in', [3, 4, None, 80000])})
+	check(lambda r: r['f'] <= 3.5, {'f': ('<=', 3.5)})
+	check(lambda r: r['f'] > 10000, {'f': ('>', 10000)})
+	check(lambda r: r['u'] is not None and r['u'].startswith('c 1'), {'u': ('startswith', 'c 1')})
+	check(lambda r: r['u'] is not None and r['u'] < 'b', {'u': ('<', 'b')})
+	check(lambda r: r['u'] is None, {'u': ('isnone',)})
+	check(lambda r: r['d'] == date(2001, 3, 1), {'d': ('==', date(2001, 3, 1))})
+	check(lambda r: r['n'] > 4000, {'n': ('>', 4000)})
+	check(lambda r: r['d'].month == 2 and r['u'] is not None and r['u'].startswith('a'), {'d': lambda d: d.month == 2, 'u': ('startswith', 'a')})
+	check(lambda r: r['i'] is not None and r['i'] < 50 and r['f'] != 2, {'i': ('<', 50), 'f': ('!=', 2)})
+	# values of other types fall back to the python version
+	check(lambda r: r['i'] is not None and r['i'] > 4999.5, {'i': ('>', 4999.5)})
+	# with range
+	check(lambda r: 100 <= r['f'] < 1000 and r['i'] is not None and r['i'] % 3 == 0, {'i': ('in', set(range(0, 100000, 3)))}, range={'f': (100, 1000)})
+	# predicates apply to translated values, so min/max must not skip anything here
+	check(lambda r: r['i'] is not None and r['i'] >= 1000000, {'i': ('>=', 1000000)}, translators={'i': lambda v: None if v is None else v + 1000000})
+
+	# equals also uses this
+	got = list(big.iterate(0, ('i', 'u'), equals={'i': 80000}))
+	assert got == [(80000, 'a 80000')], got
+
+	# datasets where min/max show nothing can match are skipped
+	seen = []
+	list(big.iterate_chain(None, 'i', filters={'i': ('<', 3000)}, pre_callback=lambda ds: seen.append(ds)))
+	assert seen == [small], seen
+	seen = []
+	list(big.iterate_chain(None, 'i', filters={'i': ('isnone',)}, pre_callback=lambda ds: seen.append(ds)))
+	assert seen == [small, big], seen
+
+	for bad in (('~', 3), ('==',), ('==', None), ('in', 'abc'), ('isnone', 3), [('<', 3), 'x']):
+		try:
+			list(small.iterate(0, 'i', filters={'i': bad}))
+			raise Exception('Filter %r was accepted' % (bad,))
+		except DatasetUsageError:
+			pass
@@ -0,0 +1,102 @@
+############################################################################
+#                                                                          #
+# Copyright (c) 2022 Carl Drougge                                          #
+#                                                                          #
+# Licensed under the Apache License, Version 2.0 (the "License");          #
+# you may not use this file except in compliance with the License.         #
+# You may obtain a copy of the License at                                  #
+#                                                                          #
+#  http://www.apache.org/licenses/LICENSE-2.0                              #
+#                                                                          #
+# Unless required by applicable law or agreed to in writing, software      #
+# distributed under the License is distributed on an "AS IS" BASIS,        #
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. #
+# See the License for the specific language governing permissions and      #
+# limitations under the License.                                           #
+#                                                                          #
+############################################################################
+
+from __future__ import print_function
+from __future__ import division
+from __future__ import unicode_literals
+
+description = r'''
+Test iterate_merged on datasets sorted by dataset_sort (in both orders)
+and on datasets written with sorted slices, including None and NaN,
+and on chains of sorted datasets.
+'''
+
+from math import isnan
+
+from accelerator import subjobs
+from accelerator.error import DatasetUsageError
+
+def fix(v, nonev, nanv=None):
+	if v is None:
+		return nonev
+	if nanv is not None and isnan(v):
+		return nanv
+	return v
+
+def want_merged(dslist, columns, key, reverse, slices):
+	# Stable sort of all slices in order gives the same order for ties.
+	rows = [row for ds in dslist for sliceno in range(slices) for row in ds.iterate(sliceno, columns)]
+	return sorted(rows, key=key, reverse=reverse)
+
+def check(got, want, msg):
+	got = list(got)
+	assert len(got) == len(want), msg
+	for g, w in zip(got, want):
+		# NaN != NaN, so compare reprs
+		assert repr(g) == repr(w), (msg, g, w,)
+
+def synthesis(job, slices):
+	dw = job.datasetwriter(name='unsorted', columns={'a': ('int64', True), 's': 'unicode', 'x': 'int32'})
+	write = dw.get_split_write()
+	for ix in range(3000):
+		write(None if ix % 17 == 0 else (ix * 7919) % 100, 'str %d' % (ix % 7,), ix)
+	unsorted = dw.finish()
+	key = lambda row: (fix(row[0], float('-inf')), row[1])
+	for order, reverse in (('ascending', False), ('descending', True)):
+		ds = subjobs.build('dataset_sort', source=unsorted, sort_columns=['a', 's'], sort_order=order).dataset()
+		want = want_merged([ds], ['a', 's', 'x'], key, reverse, slices)
+		check(ds.iterate_merged(['a', 's', 'x'], ['a', 's'], reverse=reverse), want, order)
+		# sort columns that are not iterated
+		check(ds.iterate_merged('x', ['a', 's'], reverse=reverse), [row[2] for row in want], order)
+		check(ds.iterate_merged(['x'], ['a', 's'], reverse=reverse), [row[2:] for row in want], order)
+		# a chain of sorted datasets
+		ds2 = subjobs.build('dataset_sort', source=unsorted, sort_columns=['a', 's'], sort_order=order, previous=ds).dataset()
+		chain = ds2.chain()
+		assert len(chain) == 2
+		want = want_merged(chain, ['a', 's', 'x'], key, reverse, slices)
+		check(chain.iterate_merged(['a', 's', 'x'], ['a', 's'], reverse=reverse), want, order + ' chain')
+
+	# float with None and NaN, sorted by hand in each slice
+	rows = [(None if ix % 11 == 0 else float('nan') if ix % 13 == 0 else (ix * 37) % 101 / 3, ix) for ix in range(2000)]
+	fkey = lambda row: fix(row[0], float('-inf'), float('inf'))
+	dw = job.datasetwriter(name='floats', columns={'f': ('float64', True), 'ix': 'int32'})
+	for sliceno in range(slices):
+		dw.set_slice(sliceno)
+		for row in sorted(rows[sliceno::slices], key=fkey):
+			dw.write(*row)
+	floats = dw.finish()
+	want = want_merged([floats], ['f', 'ix'], fkey, False, slices)
+	check(floats.iterate_merged(['f', 'ix'], 'f'), want, 'floats')
+	check(floats.iterate_merged('f', 'f'), [row[0] for row in want], 'floats single')
+	assert list(floats.iterate_merged('f', 'f'))[0] is None
+
+	# empty datasets and lists
+	dw = job.datasetwriter(name='empty', columns={'f': 'float64', 'ix': 'int32'})
+	dw.get_split_write()
+	empty = dw.finish()
+	assert list(empty.iterate_merged(None, 'f')) == []
+	assert list(empty.chain().iterate_merged(None, 'f')) == [] # a DatasetList
+
+	# columns where None sorts differently can't be merged
+	dw = job.datasetwriter(name='bytes', columns={'f': ('bytes', True)}, previous=empty)
+	dw.get_split_write()(b'a')
+	try:
+		list(dw.finish().chain().iterate_merged('f', 'f'))
+		raise Exception('iterate_merged accepted float64 and bytes columns')
+	except DatasetUsageError:
+		pass
@@ -0,0 +1,108 @@
+############################################################################
+#                                                                          #
+# Copyright (c) 2022 Carl Drougge                                          #
+#                                                                          #
+# Licensed under the Apache License, Version 2.0 (the "License");          #
+# you may not use this file except in compliance with the License.         #
+# You may obtain a copy of the License at                                  #
+#                                                                          #
+#  http://www.apache.org/licenses/LICENSE-2.0                              #
+#                                                                          #
+# Unless required by applicable law or agreed to in writing, software      #
+# distributed under the License is distributed on an "AS IS" BASIS,        #
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. #
+# See the License for the specific language governing permissions and      #
+# limitations under the License.                                           #
+#                                                                          #
+############################################################################
+
+from __future__ import print_function
+from __future__ import division
+from __future__ import unicode_literals
+
+description = r'''
+Test that filtered iteration gives the same rows when the non-filter
+columns are only decoded for matching rows, for all kinds of columns
+and together with translators, range, equals and batch_size.
+'''
+
+from datetime import date
+
+from accelerator.compat import PY3
+
+columns = {
+	'a': 'int64',
+	'b': 'unicode',
+	'c': 'number',
+	'd': 'date',
+	'e': 'json',
+	'f': ('int32', True),
+}
+if PY3:
+	columns['p'] = 'pickle'
+
+def mkrow(ix):
+	row = dict(
+		a=ix,
+		b='line %d' % (ix,),
+		c=ix / 4 if ix % 3 else ix,
+		d=date(2022, 1, 1 + ix % 28),
+		e={'ix': ix},
+		f=ix % 7 if ix % 11 else None,
+	)
+	if PY3:
+		row['p'] = ('pickle', ix,)
+	return row
+
+def synthesis(job, slices):
+	dw = job.datasetwriter(columns=columns, encoding={'a': 'delta'})
+	write = dw.get_split_write_dict()
+	for ix in range(200000):
+		write(mkrow(ix))
+	# one slice without any lines
+	dw2 = job.datasetwriter(name='partial', columns=columns, allow_missing_slices=True, previous=dw.finish())
+	dw2.set_slice(0)
+	for ix in range(1000):
+		dw2.write_dict(mkrow(ix))
+	ds = dw2.finish()
+	names = sorted(columns)
+	everything = {sliceno: list(ds.iterate(sliceno, names)) for sliceno in range(slices)}
+
+	def check(want_f, translated=None, **kw):
+		for sliceno in range(slices):
+			want = everything[sliceno]
+			if translated:
+				want = [translated(row) for row in want]
+			want = [row for row in want if want_f(row)]
+			got = list(ds.iterate(sliceno, names, **kw))
+			assert got == want, 'sliceno %d with %r: got %d rows, wanted %d' % (sliceno, kw, len(got), len(want),)
+			batched = list(ds.iterate(sliceno, names, batch_size=1000, **kw))
+			got = [row for batch in batched for row in zip(*batch)]
+			assert got == want, 'sliceno %d with %r and batch_size' % (sliceno, kw,)
+		want = sorted(row for row in (translated(row) if translated else row for row in ds.iterate(None, names)) if want_f(row))
+		got = sorted(ds.iterate(None, names, **kw))
+		assert got == want, 'sliceno None with %r' % (kw,)
+
+	ix_a, ix_c, ix_f = names.index('a'), names.index('c'), names.index('f')
+	check(lambda row: row[ix_a] % 1000 == 3, filters={'a': lambda v: v % 1000 == 3})
+	check(lambda row: row[ix_f], filters={'f': None})
+	check(lambda row: row[ix_f] == 2 and row[ix_a] > 500, filters={'f': lambda v: v == 2, 'a': (500).__lt__})
+	check(lambda row: row[ix_a] in (7, 8, 999, 150001), equals={'a': [7, 8, 999, 150001]})
+	check(lambda row: row[ix_f] == 5 and row[ix_a] % 2, filters={'a': lambda v: v % 2}, equals={'f': 5})
+	check(lambda row: 500 <= row[ix_a] < 600 and row[ix_a] % 10 == 0, range={'a': (500, 600)}, filters={'a': lambda v: v % 10 == 0})
+	check(lambda row: 100 <= row[ix_c] < 200 and row[ix_f] == 1, range={'c': (100, 200)}, filters={'f': lambda v: v == 1})
+	def translate(row):
+		row = list(row)
+		row[ix_a] = row[ix_a] * 2
+		row[ix_c] = -row[ix_c]
+		return tuple(row)
+	check(lambda row: row[ix_a] % 300 == 0, translated=translate, filters={'a': lambda v: v % 300 == 0}, translators={'a': lambda v: v * 2, 'c': lambda v: -v})
+
+	# Only the rows that match are decoded (and so translated) in the other columns.
+	seen = []
+	def record(v):
+		seen.append(v)
+		return v
+	got = list(ds.iterate(0, names, filters={'a': (42).__eq__}, translators={'b': record}))
+	assert [row[names.index('a')] for row in got] == [42]
+	assert seen == ['line 42'], seen
@@ -0,0 +1,77 @@
+############################################################################
+#                                                                          #
+# Copyright (c) 2022 Carl Drougge                                          #
+#                                                                          #
+# Licensed under the Apache License, Version 2.0 (the "License");          #
+# you may not use this file except in compliance with the License.         #
+# You may obtain a copy of the License at                                  #
+#                                                                          #
+#  http://www.apache.org/licenses/LICENSE-2.0                              #
+#                                                                          #
+# Unless required by applicable law or agreed to in writing, software      #
+# distributed under the License is distributed on an "AS IS" BASIS,        #
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. #
+# See the License for the specific language governing permissions and      #
+# limitations under the License.                                           #
+#                                                                          #
+############################################################################
+
+from __future__ import print_function
+from __future__ import division
+from __future__ import unicode_literals
+
+description = r'''
+Test Dataset.map_slices and DatasetList.map_slices.
+'''
+
+from collections import Counter
+import operator
+import os
+
+from accelerator.error import DatasetError, DatasetUsageError
+
+def synthesis(job, slices):
+	dw = job.datasetwriter(name='a', columns={'a': 'int32', 'b': 'unicode'})
+	write = dw.get_split_write()
+	for ix in range(10000):
+		write(ix, 'b%d' % (ix % 17,))
+	a = dw.finish()
+	dw = job.datasetwriter(name='b', columns={'a': 'int32', 'b': 'unicode'}, previous=a)
+	write = dw.get_split_write()
+	for ix in range(10000, 12345):
+		write(ix, 'b%d' % (ix % 17,))
+	b = dw.finish()
+
+	got = a.map_slices(sum, 'a')
+	assert got == [sum(a.iterate(sliceno, 'a')) for sliceno in range(slices)], got
+	assert a.map_slices(sum, 'a', merge=operator.add) == sum(range(10000))
+	# each slice really is in a separate process
+	pids = a.map_slices(lambda it: os.getpid())
+	assert len(set(pids)) == slices and os.getpid() not in pids, pids
+
+	# iterate options are passed on, and func doesn't need to be picklable
+	want = Counter(v for _, v in b.iterate_chain(None, ['a', 'b'], filters={'a': lambda v: v % 3 == 0}))
+	got = b.chain().map_slices(lambda it: Counter(v for _, v in it), ['a', 'b'], filters={'a': lambda v: v % 3 == 0}, merge=operator.add)
+	assert got == want, got
+	got = b.chain().map_slices(list, ['a', 'b'], hashlabel=None, rehash=False, equals={'b': 'b3'}, merge=operator.add)
+	assert sorted(got) == sorted(b.iterate_chain(None, ['a', 'b'], equals={'b': 'b3'})), got
+	got = b.chain().map_slices(set, 'b', rehash=True, hashlabel='b')
+	assert all(len(a & b) == 0 for ix, a in enumerate(got) for b in got[ix + 1:]), got
+	assert set.union(*got) == set('b%d' % (ix,) for ix in range(17)), got
+	try:
+		b.chain().map_slices(set, 'b', rehash='shared', hashlabel='b')
+		raise Exception('map_slices accepted rehash="shared"')
+	except DatasetUsageError:
+		pass
+
+	# errors from func are reported
+	def bad(it):
+		for v in it:
+			if v == 4711:
+				raise ValueError('4711')
+		return 0
+	try:
+		a.map_slices(bad, 'a')
+		raise Exception('map_slices did not report an error')
+	except DatasetError as e:
+		assert 'ValueError' in str(e), e
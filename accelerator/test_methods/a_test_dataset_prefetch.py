@@ -0,0 +1,77 @@
+############################################################################
+#                                                                          #
+# Copyright (c) 2022 Carl Drougge                                          #
+#                                                                          #
+# Licensed under the Apache License, Version 2.0 (the "License");          #
+# you may not use this file except in compliance with the License.         #
+# You may obtain a copy of the License at                                  #
+#                                                                          #
+#  http://www.apache.org/licenses/LICENSE-2.0                              #
+#                                                                          #
+# Unless required by applicable law or agreed to in writing, software      #
+# distributed under the License is distributed on an "AS IS" BASIS,        #
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. #
+# See the License for the specific language governing permissions and      #
+# limitations under the License.                                           #
+#                                                                          #
+############################################################################
+
+from __future__ import print_function
+from __future__ import division
+from __future__ import unicode_literals
+
+description = r'''
+Test iterating long chains of small datasets, where the readers for the
+next dataset are opened before they are needed (with readahead=True). Datasets that are
+skipped or only partly read must not disturb the prefetching.
+'''
+
+from accelerator.dataset import SkipDataset, SkipSlice
+
+def synthesis(job, slices):
+	previous = None
+	want = []
+	for dsix in range(30):
+		# every third dataset is uncompressed, so it is read from a mapping
+		compression = 'none' if dsix % 3 == 0 else 'gzip'
+		dw = job.datasetwriter(name=str(dsix), columns={'a': 'int32', 'b': 'ascii'}, previous=previous, compression=compression)
+		write = dw.get_split_write()
+		for ix in range(dsix * 1000, dsix * 1000 + 37 * (dsix % 5)):
+			write(ix, str(ix))
+			want.append((ix, str(ix),))
+		previous = dw.finish()
+	chain = previous.chain()
+
+	assert sorted(chain.iterate(None, readahead=True)) == want
+	assert sorted(chain.iterate(None)) == want
+	for sliceno in range(slices):
+		in_slice = list(chain.iterate(sliceno, 'a', readahead=True))
+		batched = [v for batch in chain.iterate(sliceno, 'a', batch_size=7, readahead=True) for v in batch]
+		assert batched == in_slice, sliceno
+	got = sorted(chain.iterate(None, filters={'a': lambda v: v % 3 == 0}, readahead=True))
+	assert got == [t for t in want if t[0] % 3 == 0]
+	got = list(chain.iterate(None, 'a', slice=slice(5, 1000), readahead=True))
+	assert got == list(chain.iterate(None, 'a'))[5:1000]
+
+	# skipping and stopping early
+	def pre_callback(ds, sliceno):
+		if int(ds.name) % 4 == 1:
+			raise SkipDataset()
+		if sliceno == 1:
+			raise SkipSlice()
+	got = sorted(chain.iterate(None, pre_callback=pre_callback, readahead=True))
+	assert got == sorted(
+		t for ds in chain if int(ds.name) % 4 != 1
+		for sliceno in range(slices) if sliceno != 1
+		for t in ds.iterate(sliceno)
+	)
+	def post_callback(ds, sliceno):
+		if ds.name == '17' and sliceno == 0:
+			raise StopIteration()
+	got = list(chain.iterate(0, 'a', post_callback=post_callback, readahead=True))
+	assert got == [v for ds in chain[:18] for v in ds.iterate(0, 'a')]
+	# abandoned iterators (with prefetched readers)
+	for _ in range(10):
+		it = chain.iterate(None, 'a', readahead=True)
+		next(it)
+		del it
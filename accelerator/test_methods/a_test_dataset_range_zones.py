@@ -0,0 +1,91 @@
+############################################################################
+#                                                                          #
+# Copyright (c) 2022 Carl Drougge                                          #
+#                                                                          #
+# Licensed under the Apache License, Version 2.0 (the "License");          #
+# you may not use this file except in compliance with the License.         #
+# You may obtain a copy of the License at                                  #
+#                                                                          #
+#  http://www.apache.org/licenses/LICENSE-2.0                              #
+#                                                                          #
+# Unless required by applicable law or agreed to in writing, software      #
+# distributed under the License is distributed on an "AS IS" BASIS,        #
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. #
+# See the License for the specific language governing permissions and      #
+# limitations under the License.                                           #
+#                                                                          #
+############################################################################
+
+from __future__ import print_function
+from __future__ import division
+from __future__ import unicode_literals
+
+description = r'''
+Test that per-zone min/max is recorded and that iterating with a range
+gives the same result when whole zones are skipped.
+'''
+
+from datetime import datetime, timedelta
+
+from accelerator.dsutil import _zone_rows
+
+def prepare(job):
+	return job.datasetwriter(name='analysis', columns={'i': 'int64'})
+
+def analysis(sliceno, prepare_res):
+	for ix in range(100):
+		prepare_res.write(sliceno * 100 + ix)
+
+def synthesis(job, slices, prepare_res):
+	# zones from slices written in analysis
+	ds = prepare_res.finish()
+	assert ds.columns['i'].zones == (_zone_rows, [[(sliceno * 100, sliceno * 100 + 99)] for sliceno in range(slices)]), ds.columns['i'].zones
+	start = datetime(2022, 1, 1)
+	# in column order
+	def mkdata(ix):
+		return (ix / 2, ix if ix % 11 else None, 'line %d' % (ix,), start + timedelta(seconds=ix),)
+	lines = _zone_rows * 3 + 1234
+	for compression in ('gzip', 'none'):
+		dw = job.datasetwriter(
+			name=compression,
+			columns={'i': ('int64', True), 's': 'unicode', 't': 'datetime', 'f': 'float64'},
+			compression=compression,
+			allow_missing_slices=True,
+		)
+		dw.set_slice(0)
+		for ix in range(lines):
+			dw.write(*mkdata(ix))
+		ds = dw.finish()
+		data = [mkdata(ix) for ix in range(lines)]
+		# strings have no min/max, so no zones either
+		assert ds.columns['s'].zones is None, ds
+		for name in 'fit':
+			col = ds.columns[name]
+			assert col.zones, '%s.%s has no zones' % (ds, name,)
+			zone_rows, zones = col.zones
+			assert zone_rows == _zone_rows
+			assert len(zones[0]) == 4, zones
+			assert all(not z for z in zones[1:]), zones
+		assert ds.columns['t'].zones[1][0][1] == (start + timedelta(seconds=_zone_rows), start + timedelta(seconds=_zone_rows * 2 - 1)), ds
+		def check(colname, bottom, top):
+			ix = {'f': 0, 'i': 1, 's': 2, 't': 3}[colname]
+			def ok(v):
+				v = v[ix]
+				return v is not None and (bottom is None or v >= bottom) and (top is None or v < top)
+			want = [v for v in data if ok(v)]
+			got = list(ds.iterate(0, ('f', 'i', 's', 't'), range={colname: (bottom, top)}))
+			assert got == want, '%s range %r-%r gave %d lines, wanted %d' % (colname, bottom, top, len(got), len(want),)
+			got = list(ds.iterate(0, 's', range={colname: (bottom, top)}))
+			assert got == [v[2] for v in want], '%s range %r-%r (single column)' % (colname, bottom, top,)
+		for colname, conv in (('i', int), ('t', lambda ix: start + timedelta(seconds=ix)), ('f', lambda ix: ix / 2)):
+			for bottom, top in (
+				(None, 100),
+				(100, 200),
+				(_zone_rows - 10, _zone_rows + 10),
+				(_zone_rows * 2 + 5, None),
+				(lines - 3, lines + 100),
+				(lines + 1, None),
+				(10, lines - 10),
+			):
+				check(colname, None if bottom is None else conv(bottom), None if top is None else conv(top))
+		assert list(ds.chain().iterate(None, 'i', range={'i': (_zone_rows * 2, _zone_rows * 2 + 12)})) == [ix for ix in range(_zone_rows * 2, _zone_rows * 2 + 12) if ix % 11]
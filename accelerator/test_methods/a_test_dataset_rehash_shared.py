@@ -0,0 +1,65 @@
+############################################################################
+#                                                                          #
+# Copyright (c) 2022 Carl Drougge                                          #
+#                                                                          #
+# Licensed under the Apache License, Version 2.0 (the "License");          #
+# you may not use this file except in compliance with the License.         #
+# You may obtain a copy of the License at                                  #
+#                                                                          #
+#  http://www.apache.org/licenses/LICENSE-2.0                              #
+#                                                                          #
+# Unless required by applicable law or agreed to in writing, software      #
+# distributed under the License is distributed on an "AS IS" BASIS,        #
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. #
+# See the License for the specific language governing permissions and      #
+# limitations under the License.                                           #
+#                                                                          #
+############################################################################
+
+from __future__ import print_function
+from __future__ import division
+from __future__ import unicode_literals
+
+description = r'''
+Test that rehash="shared" gives the same result as rehash=True when all
+slices iterate concurrently, also with range and copy_mode.
+The temp files are gone after analysis, and it's an error to use
+rehash="shared" anywhere else.
+'''
+
+from datetime import date, datetime
+import os
+
+from accelerator.dataset import _shared_rehash_dir
+from accelerator.error import DatasetUsageError
+
+def prepare(job):
+	dw = job.datasetwriter(columns={'a': 'int64', 'b': 'ascii', 'c': 'date', 'd': ('unicode', True), 'e': 'float64', 'f': 'datetime', 'g': 'bytes'}, hashlabel='a')
+	write = dw.get_split_write()
+	for ix in range(20000):
+		write(ix, 'b%d' % (ix % 7,), date(2022, 1, 1 + ix % 28), 'd%d' % (ix,) if ix % 3 else None, ix / 8, datetime(2022, 1, 1, ix % 24, ix % 60), b'g%d' % (ix % 100,))
+	return dw.finish()
+
+def analysis(sliceno, prepare_res):
+	ds = prepare_res
+	for hashlabel in ('b', 'c', 'd', 'e', 'f', 'g'):
+		want = list(ds.iterate(sliceno, hashlabel=hashlabel, rehash=True))
+		got = list(ds.iterate(sliceno, hashlabel=hashlabel, rehash='shared'))
+		assert want == got, "rehash='shared' on %r gave the wrong result in slice %d" % (hashlabel, sliceno,)
+		want = list(ds.iterate(sliceno, ['d', 'a'], hashlabel=hashlabel, rehash=True, copy_mode=True))
+		got = list(ds.iterate(sliceno, ['d', 'a'], hashlabel=hashlabel, rehash='shared', copy_mode=True))
+		assert want == got, "rehash='shared' with copy_mode on %r gave the wrong result in slice %d" % (hashlabel, sliceno,)
+		range_ = {'a': (1000, 5000)}
+		want = list(ds.iterate(sliceno, 'b', hashlabel=hashlabel, rehash=True, range=range_))
+		got = list(ds.iterate(sliceno, 'b', hashlabel=hashlabel, rehash='shared', range=range_))
+		assert want == got, "rehash='shared' with range on %r gave the wrong result in slice %d" % (hashlabel, sliceno,)
+	return len(list(ds.iterate(sliceno, 'a', hashlabel='b', rehash='shared')))
+
+def synthesis(analysis_res, prepare_res):
+	assert sum(analysis_res) == sum(prepare_res.lines)
+	assert not os.path.exists(_shared_rehash_dir)
+	try:
+		prepare_res.iterate(0, hashlabel='b', rehash='shared')
+		raise Exception('rehash="shared" worked in synthesis')
+	except DatasetUsageError:
+		pass
@@ -21,9 +21,12 @@ from __future__ import division
 from __future__ import unicode_literals
 
 description = r'''
-Test dataset iteration slicing.
+Test dataset iteration slicing, and get_rows.
 '''
 
+from os.path import exists
+
+from accelerator.dsutil import compressions, _zone_rows
 from accelerator.error import DatasetError
 
 def synthesis(job, slices):
@@ -101,3 +104,37 @@ def synthesis(job, slices):
 	assert get_chain(None, slice(99, -4)) == []
 	assert_fails(None, slice(99, -5), get_chain)
 	assert get_chain(None, slice(2, -2, 2)) == expect[2:-2:2]
+
+	# Big slices have a block index, so slicing seeks in the files.
+	lines = _zone_rows * 3 + 17
+	def mkline(ix):
+		# (mostly) incompressible, so the slices are not merged
+		h = (ix * 0x9e3779b97f4a7c15) & 0x7fffffffffffffff
+		return (h, '%x' % (h,) if ix % 3 else None, 'd%d' % (ix % 7,), h / 7,)
+	previous = None
+	for compression in compressions:
+		dw = job.datasetwriter(
+			{'a': 'int64', 'b': ('unicode', True), 'c': 'dictunicode', 'd': 'number'},
+			name='big_' + compression,
+			compression=compression,
+			previous=previous,
+			allow_missing_slices=True,
+		)
+		dw.set_slice(1)
+		for ix in range(lines):
+			dw.write(*mkline(ix))
+		ds = previous = dw.finish()
+		for col in ('a', 'b', 'd',):
+			assert exists(ds.column_filename(col, 1) + '.idx'), '%s column %s has no index' % (ds, col,)
+			assert len(ds._blocks(col, 1)) == 3, ds
+		for start, stop in ((0, 10), (_zone_rows - 2, _zone_rows + 2), (_zone_rows * 3, None), (-20, -10), (-5, None), (70000, 190000)):
+			want = [mkline(ix) for ix in range(lines)][start:stop]
+			assert ds.get_rows(1, start, stop) == want, (ds, start, stop,)
+			assert ds.get_rows(None, start, stop) == want, (ds, start, stop,)
+		assert ds.get_rows(1, 100000, 100002, 'c') == ['d%d' % (ix % 7,) for ix in (100000, 100001)]
+		assert list(ds.iterate(1, 'a', slice=slice(_zone_rows * 2, None, 1000))) == [mkline(ix)[0] for ix in range(_zone_rows * 2, lines, 1000)]
+		# filters can't seek, but should still give the same result
+		assert list(ds.iterate(1, 'a', slice=50000, filters={'a': lambda v: v % 2})) == [v for v in (mkline(ix)[0] for ix in range(lines)) if v % 2][50000:]
+	chain = ds.chain()
+	assert chain.get_rows(1, lines - 2, lines + 2, 'c') == ['d%d' % (ix % 7,) for ix in (lines - 2, lines - 1, 0, 1)]
+	assert chain.get_rows(None, -3, None, 'c') == ['d%d' % (ix % 7,) for ix in (lines - 3, lines - 2, lines - 1)]
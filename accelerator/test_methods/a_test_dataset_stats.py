@@ -0,0 +1,96 @@
+############################################################################
+#                                                                          #
+# Copyright (c) 2022 Carl Drougge                                          #
+#                                                                          #
+# Licensed under the Apache License, Version 2.0 (the "License");          #
+# you may not use this file except in compliance with the License.         #
+# You may obtain a copy of the License at                                  #
+#                                                                          #
+#  http://www.apache.org/licenses/LICENSE-2.0                              #
+#                                                                          #
+# Unless required by applicable law or agreed to in writing, software      #
+# distributed under the License is distributed on an "AS IS" BASIS,        #
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. #
+# See the License for the specific language governing permissions and      #
+# limitations under the License.                                           #
+#                                                                          #
+############################################################################
+
+from __future__ import print_function
+from __future__ import division
+from __future__ import unicode_literals
+
+description = r'''
+Test the column statistics DatasetWriter collects with stats=True, both
+for single datasets and chains, written in analysis and in synthesis.
+'''
+
+from accelerator import subjobs
+from accelerator.dataset import DatasetList
+
+columns = {'a': ('int64', True), 'b': ('ascii', True), 'c': 'float64'}
+
+def prepare(job):
+	return job.datasetwriter(name='analysis', columns=columns, stats=True)
+
+def analysis(sliceno, prepare_res):
+	dw = prepare_res
+	for ix in range(1000):
+		dw.write(ix % 100 if ix % 10 else None, 'b%d' % (ix % (sliceno + 5),), ix + 0.5)
+
+def check(ds, slices):
+	a = ds.stats('a')
+	assert a.lines == sum(ds.lines)
+	assert a.none_count == 100 * slices, a
+	assert 85 <= a.distinct <= 95, a # 90 distinct values
+	assert [s.none_count for s in a.slices] == [100] * slices, a
+	assert sum(count for _, _, count in a.histogram) == 900 * slices, a
+	zeros = [count for low, high, count in a.histogram if low == high == 0]
+	assert zeros == [], a # ix % 10 == 0 is None, so there are no zeros
+	b = ds.stats('b')
+	assert b.none_count == 0
+	assert b.histogram is None
+	assert b.distinct == slices + 4, b
+	assert [s.distinct for s in b.slices] == [sliceno + 5 for sliceno in range(slices)], b
+	c = ds.stats('c')
+	for low, high, count in c.histogram:
+		assert count == sum(1 for ix in range(1000) if low <= ix + 0.5 < high) * slices, c
+
+def synthesis(job, prepare_res, slices):
+	ds = prepare_res.finish()
+	check(ds, slices)
+	assert ds.stats('no such column') is None
+
+	dw = job.datasetwriter(name='synthesis', columns=columns, previous=ds, stats=True)
+	write = dw.get_split_write()
+	for ix in range(1000):
+		write(None, 'x', -1.0)
+	ds2 = dw.finish()
+	a = ds2.stats('a')
+	assert a.none_count == 1000 and a.distinct == 0 and a.histogram == [], a
+	assert ds2.stats('b').distinct == 1
+	assert ds2.stats('c').histogram == [(-2.0, -1.0, 1000)], ds2.stats('c')
+
+	chain = ds2.chain()
+	a = chain.stats('a')
+	assert a.lines == 1000 * slices + 1000, a
+	assert a.none_count == 100 * slices + 1000, a
+	assert 85 <= a.distinct <= 95, a
+	assert all(s.distinct is None for s in a.slices), a
+	assert chain.stats('b').distinct == slices + 5
+	assert DatasetList([ds]).stats('b') == ds.stats('b')
+
+	# Datasets written without stats=True (or not by DatasetWriter) have
+	# no statistics, and then neither does a chain containing them.
+	nostats = job.datasetwriter(name='nostats', columns={'a': 'ascii'})
+	nostats.get_split_write()('1')
+	nostats = nostats.finish()
+	assert nostats.stats('a') is None
+	typed = job.datasetwriter(name='typed', columns={'a': 'ascii'}, stats=True)
+	typed.get_split_write()('1')
+	typed = typed.finish()
+	assert typed.stats('a') is not None
+	typed = subjobs.build('dataset_type', source=typed, column2type={'a': 'int64_10'}).dataset()
+	assert typed.stats('a') is None
+	assert DatasetList([ds, typed]).stats('a') is None
+	assert DatasetList([ds, typed]).stats('b') == ds.stats('b')
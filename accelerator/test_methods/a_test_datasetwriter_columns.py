@@ -0,0 +1,142 @@
+############################################################################
+#                                                                          #
+# Copyright (c) 2022 Carl Drougge                                          #
+#                                                                          #
+# Licensed under the Apache License, Version 2.0 (the "License");          #
+# you may not use this file except in compliance with the License.         #
+# You may obtain a copy of the License at                                  #
+#                                                                          #
+#  http://www.apache.org/licenses/LICENSE-2.0                              #
+#                                                                          #
+# Unless required by applicable law or agreed to in writing, software      #
+# distributed under the License is distributed on an "AS IS" BASIS,        #
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. #
+# See the License for the specific language governing permissions and      #
+# limitations under the License.                                           #
+#                                                                          #
+############################################################################
+
+from __future__ import print_function
+from __future__ import division
+from __future__ import unicode_literals
+
+description = r'''
+Test DatasetWriter.write_columns and .get_split_write_columns, and that
+they give the same result as writing one line at a time.
+'''
+
+from array import array
+
+from accelerator.compat import PY3
+from accelerator.error import DatasetUsageError
+
+columns = {
+	'a': 'int64',
+	'b': 'float64',
+	'c': ('unicode', True),
+	'd': 'json',
+	'e': 'bool',
+}
+
+def mkcolumns(start, stop):
+	ixs = range(start, stop)
+	return {
+		'a': array('q', ixs) if PY3 else list(ixs),
+		'b': [ix / 4 for ix in ixs],
+		'c': (None if ix % 7 == 0 else 'line %d' % (ix,) for ix in ixs),
+		'd': [{'ix': ix} for ix in ixs],
+		'e': [bool(ix % 3) for ix in ixs],
+	}
+
+def mklines(start, stop):
+	# in column order
+	return [(ix, ix / 4, None if ix % 7 == 0 else 'line %d' % (ix,), {'ix': ix}, bool(ix % 3)) for ix in range(start, stop)]
+
+def check(ds, want_ds):
+	assert ds.lines == want_ds.lines, '%s: %r != %r (in %s)' % (ds, ds.lines, want_ds.lines, want_ds,)
+	for sliceno in range(len(ds.lines)):
+		got = list(ds.iterate(sliceno))
+		want = list(want_ds.iterate(sliceno))
+		assert got == want, '%s slice %d: %r != %r' % (ds, sliceno, got[:10], want[:10],)
+	for name, col in ds.columns.items():
+		want_col = want_ds.columns[name]
+		assert (col.min, col.max) == (want_col.min, want_col.max), '%s column %s' % (ds, name,)
+
+def synthesis(job, slices):
+	ranges = [(0, 1000), (1000, 1001), (1001, 1001), (1001, 3000)]
+
+	# with set_slice, one line at a time and with write_columns
+	for hashlabel in (None, 'a'):
+		for discard in (False, True):
+			if discard and not hashlabel:
+				continue
+			name = 'set_slice_%s%s' % (hashlabel, '_discard' if discard else '',)
+			dw_lines = job.datasetwriter(name=name + '_lines', columns=columns, hashlabel=hashlabel)
+			dw_columns = job.datasetwriter(name=name, columns=columns, hashlabel=hashlabel)
+			for sliceno in range(slices):
+				dw_lines.set_slice(sliceno)
+				dw_columns.set_slice(sliceno)
+				if discard:
+					dw_lines.enable_hash_discard()
+					dw_columns.enable_hash_discard()
+				for start, stop in ranges:
+					if hashlabel and not discard:
+						# only the values belonging in this slice
+						keep = [dw_columns.hashcheck(ix) for ix in range(start, stop)]
+						values = {name: [v for v, k in zip(col, keep) if k] for name, col in mkcolumns(start, stop).items()}
+						lines = [line for line, k in zip(mklines(start, stop), keep) if k]
+					else:
+						values = mkcolumns(start * slices + sliceno, stop * slices + sliceno)
+						lines = mklines(start * slices + sliceno, stop * slices + sliceno)
+					for line in lines:
+						dw_lines.write(*line)
+					dw_columns.write_columns(values)
+			check(dw_columns.finish(), dw_lines.finish())
+
+	# split writers, in several calls
+	for hashlabel in (None, 'a', 'c'):
+		dw_lines = job.datasetwriter(name='split_%s_lines' % (hashlabel,), columns=columns, hashlabel=hashlabel)
+		dw_columns = job.datasetwriter(name='split_%s' % (hashlabel,), columns=columns, hashlabel=hashlabel)
+		write = dw_lines.get_split_write()
+		write_columns = dw_columns.get_split_write_columns()
+		for start, stop in ranges:
+			for line in mklines(start, stop):
+				write(*line)
+			write_columns(mkcolumns(start, stop))
+		check(dw_columns.finish(), dw_lines.finish())
+
+	# errors
+	dw = job.datasetwriter(name='errors', columns=columns, hashlabel='a')
+	dw.set_slice(0)
+	good = mkcolumns(0, 10)
+	wrong_slice = [ix for ix in range(100) if not dw.hashcheck(ix)][:1]
+	for bad in (
+		{k: v for k, v in good.items() if k != 'a'},
+		dict(good, f=[1] * 10),
+		dict(good, b=[1.0] * 9),
+		dict(mkcolumns(0, 1), a=wrong_slice),
+	):
+		try:
+			dw.write_columns(bad)
+			raise Exception('write_columns accepted %r' % (bad,))
+		except DatasetUsageError:
+			pass
+	dw.discard()
+
+	# a failed write_columns writes nothing, so the writer can still finish
+	dw = job.datasetwriter(name='after_error', columns=columns, hashlabel='a')
+	dw.set_slice(0)
+	values = mkcolumns(0, 100)
+	keep = [dw.hashcheck(ix) for ix in range(100)]
+	assert not all(keep)
+	try:
+		dw.write_columns(values)
+		raise Exception('write_columns accepted values for other slices')
+	except DatasetUsageError:
+		pass
+	values = {name: [v for v, k in zip(col, keep) if k] for name, col in mkcolumns(0, 100).items()}
+	dw.write_columns(values)
+	for sliceno in range(1, slices):
+		dw.set_slice(sliceno)
+	ds = dw.finish()
+	assert list(ds.iterate(0)) == [line for line, k in zip(mklines(0, 100), keep) if k]
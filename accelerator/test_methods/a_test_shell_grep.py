@@ -572,6 +572,11 @@ def synthesis(job, slices):
 	grep_text(['--format=raw', '-g', 'json', '-i', 'foo', alltypes], [[b'foo', b'11111', b'99999', b'True', b'\xff\x00octets' if PY3 else b'\xef\xbf\xbd\x00octets', b'(1+2j)', b'(1.5-0.5j)', b'2021-09-20', b'2021-09-20 01:02:03', b'0.125', b'1e+42', b"[1, 2, 3, {'FOO': 'BAR'}, None]" if PY3 else b"[1, 2, 3, {u'FOO': u'BAR'}, None]", b'-2', b'04:05:06', b'codepoints\x00\xc3\xa4']], sep=b'\t', encoding=None)
 	grep_json([':05:', alltypes, 'bool', 'time', 'unicode', 'bytes'], [{'bool': True, 'time': '04:05:06', 'unicode': 'codepoints\x00\xe4', 'bytes': '\udcff\x00octets' if PY3 else '\ufffd\x00octets'}])
 
+	dictunicode = mk_ds('dictunicode', ['dictunicode', ('unicode', 'other')], ['abc', 'x'], ['dab\xe4', 'y'], ['dab\xe4', 'abc'])
+	grep_text(['ab', dictunicode], [['abc', 'x'], ['dab\xe4', 'y'], ['dab\xe4', 'abc']])
+	grep_text(['-g', 'dictunicode', 'abc', dictunicode], [['abc', 'x']])
+	grep_json(['\xe4', dictunicode, 'dictunicode'], [{'dictunicode': 'dab\xe4'}, {'dictunicode': 'dab\xe4'}])
+
 	columns = [
 		'ascii',
 		'bits32',
@@ -149,7 +149,25 @@ def main(urd):
 	urd.build("test_datasetwriter_missing_slices")
 	urd.build("test_datasetwriter_default")
 	urd.build("test_datasetwriter_parsed")
+	urd.build("test_datasetwriter_columns")
 	urd.build("test_dataset_in_prepare")
+	urd.build("test_dataset_compression")
+	urd.build("test_dataset_column_array")
+	urd.build("test_dataset_batch_size")
+	urd.build("test_dataset_range_zones")
+	urd.build("test_dataset_bloom")
+	urd.build("test_dataset_stats")
+	urd.build("test_dataset_encoding")
+	urd.build("test_dataset_late_filter")
+	urd.build("test_dataset_filter_predicates")
+	urd.build("test_dataset_copy_filter")
+	urd.build("test_dataset_map_slices")
+	urd.build("test_dataset_prefetch")
+	urd.build("test_dataset_cache")
+	urd.build("test_dataset_chain_index")
+	urd.build("test_dataset_iterate_merged")
+	urd.build("test_dataset_aggregate")
+	urd.build("test_dataset_dictunicode")
 	ds = Dataset(source, "passed")
 	csvname = "out.csv.gz"
 	csvname_uncompressed = "out.csv"
@@ -270,6 +288,7 @@ def main(urd):
 	print()
 	print("Test hashlabels")
 	urd.build("test_hashlabel")
+	urd.build("test_dataset_rehash_shared")
 
 	print()
 	print("Test dataset roundrobin iteration and slicing")
@@ -21,7 +21,6 @@
 #include <datetime.h>
 #include <structmember.h>
 
-#include <zlib.h>
 #include <unistd.h>
 #include <string.h>
 #include <stdint.h>
@@ -30,6 +29,10 @@
 #include <sys/types.h>
 #include <sys/stat.h>
 #include <sys/fcntl.h>
+#include <sys/mman.h>
+#include <pthread.h>
+
+#include "compression.h"
 
 
 // Choose some python number functions based on the size of long.
@@ -66,6 +69,9 @@
 
 #define MAX_COMPRESSORS 16
 
+// Rows per zone (of min/max values).
+#define ZONE_ROWS 65536
+
 #define err1(v) if (v) goto err
 
 static inline void add_extra_to_exc_msg(const char *extra) {
@@ -91,114 +97,110 @@ static inline void add_extra_to_exc_msg(const char *extra) {
 }
 
 
-typedef struct dsu_compressor {
-	int (*read)(void *ctx, char *buf, int *len);
-	int (*write)(void *ctx, const char *buf, int len);
-	void *(*read_open)(int fd, Py_ssize_t size_hint);
-	void *(*write_open)(int fd);
-	void (*read_close)(void *ctx);
-	int (*write_close)(void *ctx);
-} dsu_compressor;
+// Encodings for fixed width types, applied before compression.
+// delta stores each value as the (wrapping) difference from the one before,
+// so sorted columns become mostly small numbers that compress well.
+// rle stores runs of equal values as value, value, uint32 (run length - 2),
+// and single values as just the value.
+// Both work on the raw values (None-markers included) and start over
+// every ZONE_ROWS values, where the compression restarts, so readers can
+// still start at any block.
+#define ENC_NONE  0
+#define ENC_DELTA 1
+#define ENC_RLE   2
 
-typedef struct dsu_gz_ctx {
-	gzFile fh;
-} dsu_gz_ctx;
+static const char * const encoding_names[] = {"none", "delta", "rle", 0};
 
-static void *dsu_gz_read_open(int fd, Py_ssize_t size_hint)
+typedef struct enc_state {
+	int encoding;
+	int itemsize;
+	uint64_t prev;     // delta: the previous value
+	char run_value[8]; // rle: the value being repeated
+	uint32_t run_len;  // rle: length of the run (writing) or repeats left (reading)
+	int have_last;     // rle: run_value is a single value (reading)
+	uint32_t rows;     // rows since the last restart (reading)
+	char *buf;         // raw data (reading), or encoded data (rle writing)
+	int buf_pos, buf_len;
+} enc_state;
+
+static inline uint64_t enc_load(const char *ptr, int size)
 {
-	dsu_gz_ctx *ctx;
-	ctx = malloc(sizeof(*ctx));
-	err1(!ctx);
-	ctx->fh = gzdopen(fd, "rb");
-	err1(!ctx->fh);
-	if (size_hint >= 0 && size_hint < 400000) {
-		gzbuffer(ctx->fh, 16 * 1024);
-	} else {
-		gzbuffer(ctx->fh, 64 * 1024);
+	if (size == 1) return *(const uint8_t *)ptr;
+	if (size == 4) {
+		uint32_t v;
+		memcpy(&v, ptr, 4);
+		return v;
 	}
-	if (gzdirect(ctx->fh)) {
-		PyErr_SetString(PyExc_IOError, "not gzip compressed");
-		goto err;
-	}
-	return ctx;
-err:
-	if (ctx) free(ctx);
-	return 0;
+	uint64_t v;
+	memcpy(&v, ptr, 8);
+	return v;
 }
 
-static int dsu_gz_read(void *ctx_, char *buf, int *len)
+static inline void enc_store(char *ptr, uint64_t v, int size)
 {
-	dsu_gz_ctx *ctx = ctx_;
-	err1(!ctx->fh);
-	int got = gzread(ctx->fh, buf, *len);
-	err1(got == -1);
-	*len = got;
-	int error = 0;
-	if (len == 0) gzerror(ctx->fh, &error);
-	return error;
-err:
-	if (ctx->fh) {
-		gzclose(ctx->fh);
-		ctx->fh = 0;
+	if (size == 1) {
+		*(uint8_t *)ptr = v;
+	} else if (size == 4) {
+		const uint32_t v32 = v;
+		memcpy(ptr, &v32, 4);
+	} else {
+		memcpy(ptr, &v, 8);
 	}
-	return 1;
 }
 
-static void dsu_gz_read_close(void *ctx_)
+static inline void enc_restart(enc_state *enc)
 {
-	dsu_gz_ctx *ctx = ctx_;
-	if (ctx->fh) gzclose(ctx->fh);
-	free(ctx);
+	enc->prev = 0;
+	enc->run_len = 0;
+	enc->have_last = 0;
+	enc->rows = 0;
 }
 
-static void *dsu_gz_write_open(int fd)
+// Parses encoding (None or one of encoding_names) for a type with
+// itemsize (0 if the type can not be encoded).
+static int parse_encoding(enc_state *enc, PyObject *encoding, int itemsize, const char *tp_name)
 {
-	dsu_gz_ctx *ctx;
-	ctx = malloc(sizeof(*ctx));
-	err1(!ctx);
-	ctx->fh = gzdopen(fd, "wb");
-	err1(!ctx->fh);
-	return ctx;
-err:
-	if (ctx) free(ctx);
+	if (!encoding || encoding == Py_None) return 0;
+	PyObject *name = encoding;
+	if (PyUnicode_Check(encoding)) {
+		name = PyUnicode_AsASCIIString(encoding);
+		if (!name) return 1;
+	} else {
+		Py_INCREF(name);
+	}
+	int idx = -1;
+	if (PyBytes_Check(name)) {
+		for (int i = 0; encoding_names[i]; i++) {
+			if (!strcmp(PyBytes_AS_STRING(name), encoding_names[i])) idx = i;
+		}
+	}
+	Py_DECREF(name);
+	if (idx == -1) {
+		PyErr_Format(PyExc_ValueError, "Unknown encoding %R", encoding);
+		return 1;
+	}
+	if (idx != ENC_NONE && !itemsize) {
+		PyErr_Format(PyExc_ValueError, "%s does not support encoding %s", tp_name, encoding_names[idx]);
+		return 1;
+	}
+	enc->encoding = idx;
+	enc->itemsize = itemsize;
+	if (idx == ENC_NONE) return 0;
+	enc->buf = malloc(Z);
+	if (!enc->buf) {
+		PyErr_NoMemory();
+		return 1;
+	}
 	return 0;
 }
 
-static int dsu_gz_write_close(void *ctx_)
+static PyObject *encoding_obj(enc_state *enc)
 {
-	int res = 1;
-	dsu_gz_ctx *ctx = ctx_;
-	err1(!ctx->fh);
-	res = gzclose(ctx->fh);
-err:
-	free(ctx);
-	return res;
-}
-
-static int dsu_gz_write(void *ctx_, const char *buf, int len)
-{
-	dsu_gz_ctx *ctx = ctx_;
-	err1(!ctx->fh);
-	int wrote = gzwrite(ctx->fh, buf, len);
-	err1(wrote != len);
-	return 0;
-err:
-	if (ctx->fh) {
-		gzclose(ctx->fh);
-		ctx->fh = 0;
-	}
-	return 1;
+	if (!enc->encoding) Py_RETURN_NONE;
+	return PyUnicode_FromString(encoding_names[enc->encoding]);
 }
 
-static const dsu_compressor dsu_gz = {
-	dsu_gz_read,
-	dsu_gz_write,
-	dsu_gz_read_open,
-	dsu_gz_write_open,
-	dsu_gz_read_close,
-	dsu_gz_write_close,
-};
-
+struct where_state;
 
 typedef struct read {
 	PyObject_HEAD
@@ -217,13 +219,224 @@ typedef struct read {
 	int pos, len;
 	unsigned int sliceno;
 	unsigned int slices;
-	char buf[Z];
+	// buf is inline_buf, or points into map for mmapped files.
+	char *buf;
+	int mapped;
+	char *map;
+	size_t map_len;
+	size_t map_pos;
+	// The values (and their hashes) seen so far in DictUnicode files.
+	PyObject *dict_values;
+	uint64_t *dict_hashes;
+	size_t dict_alloc;
+	// With readahead a thread decompresses into ra_bufs while the
+	// main thread consumes the other buffer. The thread only touches
+	// ctx and the ra_ fields, and those only under ra_mutex.
+	int readahead;
+	pthread_t ra_thread;
+	pthread_mutex_t ra_mutex;
+	pthread_cond_t ra_cond;
+	char *ra_bufs[2];
+	int ra_lens[2];
+	int ra_full[2];
+	int ra_error;
+	int ra_stop;
+	int ra_cur, ra_pos;
+	pid_t ra_pid;
+	enc_state enc;
+	// Predicates for read_where.
+	struct where_state *where;
+	char inline_buf[Z];
 } Read;
 
 #define FREE(p) do { PyMem_Free(p); (p) = 0; } while (0)
 
+static void *Read_ra_thread(void *self_)
+{
+	Read *self = self_;
+	int i = 0;
+	pthread_mutex_lock(&self->ra_mutex);
+	while (!self->ra_stop) {
+		if (self->ra_full[i]) {
+			pthread_cond_wait(&self->ra_cond, &self->ra_mutex);
+			continue;
+		}
+		pthread_mutex_unlock(&self->ra_mutex);
+		int len = Z;
+		int error = self->compressor->read(self->ctx, self->ra_bufs[i], &len);
+		pthread_mutex_lock(&self->ra_mutex);
+		if (error) len = 0;
+		self->ra_error = error;
+		self->ra_lens[i] = len;
+		self->ra_full[i] = 1;
+		pthread_cond_signal(&self->ra_cond);
+		if (len <= 0) break; // EOF (or error), this buffer stays full.
+		i = !i;
+	}
+	pthread_mutex_unlock(&self->ra_mutex);
+	return 0;
+}
+
+static void Read_ra_start(Read *self)
+{
+	self->ra_bufs[0] = malloc(Z);
+	self->ra_bufs[1] = malloc(Z);
+	if (!self->ra_bufs[0] || !self->ra_bufs[1]) goto fail;
+	if (pthread_mutex_init(&self->ra_mutex, 0)) goto fail;
+	if (pthread_cond_init(&self->ra_cond, 0)) {
+		pthread_mutex_destroy(&self->ra_mutex);
+		goto fail;
+	}
+	if (pthread_create(&self->ra_thread, 0, Read_ra_thread, self)) {
+		pthread_cond_destroy(&self->ra_cond);
+		pthread_mutex_destroy(&self->ra_mutex);
+		goto fail;
+	}
+	self->readahead = 1;
+	self->ra_pid = getpid();
+	return;
+fail:
+	// Not fatal, this just reads without a thread.
+	free(self->ra_bufs[0]);
+	free(self->ra_bufs[1]);
+	self->ra_bufs[0] = self->ra_bufs[1] = 0;
+}
+
+static void Read_ra_stop(Read *self)
+{
+	if (!self->readahead) return;
+	self->readahead = 0;
+	// The thread does not exist in a forked child, so there is nothing
+	// to stop (and the mutex may be in any state).
+	if (self->ra_pid != getpid()) return;
+	pthread_mutex_lock(&self->ra_mutex);
+	self->ra_stop = 1;
+	pthread_cond_signal(&self->ra_cond);
+	pthread_mutex_unlock(&self->ra_mutex);
+	Py_BEGIN_ALLOW_THREADS
+	pthread_join(self->ra_thread, 0);
+	Py_END_ALLOW_THREADS
+	pthread_cond_destroy(&self->ra_cond);
+	pthread_mutex_destroy(&self->ra_mutex);
+	free(self->ra_bufs[0]);
+	free(self->ra_bufs[1]);
+	self->ra_bufs[0] = self->ra_bufs[1] = 0;
+}
+
+// Same interface as compressor->read, but takes the data from the
+// readahead thread when there is one.
+static int Read_fill_raw(Read *self, char *buf, int *len)
+{
+	if (!self->readahead) {
+		return self->compressor->read(self->ctx, buf, len);
+	}
+	if (self->ra_pid != getpid()) return 1;
+	int want = *len;
+	int got = 0;
+	while (got < want) {
+		const int i = self->ra_cur;
+		pthread_mutex_lock(&self->ra_mutex);
+		if (!self->ra_full[i]) {
+			Py_BEGIN_ALLOW_THREADS
+			while (!self->ra_full[i]) {
+				pthread_cond_wait(&self->ra_cond, &self->ra_mutex);
+			}
+			Py_END_ALLOW_THREADS
+		}
+		pthread_mutex_unlock(&self->ra_mutex);
+		if (self->ra_lens[i] <= 0) {
+			if (self->ra_error) return 1;
+			break;
+		}
+		int avail = self->ra_lens[i] - self->ra_pos;
+		if (avail > want - got) avail = want - got;
+		memcpy(buf + got, self->ra_bufs[i] + self->ra_pos, avail);
+		self->ra_pos += avail;
+		got += avail;
+		if (self->ra_pos == self->ra_lens[i]) {
+			pthread_mutex_lock(&self->ra_mutex);
+			self->ra_full[i] = 0;
+			pthread_cond_signal(&self->ra_cond);
+			pthread_mutex_unlock(&self->ra_mutex);
+			self->ra_cur = !i;
+			self->ra_pos = 0;
+		}
+	}
+	*len = got;
+	return 0;
+}
+
+// Get len bytes of encoded data. 1 at EOF, -1 for errors (including
+// EOF in the middle).
+static int Read_enc_get(Read *self, void *dest_, int len)
+{
+	enc_state *enc = &self->enc;
+	char *dest = dest_;
+	int got = 0;
+	while (got < len) {
+		if (enc->buf_pos == enc->buf_len) {
+			enc->buf_pos = 0;
+			enc->buf_len = Z;
+			if (Read_fill_raw(self, enc->buf, &enc->buf_len)) return -1;
+			if (enc->buf_len <= 0) {
+				enc->buf_len = 0;
+				return got ? -1 : 1;
+			}
+		}
+		int avail = enc->buf_len - enc->buf_pos;
+		if (avail > len - got) avail = len - got;
+		memcpy(dest + got, enc->buf + enc->buf_pos, avail);
+		enc->buf_pos += avail;
+		got += avail;
+	}
+	return 0;
+}
+
+// Same interface as Read_fill_raw, but decodes encoded files.
+// Only produces whole items.
+static int Read_fill(Read *self, char *buf, int *len)
+{
+	enc_state *enc = &self->enc;
+	if (!enc->encoding) return Read_fill_raw(self, buf, len);
+	const int size = enc->itemsize;
+	int out = 0;
+	while (out + size <= *len) {
+		char *ptr = buf + out;
+		if (enc->run_len) {
+			memcpy(ptr, enc->run_value, size);
+			enc->run_len--;
+		} else {
+			int r = Read_enc_get(self, ptr, size);
+			if (r > 0) break;
+			if (r < 0) return 1;
+			if (enc->encoding == ENC_DELTA) {
+				enc->prev += enc_load(ptr, size);
+				enc_store(ptr, enc->prev, size);
+			} else if (enc->have_last && !memcmp(ptr, enc->run_value, size)) {
+				if (Read_enc_get(self, &enc->run_len, 4)) return 1;
+				enc->have_last = 0;
+			} else {
+				memcpy(enc->run_value, ptr, size);
+				enc->have_last = 1;
+			}
+		}
+		out += size;
+		if (++enc->rows == ZONE_ROWS) {
+			if (enc->run_len) return 1; // runs never cross blocks
+			enc_restart(enc);
+		}
+	}
+	*len = out;
+	return 0;
+}
+
 static int Read_close_(Read *self)
 {
+	Read_ra_stop(self);
+	if (self->map) {
+		munmap(self->map, self->map_len);
+		self->map = 0;
+	}
 	if (self->ctx) {
 		self->compressor->read_close(self->ctx);
 		self->ctx = 0;
@@ -251,6 +464,12 @@ static int Read_close_(Read *self)
 
 // Stupid forward declarations
 static int Read_read_(Read *self, int itemsize);
+static void where_free(struct where_state *w);
+static int encoding_itemsize(PyTypeObject *type);
+static PyTypeObject ReadBytes_Type;
+static PyTypeObject ReadAscii_Type;
+static PyTypeObject ReadUnicode_Type;
+static PyTypeObject ReadDictUnicode_Type;
 static PyTypeObject ReadNumber_Type;
 static PyTypeObject ReadDateTime_Type;
 static PyTypeObject ReadDate_Type;
@@ -354,6 +573,34 @@ static int parse_compression(PyObject *compression)
 	return PyInt_AsLong(v);
 }
 
+// Uncompressed fixed width types are read straight from a mapping of
+// the file, so there is no copying and the page cache is shared.
+static int Read_mmap(Read *self, int fd, PY_LONG_LONG seek)
+{
+	PyTypeObject *type = Py_TYPE(self);
+	if (self->compressor != &dsu_none) return 0;
+	if (self->enc.encoding) return 0;
+	if (PyType_IsSubtype(type, &ReadBytes_Type)) return 0;
+	if (PyType_IsSubtype(type, &ReadAscii_Type)) return 0;
+	if (PyType_IsSubtype(type, &ReadUnicode_Type)) return 0;
+	if (PyType_IsSubtype(type, &ReadDictUnicode_Type)) return 0;
+	if (PyType_IsSubtype(type, &ReadNumber_Type)) return 0;
+	struct stat st;
+	if (fstat(fd, &st)) return 1;
+	if (seek > st.st_size) seek = st.st_size;
+	off_t start = seek - seek % sysconf(_SC_PAGESIZE);
+	self->mapped = 1;
+	self->map_len = st.st_size - start;
+	self->map_pos = seek - start;
+	if (self->map_len) {
+		void *map = mmap(0, self->map_len, PROT_READ, MAP_SHARED, fd, start);
+		if (map == MAP_FAILED) return 1;
+		self->map = map;
+		madvise(self->map, self->map_len, MADV_SEQUENTIAL);
+	}
+	return 0;
+}
+
 static int Read_init(PyObject *self_, PyObject *args, PyObject *kwds)
 {
 	int res = -1;
@@ -374,10 +621,13 @@ static int Read_init(PyObject *self_, PyObject *args, PyObject *kwds)
 	self->break_count = -1;
 	static char *kwlist[] = {
 		"name", "compression", "seek", "want_count", "hashfilter",
-		"callback", "callback_interval", "callback_offset", "fd", 0
+		"callback", "callback_interval", "callback_offset", "fd",
+		"readahead", "encoding", 0
 	};
+	int readahead = 0;
+	PyObject *encoding = 0;
 	if (!PyArg_ParseTupleAndKeywords(
-		args, kwds, "et|OLLOOLLi", kwlist,
+		args, kwds, "et|OLLOOLLiiO", kwlist,
 		Py_FileSystemDefaultEncoding, &name,
 		&compression,
 		&seek,
@@ -386,12 +636,15 @@ static int Read_init(PyObject *self_, PyObject *args, PyObject *kwds)
 		&callback,
 		&callback_interval,
 		&callback_offset,
-		&fd
+		&fd,
+		&readahead,
+		&encoding
 	)) return -1;
 	int idx = parse_compression(compression);
 	if (idx == -1) return -1;
 	self->compressor = compression_funcs[idx];
 	self->name = name;
+	err1(parse_encoding(&self->enc, encoding, encoding_itemsize(Py_TYPE(self)), Py_TYPE(self)->tp_name));
 	if (callback && callback != Py_None) {
 		if (!PyCallable_Check(callback)) {
 			PyErr_SetString(PyExc_ValueError, "callback must be callable");
@@ -417,12 +670,29 @@ static int Read_init(PyObject *self_, PyObject *args, PyObject *kwds)
 		PyErr_SetFromErrnoWithFilename(PyExc_IOError, self->name);
 		goto err;
 	}
+	self->buf = self->inline_buf;
+	if (Read_mmap(self, fd, seek)) {
+		PyErr_SetFromErrnoWithFilename(PyExc_IOError, self->name);
+		goto err;
+	}
+	if (readahead) {
+		// Have the kernel start reading the file now too.
+		if (self->map) {
+			madvise(self->map, self->map_len, MADV_WILLNEED);
+		} else {
+#ifdef POSIX_FADV_WILLNEED
+			posix_fadvise(fd, seek, 0, POSIX_FADV_WILLNEED);
+#endif
+		}
+	}
 	self->ctx = self->compressor->read_open(fd, self->want_count * 4);
 	if (!self->ctx) {
 		PyErr_SetFromErrnoWithFilename(PyExc_IOError, self->name);
 		goto err;
 	}
 	fd = -1; // belongs to self->ctx now
+	// Uncompressed (and mapped) files have nothing to decompress.
+	if (readahead && self->compressor != &dsu_none) Read_ra_start(self);
 	if (self->want_count >= 0) {
 		self->break_count = self->want_count;
 	}
@@ -449,6 +719,10 @@ static void Read_dealloc(Read *self)
 	FREE(self->name);
 	Py_CLEAR(self->hashfilter);
 	Py_CLEAR(self->callback);
+	Py_CLEAR(self->dict_values);
+	if (self->dict_hashes) free(self->dict_hashes);
+	if (self->enc.buf) free(self->enc.buf);
+	where_free(self->where);
 	PyObject_Del(self);
 }
 
@@ -471,16 +745,35 @@ static PyObject *Read_self(Read *self)
 	return (PyObject *)self;
 }
 
+// Big enough to not matter, a multiple of all item sizes and fits in an int.
+#define MAP_WINDOW (1 << 30)
+
 static int Read_read_(Read *self, int itemsize)
 {
-	if (!self->error) {
+	if (self->mapped && !self->error) {
+		size_t len = self->map_len - self->map_pos;
+		if (len > MAP_WINDOW) len = MAP_WINDOW;
+		if (self->want_count >= 0) {
+			PY_LONG_LONG count_left = self->want_count - self->count;
+			if ((size_t)count_left * itemsize < len) len = count_left * itemsize;
+		}
+		if (len < (size_t)itemsize) {
+			// A partial item at the end means the file is broken.
+			self->error = !!len;
+			len = 0;
+		}
+		len -= len % itemsize;
+		self->buf = self->map + self->map_pos;
+		self->map_pos += len;
+		self->len = len;
+	} else if (!self->error) {
 		self->len = Z;
 		if (self->want_count >= 0) {
 			PY_LONG_LONG count_left = self->want_count - self->count;
 			PY_LONG_LONG candidate = count_left * itemsize + itemsize;
 			if (candidate < self->len) self->len = candidate;
 		}
-		self->error = self->compressor->read(self->ctx, self->buf, &self->len);
+		self->error = Read_fill(self, self->buf, &self->len);
 	}
 	if (self->error) {
 		PyErr_SetString(PyExc_ValueError, "File format error");
@@ -500,6 +793,7 @@ static int Read_read_(Read *self, int itemsize)
 #define SIZE_Bytes    20
 #define SIZE_Ascii    20
 #define SIZE_Unicode  20
+#define SIZE_DictUnicode 2
 #define SIZE_Number   9
 #define SIZE_DateTime 8
 #define SIZE_Time     8
@@ -642,7 +936,7 @@ MKmkBlob(Unicode, PyUnicode_DecodeUTF8(ptr, len, 0))
 			self->pos = self->len;                                           	\
 			const int want_len = size - left_in_buf;                         	\
 			int read_len = want_len;                                         	\
-			self->error = self->compressor->read(self->ctx, tmp + left_in_buf, &read_len); \
+			self->error = Read_fill(self, tmp + left_in_buf, &read_len);   	\
 			if (self->error || read_len != want_len) {                       	\
 				free(tmp);                                               	\
 				goto fferror;                                            	\
@@ -655,7 +949,7 @@ MKmkBlob(Unicode, PyUnicode_DecodeUTF8(ptr, len, 0))
 			memmove(self->buf, ptr, left_in_buf);                            	\
 			ptr = self->buf + left_in_buf;                                   	\
 			int read_len = Z - left_in_buf;                                  	\
-			self->error = self->compressor->read(self->ctx, ptr, &read_len); 	\
+			self->error = Read_fill(self, ptr, &read_len);                   	\
 			if (self->error || read_len <= 0) goto fferror;                  	\
 			if (read_len + left_in_buf < size) goto fferror;                 	\
 			self->len = read_len + left_in_buf;                              	\
@@ -875,179 +1169,1103 @@ static PyObject *ReadTime_iternext(Read *self)
 	return unfmt_time(a[0], a[1]);
 }
 
-static PyObject *any_exit(PyObject *self, PyObject *args)
-{
-	return PyObject_CallMethod(self, "close", NULL);
-}
-
-static PyMethodDef Read_methods[] = {
-	{"__enter__", (PyCFunction)Read_self , METH_NOARGS , NULL},
-	{"__exit__",  (PyCFunction)any_exit  , METH_VARARGS, NULL},
-	{"close",     (PyCFunction)Read_close, METH_NOARGS , NULL},
-	{NULL, NULL, 0, NULL}
-};
+// Bulk decoding for readinto. Each function decodes count values from
+// in (file format) to out (numpy format), setting mask[i] for None
+// values if there is a mask. None values in out are left as the
+// noneval (or NaT for the date/time types).
 
-#define MKTYPE(name)                                                 	\
-	static PyTypeObject name ## _Type = {                        	\
-		PyVarObject_HEAD_INIT(NULL, 0)                       	\
-		#name,                          /*tp_name          */	\
-		sizeof(Read),                   /*tp_basicsize     */	\
-		0,                              /*tp_itemsize      */	\
-		(destructor)Read_dealloc,       /*tp_dealloc       */	\
-		0,                              /*tp_print         */	\
-		0,                              /*tp_getattr       */	\
-		0,                              /*tp_setattr       */	\
-		0,                              /*tp_compare       */	\
-		0,                              /*tp_repr          */	\
-		0,                              /*tp_as_number     */	\
-		0,                              /*tp_as_sequence   */	\
-		0,                              /*tp_as_mapping    */	\
-		0,                              /*tp_hash          */	\
-		0,                              /*tp_call          */	\
-		0,                              /*tp_str           */	\
-		0,                              /*tp_getattro      */	\
-		0,                              /*tp_setattro      */	\
-		0,                              /*tp_as_buffer     */	\
-		Py_TPFLAGS_DEFAULT,             /*tp_flags         */	\
-		0,                              /*tp_doc           */	\
-		0,                              /*tp_traverse      */	\
-		0,                              /*tp_clear         */	\
-		0,                              /*tp_richcompare   */	\
-		0,                              /*tp_weaklistoffset*/	\
-		(getiterfunc)Read_self,         /*tp_iter          */	\
-		(iternextfunc)name ## _iternext,/*tp_iternext      */	\
-		Read_methods,                   /*tp_methods       */	\
-		r_default_members,              /*tp_members       */	\
-		0,                              /*tp_getset        */	\
-		0,                              /*tp_base          */	\
-		0,                              /*tp_dict          */	\
-		0,                              /*tp_descr_get     */	\
-		0,                              /*tp_descr_set     */	\
-		0,                              /*tp_dictoffset    */	\
-		Read_init,                      /*tp_init          */	\
-		PyType_GenericAlloc,            /*tp_alloc         */	\
-		PyType_GenericNew,              /*tp_new           */	\
-		PyObject_Del,                   /*tp_free          */	\
-		0,                              /*tp_is_gc         */	\
+#define MKARRAYCONV(name, T, withnone)                                        	\
+	static void name ## _array(const char *in, char *out, char *mask, Py_ssize_t count)\
+	{                                                                     	\
+		memcpy(out, in, count * sizeof(T));                           	\
+		if (!mask) return;                                            	\
+		if (!withnone) {                                              	\
+			memset(mask, 0, count);                               	\
+			return;                                               	\
+		}                                                             	\
+		for (Py_ssize_t i = 0; i < count; i++) {                      	\
+			mask[i] = !memcmp(in + i * sizeof(T), &noneval_ ## T, sizeof(T));\
+		}                                                             	\
 	}
-static PyMemberDef r_default_members[] = {
-	{"name"      , T_STRING   , offsetof(Read, name       ), READONLY},
-	{"hashfilter", T_OBJECT_EX, offsetof(Read, hashfilter ), READONLY},
-	{0}
-};
-MKTYPE(ReadBytes);
-MKTYPE(ReadAscii);
-MKTYPE(ReadUnicode);
-MKTYPE(ReadNumber);
-MKTYPE(ReadComplex64);
-MKTYPE(ReadComplex32);
-MKTYPE(ReadFloat64);
-MKTYPE(ReadFloat32);
-MKTYPE(ReadInt64);
-MKTYPE(ReadInt32);
-MKTYPE(ReadBits64);
-MKTYPE(ReadBits32);
-MKTYPE(ReadBool);
-MKTYPE(ReadDateTime);
-MKTYPE(ReadDate);
-MKTYPE(ReadTime);
-
+MKARRAYCONV(ReadComplex64, complex64, 1)
+MKARRAYCONV(ReadComplex32, complex32, 1)
+MKARRAYCONV(ReadFloat64  , double   , 1)
+MKARRAYCONV(ReadFloat32  , float    , 1)
+MKARRAYCONV(ReadInt64    , int64_t  , 1)
+MKARRAYCONV(ReadInt32    , int32_t  , 1)
+MKARRAYCONV(ReadBits64   , uint64_t , 0)
+MKARRAYCONV(ReadBits32   , uint32_t , 0)
 
-typedef union {
-	double   as_double;
-	float    as_float;
-	int32_t  as_int32_t;
-	int64_t  as_int64_t;
-	uint8_t  as_uint8_t;
-	uint32_t as_uint32_t;
-	uint64_t as_uint64_t;
-} minmax_u;
+static void ReadBool_array(const char *in, char *out, char *mask, Py_ssize_t count)
+{
+	for (Py_ssize_t i = 0; i < count; i++) {
+		const int is_none = ((uint8_t *)in)[i] == noneval_uint8_t;
+		out[i] = is_none ? 0 : !!in[i];
+		if (mask) mask[i] = is_none;
+	}
+}
 
-// Same thing but with the larger complex64 type which isn't needed in minmax.
-typedef union {
-	double   as_double;
-	float    as_float;
-	int32_t  as_int32_t;
-	int64_t  as_int64_t;
-	uint8_t  as_uint8_t;
-	uint32_t as_uint32_t;
-	uint64_t as_uint64_t;
-	complex32 as_complex32;
-	complex64 as_complex64;
-} default_u;
+// Days since 1970-01-01 in the proleptic gregorian calendar.
+static inline int64_t days_from_civil(int64_t Y, int m, int d)
+{
+	Y -= m <= 2;
+	const int64_t era = (Y >= 0 ? Y : Y - 399) / 400;
+	const int yoe = Y - era * 400;
+	const int doy = (153 * (m + (m > 2 ? -3 : 9)) + 2) / 5 + d - 1;
+	const int doe = yoe * 365 + yoe / 4 - yoe / 100 + doy;
+	return era * 146097 + doe - 719468;
+}
 
-typedef struct write {
-	PyObject_HEAD
-	void *ctx;
-	const dsu_compressor *compressor;
-	char *name;
-	char *error_extra;
-	default_u *default_value;
-	unsigned PY_LONG_LONG count;
-	PyObject *hashfilter;
-	PyObject *compression;
-	PyObject *default_obj;
-	PyObject *min_obj;
-	PyObject *max_obj;
-	minmax_u min_u;
-	minmax_u max_u;
-	uint64_t spread_None;
-	unsigned int sliceno;
-	unsigned int slices;
-	int closed;
-	int none_support;
-	int len;
-	char buf[Z];
-} Write;
+#define US_PER_S  INT64_C(1000000)
+#define US_PER_DAY (86400 * US_PER_S)
 
-static char * const default_error_extra = "";
+static inline int64_t us_from_time(const uint32_t i0, const uint32_t i1)
+{
+	const int64_t H = i0 & 0x1f;
+	const int64_t M = i1 >> 26 & 0x3f;
+	const int64_t S = i1 >> 20 & 0x3f;
+	const int64_t u = i1 & 0xfffff;
+	return ((H * 60 + M) * 60 + S) * US_PER_S + u;
+}
 
-static int Write_ensure_open(Write *self)
+// datetime64[D]
+static void ReadDate_array(const char *in, char *out, char *mask, Py_ssize_t count)
 {
-	if (self->ctx) return 0;
-	if (self->closed) {
-		(void) err_closed();
-		return 1;
+	for (Py_ssize_t i = 0; i < count; i++) {
+		uint32_t i0;
+		int64_t res = INT64_MIN;
+		memcpy(&i0, in + i * 4, 4);
+		if (i0) res = days_from_civil(i0 >> 9, i0 >> 5 & 0x0f, i0 & 0x1f);
+		memcpy(out + i * 8, &res, 8);
+		if (mask) mask[i] = !i0;
 	}
-	int fd = open(self->name, O_WRONLY | O_CREAT | O_TRUNC, 0666);
-	if (fd < 0) {
-		PyErr_SetFromErrnoWithFilename(PyExc_IOError, self->name);
-		return 1;
+}
+
+// datetime64[us]
+static void ReadDateTime_array(const char *in, char *out, char *mask, Py_ssize_t count)
+{
+	for (Py_ssize_t i = 0; i < count; i++) {
+		uint32_t a[2];
+		int64_t res = INT64_MIN;
+		memcpy(a, in + i * 8, 8);
+		if (a[0]) {
+			const int64_t days = days_from_civil(a[0] >> 14 & 0x2fff, a[0] >> 10 & 0x0f, a[0] >> 5 & 0x1f);
+			res = days * US_PER_DAY + us_from_time(a[0], a[1]);
+		}
+		memcpy(out + i * 8, &res, 8);
+		if (mask) mask[i] = !a[0];
 	}
-	self->ctx = self->compressor->write_open(fd);
-	if (!self->ctx) {
-		close(fd);
-		PyErr_Format(PyExc_IOError, "failed to init compression for \"%s\"", self->name);
-		return 1;
+}
+
+// timedelta64[us] since midnight
+static void ReadTime_array(const char *in, char *out, char *mask, Py_ssize_t count)
+{
+	for (Py_ssize_t i = 0; i < count; i++) {
+		uint32_t a[2];
+		int64_t res = INT64_MIN;
+		memcpy(a, in + i * 8, 8);
+		if (a[0]) res = us_from_time(a[0], a[1]);
+		memcpy(out + i * 8, &res, 8);
+		if (mask) mask[i] = !a[0];
 	}
-	return 0;
 }
 
-static int Write_flush_(Write *self)
+typedef struct array_conv {
+	PyTypeObject *type;
+	int size; // in the file
+	int out_size; // in the array
+	void (*func)(const char *in, char *out, char *mask, Py_ssize_t count);
+} array_conv;
+
+static PyTypeObject ReadComplex64_Type;
+static PyTypeObject ReadComplex32_Type;
+static PyTypeObject ReadFloat64_Type;
+static PyTypeObject ReadFloat32_Type;
+static PyTypeObject ReadInt64_Type;
+static PyTypeObject ReadInt32_Type;
+static PyTypeObject ReadBits64_Type;
+static PyTypeObject ReadBits32_Type;
+
+#define ARRAYCONV(name, size, out_size) {&name ## _Type, size, out_size, name ## _array}
+static const array_conv array_convs[] = {
+	ARRAYCONV(ReadComplex64, 16, 16),
+	ARRAYCONV(ReadComplex32,  8,  8),
+	ARRAYCONV(ReadFloat64  ,  8,  8),
+	ARRAYCONV(ReadFloat32  ,  4,  4),
+	ARRAYCONV(ReadInt64    ,  8,  8),
+	ARRAYCONV(ReadInt32    ,  4,  4),
+	ARRAYCONV(ReadBits64   ,  8,  8),
+	ARRAYCONV(ReadBits32   ,  4,  4),
+	ARRAYCONV(ReadBool     ,  1,  1),
+	ARRAYCONV(ReadDateTime ,  8,  8),
+	ARRAYCONV(ReadDate     ,  4,  8),
+	ARRAYCONV(ReadTime     ,  8,  8),
+	{0}
+};
+
+// Size of the values for types that can be encoded, or 0.
+// (Encoding floats as integers would not gain anything.)
+static int encoding_itemsize(PyTypeObject *type)
 {
-	if (!self->len) return 0;
-	if (Write_ensure_open(self)) return 1;
-	const int len = self->len;
-	self->len = 0;
-	if (self->compressor->write(self->ctx, self->buf, len)) {
-		PyErr_SetString(PyExc_IOError, "Write failed");
-		return 1;
+	if (PyType_IsSubtype(type, &ReadComplex64_Type)) return 0;
+	if (PyType_IsSubtype(type, &ReadComplex32_Type)) return 0;
+	if (PyType_IsSubtype(type, &ReadFloat64_Type)) return 0;
+	if (PyType_IsSubtype(type, &ReadFloat32_Type)) return 0;
+	for (const array_conv *conv = array_convs; conv->type; conv++) {
+		if (PyType_IsSubtype(type, conv->type)) return conv->size;
 	}
 	return 0;
 }
 
-static PyObject *Write_flush(Write *self)
+static PyObject *Read_readinto(Read *self, PyObject *args)
+{
+	PyObject *res = 0;
+	PyObject *o_mask = Py_None;
+	Py_buffer buf, mask;
+	const array_conv *conv;
+	for (conv = array_convs; conv->type; conv++) {
+		if (PyObject_TypeCheck(self, conv->type)) break;
+	}
+	if (!conv->type) {
+		PyErr_Format(PyExc_TypeError, "%s does not support readinto", Py_TYPE(self)->tp_name);
+		return 0;
+	}
+	if (!self->ctx) return err_closed();
+	if (self->slices || self->callback) {
+		PyErr_SetString(PyExc_ValueError, "readinto can not be used with hashfilter or callback");
+		return 0;
+	}
+	if (!PyArg_ParseTuple(args, "w*|O", &buf, &o_mask)) return 0;
+	mask.buf = 0;
+	if (o_mask != Py_None && PyObject_GetBuffer(o_mask, &mask, PyBUF_WRITABLE)) goto err;
+	Py_ssize_t max_count = buf.len / conv->out_size;
+	if (mask.buf && mask.len < max_count) max_count = mask.len;
+	Py_ssize_t count = 0;
+	while (count < max_count && self->count != self->want_count) {
+		if (self->error || self->pos >= self->len) {
+			if (Read_read_(self, conv->size)) {
+				if (PyErr_Occurred()) goto err;
+				break;
+			}
+		}
+		Py_ssize_t avail = (self->len - self->pos) / conv->size;
+		if (!avail) {
+			PyErr_SetString(PyExc_ValueError, "File format error");
+			goto err;
+		}
+		if (avail > max_count - count) avail = max_count - count;
+		if (self->want_count >= 0 && avail > self->want_count - self->count) {
+			avail = self->want_count - self->count;
+		}
+		char *mask_ptr = mask.buf ? (char *)mask.buf + count : 0;
+		conv->func(self->buf + self->pos, (char *)buf.buf + count * conv->out_size, mask_ptr, avail);
+		self->pos += avail * conv->size;
+		self->count += avail;
+		count += avail;
+	}
+	res = PyLong_FromSsize_t(count);
+err:
+	PyBuffer_Release(&buf);
+	if (mask.buf) PyBuffer_Release(&mask);
+	return res;
+}
+
+static PyObject *Read_read_chunk(Read *self, PyObject *o_n)
+{
+	Py_ssize_t n = PyNumber_AsSsize_t(o_n, PyExc_OverflowError);
+	if (n == -1 && PyErr_Occurred()) return 0;
+	if (n < 0) {
+		PyErr_SetString(PyExc_ValueError, "read_chunk size must be >= 0");
+		return 0;
+	}
+	if (!self->ctx) return err_closed();
+	iternextfunc next = Py_TYPE(self)->tp_iternext;
+	// With a known count the list can be allocated up front.
+	const int prealloc = (self->want_count >= 0);
+	if (prealloc && n > self->want_count - self->count) {
+		n = self->want_count - self->count;
+	}
+	PyObject *res = PyList_New(prealloc ? n : 0);
+	if (!res) return 0;
+	Py_ssize_t got;
+	for (got = 0; got < n; got++) {
+		PyObject *v = next((PyObject *)self);
+		if (!v) break;
+		if (prealloc) {
+			PyList_SET_ITEM(res, got, v);
+		} else {
+			int err = PyList_Append(res, v);
+			Py_DECREF(v);
+			if (err) goto err;
+		}
+	}
+	if (PyErr_Occurred()) goto err;
+	if (prealloc && got < n) {
+		PyObject *short_res = PyList_GetSlice(res, 0, got);
+		Py_DECREF(res);
+		return short_res;
+	}
+	return res;
+err:
+	Py_DECREF(res);
+	return 0;
+}
+
+// Get len bytes from the file into dest (or just skip them if dest is 0).
+// This is only for the variable width types, which are never mapped.
+static int Read_take_(Read *self, char *dest, Py_ssize_t len)
+{
+	while (len) {
+		if (self->pos >= self->len) {
+			if (self->error) goto err;
+			self->len = Z;
+			self->pos = 0;
+			self->error = Read_fill(self, self->buf, &self->len);
+			if (self->error || self->len <= 0) goto err;
+		}
+		Py_ssize_t avail = self->len - self->pos;
+		if (avail > len) avail = len;
+		if (dest) {
+			memcpy(dest, self->buf + self->pos, avail);
+			dest += avail;
+		}
+		self->pos += avail;
+		len -= avail;
+	}
+	return 0;
+err:
+	self->error = 1;
+	PyErr_SetString(PyExc_ValueError, "File format error");
+	return 1;
+}
+
+static int Read_skip_blob(Read *self)
+{
+	uint8_t size8;
+	if (Read_take_(self, (char *)&size8, 1)) return 1;
+	uint32_t size = size8;
+	if (size == 255) {
+		if (Read_take_(self, (char *)&size, 4)) return 1;
+	}
+	return Read_take_(self, 0, size);
+}
+
+static int Read_skip_number(Read *self)
+{
+	uint8_t len;
+	if (Read_take_(self, (char *)&len, 1)) return 1;
+	if (!len || len >= 0x80) return 0;
+	if (len == 1) len = 8;
+	if (len >= NUMBER_MAX_BYTES || (len < 8 && len != 2 && len != 4)) {
+		self->error = 1;
+		PyErr_SetString(PyExc_ValueError, "File format error");
+		return 1;
+	}
+	return Read_take_(self, 0, len);
+}
+
+// DictUnicode files are a code per value, and each new value is stored
+// (as in Unicode files) right after the first code for it.
+// Codes are one byte when < 0xfd, otherwise 0xfd + uint16 or 0xfe + uint32.
+// A new block (see Write_block_check) starts over with no values.
+#define DICT_NONE 0
+#define DICT_NEW  1
+#define DICT_BASE 2
+// Not a value, all previous values are forgotten.
+#define DICT_RESET 0xff
+
+static int Read_dict_code(Read *self, uint32_t *r_code)
+{
+	uint8_t b;
+	if (Read_take_(self, (char *)&b, 1)) return 1;
+	if (b == DICT_RESET) {
+		Py_CLEAR(self->dict_values);
+		if (Read_take_(self, (char *)&b, 1)) return 1;
+	}
+	uint32_t code = b;
+	if (b == 0xfd) {
+		uint16_t code16;
+		if (Read_take_(self, (char *)&code16, 2)) return 1;
+		code = code16;
+	} else if (b == 0xfe) {
+		if (Read_take_(self, (char *)&code, 4)) return 1;
+	} else if (b == DICT_RESET) {
+		goto fferror;
+	}
+	if (code == DICT_NEW) {
+		uint8_t size8;
+		if (Read_take_(self, (char *)&size8, 1)) return 1;
+		uint32_t size = size8;
+		if (size == 255) {
+			if (Read_take_(self, (char *)&size, 4)) return 1;
+		}
+		char *data = malloc(size ? size : 1);
+		if (!data) {
+			PyErr_NoMemory();
+			return 1;
+		}
+		if (Read_take_(self, data, size)) {
+			free(data);
+			return 1;
+		}
+		PyObject *v = PyUnicode_DecodeUTF8(data, size, 0);
+		const uint64_t h = hash(data, size);
+		free(data);
+		if (!v) return 1;
+#if PY_MAJOR_VERSION >= 3
+		PyUnicode_InternInPlace(&v);
+#endif
+		if (!self->dict_values) {
+			self->dict_values = PyList_New(0);
+			if (!self->dict_values) {
+				Py_DECREF(v);
+				return 1;
+			}
+		}
+		const size_t ix = PyList_GET_SIZE(self->dict_values);
+		if (ix == self->dict_alloc) {
+			size_t alloc = self->dict_alloc ? self->dict_alloc * 2 : 64;
+			uint64_t *hashes = realloc(self->dict_hashes, alloc * sizeof(*hashes));
+			if (!hashes) {
+				Py_DECREF(v);
+				PyErr_NoMemory();
+				return 1;
+			}
+			self->dict_hashes = hashes;
+			self->dict_alloc = alloc;
+		}
+		int err = PyList_Append(self->dict_values, v);
+		Py_DECREF(v);
+		if (err) return 1;
+		self->dict_hashes[ix] = h;
+		code = ix + DICT_BASE;
+	} else if (code != DICT_NONE) {
+		if (!self->dict_values || code - DICT_BASE >= (uint32_t)PyList_GET_SIZE(self->dict_values)) {
+			goto fferror;
+		}
+	}
+	*r_code = code;
+	return 0;
+fferror:
+	self->error = 1;
+	PyErr_SetString(PyExc_ValueError, "File format error");
+	return 1;
+}
+
+static PyObject *ReadDictUnicode_iternext(Read *self)
+{
+	ITERPROLOGUE(DictUnicode);
+	uint32_t code;
+	if (Read_dict_code(self, &code)) return 0;
+	if (code == DICT_NONE) HC_RETURN_NONE;
+	const uint32_t ix = code - DICT_BASE;
+	HC_CHECK(self->dict_hashes[ix]);
+	PyObject *v = PyList_GET_ITEM(self->dict_values, ix);
+	Py_INCREF(v);
+	return v;
+}
+
+static int Read_skip_dict(Read *self)
+{
+	uint32_t code;
+	return Read_dict_code(self, &code);
+}
+
+// Skip up to n values, returns how many were skipped or -1 on error.
+static PY_LONG_LONG Read_skip_(Read *self, PY_LONG_LONG n, const char *name)
+{
+	if (self->slices || self->callback) {
+		PyErr_Format(PyExc_ValueError, "%s can not be used with hashfilter or callback", name);
+		return -1;
+	}
+	if (self->want_count >= 0 && n > self->want_count - self->count) {
+		n = self->want_count - self->count;
+	}
+	const PY_LONG_LONG start_count = self->count;
+	const PY_LONG_LONG end_count = self->count + n;
+	int (*skip_one)(Read *) = 0;
+	const array_conv *conv = 0;
+	if (PyObject_TypeCheck(self, &ReadNumber_Type)) {
+		skip_one = Read_skip_number;
+	} else if (PyObject_TypeCheck(self, &ReadBytes_Type) || PyObject_TypeCheck(self, &ReadAscii_Type) || PyObject_TypeCheck(self, &ReadUnicode_Type)) {
+		skip_one = Read_skip_blob;
+	} else if (PyObject_TypeCheck(self, &ReadDictUnicode_Type)) {
+		skip_one = Read_skip_dict;
+	} else {
+		for (conv = array_convs; conv->type; conv++) {
+			if (PyObject_TypeCheck(self, conv->type)) break;
+		}
+		if (!conv->type) {
+			PyErr_Format(PyExc_TypeError, "%s does not support %s", Py_TYPE(self)->tp_name, name);
+			return -1;
+		}
+	}
+	while (self->count < end_count) {
+		if (skip_one) {
+			if (self->pos >= self->len) {
+				// Read_take_ doesn't know about EOF.
+				if (Read_read_(self, SIZE_Bytes)) break;
+			}
+			if (skip_one(self)) return -1;
+			self->count++;
+			continue;
+		}
+		if (self->error || self->pos >= self->len) {
+			if (Read_read_(self, conv->size)) break;
+		}
+		PY_LONG_LONG avail = (self->len - self->pos) / conv->size;
+		if (!avail) {
+			PyErr_SetString(PyExc_ValueError, "File format error");
+			return -1;
+		}
+		if (avail > end_count - self->count) avail = end_count - self->count;
+		self->pos += avail * conv->size;
+		self->count += avail;
+	}
+	if (PyErr_Occurred()) return -1;
+	return self->count - start_count;
+}
+
+static PyObject *Read_skip(Read *self, PyObject *o_n)
+{
+	PY_LONG_LONG n = PyLong_AsLongLong(o_n);
+	if (n == -1 && PyErr_Occurred()) return 0;
+	if (n < 0) {
+		PyErr_SetString(PyExc_ValueError, "Can't skip a negative number of values");
+		return 0;
+	}
+	if (!self->ctx) return err_closed();
+	n = Read_skip_(self, n, "skip");
+	if (n < 0) return 0;
+	return PyLong_FromLongLong(n);
+}
+
+// A selection is either bytes/bytearray (fast) or any sequence of
+// things that are checked for truth.
+typedef struct selection {
+	PyObject *seq;
+	const char *bytes;
+	PyObject **items;
+	Py_ssize_t len;
+} selection;
+
+static int selection_init(selection *sel, PyObject *obj)
+{
+	sel->seq = 0;
+	sel->bytes = 0;
+	sel->items = 0;
+	if (PyBytes_Check(obj)) {
+		sel->bytes = PyBytes_AS_STRING(obj);
+		sel->len = PyBytes_GET_SIZE(obj);
+	} else if (PyByteArray_Check(obj)) {
+		sel->bytes = PyByteArray_AS_STRING(obj);
+		sel->len = PyByteArray_GET_SIZE(obj);
+	} else {
+		sel->seq = PySequence_Fast(obj, "selection must be a sequence");
+		if (!sel->seq) return 1;
+		sel->items = PySequence_Fast_ITEMS(sel->seq);
+		sel->len = PySequence_Fast_GET_SIZE(sel->seq);
+	}
+	return 0;
+}
+
+static inline int selection_get(const selection *sel, Py_ssize_t ix)
+{
+	if (sel->bytes) return !!sel->bytes[ix];
+	return PyObject_IsTrue(sel->items[ix]);
+}
+
+// Length of the run of unselected values starting at ix, or -1 on error.
+static Py_ssize_t selection_skip_run(const selection *sel, Py_ssize_t ix)
+{
+	Py_ssize_t run = 0;
+	while (ix + run < sel->len) {
+		int want = selection_get(sel, ix + run);
+		if (want < 0) return -1;
+		if (want) break;
+		run++;
+	}
+	return run;
+}
+
+// Runs of unselected values are skipped without being decoded, so this
+// is much cheaper than reading everything when few values are selected.
+static PyObject *Read_read_selected(Read *self, PyObject *o_selection)
+{
+	if (!self->ctx) return err_closed();
+	if (self->slices || self->callback) {
+		PyErr_SetString(PyExc_ValueError, "read_selected can not be used with hashfilter or callback");
+		return 0;
+	}
+	selection sel;
+	if (selection_init(&sel, o_selection)) return 0;
+	PyObject *res = PyList_New(0);
+	if (!res) goto err;
+	iternextfunc next = Py_TYPE(self)->tp_iternext;
+	Py_ssize_t ix = 0;
+	while (ix < sel.len) {
+		int want = selection_get(&sel, ix);
+		if (want < 0) goto err;
+		if (want) {
+			PyObject *v = next((PyObject *)self);
+			if (!v) break;
+			int e = PyList_Append(res, v);
+			Py_DECREF(v);
+			if (e) goto err;
+			ix++;
+		} else {
+			Py_ssize_t run = selection_skip_run(&sel, ix);
+			if (run < 0) goto err;
+			PY_LONG_LONG skipped = Read_skip_(self, run, "read_selected");
+			if (skipped < 0) goto err;
+			if (skipped < run) break;
+			ix += run;
+		}
+	}
+	if (PyErr_Occurred()) goto err;
+	Py_XDECREF(sel.seq);
+	return res;
+err:
+	Py_XDECREF(res);
+	Py_XDECREF(sel.seq);
+	return 0;
+}
+
+// Defined with the writers, as they need the value formatting from there.
+static PyObject *Read_where(Read *self, PyObject *preds);
+static PyObject *Read_read_where(Read *self, PyObject *o_selection);
+
+static PyObject *any_exit(PyObject *self, PyObject *args)
+{
+	return PyObject_CallMethod(self, "close", NULL);
+}
+
+static PyMethodDef Read_methods[] = {
+	{"__enter__", (PyCFunction)Read_self , METH_NOARGS , NULL},
+	{"__exit__",  (PyCFunction)any_exit  , METH_VARARGS, NULL},
+	{"close",     (PyCFunction)Read_close, METH_NOARGS , NULL},
+	{"skip",      (PyCFunction)Read_skip , METH_O     , "skip(n)\n\n"
+		"Skip the next n values without decoding them. Returns how many\n"
+		"were skipped, which is only less than n at the end."},
+	{"read_chunk",(PyCFunction)Read_read_chunk, METH_O , "read_chunk(n)\n\n"
+		"Read up to n values into a list. Only returns fewer than n values\n"
+		"at the end, so an empty list means there is nothing more to read."},
+	{"readinto",  (PyCFunction)Read_readinto, METH_VARARGS, "readinto(buffer[, mask])\n\n"
+		"Read as many values as fit into buffer (for example a numpy array)\n"
+		"in numpy format, and set mask[i] for None values if mask is given.\n"
+		"Only for fixed width types. Returns the number of values read."},
+	{"read_selected",(PyCFunction)Read_read_selected, METH_O, "read_selected(selection)\n\n"
+		"Read len(selection) values, but only return (in a list) the ones\n"
+		"where selection is true. The others are skipped without decoding.\n"
+		"Not usable with hashfilter or callback."},
+	{"where",     (PyCFunction)Read_where, METH_O    , "where(predicates)\n\n"
+		"Set predicates for read_where, a sequence of (op, value) tuples\n"
+		"(all must match). ops are ==, !=, <, <=, >, >= (never matching None),\n"
+		"in (value is a collection), isnone, notnone (no value) and startswith\n"
+		"(only for string types). Returns False if these predicates can not be\n"
+		"evaluated here (for example because value is of an unexpected type),\n"
+		"in which case read_where can not be used."},
+	{"read_where",(PyCFunction)Read_read_where, METH_O, "read_where(selection)\n\n"
+		"Check the next len(selection) values (or just the next selection\n"
+		"values if it is an int) against the predicates from where, skipping\n"
+		"unselected values. Returns (values, matched) where values is a list\n"
+		"of the matching values and matched is bytes with 1 for each match.\n"
+		"Values that don't match are never turned into python objects.\n"
+		"matched is shorter than selection at the end of the file."},
+	{NULL, NULL, 0, NULL}
+};
+
+#define MKTYPE(name)                                                 	\
+	static PyTypeObject name ## _Type = {                        	\
+		PyVarObject_HEAD_INIT(NULL, 0)                       	\
+		#name,                          /*tp_name          */	\
+		sizeof(Read),                   /*tp_basicsize     */	\
+		0,                              /*tp_itemsize      */	\
+		(destructor)Read_dealloc,       /*tp_dealloc       */	\
+		0,                              /*tp_print         */	\
+		0,                              /*tp_getattr       */	\
+		0,                              /*tp_setattr       */	\
+		0,                              /*tp_compare       */	\
+		0,                              /*tp_repr          */	\
+		0,                              /*tp_as_number     */	\
+		0,                              /*tp_as_sequence   */	\
+		0,                              /*tp_as_mapping    */	\
+		0,                              /*tp_hash          */	\
+		0,                              /*tp_call          */	\
+		0,                              /*tp_str           */	\
+		0,                              /*tp_getattro      */	\
+		0,                              /*tp_setattro      */	\
+		0,                              /*tp_as_buffer     */	\
+		Py_TPFLAGS_DEFAULT,             /*tp_flags         */	\
+		0,                              /*tp_doc           */	\
+		0,                              /*tp_traverse      */	\
+		0,                              /*tp_clear         */	\
+		0,                              /*tp_richcompare   */	\
+		0,                              /*tp_weaklistoffset*/	\
+		(getiterfunc)Read_self,         /*tp_iter          */	\
+		(iternextfunc)name ## _iternext,/*tp_iternext      */	\
+		Read_methods,                   /*tp_methods       */	\
+		r_default_members,              /*tp_members       */	\
+		0,                              /*tp_getset        */	\
+		0,                              /*tp_base          */	\
+		0,                              /*tp_dict          */	\
+		0,                              /*tp_descr_get     */	\
+		0,                              /*tp_descr_set     */	\
+		0,                              /*tp_dictoffset    */	\
+		Read_init,                      /*tp_init          */	\
+		PyType_GenericAlloc,            /*tp_alloc         */	\
+		PyType_GenericNew,              /*tp_new           */	\
+		PyObject_Del,                   /*tp_free          */	\
+		0,                              /*tp_is_gc         */	\
+	}
+static PyMemberDef r_default_members[] = {
+	{"name"      , T_STRING   , offsetof(Read, name       ), READONLY},
+	{"hashfilter", T_OBJECT_EX, offsetof(Read, hashfilter ), READONLY},
+	{0}
+};
+MKTYPE(ReadBytes);
+MKTYPE(ReadAscii);
+MKTYPE(ReadUnicode);
+MKTYPE(ReadDictUnicode);
+MKTYPE(ReadNumber);
+MKTYPE(ReadComplex64);
+MKTYPE(ReadComplex32);
+MKTYPE(ReadFloat64);
+MKTYPE(ReadFloat32);
+MKTYPE(ReadInt64);
+MKTYPE(ReadInt32);
+MKTYPE(ReadBits64);
+MKTYPE(ReadBits32);
+MKTYPE(ReadBool);
+MKTYPE(ReadDateTime);
+MKTYPE(ReadDate);
+MKTYPE(ReadTime);
+
+
+typedef union {
+	double   as_double;
+	float    as_float;
+	int32_t  as_int32_t;
+	int64_t  as_int64_t;
+	uint8_t  as_uint8_t;
+	uint32_t as_uint32_t;
+	uint64_t as_uint64_t;
+} minmax_u;
+
+// Same thing but with the larger complex64 type which isn't needed in minmax.
+typedef union {
+	double   as_double;
+	float    as_float;
+	int32_t  as_int32_t;
+	int64_t  as_int64_t;
+	uint8_t  as_uint8_t;
+	uint32_t as_uint32_t;
+	uint64_t as_uint64_t;
+	complex32 as_complex32;
+	complex64 as_complex64;
+} default_u;
+
+typedef struct write {
+	PyObject_HEAD
+	void *ctx;
+	const dsu_compressor *compressor;
+	char *name;
+	char *error_extra;
+	default_u *default_value;
+	unsigned PY_LONG_LONG count;
+	PyObject *hashfilter;
+	PyObject *compression;
+	PyObject *encoding;
+	PyObject *default_obj;
+	PyObject *min_obj;
+	PyObject *max_obj;
+	minmax_u min_u;
+	minmax_u max_u;
+	// min/max for each ZONE_ROWS values, as a list of (min, max).
+	PyObject *zones;
+	int (*zone_end)(struct write *self);
+	PyObject *zone_min_obj;
+	PyObject *zone_max_obj;
+	minmax_u zone_min_u;
+	minmax_u zone_max_u;
+	int zone_has_minmax;
+	// File offsets where each new block of ZONE_ROWS values starts.
+	PyObject *blocks;
+	unsigned PY_LONG_LONG block_start;
+	// Hashes of all values, turned into bloom_filter on close.
+	uint64_t *bloom_hashes;
+	size_t bloom_count;
+	size_t bloom_alloc;
+	PyObject *bloom_filter;
+	int bloom;
+	// Statistics, hll and hist are only allocated with stats=True.
+	unsigned PY_LONG_LONG none_count;
+	uint8_t *hll;
+	uint64_t *hist;
+	// {value: code} and the hash for each code in DictUnicode writers.
+	PyObject *dict_codes;
+	uint64_t *dict_hashes;
+	size_t dict_alloc;
+	uint64_t spread_None;
+	unsigned int sliceno;
+	unsigned int slices;
+	int closed;
+	int none_support;
+	enc_state enc;
+	int len;
+	char buf[Z];
+} Write;
+
+static char * const default_error_extra = "";
+
+static int Write_ensure_open(Write *self)
+{
+	if (self->ctx) return 0;
+	if (self->closed) {
+		(void) err_closed();
+		return 1;
+	}
+	int fd = open(self->name, O_WRONLY | O_CREAT | O_TRUNC, 0666);
+	if (fd < 0) {
+		PyErr_SetFromErrnoWithFilename(PyExc_IOError, self->name);
+		return 1;
+	}
+	self->ctx = self->compressor->write_open(fd, 0);
+	if (!self->ctx) {
+		close(fd);
+		PyErr_Format(PyExc_IOError, "failed to init compression for \"%s\"", self->name);
+		return 1;
+	}
+	return 0;
+}
+
+static int Write_rle_flush(Write *self)
+{
+	enc_state *enc = &self->enc;
+	const int len = enc->buf_len;
+	enc->buf_len = 0;
+	return len && self->compressor->write(self->ctx, enc->buf, len);
+}
+
+// Writes the pending run (if any) to enc->buf.
+static int Write_rle_end_run(Write *self)
+{
+	enc_state *enc = &self->enc;
+	const int size = enc->itemsize;
+	if (!enc->run_len) return 0;
+	if (enc->buf_len + size * 2 + 4 > Z && Write_rle_flush(self)) return 1;
+	memcpy(enc->buf + enc->buf_len, enc->run_value, size);
+	enc->buf_len += size;
+	if (enc->run_len > 1) {
+		const uint32_t repeats = enc->run_len - 2;
+		memcpy(enc->buf + enc->buf_len, enc->run_value, size);
+		memcpy(enc->buf + enc->buf_len + size, &repeats, 4);
+		enc->buf_len += size + 4;
+	}
+	enc->run_len = 0;
+	return 0;
+}
+
+// compressor->write, but encodes first (which may clobber buf).
+static int Write_compress(Write *self, char *buf, int len)
+{
+	enc_state *enc = &self->enc;
+	const int size = enc->itemsize;
+	if (enc->encoding == ENC_DELTA) {
+		for (int pos = 0; pos < len; pos += size) {
+			const uint64_t v = enc_load(buf + pos, size);
+			enc_store(buf + pos, v - enc->prev, size);
+			enc->prev = v;
+		}
+	} else if (enc->encoding == ENC_RLE) {
+		for (int pos = 0; pos < len; pos += size) {
+			if (enc->run_len && !memcmp(enc->run_value, buf + pos, size)) {
+				enc->run_len++;
+			} else {
+				if (Write_rle_end_run(self)) return 1;
+				memcpy(enc->run_value, buf + pos, size);
+				enc->run_len = 1;
+			}
+		}
+		return 0;
+	}
+	return self->compressor->write(self->ctx, buf, len);
+}
+
+// Before a restart (or close), all data must be out of the encoder.
+static int Write_enc_finish(Write *self)
+{
+	int err = 0;
+	if (self->enc.encoding == ENC_RLE) {
+		err = Write_rle_end_run(self) || Write_rle_flush(self);
+	}
+	enc_restart(&self->enc);
+	if (err) PyErr_SetString(PyExc_IOError, "Write failed");
+	return err;
+}
+
+static int Write_flush_(Write *self)
+{
+	if (!self->len) return 0;
+	if (Write_ensure_open(self)) return 1;
+	const int len = self->len;
+	self->len = 0;
+	if (Write_compress(self, self->buf, len)) {
+		PyErr_SetString(PyExc_IOError, "Write failed");
+		return 1;
+	}
+	return 0;
+}
+
+static PyObject *Write_flush(Write *self)
 {
 	if (Write_ensure_open(self)) return 0;
 	if (Write_flush_(self)) return 0;
 	Py_RETURN_NONE;
 }
 
+// Every ZONE_ROWS values the compression is restarted and the offset saved
+// in blocks, so readers can seek straight to any block.
+// DictUnicode writers also forget their values, and write a DICT_RESET
+// code so sequential readers do the same.
+static int Write_block_check(Write *self, unsigned PY_LONG_LONG row)
+{
+	if (row < self->block_start + ZONE_ROWS) return 0;
+	self->block_start = row;
+	if (Write_ensure_open(self) || Write_flush_(self)) return 1;
+	if (Write_enc_finish(self)) return 1;
+	if (!self->blocks) {
+		self->blocks = PyList_New(0);
+		if (!self->blocks) return 1;
+	}
+	const off_t pos = self->compressor->restart(self->ctx);
+	if (pos < 0) {
+		PyErr_SetString(PyExc_IOError, "Write failed");
+		return 1;
+	}
+	PyObject *o_pos = PyLong_FromLongLong(pos);
+	if (!o_pos) return 1;
+	int res = PyList_Append(self->blocks, o_pos);
+	Py_DECREF(o_pos);
+	if (res) return 1;
+	if (self->dict_codes && PyDict_Size(self->dict_codes)) {
+		PyDict_Clear(self->dict_codes);
+		self->buf[self->len++] = (char)DICT_RESET;
+	}
+	return 0;
+}
+
+static int Write_zone_append(Write *self, PyObject *min_obj, PyObject *max_obj)
+{
+	if (PyErr_Occurred()) goto err;
+	if (!self->zones) {
+		self->zones = PyList_New(0);
+		if (!self->zones) goto err;
+	}
+	PyObject *zone = Py_BuildValue("(OO)", min_obj ? min_obj : Py_None, max_obj ? max_obj : Py_None);
+	Py_XDECREF(min_obj);
+	Py_XDECREF(max_obj);
+	if (!zone) return 1;
+	int res = PyList_Append(self->zones, zone);
+	Py_DECREF(zone);
+	return res;
+err:
+	Py_XDECREF(min_obj);
+	Py_XDECREF(max_obj);
+	return 1;
+}
+
+// Bits set per value in bloom filters.
+#define BLOOM_K 7
+
+// The hash is used for slicing too, so the low bits are the same for all
+// values in a hashed slice. Mix it so all bits are usable.
+static inline uint64_t bloom_mix(uint64_t h)
+{
+	h ^= h >> 33;
+	h *= 0xff51afd7ed558ccdULL;
+	h ^= h >> 33;
+	h *= 0xc4ceb9fe1a85ec53ULL;
+	h ^= h >> 33;
+	return h;
+}
+
+// Sets (or checks if set) the bits for h, bits must be a power of two.
+static inline int bloom_bits(unsigned char *data, uint64_t bits, uint64_t h, int set)
+{
+	h = bloom_mix(h);
+	const uint64_t step = (h >> 32) | 1;
+	for (int i = 0; i < BLOOM_K; i++) {
+		const uint64_t bit = h & (bits - 1);
+		const unsigned char mask = 1 << (bit & 7);
+		if (set) {
+			data[bit >> 3] |= mask;
+		} else if (!(data[bit >> 3] & mask)) {
+			return 0;
+		}
+		h += step;
+	}
+	return 1;
+}
+
+static int Write_bloom_add(Write *self, uint64_t h)
+{
+	if (self->bloom_count == self->bloom_alloc) {
+		size_t alloc = self->bloom_alloc ? self->bloom_alloc * 2 : 1024;
+		uint64_t *hashes = realloc(self->bloom_hashes, alloc * sizeof(*hashes));
+		if (!hashes) {
+			PyErr_NoMemory();
+			return 1;
+		}
+		self->bloom_hashes = hashes;
+		self->bloom_alloc = alloc;
+	}
+	self->bloom_hashes[self->bloom_count++] = h;
+	return 0;
+}
+
+#define BLOOM_ADD(h) do {                                                         	\
+		if (self->bloom && Write_bloom_add(self, (h))) return 0;          	\
+	} while (0)
+
+// About 10 bits per value, which gives about 1% false positives.
+static int Write_bloom_finish(Write *self)
+{
+	if (!self->bloom || self->bloom_filter) return 0;
+	uint64_t bits = 64;
+	while (bits < (uint64_t)self->bloom_count * 10 && bits < ((uint64_t)1 << 36)) {
+		bits <<= 1;
+	}
+	PyObject *filter = PyBytes_FromStringAndSize(0, bits / 8);
+	if (!filter) return 1;
+	unsigned char *data = (unsigned char *)PyBytes_AS_STRING(filter);
+	memset(data, 0, bits / 8);
+	for (size_t i = 0; i < self->bloom_count; i++) {
+		bloom_bits(data, bits, self->bloom_hashes[i], 1);
+	}
+	free(self->bloom_hashes);
+	self->bloom_hashes = 0;
+	self->bloom_count = self->bloom_alloc = 0;
+	self->bloom_filter = filter;
+	return 0;
+}
+
+// HyperLogLog registers for the approximate distinct count, 2**HLL_BITS
+// of them gives about 3% error.
+#define HLL_BITS 10
+
+static inline void hll_add(uint8_t *hll, uint64_t h)
+{
+	h = bloom_mix(h);
+	const unsigned int ix = h >> (64 - HLL_BITS);
+	uint64_t w = h << HLL_BITS;
+	uint8_t rank = 1;
+	while (rank <= 64 - HLL_BITS && !(w & 0x8000000000000000ULL)) {
+		rank++;
+		w <<= 1;
+	}
+	if (rank > hll[ix]) hll[ix] = rank;
+}
+
+// Hashes a (non-None) value for both the bloom filter and the HLL.
+#define HASH_ADD(h) do {                                                          	\
+		if (self->bloom || self->hll) {                                   	\
+			const uint64_t h_ = (h);                                  	\
+			BLOOM_ADD(h_);                                            	\
+			if (self->hll) hll_add(self->hll, h_);                    	\
+		}                                                                 	\
+	} while (0)
+
+// Histogram over the (float) exponent of values, sign * (exponent + HIST_E + 1)
+// is the bin, 0 for zero. Exponents are clamped to +-HIST_E.
+#define HIST_E    64
+#define HIST_HALF (2 * HIST_E + 1)
+#define HIST_SIZE (2 * HIST_HALF + 1)
+
+static void Write_hist_add(Write *self, double v)
+{
+	if (isnan(v)) return;
+	int bin = 0;
+	if (v != 0) {
+		int e = HIST_E;
+		if (!isinf(v)) {
+			(void) frexp(v, &e);
+			if (e < -HIST_E) e = -HIST_E;
+			if (e > HIST_E) e = HIST_E;
+		}
+		bin = e + HIST_E + 1;
+		if (v < 0) bin = -bin;
+	}
+	self->hist[HIST_HALF + bin]++;
+}
+
+static int Write_stats_init(Write *self, int stats, int hist)
+{
+	if (!stats) return 0;
+	self->hll = calloc(1 << HLL_BITS, 1);
+	if (!self->hll) goto err;
+	if (hist) {
+		self->hist = calloc(HIST_SIZE, sizeof(*self->hist));
+		if (!self->hist) goto err;
+	}
+	return 0;
+err:
+	PyErr_NoMemory();
+	return 1;
+}
+
+// (none_count, hll_registers, {bin: count} or None), or None without stats=True.
+static PyObject *Write_stats(Write *self)
+{
+	if (!self->hll) Py_RETURN_NONE;
+	PyObject *hist;
+	if (self->hist) {
+		hist = PyDict_New();
+		if (!hist) return 0;
+		for (int i = 0; i < HIST_SIZE; i++) {
+			if (!self->hist[i]) continue;
+			PyObject *k = PyInt_FromLong(i - HIST_HALF);
+			PyObject *v = pyInt_FromU64(self->hist[i]);
+			int err = (!k || !v || PyDict_SetItem(hist, k, v));
+			Py_XDECREF(k);
+			Py_XDECREF(v);
+			if (err) {
+				Py_DECREF(hist);
+				return 0;
+			}
+		}
+	} else {
+		hist = Py_None;
+		Py_INCREF(hist);
+	}
+	PyObject *hll = PyBytes_FromStringAndSize((char *)self->hll, 1 << HLL_BITS);
+	if (!hll) {
+		Py_DECREF(hist);
+		return 0;
+	}
+	return Py_BuildValue("(KNN)", self->none_count, hll, hist);
+}
+
+// Call after count++, ends the zone if it is full.
+#define ZONE_CHECK do {                                                          		if (self->zone_end && !(self->count % ZONE_ROWS) && self->zone_end(self)) {			return 0;                                                        		}                                                                        	} while (0)
+
+// End the last (partial) zone, unless it's already done.
+static int Write_zone_finish(Write *self)
+{
+	if (!self->zone_end) return 0;
+	Py_ssize_t done = self->zones ? PyList_GET_SIZE(self->zones) : 0;
+	if ((PY_LONG_LONG)done * ZONE_ROWS >= (PY_LONG_LONG)self->count) return 0;
+	return self->zone_end(self);
+}
+
 static int Write_close_(Write *self)
 {
 	if (self->closed) return 1;
+	if (Write_zone_finish(self)) return 1;
+	if (Write_bloom_finish(self)) return 1;
 	if (!self->ctx) return 0;
 	int err = Write_flush_(self);
+	err |= Write_enc_finish(self);
 	err |= self->compressor->write_close(self->ctx);
 	self->ctx = 0;
 	self->closed = 1;
@@ -1071,26 +2289,30 @@ static int init_WriteBlob(PyObject *self_, PyObject *args, PyObject *kwds)
 	char *name = 0;
 	char *error_extra = default_error_extra;
 	PyObject *hashfilter = 0;
+	int stats = 0;
 	if (self->name) {
 		PyErr_Format(PyExc_RuntimeError, "Can't re-init %s", Py_TYPE(self)->tp_name);
 		goto err;
 	}
 	static char *kwlist[] = {
 		"name", "compression", "default", "hashfilter",
-		"error_extra", "none_support", 0
+		"error_extra", "none_support", "bloom", "stats", 0
 	};
 	if (!PyArg_ParseTupleAndKeywords(
-		args, kwds, "et|OOOeti", kwlist,
+		args, kwds, "et|OOOetiii", kwlist,
 		Py_FileSystemDefaultEncoding, &name,
 		&compression,
 		&default_obj,
 		&hashfilter,
 		Py_FileSystemDefaultEncoding, &error_extra,
-		&self->none_support
+		&self->none_support,
+		&self->bloom,
+		&stats
 	)) return -1;
 	self->name = name;
 	self->error_extra = error_extra;
 	err1(Write_parse_compression(self, compression));
+	err1(Write_stats_init(self, stats, 0));
 	err1(parse_hashfilter(hashfilter, &self->hashfilter, &self->sliceno, &self->slices, &self->spread_None));
 	if (default_obj) {
 		if (default_obj == Py_None && !self->none_support) {
@@ -1115,6 +2337,7 @@ err:
 #define init_WriteBytes   init_WriteBlob
 #define init_WriteAscii   init_WriteBlob
 #define init_WriteUnicode init_WriteBlob
+#define init_WriteDictUnicode init_WriteBlob
 
 static void Write_dealloc(Write *self)
 {
@@ -1127,6 +2350,18 @@ static void Write_dealloc(Write *self)
 	Py_CLEAR(self->default_obj);
 	Py_CLEAR(self->min_obj);
 	Py_CLEAR(self->max_obj);
+	Py_CLEAR(self->zones);
+	Py_CLEAR(self->zone_min_obj);
+	Py_CLEAR(self->zone_max_obj);
+	Py_CLEAR(self->blocks);
+	Py_CLEAR(self->bloom_filter);
+	if (self->bloom_hashes) free(self->bloom_hashes);
+	if (self->hll) free(self->hll);
+	if (self->hist) free(self->hist);
+	if (self->enc.buf) free(self->enc.buf);
+	Py_CLEAR(self->encoding);
+	Py_CLEAR(self->dict_codes);
+	if (self->dict_hashes) free(self->dict_hashes);
 	PyObject_Del(self);
 }
 
@@ -1144,12 +2379,16 @@ static PyObject *Write_self(Write *self)
 	return (PyObject *)self;
 }
 
+// Call after count++ (for the value being written).
 static PyObject *Write_write_(Write *self, const char *data, Py_ssize_t len)
 {
+	if (self->count && Write_block_check(self, self->count - 1)) return 0;
 	if (len + self->len > Z) {
 		if (Write_flush_(self)) return 0;
 	}
+	if (len > Z && Write_ensure_open(self)) return 0;
 	while (len > Z) {
+		// Only for variable width types, so never encoded.
 		if (self->compressor->write(self->ctx, data, Z)) {
 			PyErr_SetString(PyExc_IOError, "Write failed");
 			return 0;
@@ -1261,6 +2500,8 @@ static PyObject *hash_WriteUnicode(PyObject *dummy, PyObject *obj)
 #define WRITEBLOBPROLOGUE(checktype, errname) \
 	if (obj == Py_None) {                                                         	\
 		WRITE_NONE_SLICE_CHECK;                                               	\
+		BLOOM_ADD(0);                                                         	\
+		self->none_count++;                                                   	\
 		self->count++;                                                        	\
 		return Write_write_(self, "\xff\x00\x00\x00\x00", 5);                 	\
 	}                                                                             	\
@@ -1284,16 +2525,25 @@ static PyObject *hash_WriteUnicode(PyObject *dummy, PyObject *obj)
 		cleanup;                                                              	\
 		Py_RETURN_TRUE;                                                       	\
 	}                                                                             	\
+	if (self->bloom || self->hll) {                                               	\
+		const uint64_t h_ = hash(data, len);                                  	\
+		if (self->hll) hll_add(self->hll, h_);                                	\
+		if (self->bloom && Write_bloom_add(self, h_)) {                       	\
+			cleanup;                                                      	\
+			return 0;                                                     	\
+		}                                                                     	\
+	}                                                                             	\
+	if (len > 0x7fffffff) {                                                       	\
+		cleanup;                                                              	\
+		PyErr_Format(PyExc_ValueError, "Value too large%s", self->error_extra); \
+		return 0;                                                             	\
+	}                                                                             	\
+	self->count++;                                                                	\
 	PyObject *ret;                                                                	\
 	if (len < 255) {                                                              	\
 		uint8_t short_len = len;                                              	\
 		ret = Write_write_(self, (char *)&short_len, 1);                      	\
 	} else {                                                                      	\
-		if (len > 0x7fffffff) {                                               	\
-			cleanup;                                                      	\
-			PyErr_Format(PyExc_ValueError, "Value too large%s", self->error_extra); \
-			return 0;                                                     	\
-		}                                                                     	\
 		uint32_t long_len = len;                                              	\
 		uint8_t lenbuf[5];                                                    	\
 		lenbuf[0] = 255;                                                      	\
@@ -1307,8 +2557,6 @@ static PyObject *hash_WriteUnicode(PyObject *dummy, PyObject *obj)
 	Py_DECREF(ret);                                                               	\
 	ret = Write_write_(self, data, len);                                          	\
 	cleanup;                                                                      	\
-	if (!ret) return 0;                                                           	\
-	self->count++;                                                                	\
 	return ret;
 
 #define ASCIIBLOBDO(cleanup) \
@@ -1363,6 +2611,127 @@ MKWBLOB(Bytes);
 MKWBLOB(Ascii);
 MKWBLOB(Unicode);
 
+static PyObject *Write_dict_new(Write *self, PyObject *obj, const char *data, Py_ssize_t len, uint64_t h)
+{
+	const Py_ssize_t ix = PyDict_Size(self->dict_codes);
+	if (ix >= 0xfffffff0) {
+		PyErr_Format(PyExc_ValueError, "Too many different values%s", self->error_extra);
+		return 0;
+	}
+	if ((size_t)ix == self->dict_alloc) {
+		size_t alloc = self->dict_alloc ? self->dict_alloc * 2 : 64;
+		uint64_t *hashes = realloc(self->dict_hashes, alloc * sizeof(*hashes));
+		if (!hashes) return PyErr_NoMemory();
+		self->dict_hashes = hashes;
+		self->dict_alloc = alloc;
+	}
+	if (len > 0x7fffffff) {
+		PyErr_Format(PyExc_ValueError, "Value too large%s", self->error_extra);
+		return 0;
+	}
+	PyObject *o_code = PyInt_FromLong(ix + DICT_BASE);
+	if (!o_code) return 0;
+	int err = PyDict_SetItem(self->dict_codes, obj, o_code);
+	Py_DECREF(o_code);
+	if (err) return 0;
+	self->dict_hashes[ix] = h;
+	self->count++;
+	uint8_t head[6];
+	int head_len;
+	head[0] = DICT_NEW;
+	if (len < 255) {
+		head[1] = len;
+		head_len = 2;
+	} else {
+		uint32_t long_len = len;
+		head[1] = 255;
+		memcpy(head + 2, &long_len, 4);
+		head_len = 6;
+	}
+	PyObject *ret = Write_write_(self, (char *)head, head_len);
+	if (!ret) return 0;
+	Py_DECREF(ret);
+	return Write_write_(self, data, len);
+}
+
+static PyObject *C_WriteDictUnicode(Write *self, PyObject *obj, int actually_write)
+{
+	if (obj == Py_None) {
+		WRITE_NONE_SLICE_CHECK;
+		BLOOM_ADD(0);
+		self->none_count++;
+		self->count++;
+		return Write_write_(self, "\x00", 1);
+	}
+	if (!PyUnicode_Check(obj)) {
+		PyErr_Format(PyExc_TypeError,
+		             "For your protection, only " UNICODE_NAME
+		             " objects are accepted%s (line %llu)",
+		             self->error_extra,
+		             (unsigned long long) self->count + 1);
+		return 0;
+	}
+	if (!self->dict_codes) {
+		self->dict_codes = PyDict_New();
+		if (!self->dict_codes) return 0;
+	}
+	// Before looking up the code, the dict is forgotten in new blocks.
+	if (actually_write && Write_block_check(self, self->count)) return 0;
+	PyObject *o_code = PyDict_GetItem(self->dict_codes, obj);
+	if (!o_code) {
+		PyObject *ret = 0;
+#if PY_MAJOR_VERSION < 3
+		PyObject *strobj = PyUnicode_AsUTF8String(obj);
+		if (!strobj) return 0;
+		const char *data = PyBytes_AS_STRING(strobj);
+		const Py_ssize_t len = PyBytes_GET_SIZE(strobj);
+#else
+		Py_ssize_t len;
+		const char *data = PyUnicode_AsUTF8AndSize(obj, &len);
+		if (!data) return 0;
+#endif
+		const uint64_t h = hash(data, len);
+		if (self->slices && h % self->slices != self->sliceno) {
+			ret = Py_False;
+			Py_INCREF(ret);
+		} else if (!actually_write) {
+			ret = Py_True;
+			Py_INCREF(ret);
+		} else {
+			if (self->hll) hll_add(self->hll, h);
+			if (!self->bloom || !Write_bloom_add(self, h)) {
+				ret = Write_dict_new(self, obj, data, len, h);
+			}
+		}
+#if PY_MAJOR_VERSION < 3
+		Py_DECREF(strobj);
+#endif
+		return ret;
+	}
+	const uint32_t code = PyInt_AsLong(o_code);
+	const uint64_t h = self->dict_hashes[code - DICT_BASE];
+	if (self->slices && h % self->slices != self->sliceno) Py_RETURN_FALSE;
+	if (!actually_write) Py_RETURN_TRUE;
+	HASH_ADD(h);
+	self->count++;
+	if (code < 0xfd) {
+		const uint8_t code8 = code;
+		return Write_write_(self, (char *)&code8, 1);
+	}
+	uint8_t buf[5];
+	if (code <= 0xffff) {
+		const uint16_t code16 = code;
+		buf[0] = 0xfd;
+		memcpy(buf + 1, &code16, 2);
+		return Write_write_(self, (char *)buf, 3);
+	}
+	buf[0] = 0xfe;
+	memcpy(buf + 1, &code, 4);
+	return Write_write_(self, (char *)buf, 5);
+}
+MKWBLOB(DictUnicode);
+#define hash_WriteDictUnicode hash_WriteUnicode
+
 
 static inline uint64_t minmax_value_datetime(uint64_t value) {
 	/* My choice to use 2x u32 comes back to bite me. */
@@ -1398,7 +2767,14 @@ MK_MINMAX_SET(Time    , unfmt_time((*(uint64_t *)cmp_value) >> 32, *(uint64_t *)
 	}                                                                                    	\
 	if (!self->max_obj || (cmp_value > self->max_u.as_ ## T)) {                          	\
 		minmax_set(&self->max_obj, obj, &self->max_u, &cmp_value, sizeof(cmp_value));	\
-	}
+	}                                                                                    	\
+	if (!self->zone_has_minmax || (cmp_value < self->zone_min_u.as_ ## T)) {             	\
+		self->zone_min_u.as_ ## T = cmp_value;                                       	\
+	}                                                                                    	\
+	if (!self->zone_has_minmax || (cmp_value > self->zone_max_u.as_ ## T)) {             	\
+		self->zone_max_u.as_ ## T = cmp_value;                                       	\
+	}                                                                                    	\
+	self->zone_has_minmax = 1;
 #define MINMAX_FLOAT(T, v, minmax_set)                                                       	\
 	T cmp_value = v;                                                                     	\
 	T min_value = self->min_u.as_ ## T;                                                  	\
@@ -1408,15 +2784,56 @@ MK_MINMAX_SET(Time    , unfmt_time((*(uint64_t *)cmp_value) >> 32, *(uint64_t *)
 	}                                                                                    	\
 	if (!self->max_obj || (cmp_value > max_value) || isnan(max_value)) {                 	\
 		minmax_set(&self->max_obj, obj, &self->max_u, &cmp_value, sizeof(cmp_value));	\
-	}
+	}                                                                                    	\
+	min_value = self->zone_min_u.as_ ## T;                                               	\
+	max_value = self->zone_max_u.as_ ## T;                                               	\
+	if (!self->zone_has_minmax || (cmp_value < min_value) || isnan(min_value)) {         	\
+		self->zone_min_u.as_ ## T = cmp_value;                                       	\
+	}                                                                                    	\
+	if (!self->zone_has_minmax || (cmp_value > max_value) || isnan(max_value)) {         	\
+		self->zone_max_u.as_ ## T = cmp_value;                                       	\
+	}                                                                                    	\
+	self->zone_has_minmax = 1;
 #define MINMAX_DUMMY(T, v, minmax_set) /* Nothing */
 
-#define MKWRITER_C(tname, T, HT, conv, withnone, errchk, do_minmax, minmax_value, minmax_set, hash) \
+// Functions to end a zone, for the types with minmax.
+#define ZONE_END_STD(tname, T, minmax_set)                                              	\
+	static int zone_end_ ## tname(Write *self)                                      	\
+	{                                                                               	\
+		PyObject *min_obj = 0;                                                  	\
+		PyObject *max_obj = 0;                                                  	\
+		minmax_u dummy;                                                         	\
+		if (self->zone_has_minmax) {                                            	\
+			minmax_set(&min_obj, 0, &dummy, &self->zone_min_u, sizeof(T));  	\
+			minmax_set(&max_obj, 0, &dummy, &self->zone_max_u, sizeof(T));  	\
+		}                                                                       	\
+		self->zone_has_minmax = 0;                                              	\
+		return Write_zone_append(self, min_obj, max_obj);                       	\
+	}
+#define ZONE_END_MINMAX_STD(tname, T, minmax_set) ZONE_END_STD(tname, T, minmax_set)
+#define ZONE_END_MINMAX_FLOAT(tname, T, minmax_set) ZONE_END_STD(tname, T, minmax_set)
+#define ZONE_END_MINMAX_DUMMY(tname, T, minmax_set) /* Nothing */
+#define ZONE_END_FUNC_MINMAX_STD(tname) zone_end_ ## tname
+#define ZONE_END_FUNC_MINMAX_FLOAT(tname) zone_end_ ## tname
+#define ZONE_END_FUNC_MINMAX_DUMMY(tname) 0
+
+// do_hist is HIST_NUM for the numeric types, where write-time stats include
+// a histogram, and HIST_DUMMY for the rest.
+#define HIST_NUM(v) if (self->hist) Write_hist_add(self, (double)(v));
+#define HIST_DUMMY(v) /* Nothing */
+#define HIST_WANTED_HIST_NUM 1
+#define HIST_WANTED_HIST_DUMMY 0
+
+#define ENC_SIZE_ENC_OK(T) sizeof(T)
+#define ENC_SIZE_ENC_NO(T) 0
+
+#define MKWRITER_C(tname, T, HT, conv, withnone, errchk, do_minmax, minmax_value, minmax_set, hash, do_hist, do_enc) \
+	ZONE_END_ ## do_minmax(tname, T, minmax_set)                                     	\
 	static int init_ ## tname(PyObject *self_, PyObject *args, PyObject *kwds)       	\
 	{                                                                                	\
 		static char *kwlist[] = {                                                	\
 			"name", "compression", "default", "hashfilter",                  	\
-			"error_extra", "none_support", 0                                 	\
+			"error_extra", "none_support", "bloom", "stats", "encoding", 0   	\
 		};                                                                       	\
 		Write *self = (Write *)self_;                                            	\
 		char *name = 0;                                                          	\
@@ -1424,18 +2841,23 @@ MK_MINMAX_SET(Time    , unfmt_time((*(uint64_t *)cmp_value) >> 32, *(uint64_t *)
 		PyObject *compression = 0;                                               	\
 		PyObject *default_obj = 0;                                               	\
 		PyObject *hashfilter = 0;                                                	\
+		int stats = 0;                                                           	\
+		PyObject *encoding = 0;                                                  	\
 		if (self->name) {                                                        	\
 			PyErr_Format(PyExc_RuntimeError, "Can't re-init %s", Py_TYPE(self)->tp_name); \
 			goto err;                                                        	\
 		}                                                                        	\
 		if (!PyArg_ParseTupleAndKeywords(                                        	\
-			args, kwds, "et|OOOeti", kwlist,                                 	\
+			args, kwds, "et|OOOetiiiO", kwlist,                              	\
 			Py_FileSystemDefaultEncoding, &name,                             	\
 			&compression,                                                    	\
 			&default_obj,                                                    	\
 			&hashfilter,                                                     	\
 			Py_FileSystemDefaultEncoding, &error_extra,                      	\
-			&self->none_support                                              	\
+			&self->none_support,                                             	\
+			&self->bloom,                                                    	\
+			&stats,                                                          	\
+			&encoding                                                        	\
 		)) return -1;                                                            	\
 		if (!withnone && self->none_support) {                                   	\
 			PyErr_Format(PyExc_ValueError, "%s objects don't support None values%s", self_->ob_type->tp_name, error_extra); \
@@ -1443,7 +2865,12 @@ MK_MINMAX_SET(Time    , unfmt_time((*(uint64_t *)cmp_value) >> 32, *(uint64_t *)
 		}                                                                        	\
 		self->name = name;                                                       	\
 		self->error_extra = error_extra;                                         	\
+		self->zone_end = ZONE_END_FUNC_ ## do_minmax(tname);                     	\
 		err1(Write_parse_compression(self, compression));                        	\
+		err1(Write_stats_init(self, stats, HIST_WANTED_ ## do_hist));            	\
+		err1(parse_encoding(&self->enc, encoding, ENC_SIZE_ ## do_enc(T), Py_TYPE(self)->tp_name)); \
+		self->encoding = encoding_obj(&self->enc);                               	\
+		err1(!self->encoding);                                                   	\
 		if (default_obj) {                                                       	\
 			T value;                                                         	\
 			Py_INCREF(default_obj);                                          	\
@@ -1470,12 +2897,45 @@ MK_MINMAX_SET(Time    , unfmt_time((*(uint64_t *)cmp_value) >> 32, *(uint64_t *)
 err:                                                                                     	\
 		return -1;                                                               	\
 	}                                                                                	\
+	/* obj is value as a python object, or 0 (only used for min/max). */            	\
+	static PyObject *Cv_ ## tname(Write *self, T value, PyObject *obj, int actually_write) \
+	{                                                                                	\
+		if (self->slices) {                                                      	\
+			const HT h_value = value;                                        	\
+			const unsigned int sliceno = hash(&h_value) % self->slices;      	\
+			if (sliceno != self->sliceno) Py_RETURN_FALSE;                   	\
+		}                                                                        	\
+		if (!actually_write) Py_RETURN_TRUE;                                     	\
+		if (self->bloom) {                                                       	\
+			const HT h_value = value;                                        	\
+			BLOOM_ADD(hash(&h_value));                                       	\
+		}                                                                        	\
+		if (self->hll) {                                                         	\
+			/* hll_add mixes the bits, so small values need no real hash. */	\
+			const HT h_value = value;                                        	\
+			uint64_t h = 0;                                                  	\
+			if (sizeof(HT) <= sizeof(h)) {                                   	\
+				memcpy(&h, &h_value, sizeof(HT) < sizeof(h) ? sizeof(HT) : sizeof(h)); \
+			} else {                                                         	\
+				h = hash(&h_value);                                      	\
+			}                                                                	\
+			hll_add(self->hll, h);                                           	\
+		}                                                                        	\
+		do_hist(value)                                                           	\
+		do_minmax(T, minmax_value(value), minmax_set)                            	\
+		self->count++;                                                           	\
+		ZONE_CHECK;                                                              	\
+		return Write_write_(self, (char *)&value, sizeof(value));                	\
+	}                                                                                	\
 	static PyObject *C_ ## tname(Write *self, PyObject *obj, int actually_write)     	\
 	{                                                                                	\
 		if (withnone && obj == Py_None && (self->none_support || !self->default_value)) { \
 is_none:                                                                                 	\
 			WRITE_NONE_SLICE_CHECK;                                          	\
+			BLOOM_ADD(0);                                                    	\
+			self->none_count++;                                              	\
 			self->count++;                                                   	\
+			ZONE_CHECK;                                                      	\
 			return Write_write_(self, (char *)&noneval_ ## T, sizeof(T));    	\
 		}                                                                        	\
 		T value = conv(obj);                                                     	\
@@ -1496,15 +2956,17 @@ is_none:
 			value = self->default_value->as_ ## T;                           	\
 			obj = self->default_obj;                                         	\
 		}                                                                        	\
-		if (self->slices) {                                                      	\
-			const HT h_value = value;                                        	\
-			const unsigned int sliceno = hash(&h_value) % self->slices;      	\
-			if (sliceno != self->sliceno) Py_RETURN_FALSE;                   	\
+		return Cv_ ## tname(self, value, obj, actually_write);                   	\
+	}                                                                                	\
+	/* One value from a buffer in write_array, None-markers are None. */             	\
+	static inline PyObject *array_ ## tname(Write *self, const char *ptr)            	\
+	{                                                                                	\
+		T value;                                                                 	\
+		memcpy(&value, ptr, sizeof(T));                                          	\
+		if (withnone && !memcmp(&value, &noneval_ ## T, sizeof(T))) {            	\
+			return C_ ## tname(self, Py_None, 1);                            	\
 		}                                                                        	\
-		if (!actually_write) Py_RETURN_TRUE;                                     	\
-		do_minmax(T, minmax_value(value), minmax_set)                            	\
-		self->count++;                                                           	\
-		return Write_write_(self, (char *)&value, sizeof(value));                	\
+		return Cv_ ## tname(self, value, 0, 1);                                  	\
 	}                                                                                	\
 	static PyObject *write_ ## tname(Write *self, PyObject *obj)                     	\
 	{                                                                                	\
@@ -1532,8 +2994,8 @@ is_none:
 		return pyInt_FromU64(h);                                                 	\
 	}
 
-#define MKWRITER(tname, T, HT, conv, withnone, minmax_value, minmax_set, hash) \
-	MKWRITER_C(tname, T, HT, conv, withnone, value == (T)-1, MINMAX_STD, minmax_value, minmax_set, hash)
+#define MKWRITER(tname, T, HT, conv, withnone, minmax_value, minmax_set, hash, do_hist) \
+	MKWRITER_C(tname, T, HT, conv, withnone, value == (T)-1, MINMAX_STD, minmax_value, minmax_set, hash, do_hist, ENC_OK)
 
 #if PY_MAJOR_VERSION < 3
 // Passing a non-int object to some of the As functions in py2 gives
@@ -1626,15 +3088,15 @@ static inline complex32 pyComplex_AsCComplex32(PyObject *obj)
 	return v;
 }
 
-MKWRITER_C(WriteComplex64, complex64, complex64, PyComplex_AsCComplex  , 1, value.real == -1.0, MINMAX_DUMMY, ,                   , hash_complex64);
-MKWRITER_C(WriteComplex32, complex32, complex32, pyComplex_AsCComplex32, 1, value.real == -1.0, MINMAX_DUMMY, ,                   , hash_complex32);
-MKWRITER_C(WriteFloat64  , double   , double   , PyFloat_AsDouble      , 1, value == -1.0     , MINMAX_FLOAT, , minmax_set_Float64, hash_double   );
-MKWRITER_C(WriteFloat32  , float    , double   , PyFloat_AsDouble      , 1, value == -1.0     , MINMAX_FLOAT, , minmax_set_Float32, hash_double   );
-MKWRITER(WriteInt64      , int64_t  , int64_t  , pyLong_AsS64          , 1,                                   , minmax_set_Int64  , hash_int64    );
-MKWRITER(WriteInt32      , int32_t  , int64_t  , pyLong_AsS32          , 1,                                   , minmax_set_Int32  , hash_int64    );
-MKWRITER(WriteBits64     , uint64_t , uint64_t , pyLong_AsU64          , 0,                                   , minmax_set_Bits64 , hash_uint64   );
-MKWRITER(WriteBits32     , uint32_t , uint64_t , pyLong_AsU32          , 0,                                   , minmax_set_Bits32 , hash_uint64   );
-MKWRITER(WriteBool       , uint8_t  , uint8_t  , pyLong_AsBool         , 1,                                   , minmax_set_Bool   , hash_bool     );
+MKWRITER_C(WriteComplex64, complex64, complex64, PyComplex_AsCComplex  , 1, value.real == -1.0, MINMAX_DUMMY, ,                   , hash_complex64, HIST_DUMMY, ENC_NO);
+MKWRITER_C(WriteComplex32, complex32, complex32, pyComplex_AsCComplex32, 1, value.real == -1.0, MINMAX_DUMMY, ,                   , hash_complex32, HIST_DUMMY, ENC_NO);
+MKWRITER_C(WriteFloat64  , double   , double   , PyFloat_AsDouble      , 1, value == -1.0     , MINMAX_FLOAT, , minmax_set_Float64, hash_double   , HIST_NUM  , ENC_NO);
+MKWRITER_C(WriteFloat32  , float    , double   , PyFloat_AsDouble      , 1, value == -1.0     , MINMAX_FLOAT, , minmax_set_Float32, hash_double   , HIST_NUM  , ENC_NO);
+MKWRITER(WriteInt64      , int64_t  , int64_t  , pyLong_AsS64          , 1,                                   , minmax_set_Int64  , hash_int64    , HIST_NUM  );
+MKWRITER(WriteInt32      , int32_t  , int64_t  , pyLong_AsS32          , 1,                                   , minmax_set_Int32  , hash_int64    , HIST_NUM  );
+MKWRITER(WriteBits64     , uint64_t , uint64_t , pyLong_AsU64          , 0,                                   , minmax_set_Bits64 , hash_uint64   , HIST_NUM  );
+MKWRITER(WriteBits32     , uint32_t , uint64_t , pyLong_AsU32          , 0,                                   , minmax_set_Bits32 , hash_uint64   , HIST_NUM  );
+MKWRITER(WriteBool       , uint8_t  , uint8_t  , pyLong_AsBool         , 1,                                   , minmax_set_Bool   , hash_bool     , HIST_DUMMY);
 static uint64_t fmt_datetime(PyObject *dt)
 {
 	if (!PyDateTime_Check(dt)) {
@@ -1685,9 +3147,607 @@ static uint64_t fmt_time(PyObject *dt)
 #endif
 	return r.res;
 }
-MKWRITER_C(WriteDateTime, uint64_t, uint64_t, fmt_datetime, 1, !value, MINMAX_STD, minmax_value_datetime, minmax_set_DateTime, hash_datetime);
-MKWRITER_C(WriteDate    , uint32_t, uint32_t, fmt_date,     1, !value, MINMAX_STD,                      , minmax_set_Date    , hash_32bits  );
-MKWRITER_C(WriteTime    , uint64_t, uint64_t, fmt_time,     1, !value, MINMAX_STD, minmax_value_datetime, minmax_set_Time    , hash_datetime);
+MKWRITER_C(WriteDateTime, uint64_t, uint64_t, fmt_datetime, 1, !value, MINMAX_STD, minmax_value_datetime, minmax_set_DateTime, hash_datetime, HIST_DUMMY, ENC_OK);
+MKWRITER_C(WriteDate    , uint32_t, uint32_t, fmt_date,     1, !value, MINMAX_STD,                      , minmax_set_Date    , hash_32bits  , HIST_DUMMY, ENC_OK);
+MKWRITER_C(WriteTime    , uint64_t, uint64_t, fmt_time,     1, !value, MINMAX_STD, minmax_value_datetime, minmax_set_Time    , hash_datetime, HIST_DUMMY, ENC_OK);
+
+// Predicates evaluated on the values in the file, for Read.read_where.
+
+#define WHERE_EQ         0
+#define WHERE_NE         1
+#define WHERE_LT         2
+#define WHERE_LE         3
+#define WHERE_GT         4
+#define WHERE_GE         5
+#define WHERE_IN         6
+#define WHERE_ISNONE     7
+#define WHERE_NOTNONE    8
+#define WHERE_STARTSWITH 9
+static const char * const where_op_names[] = {"==", "!=", "<", "<=", ">", ">=", "in", "isnone", "notnone", "startswith", 0};
+
+#define WK_INT    0
+#define WK_UINT   1
+#define WK_DOUBLE 2
+#define WK_BLOB   3
+
+typedef union where_key {
+	int64_t i;
+	uint64_t u;
+	double d;
+} where_key;
+
+typedef struct where_pred {
+	int op;
+	int in_none; // None is in the values for "in"
+	where_key key;
+	PyObject *blob; // bytes, value for blob types
+	Py_ssize_t count; // number of values for "in"
+	where_key *keys; // sorted values for "in"
+	PyObject **blobs; // sorted values for "in" on blob types
+} where_pred;
+
+typedef struct where_state {
+	int kind;
+	int size; // item size for fixed width types
+	// Decode a fixed width value into key, returns 1 for None.
+	int (*get_key)(const char *ptr, where_key *key);
+	PyObject *(*mkblob)(Read *self, const char *ptr, int len);
+	int count;
+	where_pred *preds;
+	char *scratch;
+	size_t scratch_alloc;
+} where_state;
+
+static void where_free(where_state *w)
+{
+	if (!w) return;
+	for (int i = 0; i < w->count; i++) {
+		where_pred *p = &w->preds[i];
+		Py_XDECREF(p->blob);
+		if (p->blobs) {
+			for (Py_ssize_t j = 0; j < p->count; j++) Py_DECREF(p->blobs[j]);
+			free(p->blobs);
+		}
+		if (p->keys) free(p->keys);
+	}
+	free(w->preds);
+	free(w->scratch);
+	free(w);
+}
+
+static int where_key_Int64(const char *ptr, where_key *key)
+{
+	int64_t v;
+	memcpy(&v, ptr, 8);
+	key->i = v;
+	return v == noneval_int64_t;
+}
+static int where_key_Int32(const char *ptr, where_key *key)
+{
+	int32_t v;
+	memcpy(&v, ptr, 4);
+	key->i = v;
+	return v == noneval_int32_t;
+}
+static int where_key_Bool(const char *ptr, where_key *key)
+{
+	const uint8_t v = *(const uint8_t *)ptr;
+	key->i = v;
+	return v == noneval_uint8_t;
+}
+static int where_key_Bits64(const char *ptr, where_key *key)
+{
+	memcpy(&key->u, ptr, 8);
+	return 0;
+}
+static int where_key_Bits32(const char *ptr, where_key *key)
+{
+	uint32_t v;
+	memcpy(&v, ptr, 4);
+	key->u = v;
+	return 0;
+}
+static int where_key_Float64(const char *ptr, where_key *key)
+{
+	if (!memcmp(ptr, noneval_double, 8)) return 1;
+	memcpy(&key->d, ptr, 8);
+	return 0;
+}
+static int where_key_Float32(const char *ptr, where_key *key)
+{
+	float v;
+	if (!memcmp(ptr, noneval_float, 4)) return 1;
+	memcpy(&v, ptr, 4);
+	key->d = v;
+	return 0;
+}
+static int where_key_Date(const char *ptr, where_key *key)
+{
+	uint32_t v;
+	memcpy(&v, ptr, 4);
+	key->u = v;
+	return !v;
+}
+static int where_key_DateTime(const char *ptr, where_key *key)
+{
+	uint64_t v;
+	uint32_t i0;
+	memcpy(&v, ptr, 8);
+	memcpy(&i0, ptr, 4);
+	key->u = minmax_value_datetime(v);
+	return !i0;
+}
+
+static int where_is_naive(PyObject *obj)
+{
+	PyObject *tz = PyObject_GetAttrString(obj, "tzinfo");
+	if (!tz) {
+		PyErr_Clear();
+		return 0;
+	}
+	Py_DECREF(tz);
+	return tz == Py_None;
+}
+
+// Convert a value for comparing with values in this file.
+// Returns 0 if that is not possible (without an exception set), so
+// the predicate has to be evaluated on the python values instead.
+static int where_value(Read *self, where_state *w, PyObject *obj, where_key *key, PyObject **r_blob)
+{
+	PyTypeObject *type = Py_TYPE(self);
+	if (w->kind == WK_INT || w->kind == WK_UINT || w->kind == WK_DOUBLE) {
+		if (PyType_IsSubtype(type, &ReadDate_Type)) {
+			if (!PyDate_Check(obj) || PyDateTime_Check(obj)) return 0;
+			key->u = fmt_date(obj);
+			return 1;
+		}
+		if (PyType_IsSubtype(type, &ReadDateTime_Type)) {
+			if (!PyDateTime_Check(obj) || !where_is_naive(obj)) return 0;
+			key->u = minmax_value_datetime(fmt_datetime(obj));
+			return 1;
+		}
+		if (PyType_IsSubtype(type, &ReadTime_Type)) {
+			if (!PyTime_Check(obj) || !where_is_naive(obj)) return 0;
+			key->u = minmax_value_datetime(fmt_time(obj));
+			return 1;
+		}
+		if (w->kind == WK_DOUBLE && PyFloat_Check(obj)) {
+			key->d = PyFloat_AS_DOUBLE(obj);
+			return 1;
+		}
+		if (!Integer_Check(obj)) return 0;
+		PyObject *l = PyNumber_Long(obj);
+		if (!l) goto fail;
+		int ok = 1;
+		if (w->kind == WK_INT) {
+			key->i = PyLong_AsLongLong(l);
+			ok = !PyErr_Occurred();
+		} else if (w->kind == WK_UINT) {
+			key->u = PyLong_AsUnsignedLongLong(l);
+			ok = !PyErr_Occurred();
+		} else {
+			// Only integers that are exactly representable.
+			key->d = PyLong_AsDouble(l);
+			ok = !PyErr_Occurred();
+			if (ok) {
+				PyObject *back = PyLong_FromDouble(key->d);
+				ok = back && PyObject_RichCompareBool(back, l, Py_EQ) == 1;
+				Py_XDECREF(back);
+			}
+		}
+		Py_DECREF(l);
+		if (!ok) goto fail;
+		return 1;
+	}
+	PyObject *blob = 0;
+#if PY_MAJOR_VERSION < 3
+	if (PyType_IsSubtype(type, &ReadUnicode_Type)) {
+		if (PyUnicode_Check(obj)) blob = PyUnicode_AsUTF8String(obj);
+	} else if (PyBytes_Check(obj)) {
+		Py_INCREF(obj);
+		blob = obj;
+	}
+#else
+	if (PyType_IsSubtype(type, &ReadBytes_Type)) {
+		if (PyBytes_Check(obj)) {
+			Py_INCREF(obj);
+			blob = obj;
+		}
+	} else if (PyUnicode_Check(obj)) {
+		if (PyType_IsSubtype(type, &ReadUnicode_Type) || PyUnicode_IS_ASCII(obj)) {
+			blob = PyUnicode_AsUTF8String(obj);
+		}
+	}
+#endif
+	if (!blob) goto fail;
+	*r_blob = blob;
+	return 1;
+fail:
+	PyErr_Clear();
+	return 0;
+}
+
+static inline int where_cmp_blob(const char *a, Py_ssize_t a_len, const char *b, Py_ssize_t b_len)
+{
+	// utf-8 sorts by code point when compared bytewise, like python does.
+	int c = memcmp(a, b, a_len < b_len ? a_len : b_len);
+	if (c) return c;
+	return (a_len > b_len) - (a_len < b_len);
+}
+
+static inline int where_cmp_key(int kind, const where_key *a, const where_key *b)
+{
+	switch (kind) {
+		case WK_INT: return (a->i > b->i) - (a->i < b->i);
+		case WK_UINT: return (a->u > b->u) - (a->u < b->u);
+		default: return (a->d > b->d) - (a->d < b->d);
+	}
+}
+
+static int where_sort_kind;
+static int where_sort_keys(const void *a, const void *b)
+{
+	return where_cmp_key(where_sort_kind, a, b);
+}
+static int where_sort_blobs(const void *a, const void *b)
+{
+	PyObject *a_obj = *(PyObject * const *)a;
+	PyObject *b_obj = *(PyObject * const *)b;
+	return where_cmp_blob(PyBytes_AS_STRING(a_obj), PyBytes_GET_SIZE(a_obj), PyBytes_AS_STRING(b_obj), PyBytes_GET_SIZE(b_obj));
+}
+
+// Returns 0 if the predicate can not be used here.
+static int where_parse_in(Read *self, where_state *w, where_pred *p, PyObject *values)
+{
+	PyObject *seq = PySequence_Fast(values, "");
+	if (!seq) {
+		PyErr_Clear();
+		return 0;
+	}
+	const Py_ssize_t len = PySequence_Fast_GET_SIZE(seq);
+	PyObject **items = PySequence_Fast_ITEMS(seq);
+	if (w->kind == WK_BLOB) {
+		p->blobs = malloc(sizeof(PyObject *) * (len ? len : 1));
+	} else {
+		p->keys = malloc(sizeof(where_key) * (len ? len : 1));
+	}
+	if (!p->blobs && !p->keys) goto fail;
+	for (Py_ssize_t i = 0; i < len; i++) {
+		if (items[i] == Py_None) {
+			p->in_none = 1;
+			continue;
+		}
+		if (w->kind == WK_BLOB) {
+			if (!where_value(self, w, items[i], 0, &p->blobs[p->count])) goto fail;
+		} else {
+			where_key *key = &p->keys[p->count];
+			if (!where_value(self, w, items[i], key, 0)) goto fail;
+			// NaN is never equal to anything.
+			if (w->kind == WK_DOUBLE && isnan(key->d)) continue;
+		}
+		p->count++;
+	}
+	if (w->kind == WK_BLOB) {
+		qsort(p->blobs, p->count, sizeof(PyObject *), where_sort_blobs);
+	} else {
+		where_sort_kind = w->kind;
+		qsort(p->keys, p->count, sizeof(where_key), where_sort_keys);
+	}
+	Py_DECREF(seq);
+	return 1;
+fail:
+	Py_DECREF(seq);
+	return 0;
+}
+
+static PyObject *Read_where(Read *self, PyObject *preds)
+{
+	where_free(self->where);
+	self->where = 0;
+	if (self->slices || self->callback) Py_RETURN_FALSE;
+	PyTypeObject *type = Py_TYPE(self);
+	where_state *w = calloc(1, sizeof(where_state));
+	if (!w) return PyErr_NoMemory();
+	static const struct {
+		PyTypeObject *type;
+		int kind;
+		int size;
+		int (*get_key)(const char *, where_key *);
+	} fixed[] = {
+		{&ReadInt64_Type   , WK_INT   , 8, where_key_Int64},
+		{&ReadInt32_Type   , WK_INT   , 4, where_key_Int32},
+		{&ReadBool_Type    , WK_INT   , 1, where_key_Bool},
+		{&ReadBits64_Type  , WK_UINT  , 8, where_key_Bits64},
+		{&ReadBits32_Type  , WK_UINT  , 4, where_key_Bits32},
+		{&ReadFloat64_Type , WK_DOUBLE, 8, where_key_Float64},
+		{&ReadFloat32_Type , WK_DOUBLE, 4, where_key_Float32},
+		{&ReadDate_Type    , WK_UINT  , 4, where_key_Date},
+		{&ReadDateTime_Type, WK_UINT  , 8, where_key_DateTime},
+		{&ReadTime_Type    , WK_UINT  , 8, where_key_DateTime},
+		{0}
+	};
+	for (int i = 0; fixed[i].type; i++) {
+		if (PyType_IsSubtype(type, fixed[i].type)) {
+			w->kind = fixed[i].kind;
+			w->size = fixed[i].size;
+			w->get_key = fixed[i].get_key;
+			break;
+		}
+	}
+	if (!w->size) {
+		w->kind = WK_BLOB;
+		if (PyType_IsSubtype(type, &ReadBytes_Type)) {
+			w->mkblob = mkblobBytes;
+		} else if (PyType_IsSubtype(type, &ReadAscii_Type)) {
+			w->mkblob = mkblobAscii;
+		} else if (PyType_IsSubtype(type, &ReadUnicode_Type)) {
+			w->mkblob = mkblobUnicode;
+		} else {
+			goto unsupported;
+		}
+	}
+	PyObject *seq = PySequence_Fast(preds, "predicates must be a sequence");
+	if (!seq) goto err;
+	const Py_ssize_t len = PySequence_Fast_GET_SIZE(seq);
+	w->preds = calloc(len ? len : 1, sizeof(where_pred));
+	if (!w->preds) {
+		Py_DECREF(seq);
+		PyErr_NoMemory();
+		goto err;
+	}
+	for (Py_ssize_t i = 0; i < len; i++) {
+		PyObject *pred = PySequence_Fast_GET_ITEM(seq, i);
+		where_pred *p = &w->preds[i];
+		w->count++;
+		if (!PyTuple_Check(pred) || PyTuple_GET_SIZE(pred) < 1 || PyTuple_GET_SIZE(pred) > 2) goto unsupported_seq;
+		PyObject *op_obj = PyTuple_GET_ITEM(pred, 0);
+		const char *op_name = 0;
+#if PY_MAJOR_VERSION < 3
+		if (PyBytes_Check(op_obj)) op_name = PyBytes_AS_STRING(op_obj);
+#else
+		if (PyUnicode_Check(op_obj)) op_name = PyUnicode_AsUTF8(op_obj);
+#endif
+		if (!op_name) goto unsupported_seq;
+		for (p->op = 0; where_op_names[p->op]; p->op++) {
+			if (!strcmp(op_name, where_op_names[p->op])) break;
+		}
+		if (!where_op_names[p->op]) goto unsupported_seq;
+		const int want_value = (p->op != WHERE_ISNONE && p->op != WHERE_NOTNONE);
+		if (PyTuple_GET_SIZE(pred) != 1 + want_value) goto unsupported_seq;
+		if (!want_value) continue;
+		PyObject *value = PyTuple_GET_ITEM(pred, 1);
+		if (p->op == WHERE_IN) {
+			if (!where_parse_in(self, w, p, value)) goto unsupported_seq;
+		} else if (p->op == WHERE_STARTSWITH) {
+			if (w->kind != WK_BLOB) goto unsupported_seq;
+			if (!where_value(self, w, value, 0, &p->blob)) goto unsupported_seq;
+		} else {
+			if (!where_value(self, w, value, &p->key, &p->blob)) goto unsupported_seq;
+		}
+	}
+	Py_DECREF(seq);
+	self->where = w;
+	Py_RETURN_TRUE;
+unsupported_seq:
+	Py_DECREF(seq);
+unsupported:
+	PyErr_Clear();
+	where_free(w);
+	Py_RETURN_FALSE;
+err:
+	where_free(w);
+	return 0;
+}
+
+// Does a value (key for fixed width types, ptr + len for blobs) match?
+static int where_match(const where_state *w, const int is_none, const where_key *key, const char *ptr, const Py_ssize_t len)
+{
+	for (int i = 0; i < w->count; i++) {
+		const where_pred *p = &w->preds[i];
+		if (p->op == WHERE_ISNONE) {
+			if (!is_none) return 0;
+			continue;
+		}
+		if (is_none) {
+			if (p->op == WHERE_IN && p->in_none) continue;
+			return 0;
+		}
+		if (p->op == WHERE_NOTNONE) continue;
+		if (p->op == WHERE_IN) {
+			if (w->kind == WK_DOUBLE && isnan(key->d)) return 0;
+			Py_ssize_t lo = 0, hi = p->count;
+			int found = 0;
+			while (lo < hi) {
+				const Py_ssize_t mid = lo + (hi - lo) / 2;
+				int c;
+				if (w->kind == WK_BLOB) {
+					c = where_cmp_blob(ptr, len, PyBytes_AS_STRING(p->blobs[mid]), PyBytes_GET_SIZE(p->blobs[mid]));
+				} else {
+					c = where_cmp_key(w->kind, key, &p->keys[mid]);
+				}
+				if (!c) {
+					found = 1;
+					break;
+				}
+				if (c < 0) {
+					hi = mid;
+				} else {
+					lo = mid + 1;
+				}
+			}
+			if (!found) return 0;
+			continue;
+		}
+		if (p->op == WHERE_STARTSWITH) {
+			const Py_ssize_t p_len = PyBytes_GET_SIZE(p->blob);
+			if (len < p_len || memcmp(ptr, PyBytes_AS_STRING(p->blob), p_len)) return 0;
+			continue;
+		}
+		int c;
+		if (w->kind == WK_BLOB) {
+			c = where_cmp_blob(ptr, len, PyBytes_AS_STRING(p->blob), PyBytes_GET_SIZE(p->blob));
+		} else {
+			if (w->kind == WK_DOUBLE && (isnan(key->d) || isnan(p->key.d))) {
+				// Only != is true for NaN.
+				if (p->op != WHERE_NE) return 0;
+				continue;
+			}
+			c = where_cmp_key(w->kind, key, &p->key);
+		}
+		switch (p->op) {
+			case WHERE_EQ: if (c != 0) return 0; break;
+			case WHERE_NE: if (c == 0) return 0; break;
+			case WHERE_LT: if (c >= 0) return 0; break;
+			case WHERE_LE: if (c > 0) return 0; break;
+			case WHERE_GT: if (c <= 0) return 0; break;
+			case WHERE_GE: if (c < 0) return 0; break;
+		}
+	}
+	return 1;
+}
+
+// Read the next blob into w->scratch. Returns 1 on EOF, -1 on error.
+static int where_read_blob(Read *self, where_state *w, Py_ssize_t *r_len, int *r_is_none)
+{
+	if (self->pos >= self->len) {
+		// Read_take_ doesn't know about EOF.
+		if (Read_read_(self, SIZE_Bytes)) return PyErr_Occurred() ? -1 : 1;
+	}
+	uint8_t size8;
+	if (Read_take_(self, (char *)&size8, 1)) return -1;
+	uint32_t size = size8;
+	*r_is_none = 0;
+	if (size == 255) {
+		if (Read_take_(self, (char *)&size, 4)) return -1;
+		if (size == 0) {
+			*r_is_none = 1;
+			*r_len = 0;
+			return 0;
+		}
+		if (size < 255) {
+			PyErr_SetString(PyExc_ValueError, "File format error");
+			return -1;
+		}
+	}
+	if (size > w->scratch_alloc || !w->scratch) {
+		const size_t alloc = size < 64 ? 64 : size;
+		char *scratch = realloc(w->scratch, alloc);
+		if (!scratch) {
+			PyErr_NoMemory();
+			return -1;
+		}
+		w->scratch = scratch;
+		w->scratch_alloc = alloc;
+	}
+	if (Read_take_(self, w->scratch, size)) return -1;
+	*r_len = size;
+	return 0;
+}
+
+static PyObject *Read_read_where(Read *self, PyObject *o_selection)
+{
+	if (!self->ctx) return err_closed();
+	where_state *w = self->where;
+	if (!w) {
+		PyErr_SetString(PyExc_ValueError, "read_where needs predicates from where first");
+		return 0;
+	}
+	selection sel;
+	sel.seq = 0;
+	Py_ssize_t n;
+	const int all = Integer_Check(o_selection);
+	if (all) {
+		n = PyNumber_AsSsize_t(o_selection, PyExc_OverflowError);
+		if (n == -1 && PyErr_Occurred()) return 0;
+		if (n < 0) {
+			PyErr_SetString(PyExc_ValueError, "read_where size must be >= 0");
+			return 0;
+		}
+	} else {
+		if (selection_init(&sel, o_selection)) return 0;
+		n = sel.len;
+	}
+	PyObject *res = 0;
+	char *matched = malloc(n ? n : 1);
+	PyObject *values = PyList_New(0);
+	if (!matched || !values) {
+		PyErr_NoMemory();
+		goto err;
+	}
+	iternextfunc next = Py_TYPE(self)->tp_iternext;
+	Py_ssize_t ix = 0;
+	while (ix < n) {
+		if (!all) {
+			Py_ssize_t run = selection_skip_run(&sel, ix);
+			if (run < 0) goto err;
+			if (run) {
+				PY_LONG_LONG skipped = Read_skip_(self, run, "read_where");
+				if (skipped < 0) goto err;
+				memset(matched + ix, 0, skipped);
+				ix += skipped;
+				if (skipped < run) break;
+				continue;
+			}
+		}
+		if (self->want_count >= 0 && self->count >= self->want_count) break;
+		PyObject *v = 0;
+		int is_none;
+		if (w->kind == WK_BLOB) {
+			Py_ssize_t len;
+			int r = where_read_blob(self, w, &len, &is_none);
+			if (r < 0) goto err;
+			if (r) break;
+			self->count++;
+			if (where_match(w, is_none, 0, w->scratch, len)) {
+				if (is_none) {
+					Py_INCREF(Py_None);
+					v = Py_None;
+				} else {
+					v = w->mkblob(self, w->scratch, len);
+					if (!v) goto err;
+				}
+			}
+		} else {
+			if (self->error || self->pos >= self->len) {
+				if (Read_read_(self, w->size)) {
+					if (PyErr_Occurred()) goto err;
+					break;
+				}
+			}
+			where_key key;
+			is_none = w->get_key(self->buf + self->pos, &key);
+			if (where_match(w, is_none, &key, 0, 0)) {
+				// Let the normal iternext make the object.
+				v = next((PyObject *)self);
+				if (!v) {
+					if (!PyErr_Occurred()) {
+						PyErr_SetString(PyExc_ValueError, "File format error");
+					}
+					goto err;
+				}
+			} else {
+				self->pos += w->size;
+				self->count++;
+			}
+		}
+		if (v) {
+			int e = PyList_Append(values, v);
+			Py_DECREF(v);
+			if (e) goto err;
+		}
+		matched[ix++] = !!v;
+	}
+	PyObject *matched_obj = PyBytes_FromStringAndSize(matched, ix);
+	if (matched_obj) {
+		res = PyTuple_Pack(2, values, matched_obj);
+		Py_DECREF(matched_obj);
+	}
+err:
+	Py_XDECREF(values);
+	Py_XDECREF(sel.seq);
+	free(matched);
+	return res;
+}
 
 static int WriteNumber_serialize_Long(PyObject *obj, char *buf, const char *msg, const char *error_extra)
 {
@@ -1708,11 +3768,13 @@ static int WriteNumber_serialize_Long(PyObject *obj, char *buf, const char *msg,
 	return _PyLong_AsByteArray(lobj, ptr, len_bytes, 1, 1) < 0;
 }
 
+static int zone_end_WriteNumber(Write *self);
+
 static int init_WriteNumber(PyObject *self_, PyObject *args, PyObject *kwds)
 {
 	static char *kwlist[] = {
 		"name", "compression", "default", "hashfilter",
-		"error_extra", "none_support", 0
+		"error_extra", "none_support", "bloom", "stats", 0
 	};
 	Write *self = (Write *)self_;
 	char *name = 0;
@@ -1720,22 +3782,27 @@ static int init_WriteNumber(PyObject *self_, PyObject *args, PyObject *kwds)
 	PyObject *compression = 0;
 	PyObject *default_obj = 0;
 	PyObject *hashfilter = 0;
+	int stats = 0;
 	if (self->name) {
 		PyErr_Format(PyExc_RuntimeError, "Can't re-init %s", Py_TYPE(self)->tp_name);
 		goto err;
 	}
 	if (!PyArg_ParseTupleAndKeywords(
-		args, kwds, "et|OOOeti", kwlist,
+		args, kwds, "et|OOOetiii", kwlist,
 		Py_FileSystemDefaultEncoding, &name,
 		&compression,
 		&default_obj,
 		&hashfilter,
 		Py_FileSystemDefaultEncoding, &error_extra,
-		&self->none_support
+		&self->none_support,
+		&self->bloom,
+		&stats
 	)) return -1;
 	self->name = name;
 	self->error_extra = error_extra;
+	self->zone_end = zone_end_WriteNumber;
 	err1(Write_parse_compression(self, compression));
+	err1(Write_stats_init(self, stats, 1));
 	if (default_obj) {
 		Py_INCREF(default_obj);
 		self->default_obj = default_obj;
@@ -1763,8 +3830,40 @@ err:
 	return -1;
 }
 
+static void Write_obj_zone_minmax(Write *self, PyObject *obj)
+{
+	if (!self->zone_min_obj || (PyFloat_Check(self->zone_min_obj) && isnan(PyFloat_AS_DOUBLE(self->zone_min_obj)))) {
+		Py_INCREF(obj);
+		Py_XDECREF(self->zone_min_obj);
+		self->zone_min_obj = obj;
+		Py_INCREF(obj);
+		Py_XDECREF(self->zone_max_obj);
+		self->zone_max_obj = obj;
+		return;
+	}
+	if (PyObject_RichCompareBool(obj, self->zone_min_obj, Py_LT)) {
+		Py_INCREF(obj);
+		Py_XDECREF(self->zone_min_obj);
+		self->zone_min_obj = obj;
+	}
+	if (PyObject_RichCompareBool(obj, self->zone_max_obj, Py_GT)) {
+		Py_INCREF(obj);
+		Py_XDECREF(self->zone_max_obj);
+		self->zone_max_obj = obj;
+	}
+}
+
+static int zone_end_WriteNumber(Write *self)
+{
+	PyObject *min_obj = self->zone_min_obj;
+	PyObject *max_obj = self->zone_max_obj;
+	self->zone_min_obj = self->zone_max_obj = 0;
+	return Write_zone_append(self, min_obj, max_obj);
+}
+
 static void Write_obj_minmax(Write *self, PyObject *obj)
 {
+	Write_obj_zone_minmax(self, obj);
 	if (!self->min_obj || (PyFloat_Check(self->min_obj) && isnan(PyFloat_AS_DOUBLE(self->min_obj)))) {
 		Py_INCREF(obj);
 		Py_XDECREF(self->min_obj);
@@ -1790,7 +3889,10 @@ static PyObject *C_WriteNumber(Write *self, PyObject *obj, int actually_write, i
 {
 	if (obj == Py_None && (self->none_support || !self->default_obj)) {
 		WRITE_NONE_SLICE_CHECK;
+		BLOOM_ADD(0);
+		self->none_count++;
 		self->count++;
+		ZONE_CHECK;
 		return Write_write_(self, "", 1);
 	}
 	if (PyFloat_Check(obj)) {
@@ -1800,11 +3902,14 @@ static PyObject *C_WriteNumber(Write *self, PyObject *obj, int actually_write, i
 			if (sliceno != self->sliceno) Py_RETURN_FALSE;
 		}
 		if (!actually_write) Py_RETURN_TRUE;
+		HASH_ADD(hash_double(&value));
+		if (self->hist) Write_hist_add(self, value);
 		Write_obj_minmax(self, obj);
 		char buf[9];
 		buf[0] = 1;
 		memcpy(buf + 1, &value, 8);
 		self->count++;
+		ZONE_CHECK;
 		return Write_write_(self, buf, 9);
 	}
 	if (first && !Integer_Check(obj)) {
@@ -1822,10 +3927,13 @@ static PyObject *C_WriteNumber(Write *self, PyObject *obj, int actually_write, i
 			if (sliceno != self->sliceno) Py_RETURN_FALSE;
 		}
 		if (!actually_write) Py_RETURN_TRUE;
+		HASH_ADD(hash_int64(&value));
+		if (self->hist) Write_hist_add(self, value);
 		Write_obj_minmax(self, obj);
 		if (value <= 122 && value >= -5) {
 			uint8_t u8 = 0x80 | (value + 5);
 			self->count++;
+			ZONE_CHECK;
 			return Write_write_(self, (char *)&u8, 1);
 		}
 		if (value <= INT16_MAX && value >= INT16_MIN) {
@@ -1833,6 +3941,7 @@ static PyObject *C_WriteNumber(Write *self, PyObject *obj, int actually_write, i
 			int16_t value16 = value;
 			memcpy(buf + 1, &value16, 2);
 			self->count++;
+			ZONE_CHECK;
 			return Write_write_(self, buf, 3);
 		}
 		if (value <= INT32_MAX && value >= INT32_MIN) {
@@ -1840,11 +3949,13 @@ static PyObject *C_WriteNumber(Write *self, PyObject *obj, int actually_write, i
 			int32_t value32 = value;
 			memcpy(buf + 1, &value32, 4);
 			self->count++;
+			ZONE_CHECK;
 			return Write_write_(self, buf, 5);
 		}
 		buf[0] = 8;
 		memcpy(buf + 1, &value, 8);
 		self->count++;
+		ZONE_CHECK;
 		return Write_write_(self, buf, 9);
 	}
 	if (WriteNumber_serialize_Long(obj, buf, "Value", self->error_extra)) {
@@ -1860,8 +3971,18 @@ static PyObject *C_WriteNumber(Write *self, PyObject *obj, int actually_write, i
 		if (sliceno != self->sliceno) Py_RETURN_FALSE;
 	}
 	if (!actually_write) Py_RETURN_TRUE;
+	HASH_ADD(hash(buf + 1, buf[0]));
+	if (self->hist) {
+		double value = PyLong_AsDouble(obj);
+		if (value == -1.0 && PyErr_Occurred()) {
+			PyErr_Clear();
+			value = (_PyLong_Sign(obj) < 0 ? -INFINITY : INFINITY);
+		}
+		Write_hist_add(self, value);
+	}
 	Write_obj_minmax(self, obj);
 	self->count++;
+	ZONE_CHECK;
 	return Write_write_(self, buf, buf[0] + 1);
 }
 static PyObject *write_WriteNumber(Write *self, PyObject *obj)
@@ -1906,7 +4027,7 @@ static int init_WriteParsedNumber(PyObject *self_, PyObject *args, PyObject *kwd
 {
 	static char *kwlist[] = {
 		"name", "compression", "default", "hashfilter",
-		"error_extra", "none_support", 0
+		"error_extra", "none_support", "bloom", "stats", 0
 	};
 	PyObject *name = 0;
 	PyObject *error_extra = 0;
@@ -1915,17 +4036,21 @@ static int init_WriteParsedNumber(PyObject *self_, PyObject *args, PyObject *kwd
 	PyObject *default_obj = 0;
 	PyObject *hashfilter = 0;
 	PyObject *none_support = 0;
+	PyObject *bloom = 0;
+	PyObject *stats = 0;
 	PyObject *new_args = 0;
 	PyObject *new_kwds = 0;
 	int res = -1;
 	err1(!PyArg_ParseTupleAndKeywords(
-		args, kwds, "O|OOOOO", kwlist,
+		args, kwds, "O|OOOOOOO", kwlist,
 		&name,
 		&compression,
 		&default_obj_,
 		&hashfilter,
 		&error_extra,
-		&none_support
+		&none_support,
+		&bloom,
+		&stats
 	));
 	if (default_obj_) {
 		if (default_obj_ == Py_None || PyFloat_Check(default_obj_)) {
@@ -1948,6 +4073,8 @@ static int init_WriteParsedNumber(PyObject *self_, PyObject *args, PyObject *kwd
 	if (hashfilter) err1(PyDict_SetItemString(new_kwds, "hashfilter", hashfilter));
 	if (error_extra) err1(PyDict_SetItemString(new_kwds, "error_extra", error_extra));
 	if (none_support) err1(PyDict_SetItemString(new_kwds, "none_support", none_support));
+	if (bloom) err1(PyDict_SetItemString(new_kwds, "bloom", bloom));
+	if (stats) err1(PyDict_SetItemString(new_kwds, "stats", stats));
 	res = init_WriteNumber(self_, new_args, new_kwds);
 err:
 	Py_XDECREF(new_kwds);
@@ -1981,7 +4108,7 @@ MKPARSEDNUMBERWRAPPER(write, Write)
 MKPARSEDNUMBERWRAPPER(hashcheck, Write)
 MKPARSEDNUMBERWRAPPER(hash, PyObject)
 
-#define MKPARSED_C(name, T, HT, inner, conv, withnone, errchk, err_v, do_minmax, minmax_set, hash) \
+#define MKPARSED_C(name, T, HT, inner, conv, withnone, errchk, err_v, do_minmax, minmax_set, hash, do_hist, do_enc) \
 	static T parse ## name(PyObject *obj)                        	\
 	{                                                            	\
 		PyObject *parsed = inner(obj);                       	\
@@ -1990,9 +4117,9 @@ MKPARSEDNUMBERWRAPPER(hash, PyObject)
 		Py_DECREF(parsed);                                   	\
 		return res;                                          	\
 	}                                                            	\
-	MKWRITER_C(WriteParsed ## name, T, HT, parse ## name, withnone, errchk, do_minmax, , minmax_set, hash)
+	MKWRITER_C(WriteParsed ## name, T, HT, parse ## name, withnone, errchk, do_minmax, , minmax_set, hash, do_hist, do_enc)
 #define MKPARSED(name, T, HT, inner, conv, withnone, minmax_set, hash)	\
-	MKPARSED_C(name, T, HT, inner, conv, withnone, value == (T)-1, -1, MINMAX_STD, minmax_set, hash)
+	MKPARSED_C(name, T, HT, inner, conv, withnone, value == (T)-1, -1, MINMAX_STD, minmax_set, hash, HIST_NUM, ENC_OK)
 
 static inline PyObject *pyComplex_parse(PyObject *obj)
 {
@@ -2007,10 +4134,10 @@ static inline PyObject *pyComplex_parse(PyObject *obj)
 
 static const complex64 complex64_error = { -1.0, 0.0 };
 static const complex32 complex32_error = { -1.0, 0.0 };
-MKPARSED_C(Complex64, complex64, complex64, pyComplex_parse, PyComplex_AsCComplex  , 1, value.real == -1.0, complex64_error, MINMAX_DUMMY, , hash_complex64);
-MKPARSED_C(Complex32, complex32, complex32, pyComplex_parse, pyComplex_AsCComplex32, 1, value.real == -1.0, complex32_error, MINMAX_DUMMY, , hash_complex32);
-MKPARSED_C(Float64, double  , double  , PyNumber_Float, PyFloat_AsDouble , 1, value == -1.0, -1, MINMAX_FLOAT, minmax_set_Float64, hash_double);
-MKPARSED_C(Float32, float   , double  , PyNumber_Float, PyFloat_AsDouble , 1, value == -1.0, -1, MINMAX_FLOAT, minmax_set_Float32, hash_double);
+MKPARSED_C(Complex64, complex64, complex64, pyComplex_parse, PyComplex_AsCComplex  , 1, value.real == -1.0, complex64_error, MINMAX_DUMMY, , hash_complex64, HIST_DUMMY, ENC_NO);
+MKPARSED_C(Complex32, complex32, complex32, pyComplex_parse, pyComplex_AsCComplex32, 1, value.real == -1.0, complex32_error, MINMAX_DUMMY, , hash_complex32, HIST_DUMMY, ENC_NO);
+MKPARSED_C(Float64, double  , double  , PyNumber_Float, PyFloat_AsDouble , 1, value == -1.0, -1, MINMAX_FLOAT, minmax_set_Float64, hash_double, HIST_NUM, ENC_NO);
+MKPARSED_C(Float32, float   , double  , PyNumber_Float, PyFloat_AsDouble , 1, value == -1.0, -1, MINMAX_FLOAT, minmax_set_Float32, hash_double, HIST_NUM, ENC_NO);
 MKPARSED(Int64  , int64_t , int64_t , PyNumber_Int  , pyLong_AsS64     , 1, minmax_set_Int64  , hash_int64);
 MKPARSED(Int32  , int32_t , int64_t , PyNumber_Int  , pyLong_AsS32     , 1, minmax_set_Int32  , hash_int64);
 MKPARSED(Bits64 , uint64_t, uint64_t, PyNumber_Long , pyLong_AsU64     , 0, minmax_set_Bits64 , hash_uint64);
@@ -2024,6 +4151,11 @@ static PyMemberDef w_default_members[] = {
 	{"max"       , T_OBJECT   , offsetof(Write, max_obj    ), READONLY},
 	{"default"   , T_OBJECT_EX, offsetof(Write, default_obj), READONLY},
 	{"compression",T_OBJECT_EX, offsetof(Write, compression), READONLY},
+	{"encoding"  , T_OBJECT   , offsetof(Write, encoding   ), READONLY},
+	{"zones"     , T_OBJECT   , offsetof(Write, zones      ), READONLY},
+	{"blocks"    , T_OBJECT   , offsetof(Write, blocks     ), READONLY},
+	{"bloom_filter",T_OBJECT  , offsetof(Write, bloom_filter), READONLY},
+	{"none_count", T_ULONGLONG, offsetof(Write, none_count ), READONLY},
 	{0}
 };
 
@@ -2070,21 +4202,35 @@ static PyMemberDef w_default_members[] = {
 		PyObject_Del,                   /*tp_free*/          	\
 		0,                              /*tp_is_gc*/         	\
 	}
+static PyObject *Write_write_many(Write *self, PyObject *obj, PyObject *(*write)(Write *, PyObject *));
+static PyObject *Write_write_array(Write *self, PyObject *obj);
+
 #define MKWTYPE(name)                                                                	\
+	static PyObject *write_many_ ## name(Write *self, PyObject *obj)                      	\
+	{                                                                                     	\
+		return Write_write_many(self, obj, write_ ## name);                           	\
+	}                                                                                     	\
 	static PyMethodDef name ## _methods[] = {                                             	\
 		{"__enter__", (PyCFunction)Write_self         , METH_NOARGS         , NULL},  	\
 		{"__exit__",  (PyCFunction)any_exit           , METH_VARARGS        , NULL},  	\
 		{"write",     (PyCFunction)write_ ## name     , METH_O              , NULL},  	\
+		{"write_many",(PyCFunction)write_many_ ## name, METH_O              , "write_many(iterable)\n\n" \
+			"Write all values from iterable, or from a buffer like write_array if possible."}, \
+		{"write_array",(PyCFunction)Write_write_array , METH_O              , "write_array(buffer)\n\n" \
+			"Write all values from a one dimensional buffer (array, numpy array, ...)\n" \
+			"with exactly the right format, no conversions are made."}, \
 		{"flush",     (PyCFunction)Write_flush        , METH_NOARGS         , NULL},  	\
 		{"close",     (PyCFunction)Write_close        , METH_NOARGS         , NULL},  	\
 		{"hashcheck", (PyCFunction)hashcheck_ ## name , METH_O              , NULL},  	\
 		{"hash"     , (PyCFunction)hash_## name       , METH_STATIC | METH_O, NULL},  	\
+		{"stats"    , (PyCFunction)Write_stats        , METH_NOARGS         , "stats() - (none_count, hll_registers, histogram) or None without stats=True"}, \
 		{0}                                                                           	\
 	};                                                                                    	\
 	MKWTYPE_i(name, name ## _methods, w_default_members);
 MKWTYPE(WriteBytes);
 MKWTYPE(WriteAscii);
 MKWTYPE(WriteUnicode);
+MKWTYPE(WriteDictUnicode);
 MKWTYPE(WriteComplex64);
 MKWTYPE(WriteComplex32);
 MKWTYPE(WriteFloat64);
@@ -2109,6 +4255,826 @@ MKWTYPE(WriteParsedInt32);
 MKWTYPE(WriteParsedBits64);
 MKWTYPE(WriteParsedBits32);
 
+typedef struct {
+	PyTypeObject *type;
+	// The buffer formats (without size) accepted, with itemsize == size.
+	const char *formats;
+	size_t size;
+	PyObject *(*write)(Write *self, const char *ptr);
+} write_array_conv;
+#define WARRAYCONV(name, formats, T) { &Write ## name ## _Type, formats, sizeof(T), array_Write ## name }
+static const write_array_conv write_array_convs[] = {
+	WARRAYCONV(Complex64      , "Zd"    , complex64),
+	WARRAYCONV(Complex32      , "Zf"    , complex32),
+	WARRAYCONV(Float64        , "d"     , double   ),
+	WARRAYCONV(Float32        , "f"     , float    ),
+	WARRAYCONV(Int64          , "bhilqn", int64_t  ),
+	WARRAYCONV(Int32          , "bhilqn", int32_t  ),
+	WARRAYCONV(Bits64         , "BHILQN", uint64_t ),
+	WARRAYCONV(Bits32         , "BHILQN", uint32_t ),
+	WARRAYCONV(Bool           , "?"     , uint8_t  ),
+	WARRAYCONV(ParsedComplex64, "Zd"    , complex64),
+	WARRAYCONV(ParsedComplex32, "Zf"    , complex32),
+	WARRAYCONV(ParsedFloat64  , "d"     , double   ),
+	WARRAYCONV(ParsedFloat32  , "f"     , float    ),
+	WARRAYCONV(ParsedInt64    , "bhilqn", int64_t  ),
+	WARRAYCONV(ParsedInt32    , "bhilqn", int32_t  ),
+	WARRAYCONV(ParsedBits64   , "BHILQN", uint64_t ),
+	WARRAYCONV(ParsedBits32   , "BHILQN", uint32_t ),
+	{0}
+};
+
+static const write_array_conv *Write_array_conv(Write *self)
+{
+	const write_array_conv *conv;
+	for (conv = write_array_convs; conv->type; conv++) {
+		if (Py_TYPE(self) == conv->type) return conv;
+	}
+	return 0;
+}
+
+// Native byte order and a single value of one of the formats.
+static int Write_array_format_ok(const write_array_conv *conv, const Py_buffer *view)
+{
+	const char *format = view->format ? view->format : "B";
+	const char *formats = conv->formats;
+	if (view->ndim != 1 || view->itemsize != (Py_ssize_t)conv->size) return 0;
+	if (*format == '@' || *format == '=') {
+		format++;
+#if PY_LITTLE_ENDIAN
+	} else if (*format == '<') {
+#else
+	} else if (*format == '>' || *format == '!') {
+#endif
+		format++;
+	}
+	if (*formats == 'Z') {
+		if (*format != 'Z') return 0;
+		format++;
+		formats++;
+	}
+	return format[0] && !format[1] && strchr(formats, format[0]);
+}
+
+static PyObject *Write_write_array_(Write *self, const write_array_conv *conv, Py_buffer *view)
+{
+	const char *ptr = view->buf;
+	const Py_ssize_t stride = view->strides ? view->strides[0] : view->itemsize;
+	for (Py_ssize_t i = 0; i < view->shape[0]; i++, ptr += stride) {
+		PyObject *res = conv->write(self, ptr);
+		if (!res) return 0;
+		Py_DECREF(res);
+	}
+	Py_RETURN_NONE;
+}
+
+static PyObject *Write_write_array(Write *self, PyObject *obj)
+{
+	const write_array_conv *conv = Write_array_conv(self);
+	Py_buffer view;
+	if (!conv) {
+		PyErr_Format(PyExc_TypeError, "%s does not support write_array", Py_TYPE(self)->tp_name);
+		return 0;
+	}
+	if (PyObject_GetBuffer(obj, &view, PyBUF_STRIDES | PyBUF_FORMAT)) return 0;
+	PyObject *res = 0;
+	if (Write_array_format_ok(conv, &view)) {
+		res = Write_write_array_(self, conv, &view);
+	} else {
+		PyErr_Format(PyExc_TypeError,
+			"%s.write_array needs a one dimensional buffer with format %s (itemsize %d), not %s (itemsize %d)",
+			Py_TYPE(self)->tp_name, conv->formats, (int)conv->size,
+			view.format ? view.format : "B", (int)view.itemsize
+		);
+	}
+	PyBuffer_Release(&view);
+	return res;
+}
+
+static PyObject *Write_write_many(Write *self, PyObject *obj, PyObject *(*write)(Write *, PyObject *))
+{
+	const write_array_conv *conv = Write_array_conv(self);
+	if (conv && PyObject_CheckBuffer(obj)) {
+		Py_buffer view;
+		if (PyObject_GetBuffer(obj, &view, PyBUF_STRIDES | PyBUF_FORMAT)) {
+			PyErr_Clear();
+		} else {
+			PyObject *res = 0;
+			const int ok = Write_array_format_ok(conv, &view);
+			if (ok) res = Write_write_array_(self, conv, &view);
+			PyBuffer_Release(&view);
+			if (ok) return res;
+		}
+	}
+	PyObject *it = PyObject_GetIter(obj);
+	if (!it) return 0;
+	PyObject *item;
+	while ((item = PyIter_Next(it))) {
+		PyObject *res = write(self, item);
+		Py_DECREF(item);
+		if (!res) break;
+		Py_DECREF(res);
+	}
+	Py_DECREF(it);
+	if (PyErr_Occurred()) return 0;
+	Py_RETURN_NONE;
+}
+
+// A function to call with one argument, directly if it's a C function.
+typedef struct {
+	PyObject *func;
+	PyCFunction cfunc;
+	PyObject *cself;
+} split_func;
+
+static void split_func_set(split_func *f, PyObject *func)
+{
+	Py_INCREF(func);
+	f->func = func;
+	if (PyCFunction_Check(func) && (PyCFunction_GET_FLAGS(func) & ~METH_STATIC) == METH_O) {
+		f->cfunc = PyCFunction_GET_FUNCTION(func);
+		f->cself = PyCFunction_GET_SELF(func);
+	}
+}
+
+static inline PyObject *split_func_call(split_func *f, PyObject *arg)
+{
+	if (f->cfunc) return f->cfunc(f->cself, arg);
+	return PyObject_CallFunctionObjArgs(f->func, arg, 0);
+}
+
+// The split writer for DatasetWriter, calling the write function for
+// each column in the slice hashfunc (or round robin) picked.
+typedef struct splitwriter {
+	PyObject_HEAD
+	PyObject *names;
+	PyObject *keys;
+	split_func hashfunc;
+	split_func *writes;
+	unsigned int slices;
+	unsigned int columns;
+	int hashix;
+	int default_sliceno;
+	unsigned int next_sliceno;
+} SplitWriter;
+
+static int SplitWriter_init(PyObject *self_, PyObject *args, PyObject *kwds)
+{
+	SplitWriter *self = (SplitWriter *)self_;
+	static char *kwlist[] = {"writes", "names", "keys", "hashix", "hashfunc", "default_slice", 0};
+	PyObject *writes;
+	PyObject *names;
+	PyObject *keys;
+	int hashix = -1;
+	PyObject *hashfunc = 0;
+	int default_sliceno = -1;
+	if (self->names || self->writes) {
+		PyErr_Format(PyExc_RuntimeError, "Can't re-init %s", Py_TYPE(self)->tp_name);
+		return -1;
+	}
+	if (!PyArg_ParseTupleAndKeywords(
+		args, kwds, "O!O!O!|iOi", kwlist,
+		&PyList_Type, &writes,
+		&PyTuple_Type, &names,
+		&PyTuple_Type, &keys,
+		&hashix,
+		&hashfunc,
+		&default_sliceno
+	)) return -1;
+	const Py_ssize_t slices = PyList_GET_SIZE(writes);
+	const Py_ssize_t columns = PyTuple_GET_SIZE(names);
+	if (!slices || !columns || PyTuple_GET_SIZE(keys) != columns) {
+		PyErr_SetString(PyExc_ValueError, "Need at least one slice and column, and as many keys as names");
+		return -1;
+	}
+	if (hashix >= columns || (hashix >= 0 && (!hashfunc || hashfunc == Py_None))) {
+		PyErr_SetString(PyExc_ValueError, "Bad hashix or hashfunc");
+		return -1;
+	}
+	if (default_sliceno >= slices) {
+		PyErr_SetString(PyExc_ValueError, "Bad default_slice");
+		return -1;
+	}
+	self->writes = calloc(slices * columns, sizeof(split_func));
+	if (!self->writes) {
+		PyErr_NoMemory();
+		return -1;
+	}
+	self->slices = slices;
+	self->columns = columns;
+	for (Py_ssize_t sliceno = 0; sliceno < slices; sliceno++) {
+		PyObject *slice_writes = PyList_GET_ITEM(writes, sliceno);
+		if (!PyList_Check(slice_writes) || PyList_GET_SIZE(slice_writes) != columns) {
+			PyErr_SetString(PyExc_ValueError, "writes must be a list (per slice) of lists (per column) of write functions");
+			return -1;
+		}
+		for (Py_ssize_t ix = 0; ix < columns; ix++) {
+			split_func_set(self->writes + sliceno * columns + ix, PyList_GET_ITEM(slice_writes, ix));
+		}
+	}
+	Py_INCREF(names);
+	self->names = names;
+	Py_INCREF(keys);
+	self->keys = keys;
+	self->hashix = hashix;
+	if (hashix >= 0) split_func_set(&self->hashfunc, hashfunc);
+	self->default_sliceno = default_sliceno;
+	return 0;
+}
+
+static void SplitWriter_close_(SplitWriter *self)
+{
+	if (self->writes) {
+		for (unsigned int i = 0; i < self->slices * self->columns; i++) {
+			Py_XDECREF(self->writes[i].func);
+		}
+		free(self->writes);
+		self->writes = 0;
+	}
+	Py_CLEAR(self->hashfunc.func);
+}
+
+static PyObject *SplitWriter_close(SplitWriter *self)
+{
+	SplitWriter_close_(self);
+	Py_RETURN_NONE;
+}
+
+static void SplitWriter_dealloc(SplitWriter *self)
+{
+	SplitWriter_close_(self);
+	Py_XDECREF(self->names);
+	Py_XDECREF(self->keys);
+	PyObject_Del(self);
+}
+
+static PyObject *SplitWriter_write_(SplitWriter *self, PyObject **values)
+{
+	unsigned int sliceno;
+	if (self->hashix >= 0) {
+		PyObject *h = split_func_call(&self->hashfunc, values[self->hashix]);
+		if (h) {
+			const uint64_t h_value = pyLong_AsU64(h);
+			Py_DECREF(h);
+			if (h_value == (uint64_t)-1 && PyErr_Occurred()) return 0;
+			sliceno = h_value % self->slices;
+		} else if (self->default_sliceno >= 0 && (
+			PyErr_ExceptionMatches(PyExc_ValueError) ||
+			PyErr_ExceptionMatches(PyExc_TypeError) ||
+			PyErr_ExceptionMatches(PyExc_OverflowError)
+		)) {
+			PyErr_Clear();
+			sliceno = self->default_sliceno;
+		} else {
+			return 0;
+		}
+	} else {
+		sliceno = self->next_sliceno;
+		self->next_sliceno = (sliceno + 1) % self->slices;
+	}
+	split_func *writes = self->writes + sliceno * self->columns;
+	for (unsigned int ix = 0; ix < self->columns; ix++) {
+		PyObject *res = split_func_call(writes + ix, values[ix]);
+		if (!res) return 0;
+		Py_DECREF(res);
+	}
+	Py_RETURN_NONE;
+}
+
+static PyObject *SplitWriter_wrong_count(SplitWriter *self, Py_ssize_t count)
+{
+	PyErr_Format(PyExc_TypeError, "Expected %d values, got %zd", self->columns, count);
+	return 0;
+}
+
+static PyObject *SplitWriter_call(SplitWriter *self, PyObject *args, PyObject *kwds)
+{
+	if (!self->writes) return err_closed();
+	const Py_ssize_t count = PyTuple_GET_SIZE(args);
+	if (!kwds || !PyDict_Size(kwds)) {
+		if (count != self->columns) return SplitWriter_wrong_count(self, count);
+		return SplitWriter_write_(self, &PyTuple_GET_ITEM(args, 0));
+	}
+	// Slow path, arguments by name.
+	PyObject *values[self->columns];
+	Py_ssize_t got = count;
+	if (count > self->columns) return SplitWriter_wrong_count(self, count);
+	for (unsigned int ix = 0; ix < self->columns; ix++) {
+		if (ix < count) {
+			values[ix] = PyTuple_GET_ITEM(args, ix);
+			if (PyDict_GetItem(kwds, PyTuple_GET_ITEM(self->names, ix))) {
+				PyErr_Format(PyExc_TypeError, "Got multiple values for argument %S", PyTuple_GET_ITEM(self->names, ix));
+				return 0;
+			}
+		} else {
+			values[ix] = PyDict_GetItem(kwds, PyTuple_GET_ITEM(self->names, ix));
+			if (!values[ix]) {
+				PyErr_Format(PyExc_TypeError, "Missing argument %S", PyTuple_GET_ITEM(self->names, ix));
+				return 0;
+			}
+			got++;
+		}
+	}
+	if (got != count + PyDict_Size(kwds)) {
+		PyErr_SetString(PyExc_TypeError, "Unknown argument name");
+		return 0;
+	}
+	return SplitWriter_write_(self, values);
+}
+
+static PyObject *SplitWriter_write_list(SplitWriter *self, PyObject *obj)
+{
+	if (!self->writes) return err_closed();
+	PyObject *seq = PySequence_Fast(obj, "write_list needs a sequence");
+	if (!seq) return 0;
+	PyObject *res;
+	if (PySequence_Fast_GET_SIZE(seq) != self->columns) {
+		res = SplitWriter_wrong_count(self, PySequence_Fast_GET_SIZE(seq));
+	} else {
+		res = SplitWriter_write_(self, PySequence_Fast_ITEMS(seq));
+	}
+	Py_DECREF(seq);
+	return res;
+}
+
+static PyObject *SplitWriter_write_dict(SplitWriter *self, PyObject *obj)
+{
+	if (!self->writes) return err_closed();
+	PyObject *values[self->columns];
+	PyObject *res = 0;
+	unsigned int ix;
+	for (ix = 0; ix < self->columns; ix++) {
+		values[ix] = PyObject_GetItem(obj, PyTuple_GET_ITEM(self->keys, ix));
+		if (!values[ix]) goto err;
+	}
+	res = SplitWriter_write_(self, values);
+err:
+	while (ix--) Py_DECREF(values[ix]);
+	return res;
+}
+
+static PyMethodDef SplitWriter_methods[] = {
+	{"write_list", (PyCFunction)SplitWriter_write_list, METH_O, "write_list([value, value, ...])"},
+	{"write_dict", (PyCFunction)SplitWriter_write_dict, METH_O, "write_dict({key: value})"},
+	{"close",      (PyCFunction)SplitWriter_close     , METH_NOARGS, "close() - Release the write functions"},
+	{0}
+};
+
+static PyTypeObject SplitWriter_Type = {
+	PyVarObject_HEAD_INIT(NULL, 0)
+	"SplitWriter",                  /*tp_name*/
+	sizeof(SplitWriter),            /*tp_basicsize*/
+	0,                              /*tp_itemsize*/
+	(destructor)SplitWriter_dealloc,/*tp_dealloc*/
+	0,                              /*tp_print*/
+	0,                              /*tp_getattr*/
+	0,                              /*tp_setattr*/
+	0,                              /*tp_compare*/
+	0,                              /*tp_repr*/
+	0,                              /*tp_as_number*/
+	0,                              /*tp_as_sequence*/
+	0,                              /*tp_as_mapping*/
+	0,                              /*tp_hash*/
+	(ternaryfunc)SplitWriter_call,  /*tp_call*/
+	0,                              /*tp_str*/
+	0,                              /*tp_getattro*/
+	0,                              /*tp_setattro*/
+	0,                              /*tp_as_buffer*/
+	Py_TPFLAGS_DEFAULT,             /*tp_flags*/
+	"SplitWriter(writes, names, keys, hashix=-1, hashfunc=None, default_slice=-1)\n\n"
+	"Call it with the values for a line (positionally, or by names), or\n"
+	"use .write_list([values]) or .write_dict({key: value}). The slice\n"
+	"is hashfunc(values[hashix]) % len(writes), or default_slice if that\n"
+	"fails, or round robin if hashix is -1. writes[sliceno][ix] is\n"
+	"called with value ix. .close() releases the write functions.", /*tp_doc*/
+	0,                              /*tp_traverse*/
+	0,                              /*tp_clear*/
+	0,                              /*tp_richcompare*/
+	0,                              /*tp_weaklistoffset*/
+	0,                              /*tp_iter*/
+	0,                              /*tp_iternext*/
+	SplitWriter_methods,            /*tp_methods*/
+	0,                              /*tp_members*/
+	0,                              /*tp_getset*/
+	0,                              /*tp_base*/
+	0,                              /*tp_dict*/
+	0,                              /*tp_descr_get*/
+	0,                              /*tp_descr_set*/
+	0,                              /*tp_dictoffset*/
+	SplitWriter_init,               /*tp_init*/
+	PyType_GenericAlloc,            /*tp_alloc*/
+	PyType_GenericNew,              /*tp_new*/
+	PyObject_Del,                   /*tp_free*/
+	0,                              /*tp_is_gc*/
+};
+
+// Iterates rows from column iterators, translating (with a dict or a
+// function) and filtering the values on the way. This replaces a stack
+// of izip, imap and ifilter with one iterator.
+typedef struct rowiter {
+	PyObject_HEAD
+	PyObject *readers;
+	Py_ssize_t columns;
+	iternextfunc *nexts;
+	PyObject **trans_dicts;
+	split_func *trans_funcs;
+	// 0 for no filter, 1 for using the value directly, 2 for a function.
+	char *filter_kinds;
+	split_func *filter_funcs;
+	Py_ssize_t range_ix;
+	PyObject *range_bottom;
+	PyObject *range_top;
+	int want_tuple;
+	PyObject **values;
+} RowIter;
+
+static void RowIter_clear(RowIter *self)
+{
+	for (Py_ssize_t ix = 0; ix < self->columns; ix++) {
+		if (self->trans_dicts) Py_XDECREF(self->trans_dicts[ix]);
+		if (self->trans_funcs) Py_XDECREF(self->trans_funcs[ix].func);
+		if (self->filter_funcs) Py_XDECREF(self->filter_funcs[ix].func);
+	}
+	free(self->nexts);
+	free(self->trans_dicts);
+	free(self->trans_funcs);
+	free(self->filter_kinds);
+	free(self->filter_funcs);
+	free(self->values);
+	self->nexts = 0;
+	self->trans_dicts = 0;
+	self->trans_funcs = 0;
+	self->filter_kinds = 0;
+	self->filter_funcs = 0;
+	self->values = 0;
+	Py_CLEAR(self->readers);
+	Py_CLEAR(self->range_bottom);
+	Py_CLEAR(self->range_top);
+	self->columns = 0;
+}
+
+// ix from a {ix: thing} dict, or -1 with an exception.
+static Py_ssize_t RowIter_column(RowIter *self, PyObject *key)
+{
+	Py_ssize_t ix = PyNumber_AsSsize_t(key, PyExc_OverflowError);
+	if (ix == -1 && PyErr_Occurred()) return -1;
+	if (ix < 0 || ix >= self->columns) {
+		PyErr_Format(PyExc_ValueError, "Column %zd out of range", ix);
+		return -1;
+	}
+	return ix;
+}
+
+static int RowIter_init(PyObject *self_, PyObject *args, PyObject *kwds)
+{
+	RowIter *self = (RowIter *)self_;
+	static char *kwlist[] = {"readers", "translators", "filters", "range", "want_tuple", 0};
+	PyObject *readers;
+	PyObject *translators = Py_None;
+	PyObject *filters = Py_None;
+	PyObject *range = Py_None;
+	int want_tuple = 1;
+	if (!PyArg_ParseTupleAndKeywords(args, kwds, "O|OOOi", kwlist, &readers, &translators, &filters, &range, &want_tuple)) return -1;
+	RowIter_clear(self);
+	self->readers = PySequence_Tuple(readers);
+	if (!self->readers) return -1;
+	const Py_ssize_t columns = PyTuple_GET_SIZE(self->readers);
+	if (!columns || (!want_tuple && columns != 1)) {
+		PyErr_SetString(PyExc_ValueError, "Need at least one reader (and exactly one without want_tuple)");
+		goto err;
+	}
+	self->columns = columns;
+	self->want_tuple = want_tuple;
+	self->nexts = calloc(columns, sizeof(iternextfunc));
+	self->trans_dicts = calloc(columns, sizeof(PyObject *));
+	self->trans_funcs = calloc(columns, sizeof(split_func));
+	self->filter_kinds = calloc(columns, 1);
+	self->filter_funcs = calloc(columns, sizeof(split_func));
+	self->values = calloc(columns, sizeof(PyObject *));
+	if (!self->nexts || !self->trans_dicts || !self->trans_funcs || !self->filter_kinds || !self->filter_funcs || !self->values) {
+		PyErr_NoMemory();
+		goto err;
+	}
+	for (Py_ssize_t ix = 0; ix < columns; ix++) {
+		PyObject *reader = PyTuple_GET_ITEM(self->readers, ix);
+		if (!PyIter_Check(reader)) {
+			PyErr_Format(PyExc_TypeError, "Reader %zd is not an iterator", ix);
+			goto err;
+		}
+		self->nexts[ix] = Py_TYPE(reader)->tp_iternext;
+	}
+	PyObject *key, *value;
+	Py_ssize_t pos = 0;
+	if (translators != Py_None) {
+		if (!PyDict_Check(translators)) {
+			PyErr_SetString(PyExc_TypeError, "translators must be a dict {ix: dict or function}");
+			goto err;
+		}
+		while (PyDict_Next(translators, &pos, &key, &value)) {
+			Py_ssize_t ix = RowIter_column(self, key);
+			if (ix < 0) goto err;
+			if (PyDict_Check(value)) {
+				Py_INCREF(value);
+				self->trans_dicts[ix] = value;
+			} else {
+				split_func_set(&self->trans_funcs[ix], value);
+			}
+		}
+	}
+	if (filters != Py_None) {
+		if (!PyDict_Check(filters)) {
+			PyErr_SetString(PyExc_TypeError, "filters must be a dict {ix: function or None}");
+			goto err;
+		}
+		pos = 0;
+		while (PyDict_Next(filters, &pos, &key, &value)) {
+			Py_ssize_t ix = RowIter_column(self, key);
+			if (ix < 0) goto err;
+			if (value == Py_None || value == (PyObject *)&PyBool_Type) {
+				self->filter_kinds[ix] = 1;
+			} else {
+				self->filter_kinds[ix] = 2;
+				split_func_set(&self->filter_funcs[ix], value);
+			}
+		}
+	}
+	self->range_ix = -1;
+	if (range != Py_None) {
+		PyObject *range_ix;
+		if (!PyArg_ParseTuple(range, "OOO", &range_ix, &self->range_bottom, &self->range_top)) goto err;
+		Py_INCREF(self->range_bottom);
+		Py_INCREF(self->range_top);
+		self->range_ix = RowIter_column(self, range_ix);
+		if (self->range_ix < 0) goto err;
+	}
+	return 0;
+err:
+	RowIter_clear(self);
+	return -1;
+}
+
+static void RowIter_dealloc(RowIter *self)
+{
+	RowIter_clear(self);
+	PyObject_Del(self);
+}
+
+// 1 if the row matches, 0 if not, -1 on error.
+static int RowIter_match(RowIter *self)
+{
+	if (self->range_ix >= 0) {
+		PyObject *v = self->values[self->range_ix];
+		if (v == Py_None) return 0;
+		if (self->range_bottom != Py_None) {
+			int r = PyObject_RichCompareBool(v, self->range_bottom, Py_GE);
+			if (r <= 0) return r;
+		}
+		if (self->range_top != Py_None) {
+			int r = PyObject_RichCompareBool(v, self->range_top, Py_LT);
+			if (r <= 0) return r;
+		}
+	}
+	for (Py_ssize_t ix = 0; ix < self->columns; ix++) {
+		const int kind = self->filter_kinds[ix];
+		if (!kind) continue;
+		int r;
+		if (kind == 1) {
+			r = PyObject_IsTrue(self->values[ix]);
+		} else {
+			PyObject *res = split_func_call(&self->filter_funcs[ix], self->values[ix]);
+			if (!res) return -1;
+			r = PyObject_IsTrue(res);
+			Py_DECREF(res);
+		}
+		if (r <= 0) return r;
+	}
+	return 1;
+}
+
+static PyObject *RowIter_iternext(RowIter *self)
+{
+	if (!self->readers) return 0;
+	const Py_ssize_t columns = self->columns;
+	PyObject **values = self->values;
+	while (1) {
+		Py_ssize_t ix;
+		for (ix = 0; ix < columns; ix++) {
+			PyObject *v = self->nexts[ix](PyTuple_GET_ITEM(self->readers, ix));
+			if (!v) goto err;
+			if (self->trans_dicts[ix]) {
+#if PY_MAJOR_VERSION < 3
+				PyObject *t = PyDict_GetItem(self->trans_dicts[ix], v);
+#else
+				PyObject *t = PyDict_GetItemWithError(self->trans_dicts[ix], v);
+#endif
+				Py_DECREF(v);
+				if (!t) {
+					if (PyErr_Occurred()) goto err;
+					t = Py_None;
+				}
+				Py_INCREF(t);
+				v = t;
+			} else if (self->trans_funcs[ix].func) {
+				PyObject *t = split_func_call(&self->trans_funcs[ix], v);
+				Py_DECREF(v);
+				if (!t) goto err;
+				v = t;
+			}
+			values[ix] = v;
+		}
+		int r = RowIter_match(self);
+		if (r == 1) break;
+		for (ix = 0; ix < columns; ix++) Py_DECREF(values[ix]);
+		if (r < 0) return 0;
+		continue;
+err:
+		while (ix--) Py_DECREF(values[ix]);
+		return 0;
+	}
+	if (!self->want_tuple) return values[0];
+	PyObject *res = PyTuple_New(columns);
+	if (!res) {
+		for (Py_ssize_t ix = 0; ix < columns; ix++) Py_DECREF(values[ix]);
+		return 0;
+	}
+	for (Py_ssize_t ix = 0; ix < columns; ix++) PyTuple_SET_ITEM(res, ix, values[ix]);
+	return res;
+}
+
+static PyTypeObject RowIter_Type = {
+	PyVarObject_HEAD_INIT(NULL, 0)
+	"RowIter",                      /*tp_name*/
+	sizeof(RowIter),                /*tp_basicsize*/
+	0,                              /*tp_itemsize*/
+	(destructor)RowIter_dealloc,    /*tp_dealloc*/
+	0,                              /*tp_print*/
+	0,                              /*tp_getattr*/
+	0,                              /*tp_setattr*/
+	0,                              /*tp_compare*/
+	0,                              /*tp_repr*/
+	0,                              /*tp_as_number*/
+	0,                              /*tp_as_sequence*/
+	0,                              /*tp_as_mapping*/
+	0,                              /*tp_hash*/
+	0,                              /*tp_call*/
+	0,                              /*tp_str*/
+	0,                              /*tp_getattro*/
+	0,                              /*tp_setattro*/
+	0,                              /*tp_as_buffer*/
+	Py_TPFLAGS_DEFAULT,             /*tp_flags*/
+	"RowIter(readers, translators=None, filters=None, range=None, want_tuple=True)\n\n"
+	"Iterate tuples of values from the readers (any iterators), stopping\n"
+	"when any of them ends. translators is {ix: dict or function}, where\n"
+	"values missing from a dict become None. filters is {ix: function}\n"
+	"(or None to use the value directly) and only rows where all filters\n"
+	"return true are produced. range is (ix, bottom, top) and only rows\n"
+	"where bottom <= value < top (and value is not None) are produced.\n"
+	"Either of bottom and top may be None. Filtering happens after\n"
+	"translation. Without want_tuple there must be exactly one reader,\n"
+	"and you get just the values.", /*tp_doc*/
+	0,                              /*tp_traverse*/
+	0,                              /*tp_clear*/
+	0,                              /*tp_richcompare*/
+	0,                              /*tp_weaklistoffset*/
+	PyObject_SelfIter,              /*tp_iter*/
+	(iternextfunc)RowIter_iternext, /*tp_iternext*/
+	0,                              /*tp_methods*/
+	0,                              /*tp_members*/
+	0,                              /*tp_getset*/
+	0,                              /*tp_base*/
+	0,                              /*tp_dict*/
+	0,                              /*tp_descr_get*/
+	0,                              /*tp_descr_set*/
+	0,                              /*tp_dictoffset*/
+	RowIter_init,                   /*tp_init*/
+	PyType_GenericAlloc,            /*tp_alloc*/
+	PyType_GenericNew,              /*tp_new*/
+	PyObject_Del,                   /*tp_free*/
+	0,                              /*tp_is_gc*/
+};
+
+// Takes one value from each iterator in turn, dropping iterators as
+// they end. This is what iterate_list uses for sliceno="roundrobin".
+typedef struct roundrobin {
+	PyObject_HEAD
+	PyObject **iters;
+	Py_ssize_t count;
+	Py_ssize_t pos;
+} RoundRobin;
+
+static void RoundRobin_clear(RoundRobin *self)
+{
+	for (Py_ssize_t ix = 0; ix < self->count; ix++) {
+		Py_DECREF(self->iters[ix]);
+	}
+	free(self->iters);
+	self->iters = 0;
+	self->count = 0;
+	self->pos = 0;
+}
+
+static int RoundRobin_init(PyObject *self_, PyObject *args, PyObject *kwds)
+{
+	RoundRobin *self = (RoundRobin *)self_;
+	static char *kwlist[] = {"iterators", 0};
+	PyObject *iterators;
+	if (!PyArg_ParseTupleAndKeywords(args, kwds, "O", kwlist, &iterators)) return -1;
+	RoundRobin_clear(self);
+	PyObject *seq = PySequence_Fast(iterators, "iterators must be a sequence");
+	if (!seq) return -1;
+	const Py_ssize_t count = PySequence_Fast_GET_SIZE(seq);
+	self->iters = calloc(count ? count : 1, sizeof(PyObject *));
+	if (!self->iters) {
+		Py_DECREF(seq);
+		PyErr_NoMemory();
+		return -1;
+	}
+	for (Py_ssize_t ix = 0; ix < count; ix++) {
+		PyObject *it = PyObject_GetIter(PySequence_Fast_GET_ITEM(seq, ix));
+		if (!it) {
+			Py_DECREF(seq);
+			RoundRobin_clear(self);
+			return -1;
+		}
+		self->iters[self->count++] = it;
+	}
+	Py_DECREF(seq);
+	return 0;
+}
+
+static void RoundRobin_dealloc(RoundRobin *self)
+{
+	RoundRobin_clear(self);
+	PyObject_Del(self);
+}
+
+static PyObject *RoundRobin_iternext(RoundRobin *self)
+{
+	while (self->count) {
+		if (self->pos >= self->count) self->pos = 0;
+		PyObject *it = self->iters[self->pos];
+		PyObject *v = Py_TYPE(it)->tp_iternext(it);
+		if (v) {
+			self->pos++;
+			return v;
+		}
+		if (PyErr_Occurred()) {
+			if (!PyErr_ExceptionMatches(PyExc_StopIteration)) return 0;
+			PyErr_Clear();
+		}
+		// This one has ended, the next one takes its place.
+		Py_DECREF(it);
+		self->count--;
+		memmove(self->iters + self->pos, self->iters + self->pos + 1, (self->count - self->pos) * sizeof(PyObject *));
+	}
+	return 0;
+}
+
+static PyTypeObject RoundRobin_Type = {
+	PyVarObject_HEAD_INIT(NULL, 0)
+	"RoundRobin",                   /*tp_name*/
+	sizeof(RoundRobin),             /*tp_basicsize*/
+	0,                              /*tp_itemsize*/
+	(destructor)RoundRobin_dealloc, /*tp_dealloc*/
+	0,                              /*tp_print*/
+	0,                              /*tp_getattr*/
+	0,                              /*tp_setattr*/
+	0,                              /*tp_compare*/
+	0,                              /*tp_repr*/
+	0,                              /*tp_as_number*/
+	0,                              /*tp_as_sequence*/
+	0,                              /*tp_as_mapping*/
+	0,                              /*tp_hash*/
+	0,                              /*tp_call*/
+	0,                              /*tp_str*/
+	0,                              /*tp_getattro*/
+	0,                              /*tp_setattro*/
+	0,                              /*tp_as_buffer*/
+	Py_TPFLAGS_DEFAULT,             /*tp_flags*/
+	"RoundRobin(iterators)\n\n"
+	"Iterate one value from each of the iterators in turn. When one\n"
+	"ends the others continue, until all have ended.", /*tp_doc*/
+	0,                              /*tp_traverse*/
+	0,                              /*tp_clear*/
+	0,                              /*tp_richcompare*/
+	0,                              /*tp_weaklistoffset*/
+	PyObject_SelfIter,              /*tp_iter*/
+	(iternextfunc)RoundRobin_iternext, /*tp_iternext*/
+	0,                              /*tp_methods*/
+	0,                              /*tp_members*/
+	0,                              /*tp_getset*/
+	0,                              /*tp_base*/
+	0,                              /*tp_dict*/
+	0,                              /*tp_descr_get*/
+	0,                              /*tp_descr_set*/
+	0,                              /*tp_dictoffset*/
+	RoundRobin_init,                /*tp_init*/
+	PyType_GenericAlloc,            /*tp_alloc*/
+	PyType_GenericNew,              /*tp_new*/
+	PyObject_Del,                   /*tp_free*/
+	0,                              /*tp_is_gc*/
+};
+
 static PyObject *generic_hash(PyObject *dummy, PyObject *obj)
 {
 	if (obj == Py_None)        return PyInt_FromLong(0);
@@ -2143,9 +5109,23 @@ static PyObject *siphash24(PyObject *dummy, PyObject *args)
 	return pyInt_FromU64(res);
 }
 
+static PyObject *bloom_check(PyObject *dummy, PyObject *args)
+{
+	const char *data;
+	Py_ssize_t len;
+	unsigned PY_LONG_LONG h;
+	if (!PyArg_ParseTuple(args, "s#K", &data, &len, &h)) return 0;
+	if (len < 8 || (len & (len - 1))) {
+		PyErr_Format(PyExc_ValueError, "Bad bloom filter length %zd", len);
+		return 0;
+	}
+	return PyBool_FromLong(bloom_bits((unsigned char *)data, (uint64_t)len * 8, h, 0));
+}
+
 static PyMethodDef module_methods[] = {
 	{"hash", generic_hash, METH_O, "hash(v) - The hash a writer for type(v) would have used to slice v"},
 	{"siphash24", siphash24, METH_VARARGS, "siphash24(v, k=...) - SipHash-2-4 of v, defaults to the same k as the slicing hash"},
+	{"bloom_check", bloom_check, METH_VARARGS, "bloom_check(filter, h) - False if a value with hash h was definitely not written to a writer with this bloom_filter"},
 	{0}
 };
 
@@ -2219,6 +5199,7 @@ __attribute__ ((visibility("default"))) PyMODINIT_FUNC INITFUNC(void)
 	if (!m) return INITERR;
 	INIT(ReadBytes);
 	INIT(ReadUnicode);
+	INIT(ReadDictUnicode);
 	INIT(ReadAscii);
 	INIT(ReadNumber);
 	INIT(ReadComplex64);
@@ -2235,6 +5216,7 @@ __attribute__ ((visibility("default"))) PyMODINIT_FUNC INITFUNC(void)
 	INIT(ReadTime);
 	INIT(WriteBytes);
 	INIT(WriteUnicode);
+	INIT(WriteDictUnicode);
 	INIT(WriteAscii);
 	INIT(WriteNumber);
 	INIT(WriteComplex64);
@@ -2258,11 +5240,26 @@ __attribute__ ((visibility("default"))) PyMODINIT_FUNC INITFUNC(void)
 	INIT(WriteParsedInt32);
 	INIT(WriteParsedBits64);
 	INIT(WriteParsedBits32);
+	INIT(SplitWriter);
+	INIT(RowIter);
+	INIT(RoundRobin);
 	compression_dict = PyDict_New();
 	if (!compression_dict) return INITERR;
-	compression_funcs[1] = &dsu_gz;
-	compression_names[1] = PyUnicode_FromString("gzip");
-	if (PyDict_SetItem(compression_dict, compression_names[1], PyInt_FromLong(1))) return INITERR;
+	PyObject *compressions = PyList_New(0);
+	if (!compressions) return INITERR;
+	for (int i = 0; dsu_compressors[i] && i + 1 < MAX_COMPRESSORS; i++) {
+		const int idx = i + 1; // 0 is not used
+		compression_funcs[idx] = dsu_compressors[i];
+		compression_names[idx] = PyUnicode_FromString(dsu_compressors[i]->name);
+		if (!compression_names[idx]) return INITERR;
+		if (PyDict_SetItem(compression_dict, compression_names[idx], PyInt_FromLong(idx))) return INITERR;
+		if (PyList_Append(compressions, compression_names[idx])) return INITERR;
+	}
+	PyModule_AddObject(m, "compressions", PyList_AsTuple(compressions));
+	PyModule_AddIntConstant(m, "zone_rows", ZONE_ROWS);
+	PyModule_AddIntConstant(m, "hist_e", HIST_E);
+	PyModule_AddObject(m, "encodings", Py_BuildValue("(ss)", encoding_names[ENC_DELTA], encoding_names[ENC_RLE]));
+	Py_DECREF(compressions);
 #if PY_MAJOR_VERSION >= 3
 	return m;
 #endif
@@ -23,10 +23,11 @@
 
 from __future__ import division, print_function, unicode_literals
 
-from datetime import datetime, date, time
+from datetime import datetime, date, time, timedelta
 from sys import version_info
 from itertools import compress
 from os import unlink
+from os.path import getsize
 from functools import partial
 
 from accelerator import _dsutil
@@ -56,7 +57,7 @@ if version_info > (3, 6, 0):
 	tm1 = tm1.replace(fold=1)
 
 def forstrings(name):
-	return name in ("Bytes", "Ascii", "Unicode")
+	return name in ("Bytes", "Ascii", "Unicode", "DictUnicode")
 def can_minmax(name):
 	return 'Complex' not in name and not forstrings(name)
 
@@ -74,6 +75,7 @@ for name, data, bad_cnt, res_data in (
 	("Bytes"         , [42, str, u"a", b"\n", b"\0", b"", None, b"long" * 1000, b"a\r", b"a\r\n", b"a\nb\0c"], 3, [b"\n", b"\0", b"", None, b"long" * 1000, b"a\r", b"a\r\n", b"a\nb\0c"]),
 	("Ascii"         , [42, str, u"foo\xe4", u"a", b"\n", b"\0", b"", None, b"long" * 1000, b"a\r", b"a\r\n", u"a\nb\0c"], 3, [str("a"), str("\n"), str("\0"), str(""), None, str("long" * 1000), str("a\r"), str("a\r\n"), str("a\nb\0c")]),
 	("Unicode"         , [42, str, b"a", u"foo\xe4", u"\n", u"\0", u"", None, u"long" * 1000, u"a\r", "a\r\n", "a\nb\0c"], 3, [u"foo\xe4", u"\n", u"\0", u"", None, u"long" * 1000, u"a\r", u"a\r\n", u"a\nb\0c"]),
+	("DictUnicode"   , [42, str, b"a", u"foo\xe4", u"\n", u"\0", u"", None, u"long" * 1000, u"a\r", "a\r\n", "a\nb\0c", u"\n", u"long" * 1000], 3, [u"foo\xe4", u"\n", u"\0", u"", None, u"long" * 1000, u"a\r", u"a\r\n", u"a\nb\0c", u"\n", u"long" * 1000]),
 	("DateTime"      , [42, "now", tm0, dttm0, dttm1, dttm2, None], 3, [dttm0, dttm1, dttm2, None]),
 	("Date"          , [42, "now", tm0, dttm0, dttm1, dttm2, dt0, None], 3, [dttm0.date(), dttm1.date(), dttm2.date(), dt0, None]),
 	("Time"          , [42, "now", dttm0, tm0, tm1, tm2, None], 3, [tm0, tm1, tm2, None]),
@@ -345,4 +347,727 @@ with _dsutil.ReadNumber(TMP_FN, callback=callback3, callback_interval=1, compres
 		good = True
 	assert good
 
+print("Compressions")
+data = [b"a" * n for n in range(1000)] + [b"b" * (300 * 1024), None, b"c"]
+for compression in _dsutil.compressions:
+	sizes = []
+	with open(TMP_FN, "wb") as concat_fh:
+		for part in (data, data[::-1]):
+			with _dsutil.WriteBytes(TMP_FN + ".part", compression=compression, none_support=True) as fh:
+				for v in part:
+					fh.write(v)
+			with open(TMP_FN + ".part", "rb") as fh:
+				part_data = fh.read()
+			sizes.append(len(part_data))
+			concat_fh.write(part_data)
+	unlink(TMP_FN + ".part")
+	with _dsutil.ReadBytes(TMP_FN, compression=compression) as fh:
+		assert list(fh) == data + data[::-1], compression + " fails to read concatenated data"
+	with _dsutil.ReadBytes(TMP_FN, compression=compression, want_count=len(data)) as fh:
+		assert list(fh) == data, compression + " fails with want_count"
+	with _dsutil.ReadBytes(TMP_FN, compression=compression, seek=sizes[0]) as fh:
+		assert list(fh) == data[::-1], compression + " fails with seek"
+	other = [c for c in _dsutil.compressions if c != compression][0]
+	try:
+		with _dsutil.ReadBytes(TMP_FN, compression=other) as fh:
+			list(fh)
+		raise Exception("%s read %s data" % (other, compression,))
+	except (IOError, ValueError):
+		pass
+
+unlink(TMP_FN)
+
+print("Uncompressed fixed width (mmap)")
+numbers = list(range(-5000, 5000)) + [None]
+with _dsutil.WriteInt64(TMP_FN, compression="none", none_support=True) as fh:
+	for v in numbers * 2:
+		fh.write(v)
+size = 8 * len(numbers)
+with _dsutil.ReadInt64(TMP_FN, compression="none") as fh:
+	assert list(fh) == numbers * 2, "none fails to read int64"
+with _dsutil.ReadInt64(TMP_FN, compression="none", want_count=len(numbers)) as fh:
+	assert list(fh) == numbers, "none fails with want_count"
+with _dsutil.ReadInt64(TMP_FN, compression="none", seek=size + 8, want_count=3) as fh:
+	assert list(fh) == numbers[1:4], "none fails with seek"
+with _dsutil.ReadInt64(TMP_FN, compression="none", seek=size * 2) as fh:
+	assert list(fh) == [], "none fails at EOF"
+try:
+	with _dsutil.ReadInt64(TMP_FN, compression="none", seek=size, want_count=len(numbers) + 1) as fh:
+		list(fh)
+	raise Exception("none read more data than there is")
+except ValueError:
+	pass
+with open(TMP_FN, "ab") as fh:
+	fh.write(b"x")
+try:
+	with _dsutil.ReadInt64(TMP_FN, compression="none") as fh:
+		list(fh)
+	raise Exception("none accepted a partial value")
+except ValueError:
+	pass
+
+unlink(TMP_FN)
+
+print("readinto")
+from array import array
+for compression in _dsutil.compressions:
+	with _dsutil.WriteInt64(TMP_FN, compression=compression, none_support=True) as fh:
+		for v in numbers:
+			fh.write(v)
+	with _dsutil.ReadInt64(TMP_FN, compression=compression, want_count=len(numbers) - 10) as fh:
+		a = array("q", [0] * 4000)
+		mask = bytearray(4000)
+		assert fh.readinto(a, mask) == 4000, compression
+		assert fh.readinto(a[:1]) == 1, compression
+		assert next(fh) == numbers[4001], compression
+		a = array("q", [0] * 10000)
+		mask = bytearray(10000)
+		got = fh.readinto(a, mask)
+		assert got == len(numbers) - 4012, compression
+		assert list(a[:got]) == numbers[4002:-10], compression
+		assert list(mask) == [0] * 10000, compression
+		assert fh.readinto(a) == 0, compression
+	with _dsutil.ReadInt64(TMP_FN, compression=compression) as fh:
+		a = array("q", [0] * 20000)
+		mask = bytearray(20000)
+		assert fh.readinto(a, mask) == len(numbers), compression
+		assert list(mask[:len(numbers)]) == [0] * (len(numbers) - 1) + [1], compression
+with _dsutil.WriteDate(TMP_FN, compression="none", none_support=True) as fh:
+	for v in (date(1970, 1, 2), date(1969, 12, 31), None, date(2000, 3, 1)):
+		fh.write(v)
+with _dsutil.ReadDate(TMP_FN, compression="none") as fh:
+	a = array("q", [0] * 4)
+	assert fh.readinto(a) == 4
+	assert list(a) == [1, -1, -2 ** 63, 11017], a
+with _dsutil.WriteTime(TMP_FN) as fh:
+	fh.write(tm1)
+with _dsutil.ReadTime(TMP_FN) as fh:
+	a = array("q", [0])
+	assert fh.readinto(a) == 1
+	assert a[0] == (2 * 60 + 42) * 60000000 + 3, a
+try:
+	with _dsutil.ReadBytes(TMP_FN) as fh:
+		fh.readinto(bytearray(10))
+	raise Exception("ReadBytes supports readinto")
+except TypeError:
+	pass
+
+unlink(TMP_FN)
+
+print("read_chunk")
+data_u = ["a", None, "\u00e5" * 300] * 300 + ["end"]
+with _dsutil.WriteUnicode(TMP_FN, none_support=True) as fh:
+	for v in data_u:
+		fh.write(v)
+for want_count, want_end in ((-1, len(data_u)), (len(data_u) - 1, -1)):
+	with _dsutil.ReadUnicode(TMP_FN, want_count=want_count) as fh:
+		got = fh.read_chunk(3)
+		assert got == data_u[:3], "read_chunk(3)"
+		assert next(fh) == data_u[3]
+		got = fh.read_chunk(0)
+		assert got == [], got
+		got = fh.read_chunk(len(data_u) * 2)
+		assert got == data_u[4:want_end], "read_chunk with want_count=%d" % (want_count,)
+		assert fh.read_chunk(10) == []
+with _dsutil.ReadUnicode(TMP_FN, hashfilter=(1, 3)) as fh:
+	assert fh.read_chunk(len(data_u)) == list(_dsutil.ReadUnicode(TMP_FN, hashfilter=(1, 3)))
+
+unlink(TMP_FN)
+
+print("skip")
+skip_data = {
+	"Int64": list(range(-100, 100000)) + [None],
+	"Number": [None, 1, 1000, 100000, 2 ** 40, 2 ** 100, -(2 ** 200), 0.5] * 10000,
+	"Unicode": data_u * 10,
+	"DictUnicode": data_u * 10 + ["x%d" % (ix,) for ix in range(70000)] + data_u,
+	"Date": [date(2000 + ix % 10, 1, 1) for ix in range(20000)],
+}
+for name, values in sorted(skip_data.items()):
+	for compression in _dsutil.compressions:
+		with getattr(_dsutil, "Write" + name)(TMP_FN, compression=compression, none_support=True) as fh:
+			for v in values:
+				fh.write(v)
+		for want_count in (-1, len(values) - 7):
+			with getattr(_dsutil, "Read" + name)(TMP_FN, compression=compression, want_count=want_count) as fh:
+				want = values[:want_count] if want_count > 0 else values
+				assert fh.skip(0) == 0
+				assert next(fh) == want[0]
+				assert fh.skip(3) == 3
+				assert next(fh) == want[4], name + " " + compression
+				assert fh.skip(len(want) - 10) == len(want) - 10, name + " " + compression
+				assert list(fh) == want[-5:], name + " " + compression
+				assert fh.skip(10) == 0
+
+unlink(TMP_FN)
+
+print("blocks")
+zone_rows = _dsutil.zone_rows
+for name, values in sorted(skip_data.items()) + [
+	("Bool", [True, False, None] * zone_rows),
+	("Bytes", [b"x" * 300, None] * zone_rows),
+]:
+	for compression in _dsutil.compressions:
+		with getattr(_dsutil, "Write" + name)(TMP_FN, compression=compression, none_support=True) as fh:
+			assert fh.blocks is None
+			for v in values:
+				fh.write(v)
+		blocks = fh.blocks or []
+		assert len(blocks) == (len(values) - 1) // zone_rows, name + " " + compression
+		assert blocks == sorted(set(blocks)), name + " " + compression
+		with getattr(_dsutil, "Read" + name)(TMP_FN, compression=compression) as fh:
+			assert list(fh) == values, name + " " + compression
+		for ix, seek in enumerate(blocks, 1):
+			start = ix * zone_rows
+			with getattr(_dsutil, "Read" + name)(TMP_FN, compression=compression, seek=seek, want_count=len(values) - start) as fh:
+				assert next(fh) == values[start], name + " " + compression
+				assert fh.skip(7) == 7
+				assert list(fh) == values[start + 8:], name + " " + compression
+
+print("readahead")
+for name, values in sorted(skip_data.items()) + [
+	("Bytes", [b"x" * (300 * 1024), None, b"y"] * 10 + [b"z" * ix for ix in range(3000)]),
+]:
+	for compression in _dsutil.compressions:
+		with getattr(_dsutil, "Write" + name)(TMP_FN, compression=compression, none_support=True) as fh:
+			for v in values:
+				fh.write(v)
+		for want_count in (-1, len(values) - 7, 3):
+			want = values[:want_count] if want_count > 0 else values
+			with getattr(_dsutil, "Read" + name)(TMP_FN, compression=compression, want_count=want_count, readahead=True) as fh:
+				assert list(fh) == want, name + " " + compression
+			with getattr(_dsutil, "Read" + name)(TMP_FN, compression=compression, want_count=want_count, readahead=True) as fh:
+				assert next(fh) == want[0], name + " " + compression
+				assert fh.skip(len(want) - 2) == len(want) - 2, name + " " + compression
+				assert list(fh) == want[-1:], name + " " + compression
+		# closing before the end has to stop the thread
+		for _ in range(20):
+			with getattr(_dsutil, "Read" + name)(TMP_FN, compression=compression, readahead=True) as fh:
+				assert next(fh) == values[0], name + " " + compression
+
+unlink(TMP_FN)
+
+print("write_many and write_array")
+# array.array has no (new style) buffer interface in python 2
+if version_info[0] > 2:
+	for name, typecode, values in (
+		("Int64", "q", [1, -2, -(2 ** 63), 2 ** 62]),
+		("Int32", "i", [1, -2, -(2 ** 31), 2 ** 30]),
+		("Bits64", "Q", [1, 2 ** 64 - 1]),
+		("Bits32", "I", [1, 2 ** 32 - 1]),
+		("Float64", "d", [1.5, -2.0, 1e300]),
+		("Float32", "f", [1.5, -2.0, 1e30]),
+	):
+		none_support = not name.startswith("Bits")
+		want = values + values[::-1]
+		if none_support:
+			# -(2 ** bits) is the None-marker for IntXX
+			want = [None if name.startswith("Int") and v < -2 ** 30 else v for v in want]
+		want = [v if v is None or name != "Float32" else array("f", [v])[0] for v in want]
+		for how in ("write_many", "write_array", "list", "strided"):
+			with getattr(_dsutil, "Write" + name)(TMP_FN, none_support=none_support) as fh:
+				if how == "list":
+					fh.write_many(want[:len(values)])
+					fh.write_many(iter(want[len(values):]))
+				elif how == "strided":
+					fh.write_many(memoryview(array(typecode, [v for v in values for _ in "ab"]))[::2])
+					fh.write_array(memoryview(array(typecode, values))[::-1])
+				else:
+					getattr(fh, how)(array(typecode, values))
+					getattr(fh, how)(array(typecode, values[::-1]))
+				assert fh.count == len(want), name + " " + how
+				not_none = [v for v in want if v is not None]
+				assert (fh.min, fh.max) == (min(not_none), max(not_none)), name + " " + how
+			with getattr(_dsutil, "Read" + name)(TMP_FN) as fh:
+				assert list(fh) == want, name + " " + how
+		with getattr(_dsutil, "Write" + name)(TMP_FN) as fh:
+			if none_support:
+				try:
+					# The None-marker can't be written without none_support
+					fh.write_array(array(typecode, values))
+					assert name.startswith("Float"), name
+				except ValueError:
+					pass
+			for bad in (array("b", [1]), array("d" if typecode != "d" else "f", [1]), b"\x01" * 8):
+				try:
+					fh.write_array(bad)
+					raise Exception("%s.write_array accepted %r" % (name, bad,))
+				except TypeError:
+					pass
+	with _dsutil.WriteBool(TMP_FN) as fh:
+		fh.write_array(memoryview(b"\x01\x00\x01").cast("?"))
+		fh.write_many(b"\x00\x01")
+		fh.write_many([True, 0])
+	with _dsutil.ReadBool(TMP_FN) as fh:
+		assert list(fh) == [True, False, True, False, True, True, False]
+	with _dsutil.WriteInt64(TMP_FN, hashfilter=(1, 3)) as fh:
+		fh.write_array(array("q", range(100)))
+		fh.write_many(range(100, 200))
+	with _dsutil.ReadInt64(TMP_FN) as fh:
+		assert list(fh) == [v for v in range(200) if _dsutil.WriteInt64.hash(v) % 3 == 1]
+for name, values in sorted(skip_data.items()):
+	with getattr(_dsutil, "Write" + name)(TMP_FN, none_support=True) as fh:
+		fh.write_many(values)
+		try:
+			fh.write_array(b"x" * 8)
+			raise Exception("Write%s accepted write_array" % (name,))
+		except TypeError:
+			pass
+	with getattr(_dsutil, "Read" + name)(TMP_FN) as fh:
+		assert list(fh) == values, name
+with _dsutil.WriteUnicode(TMP_FN) as fh:
+	try:
+		fh.write_many(["a", 1, "b"])
+		raise Exception("WriteUnicode.write_many accepted an int")
+	except TypeError:
+		pass
+	assert fh.count == 1
+
+print("SplitWriter")
+got = [[] for _ in range(3)]
+writes = [[got[sliceno].append, lambda v: None] for sliceno in range(3)]
+split = _dsutil.SplitWriter(writes, ("a", "b"), ("A", "B"))
+for v in range(7):
+	split(v, None)
+assert got == [[0, 3, 6], [1, 4], [2, 5]], got
+got = [[] for _ in range(3)]
+writers = [(_dsutil.WriteInt64("%s.%d.a" % (TMP_FN, sliceno), default=0), _dsutil.WriteUnicode("%s.%d.b" % (TMP_FN, sliceno))) for sliceno in range(3)]
+writes = [[w.write for w in writers[sliceno]] + [got[sliceno].append] for sliceno in range(3)]
+split = _dsutil.SplitWriter(writes, ("a", "b", "c"), ("A", "B", "C"), hashix=0, hashfunc=_dsutil.WriteInt64.hash, default_slice=1)
+for v in range(100):
+	split(v, "x", v)
+	split.write_list([v, "y", v])
+	split.write_dict({"A": v, "B": "z", "C": v})
+	split(v, c=v, b="w")
+split("bad", "x", "bad")
+for sliceno in range(3):
+	want = [v for v in range(100) if _dsutil.WriteInt64.hash(v) % 3 == sliceno for _ in range(4)]
+	if sliceno == 1:
+		want.append("bad")
+	assert got[sliceno] == want, sliceno
+for bad in ((1, "x"), (1, "x", 1, 1), ()):
+	try:
+		split(*bad)
+		raise Exception("SplitWriter accepted %r" % (bad,))
+	except TypeError:
+		pass
+try:
+	split(1, "x", 1, c=1)
+	raise Exception("SplitWriter accepted c twice")
+except TypeError:
+	pass
+split = _dsutil.SplitWriter(writes, ("a", "b", "c"), ("A", "B", "C"), hashix=0, hashfunc=_dsutil.WriteInt64.hash)
+try:
+	split("bad", "x", "bad")
+	raise Exception("SplitWriter without default_slice accepted a bad value")
+except TypeError:
+	pass
+split.close()
+try:
+	split(1, "x", 1)
+	raise Exception("SplitWriter still works after close")
+except ValueError:
+	pass
+for sliceno in range(3):
+	for w in writers[sliceno]:
+		w.close()
+	for unlink_fn in ("a", "b"):
+		unlink("%s.%d.%s" % (TMP_FN, sliceno, unlink_fn))
+
+print("DictUnicode")
+values = [None if ix % 13 == 0 else "value %d" % (ix % 100,) for ix in range(100000)]
+for compression in _dsutil.compressions:
+	with _dsutil.WriteDictUnicode(TMP_FN, compression=compression, none_support=True) as fh:
+		for v in values:
+			fh.write(v)
+	with _dsutil.ReadDictUnicode(TMP_FN, compression=compression) as fh:
+		res = list(fh)
+	assert res == values, compression
+	assert res[1] is res[101], "DictUnicode values are not shared"
+	dict_size = getsize(TMP_FN)
+	with _dsutil.WriteUnicode(TMP_FN, compression=compression, none_support=True) as fh:
+		for v in values:
+			fh.write(v)
+	assert dict_size < getsize(TMP_FN), compression
+	for sliceno in range(3):
+		with _dsutil.WriteDictUnicode(TMP_FN, compression=compression, none_support=True, hashfilter=(sliceno, 3)) as fh:
+			for v in values:
+				assert fh.hashcheck(v) == (_dsutil.WriteUnicode.hash(v) % 3 == sliceno if v is not None else sliceno == 0)
+				fh.write(v)
+		with _dsutil.ReadDictUnicode(TMP_FN, compression=compression) as fh:
+			res = list(fh)
+		assert res == [v for v in values if (_dsutil.hash(v) % 3 == sliceno if v is not None else sliceno == 0)], compression
+
+unlink(TMP_FN)
+
+print("bloom filters")
+for name, values, missing in (
+	("Int64", list(range(0, 30000, 3)), [1, 2, 30001, -3]),
+	("Number", [1, 2.5, 2 ** 100], [3, 2.25, 2 ** 101]),
+	("Ascii", ["a%d" % (ix,) for ix in range(5000)], ["b", "a5000"]),
+	("DateTime", [datetime(2022, 1, 1, ix % 24) for ix in range(100)], [datetime(2022, 1, 2)]),
+):
+	writer = getattr(_dsutil, "Write" + name)
+	with writer(TMP_FN, none_support=True) as fh:
+		fh.write(values[0])
+	assert fh.bloom_filter is None, "bloom_filter without bloom=True"
+	with writer(TMP_FN, none_support=True, bloom=True) as fh:
+		assert fh.bloom_filter is None, "bloom_filter before close"
+		for v in values:
+			fh.write(v)
+	bloom_filter = fh.bloom_filter
+	assert len(bloom_filter) * 8 >= len(values) * 10, name
+	for v in values:
+		assert _dsutil.bloom_check(bloom_filter, writer.hash(v)), "%s: %r not in bloom filter" % (name, v,)
+	# Could be false positives, but these are known not to be.
+	for v in missing:
+		assert not _dsutil.bloom_check(bloom_filter, writer.hash(v)), "%s: false positive for %r" % (name, v,)
+for bad in (b"", b"x" * 7, b"x" * 24):
+	try:
+		_dsutil.bloom_check(bad, 0)
+		raise Exception("bloom_check accepted a filter of length %d" % (len(bad),))
+	except ValueError:
+		pass
+
+unlink(TMP_FN)
+
+print("stats")
+from accelerator.dsutil import _hll_estimate, _hll_merge, _hist_range
+for name, values, want_distinct, want_hist in (
+	("Int64", [None, 0, 1, 3, -4, None, 1, 1024] * 100, 5, {0: 100, 1: 200, 3: 100, -4: 100, 1024: 100}),
+	("Float64", [0.5, 0.75, None, float("nan"), ninf], 4, {0.5: 2, ninf: 1}),
+	("Number", [2 ** 100, -(2 ** 100), 0.25, None], 3, {2 ** 100: 1, -(2 ** 100): 1, 0.25: 1}),
+	("Ascii", ["a%d" % (ix % 1000,) for ix in range(10000)] + [None], 1000, None),
+	("DateTime", [datetime(2022, 1, 1, ix % 24) for ix in range(100)] + [None], 24, None),
+):
+	writer = getattr(_dsutil, "Write" + name)
+	with writer(TMP_FN, none_support=True) as fh:
+		fh.write(values[0])
+	assert fh.stats() is None, "stats without stats=True"
+	with writer(TMP_FN, none_support=True, stats=True) as fh:
+		for v in values:
+			fh.write(v)
+	none_count, hll, histogram = fh.stats()
+	assert none_count == values.count(None), "%s: none_count %d" % (name, none_count,)
+	distinct = _hll_estimate(hll)
+	assert abs(distinct - want_distinct) <= want_distinct * 0.05, "%s: %d distinct, wanted about %d" % (name, distinct, want_distinct,)
+	assert _hll_estimate(_hll_merge(hll, hll)) == distinct, name
+	if want_hist is None:
+		assert histogram is None, "%s: has histogram" % (name,)
+	else:
+		got = {}
+		for v, cnt in want_hist.items():
+			for k in histogram:
+				low, high = _hist_range(k)
+				if v in (low, high) and v in (0, inf, ninf):
+					hit = True # zero, or one of the bins that ends with inf
+				elif k > 0:
+					hit = (low <= v < high)
+				else:
+					hit = (low < v <= high)
+				if hit:
+					got[v] = histogram[k]
+		assert got == want_hist, "%s: histogram %r" % (name, histogram,)
+		assert sum(histogram.values()) == sum(want_hist.values()), "%s: histogram %r" % (name, histogram,)
+
+unlink(TMP_FN)
+
+print("encodings")
+sorted_ints = [ix * 1000 + ix % 7 for ix in range(150000)]
+sorted_ints[3] = None
+runs = [bool((ix // 1000) % 2) for ix in range(150000)]
+runs[7] = None
+for name, values in (
+	("Int64", sorted_ints),
+	("Int32", [ix // 100 for ix in range(150000)]),
+	("Bits64", [ix * 3 for ix in range(150000)]),
+	("Bool", runs),
+	("DateTime", [datetime(2022, 1, 1) + timedelta(seconds=ix * 7) for ix in range(150000)]),
+	("Date", [date(2022, 1, 1) + timedelta(days=ix // 5000) for ix in range(150000)]),
+	("Time", [time(ix % 24, ix % 60) for ix in range(150000)]),
+):
+	none_support = ("Bits" not in name)
+	for compression in _dsutil.compressions:
+		for encoding in _dsutil.encodings:
+			with getattr(_dsutil, "Write" + name)(TMP_FN, compression=compression, encoding=encoding, none_support=none_support) as fh:
+				assert fh.encoding == encoding
+				for v in values:
+					fh.write(v)
+			blocks = fh.blocks
+			assert len(blocks) == 2, "%s %s %s: %r" % (name, compression, encoding, blocks,)
+			r_mk = partial(getattr(_dsutil, "Read" + name), TMP_FN, compression=compression, encoding=encoding)
+			with r_mk() as fh:
+				assert list(fh) == values, "%s %s %s" % (name, compression, encoding,)
+			with r_mk() as fh:
+				assert fh.skip(100001) == 100001
+				assert list(fh) == values[100001:], "%s %s %s skip" % (name, compression, encoding,)
+			# starting at a block works
+			for ix, offset in enumerate(blocks, 1):
+				start = ix * _dsutil.zone_rows
+				with r_mk(seek=offset, want_count=len(values) - start) as fh:
+					assert list(fh) == values[start:], "%s %s %s block %d" % (name, compression, encoding, ix,)
+# Runs of 1 and 2, and the end of the file in a run
+for values in ([1], [1, 1], [1, 1, 2], [1, 2, 2, 2, None, None, 1, 1]):
+	for encoding in _dsutil.encodings:
+		with _dsutil.WriteInt64(TMP_FN, encoding=encoding, none_support=True) as fh:
+			for v in values:
+				fh.write(v)
+		with _dsutil.ReadInt64(TMP_FN, encoding=encoding) as fh:
+			assert list(fh) == values, "%s %r" % (encoding, values,)
+for typ in (_dsutil.WriteFloat64, _dsutil.ReadFloat64, _dsutil.WriteAscii, _dsutil.ReadNumber):
+	try:
+		typ(TMP_FN, encoding="delta")
+		raise Exception("%r accepted encoding" % (typ,))
+	except (ValueError, TypeError):
+		pass
+try:
+	_dsutil.WriteInt64(TMP_FN, encoding="foo")
+	raise Exception("WriteInt64 accepted a bad encoding")
+except ValueError:
+	pass
+# Encoding makes sorted data smaller
+sizes = []
+for encoding in (None, "delta"):
+	with _dsutil.WriteDateTime(TMP_FN, encoding=encoding) as fh:
+		for ix in range(100000):
+			fh.write(datetime(2022, 1, 1) + timedelta(seconds=ix * 7))
+	sizes.append(getsize(TMP_FN))
+assert sizes[1] * 10 < sizes[0], sizes
+
+unlink(TMP_FN)
+
+print("read_selected")
+selections = (
+	[ix % 3 == 0 for ix in range(150000)],
+	[ix % 20000 < 5 for ix in range(150000)],
+	[True] * 100 + [False] * 140000,
+	[],
+)
+for name, values in sorted(skip_data.items()) + [("Int32", list(range(150000)))]:
+	for compression in _dsutil.compressions:
+		encodings = _dsutil.encodings if name == "Int32" else (None,)
+		for encoding in encodings:
+			kw = dict(compression=compression, encoding=encoding) if encoding else dict(compression=compression)
+			with getattr(_dsutil, "Write" + name)(TMP_FN, none_support=True, **kw) as fh:
+				for v in values:
+					fh.write(v)
+			for selection in selections:
+				with getattr(_dsutil, "Read" + name)(TMP_FN, **kw) as fh:
+					got = fh.read_selected(selection)
+					assert got == list(compress(values, selection)), "%s %s %s" % (name, compression, encoding,)
+					# exactly len(selection) values were consumed
+					assert list(fh) == values[len(selection):], "%s %s %s" % (name, compression, encoding,)
+			with getattr(_dsutil, "Read" + name)(TMP_FN, **kw) as fh:
+				assert fh.read_selected([0, 1, None, "x"]) == [values[1], values[3]]
+with _dsutil.WriteInt64(TMP_FN) as fh:
+	fh.write(1)
+try:
+	_dsutil.ReadInt64(TMP_FN, hashfilter=(0, 2)).read_selected([True])
+	raise Exception("read_selected allowed hashfilter")
+except ValueError:
+	pass
+
+unlink(TMP_FN)
+
+print("where")
+from operator import eq, ne, lt, le, gt, ge
+def where_check(op, value=None):
+	if op == "isnone":
+		return lambda v: v is None
+	if op == "notnone":
+		return lambda v: v is not None
+	if op == "in":
+		return lambda v: v in value
+	if op == "startswith":
+		return lambda v: v is not None and v.startswith(value)
+	cmp = {"==": eq, "!=": ne, "<": lt, "<=": le, ">": gt, ">=": ge}[op]
+	return lambda v: v is not None and cmp(v, value)
+where_data = {
+	"Int64": ([ix - 500 if ix % 7 else None for ix in range(1000)], [0, -3, 499, 10 ** 20, True, 2.5]),
+	"Int32": ([ix // 3 if ix % 5 else None for ix in range(1000)], [0, 100, -1, 2 ** 40]),
+	"Bits64": ([ix * 1000 for ix in range(1000)], [0, 5000, 2 ** 63, -1]),
+	"Bits32": ([ix for ix in range(1000)], [0, 999, 4000000000]),
+	"Float64": ([ix / 4 if ix % 9 else (None if ix % 2 else float("nan")) for ix in range(1000)], [0.5, 100, 2 ** 60 + 1, float("nan"), -0.0]),
+	"Float32": ([ix / 4 if ix % 9 else None for ix in range(1000)], [0.5, 12.25, 3]),
+	"Bool": ([[True, False, None][ix % 3] for ix in range(1000)], [True, False, 1, 0]),
+	"Date": ([date(2000 + ix % 20, 1 + ix % 12, 1) if ix % 11 else None for ix in range(1000)], [date(2010, 5, 1), date(2000, 1, 1), datetime(2010, 5, 1)]),
+	"DateTime": ([datetime(2000, 1, 1, ix % 24, ix % 60) if ix % 11 else None for ix in range(1000)], [datetime(2000, 1, 1, 12, 30), date(2000, 1, 1)]),
+	"Time": ([time(ix % 24, ix % 60) if ix % 11 else None for ix in range(1000)], [time(12, 30), time(0, 0)]),
+	"Bytes": ([b"v%d" % (ix,) if ix % 6 else None for ix in range(1000)] + [b"", b"x" * 300], [b"v5", b"v", b"", b"x" * 300, "v5"]),
+	"Ascii": (["v%d" % (ix,) if ix % 6 else None for ix in range(1000)] + ["", "x" * 300], ["v5", "v", "", "x" * 300]),
+	"Unicode": (["v%d\xe5" % (ix,) if ix % 6 else None for ix in range(1000)] + ["", "\u20ac" * 300], ["v5\xe5", "v", "", "\u20ac", "\xe5"]),
+}
+if version_info[0] < 3:
+	del where_data["Unicode"]
+for name, (values, cmp_values) in sorted(where_data.items()):
+	preds_list = [[("isnone",)], [("notnone",)]]
+	for v in cmp_values:
+		for op in ("==", "!=", "<", "<=", ">", ">="):
+			preds_list.append([(op, v)])
+		if isinstance(v, (str, bytes)) and type(v) is type(values[1]):
+			preds_list.append([("startswith", v)])
+	preds_list.append([("in", frozenset(cmp_values[:2] + [None]))])
+	preds_list.append([("in", frozenset(cmp_values[1:]))])
+	# (NaN is left out, it would only match itself by identity here)
+	preds_list.append([("notnone",), ("!=", cmp_values[0]), ("in", frozenset(v for v in values[::3] if v == v))])
+	for compression in _dsutil.compressions:
+		with getattr(_dsutil, "Write" + name)(TMP_FN, compression=compression, none_support=("Bits" not in name)) as fh:
+			for v in values:
+				fh.write(v)
+		for preds in preds_list:
+			with getattr(_dsutil, "Read" + name)(TMP_FN, compression=compression) as fh:
+				try:
+					checks = [where_check(*p) for p in preds]
+					want_matched = [all(c(v) for c in checks) for v in values]
+				except TypeError:
+					want_matched = None # python can't compare these
+				if not fh.where(preds):
+					continue # values of other types, checked below
+				assert want_matched is not None, "%s %r" % (name, preds,)
+				got_values, got_matched = fh.read_where(len(values) + 10)
+				assert list(bytearray(got_matched)) == want_matched, "%s %s %r" % (name, compression, preds,)
+				assert list(map(repr, got_values)) == list(map(repr, compress(values, want_matched))), "%s %s %r" % (name, compression, preds,)
+			# with a selection, and in pieces
+			with getattr(_dsutil, "Read" + name)(TMP_FN, compression=compression) as fh:
+				if fh.where(preds):
+					selection = [ix % 3 != 1 for ix in range(len(values))]
+					got_values, got_matched = fh.read_where(selection[:500])
+					more_values, more_matched = fh.read_where(bytes(bytearray(selection[500:])))
+					got_values += more_values
+					got_matched += more_matched
+					want_matched = [s and m for s, m in zip(selection, want_matched)]
+					assert list(bytearray(got_matched)) == want_matched, "%s %s %r selection" % (name, compression, preds,)
+					assert list(map(repr, got_values)) == list(map(repr, compress(values, want_matched))), "%s %s %r selection" % (name, compression, preds,)
+# which values can be compared in the reader
+for name, value, ok in (
+	("Int64", 3, True),
+	("Int64", True, True),
+	("Int64", 2.5, False),
+	("Int64", 10 ** 20, False),
+	("Bits64", 2 ** 63, True),
+	("Bits64", -1, False),
+	("Float64", 3, True),
+	("Float64", 2 ** 60 + 1, False),
+	("Float64", float("nan"), True),
+	("Date", date(2000, 1, 1), True),
+	("Date", datetime(2000, 1, 1), False),
+	("DateTime", datetime(2000, 1, 1), True),
+	("DateTime", date(2000, 1, 1), False),
+	("Time", time(1, 2), True),
+	("Bytes", b"a", True),
+	("Bytes", 1, False),
+	("Ascii", "a", True),
+	("Ascii", 1, False),
+):
+	with getattr(_dsutil, "Write" + name)(TMP_FN) as fh:
+		fh.write(where_data[name][0][1])
+	with getattr(_dsutil, "Read" + name)(TMP_FN) as fh:
+		assert fh.where([("==", value)]) == ok, "%s %r" % (name, value,)
+		assert fh.where([("in", [value, value])]) == ok, "%s %r" % (name, value,)
+if version_info[0] > 2:
+	with _dsutil.WriteBytes(TMP_FN) as fh:
+		fh.write(b"a")
+	with _dsutil.ReadBytes(TMP_FN) as fh:
+		assert not fh.where([("==", "a")])
+		assert not fh.where([("in", [b"a", "a"])])
+	with _dsutil.WriteAscii(TMP_FN) as fh:
+		fh.write("a")
+	with _dsutil.ReadAscii(TMP_FN) as fh:
+		assert not fh.where([("==", "\xe5")])
+# encoded columns and several blocks
+for encoding in _dsutil.encodings:
+	values = [ix // 10 for ix in range(200000)]
+	with _dsutil.WriteInt64(TMP_FN, encoding=encoding) as fh:
+		for v in values:
+			fh.write(v)
+	with _dsutil.ReadInt64(TMP_FN, encoding=encoding) as fh:
+		assert fh.where([(">=", 17000), ("<", 17002)])
+		got_values, got_matched = fh.read_where(len(values))
+		assert got_values == [17000] * 10 + [17001] * 10, encoding
+		assert len(got_matched) == len(values)
+for typ in ("Number", "DictUnicode", "Complex64"):
+	with getattr(_dsutil, "Write" + typ)(TMP_FN) as fh:
+		fh.write(1 if typ != "DictUnicode" else "a")
+	with getattr(_dsutil, "Read" + typ)(TMP_FN) as fh:
+		assert not fh.where([("==", 1)]), typ
+		try:
+			fh.read_where(1)
+			raise Exception("%s allowed read_where without predicates" % (typ,))
+		except ValueError:
+			pass
+
+print("RowIter")
+with _dsutil.WriteInt64(TMP_FN) as fh:
+	for ix in range(10):
+		fh.write(ix)
+def int_reader():
+	return _dsutil.ReadInt64(TMP_FN)
+def mkrows(**kw):
+	return list(_dsutil.RowIter([int_reader(), iter("abcdefghij"), iter(range(100, 120))], **kw))
+want = [(ix, "abcdefghij"[ix], ix + 100) for ix in range(10)]
+assert mkrows() == want
+assert list(_dsutil.RowIter([int_reader()], want_tuple=False)) == list(range(10))
+# dict translators give None for missing values, functions are called
+got = mkrows(translators={0: {3: "three", 4: 4.0}, 2: str})
+assert got == [({3: "three", 4: 4.0}.get(a), b, str(c)) for a, b, c in want], got
+# None (and bool) filters use the value directly, and happen after translation
+assert mkrows(filters={0: None}) == want[1:]
+assert mkrows(filters={0: bool}, translators={0: {3: 0, 4: 1}}) == [(1, "e", 104)]
+assert mkrows(filters={1: lambda v: v in "bcd", 2: lambda v: v != 102}) == [want[1], want[3]]
+# range never matches None, either end may be None
+got = mkrows(range=(0, 2, 5))
+assert got == want[2:5], got
+assert mkrows(range=(0, None, 2)) == want[:2]
+assert mkrows(range=(0, 8, None)) == want[8:]
+got = mkrows(range=(0, 2, None), translators={0: {2: 2, 5: 5}})
+assert got == [(2, "c", 102), (5, "f", 105)], got
+# stops at the shortest reader
+assert len(list(_dsutil.RowIter([int_reader(), iter("ab")]))) == 2
+# errors from user functions propagate
+def bad(v):
+	raise ZeroDivisionError()
+for kw in ({"translators": {1: bad}}, {"filters": {2: bad}}):
+	try:
+		mkrows(**kw)
+		raise Exception("RowIter swallowed an exception with %r" % (kw,))
+	except ZeroDivisionError:
+		pass
+for args, kw in (
+	([], {}),
+	([int_reader(), int_reader()], {"want_tuple": False}),
+	([int_reader()], {"translators": {1: str}}),
+	([int_reader()], {"filters": {-1: None}}),
+	([int_reader()], {"range": (0, 1)}),
+):
+	try:
+		_dsutil.RowIter(args, **kw)
+		raise Exception("RowIter accepted %r, %r" % (args, kw,))
+	except (ValueError, TypeError):
+		pass
+
+print("RoundRobin")
+got = list(_dsutil.RoundRobin([iter("abc"), iter(""), "de", [1, 2, 3, 4]]))
+assert got == ["a", "d", 1, "b", "e", 2, "c", 3, 4], got
+assert list(_dsutil.RoundRobin([])) == []
+assert list(_dsutil.RoundRobin([[], ()])) == []
+with _dsutil.WriteInt64(TMP_FN) as fh:
+	for ix in range(5):
+		fh.write(ix)
+got = list(_dsutil.RoundRobin([_dsutil.ReadInt64(TMP_FN), _dsutil.ReadInt64(TMP_FN, want_count=2)]))
+assert got == [0, 0, 1, 1, 2, 3, 4], got
+def bad():
+	yield 1
+	raise ZeroDivisionError()
+it = _dsutil.RoundRobin([bad(), range(10)])
+assert next(it) == 1 and next(it) == 0
+try:
+	next(it)
+	raise Exception("RoundRobin swallowed an exception")
+except ZeroDivisionError:
+	pass
+try:
+	_dsutil.RoundRobin([1])
+	raise Exception("RoundRobin accepted a non-iterable")
+except TypeError:
+	pass
+
 unlink(TMP_FN)
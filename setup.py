@@ -98,12 +98,23 @@ def mk_file(fn, contents):
 def mk_ext(name, *sources):
 	zlib = os.environ.get('ACCELERATOR_BUILD_STATIC_ZLIB')
 	if zlib:
-		kw = dict(extra_objects=[zlib])
+		kw = dict(extra_objects=[zlib], libraries=[])
 	else:
 		kw = dict(libraries=['z'])
+	# zstd is optional, set ACCELERATOR_BUILD_ZSTD to 1 to use the system
+	# libzstd or to the path of a static libzstd.a.
+	zstd = os.environ.get('ACCELERATOR_BUILD_ZSTD')
+	if zstd:
+		kw['define_macros'] = [('DSU_HAVE_ZSTD', '1')]
+		if zstd == '1':
+			kw['libraries'].append('zstd')
+		else:
+			kw.setdefault('extra_objects', []).append(zstd)
 	return Extension(
 		name,
-		sources=list(sources),
+		sources=list(sources) + ['accelerator/csrc/lz4.c'],
+		include_dirs=['accelerator/csrc'],
+		depends=['accelerator/csrc/compression.h', 'accelerator/csrc/lz4.h'],
 		extra_compile_args=['-std=c99', '-O3', '-fvisibility=hidden'],
 		**kw
 	)
@@ -143,6 +154,8 @@ setup(
 
 	package_data={
 		'': ['*.txt', 'methods.conf', 'board/*.tpl', 'examples/*.csv'],
+		# for the cffi fallback in standard_methods/c_backend_support.py
+		'accelerator': ['csrc/*.h', 'csrc/*.c', 'csrc/*.LICENSE'],
 	},
 
 	author="Carl Drougge",